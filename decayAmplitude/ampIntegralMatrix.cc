@@ -31,6 +31,8 @@
 //-------------------------------------------------------------------------
 
 
+#include <cmath>
+
 #include <boost/progress.hpp>
 #include <boost/numeric/conversion/cast.hpp>
 
@@ -55,6 +57,78 @@ using namespace boost::accumulators;
 using namespace rpwa;
 
 
+namespace {
+
+	// number of amplitude values per wave which are summed up in one block
+	const size_t ampBlockSize  = 256;
+	// number of waves whose rows are processed together, so that their
+	// amplitudes stay in the cache while they are multiplied with other waves
+	const size_t waveBlockSize = 16;
+	// minimum number of events before the integration may be stopped
+	// because the target precision is reached, so that the variance
+	// estimates are reliable
+	const unsigned long minNmbEventsPrecision = 1000;
+
+	// adds sum_k weightedAmps[i][k] * conj(amps[j][k]) to products[i][j] for
+	// the upper triangle (j >= i) of the nmbWaves x nmbWaves row-major matrix
+	// products, skipping the elements with j < firstWave; weightedAmps may be
+	// the same as amps. the complex products are written out in real and
+	// imaginary parts so that the compiler can vectorize the inner loop
+	void
+	addHermitianProducts(const vector<const complex<double>*>& amps,
+	                     const vector<const complex<double>*>& weightedAmps,
+	                     const size_t                          nmbAmps,
+	                     const size_t                          firstWave,
+	                     vector<complex<double> >&             products)
+	{
+		const size_t nmbWaves = amps.size();
+		for (size_t blockI = 0; blockI < nmbWaves; blockI += waveBlockSize)
+			for (size_t blockJ = blockI; blockJ < nmbWaves; blockJ += waveBlockSize) {
+				const size_t endI = min(blockI + waveBlockSize, nmbWaves);
+				const size_t endJ = min(blockJ + waveBlockSize, nmbWaves);
+				if (endJ <= firstWave)
+					continue;
+				for (size_t iWave = blockI; iWave < endI; ++iWave) {
+					const double* ampsI = reinterpret_cast<const double*>(weightedAmps[iWave]);
+					for (size_t jWave = max(max(blockJ, iWave), firstWave); jWave < endJ; ++jWave) {
+						const double* ampsJ = reinterpret_cast<const double*>(amps[jWave]);
+						double re = 0;
+						double im = 0;
+						for (size_t k = 0; k < 2 * nmbAmps; k += 2) {
+							re += ampsI[k] * ampsJ[k] + ampsI[k + 1] * ampsJ[k + 1];
+							im += ampsI[k + 1] * ampsJ[k] - ampsI[k] * ampsJ[k + 1];
+						}
+						products[iWave * nmbWaves + jWave] += complex<double>(re, im);
+					}
+				}
+			}
+	}
+
+	// adds sum_k values[i][k] * values[j][k] to products[i][j] for the upper
+	// triangle (j >= i) of the nmbWaves x nmbWaves row-major matrix products
+	void
+	addSymmetricProducts(const vector<const double*>& values,
+	                     const size_t                 nmbValues,
+	                     vector<double>&              products)
+	{
+		const size_t nmbWaves = values.size();
+		for (size_t blockI = 0; blockI < nmbWaves; blockI += waveBlockSize)
+			for (size_t blockJ = blockI; blockJ < nmbWaves; blockJ += waveBlockSize) {
+				const size_t endI = min(blockI + waveBlockSize, nmbWaves);
+				const size_t endJ = min(blockJ + waveBlockSize, nmbWaves);
+				for (size_t iWave = blockI; iWave < endI; ++iWave)
+					for (size_t jWave = max(blockJ, iWave); jWave < endJ; ++jWave) {
+						double sum = 0;
+						for (size_t k = 0; k < nmbValues; ++k)
+							sum += values[iWave][k] * values[jWave][k];
+						products[iWave * nmbWaves + jWave] += sum;
+					}
+			}
+	}
+
+}
+
+
 ClassImp(ampIntegralMatrix);
 
 
@@ -67,6 +141,8 @@ ampIntegralMatrix::ampIntegralMatrix()
 	  _nmbWaves             (0),
 	  _waveNames            (),
 	  _nmbEvents            (0),
+	  _weightSum            (0),
+	  _precision            (0),
 	  _integrals            (),
 	  _intStorageShape      (),
 	  _intStorageNmbElements(0),
@@ -93,6 +169,8 @@ ampIntegralMatrix::clear()
 {
 	_nmbWaves  = 0;
 	_nmbEvents = 0;
+	_weightSum = 0;
+	_precision = 0;
 	_waveNames.clear();
 	_integrals.resize(extents[0][0]);
 	_intStorageShape.clear();
@@ -110,6 +188,8 @@ ampIntegralMatrix::operator =(const ampIntegralMatrix& integral)
 		_nmbWaves           = integral._nmbWaves;
 		_waveNames          = integral._waveNames;
 		_nmbEvents          = integral._nmbEvents;
+		_weightSum          = integral._weightSum;
+		_precision          = integral._precision;
 		// multiarray's = operator does not seem to set shape correctly
 		// setting manually prevents crash in glibc
 		const sizeType* shape = integral._integrals.shape();
@@ -136,6 +216,7 @@ ampIntegralMatrix::operator +=(const ampIntegralMatrix& integral)
 			_integrals[i][j] += integral.matrix()[integral.waveIndex(waveNameI)][integral.waveIndex(waveName(j))];
 	}
 	_nmbEvents       += integral.nmbEvents();
+	_weightSum       += integral.weightSum();
 	_waveDescriptions = integral._waveDescriptions;
 	return *this;
 }
@@ -156,6 +237,7 @@ ampIntegralMatrix::operator -=(const ampIntegralMatrix& integral)
 			_integrals[i][j] -= integral.matrix()[integral.waveIndex(waveNameI)][integral.waveIndex(waveName(j))];
 	}
 	_nmbEvents       -= integral.nmbEvents();
+	_weightSum       -= integral.weightSum();
 	_waveDescriptions = integral._waveDescriptions;
 	return *this;
 }
@@ -168,6 +250,7 @@ ampIntegralMatrix::operator *=(const double factor)
 		for (unsigned int j = 0; j < _nmbWaves; ++j)
 			_integrals[i][j] *= factor;
 	_nmbEvents *= factor;
+	_weightSum *= factor;
 	return *this;
 }
 
@@ -179,6 +262,7 @@ ampIntegralMatrix::operator /=(const double factor)
 		for (unsigned int j = 0; j < _nmbWaves; ++j)
 			_integrals[i][j] /= factor;
 	_nmbEvents /= factor;
+	_weightSum /= factor;
 	return *this;
 }
 
@@ -284,21 +368,144 @@ ampIntegralMatrix::addEvent(map<string, complex<double> > &amplitudes)
 			return false;
 		}
 	}
+	vector<const complex<double>*> amps(_nmbWaves);
+	for (size_t iWave = 0; iWave < _nmbWaves; ++iWave)
+		amps[iWave] = &amplitudes[_waveNames[iWave]];
+	// a single event is added directly to the upper triangle and its
+	// hermitian conjugate, without the buffer of addProducts()
 	for (size_t iWave = 0; iWave < _nmbWaves; ++iWave) {
-		complex<double> iAmp = amplitudes[_waveNames[iWave]];
-		for (size_t jWave = 0; jWave < _nmbWaves; ++jWave) {
-			complex<double> jAmp = amplitudes[_waveNames[jWave]];
-			_integrals[iWave][jWave] += iAmp * conj(jAmp);
+		_integrals[iWave][iWave] += norm(*amps[iWave]);
+		for (size_t jWave = iWave + 1; jWave < _nmbWaves; ++jWave) {
+			const complex<double> product = (*amps[iWave]) * conj(*amps[jWave]);
+			_integrals[iWave][jWave] += product;
+			_integrals[jWave][iWave] += conj(product);
 		}
 	}
 	++_nmbEvents;
+	++_weightSum;
+	return true;
+}
+
+bool
+ampIntegralMatrix::addEvents(const vector<vector<complex<double> > >& amplitudes)
+{
+	if (amplitudes.size() != _nmbWaves) {
+		printErr << "got amplitudes for " << amplitudes.size() << " waves, "
+		         << "but integral matrix has " << _nmbWaves << " waves." << endl;
+		return false;
+	}
+	if (_nmbWaves == 0)
+		return true;
+	const size_t nmbEvents = amplitudes[0].size();
+	for (size_t iWave = 1; iWave < _nmbWaves; ++iWave) {
+		if (amplitudes[iWave].size() != nmbEvents) {
+			printErr << "got " << amplitudes[iWave].size() << " amplitudes for wave '" << _waveNames[iWave] << "', "
+			         << "but " << nmbEvents << " for wave '" << _waveNames[0] << "'." << endl;
+			return false;
+		}
+	}
+	vector<const complex<double>*> amps(_nmbWaves);
+	for (size_t firstEvent = 0; firstEvent < nmbEvents; firstEvent += ampBlockSize) {
+		for (size_t iWave = 0; iWave < _nmbWaves; ++iWave)
+			amps[iWave] = amplitudes[iWave].data() + firstEvent;
+		addProducts(amps, amps, min(ampBlockSize, nmbEvents - firstEvent));
+	}
+	_nmbEvents += nmbEvents;
+	_weightSum += nmbEvents;
+	return true;
+}
+
+void
+ampIntegralMatrix::addProducts(const vector<const complex<double>*>& amps,
+                               const vector<const complex<double>*>& weightedAmps,
+                               const size_t                          nmbAmps)
+{
+	// the matrix is hermitian, so only the upper triangle is summed up
+	vector<complex<double> > products(_nmbWaves * _nmbWaves, 0);
+	addHermitianProducts(amps, weightedAmps, nmbAmps, 0, products);
+	for (size_t iWave = 0; iWave < _nmbWaves; ++iWave) {
+		_integrals[iWave][iWave] += products[iWave * _nmbWaves + iWave].real();
+		for (size_t jWave = iWave + 1; jWave < _nmbWaves; ++jWave) {
+			_integrals[iWave][jWave] += products[iWave * _nmbWaves + jWave];
+			_integrals[jWave][iWave] += conj(products[iWave * _nmbWaves + jWave]);
+		}
+	}
+}
+
+bool
+ampIntegralMatrix::merge(const ampIntegralMatrix& integral)
+{
+	if (_nmbWaves == 0 and _nmbEvents == 0) {
+		*this = integral;
+		return true;
+	}
+	if (not hasIdenticalWaveSet(integral)) {
+		printErr << "cannot merge integral matrices with different wave sets." << endl;
+		return false;
+	}
+	if (integral.nmbEvents() == 0)
+		return true;
+	// weighted integrals are normalized to nmbEvents / weightSum, so the
+	// normalization is undone before summing up; for unweighted integrals
+	// all factors are one and the matrices are simply added
+	const unsigned long totalNmbEvents = _nmbEvents + integral.nmbEvents();
+	const double        totalWeightSum = _weightSum + integral.weightSum();
+	const double        factor         = (_nmbEvents > 0) ? _weightSum / _nmbEvents : 0;
+	const double        factorOther    = integral.weightSum() / integral.nmbEvents();
+	const double        norm           = totalNmbEvents / totalWeightSum;
+	for (unsigned int i = 0; i < _nmbWaves; ++i) {
+		const string waveNameI = waveName(i);
+		for (unsigned int j = 0; j < _nmbWaves; ++j) {
+			const complex<double> other = integral.matrix()[integral.waveIndex(waveNameI)][integral.waveIndex(waveName(j))];
+			_integrals[i][j] = (factor * _integrals[i][j] + factorOther * other) * norm;
+		}
+	}
+	_nmbEvents = totalNmbEvents;
+	_weightSum = totalWeightSum;
 	return true;
 }
 
 bool
 ampIntegralMatrix::integrate(const vector<const amplitudeMetadata*>& ampMetadata,
                              const unsigned long                     maxNmbEvents,
-                             const string&                           weightFileName)
+                             const string&                           weightFileName,
+                             const unsigned long                     startEvent,
+                             const double                            targetPrecision)
+{
+	return integrateEvents(ampMetadata, maxNmbEvents, weightFileName, startEvent, targetPrecision, 0, 0);
+}
+
+
+bool
+ampIntegralMatrix::integrateWithAcceptance(const vector<const amplitudeMetadata*>& ampMetadata,
+                                           const vector<double>&                   acceptance,
+                                           ampIntegralMatrix&                      acceptedIntegral,
+                                           const unsigned long                     maxNmbEvents,
+                                           const string&                           weightFileName,
+                                           const unsigned long                     startEvent)
+{
+	if (&acceptedIntegral == this) {
+		printErr << "integral of accepted events has to be a different object. cannot calculate integral." << endl;
+		return false;
+	}
+	for (size_t iEvent = 0; iEvent < acceptance.size(); ++iEvent)
+		if (acceptance[iEvent] < 0) {
+			printErr << "acceptance " << acceptance[iEvent] << " of event " << iEvent << " is negative. "
+			         << "cannot calculate integral." << endl;
+			return false;
+		}
+	return integrateEvents(ampMetadata, maxNmbEvents, weightFileName, startEvent, 0, &acceptance, &acceptedIntegral);
+}
+
+
+bool
+ampIntegralMatrix::integrateEvents(const vector<const amplitudeMetadata*>& ampMetadata,
+                                   const unsigned long                     maxNmbEvents,
+                                   const string&                           weightFileName,
+                                   const unsigned long                     startEvent,
+                                   const double                            targetPrecision,
+                                   const vector<double>*                   acceptance,
+                                   ampIntegralMatrix*                      acceptedIntegral)
 {
 	if (ampMetadata.empty()) {
 		printWarn << "did not receive any amplitude trees. cannot calculate integral." << endl;
@@ -324,28 +531,31 @@ ampIntegralMatrix::integrate(const vector<const amplitudeMetadata*>& ampMetadata
 		printErr << "integral matrix was already initialized, but with a different number of waves. Aborting..." << endl;
 		return false;
 	}
-	const unsigned long nmbEvents = (unsigned long) ampMetadata[0]->amplitudeTree()->GetEntries();
+	const unsigned long nmbEvents = (unsigned long) ampMetadata[0]->nmbAmplitudes();
 	if (nmbEvents == 0) {
 		printWarn << "amplitude trees contain no amplitudes values. cannot calculate integral." << endl;
 		return false;
 	}
 	for (size_t i = 1; i < ampMetadata.size(); i++) {
-		if (nmbEvents != (unsigned int) ampMetadata[i]->amplitudeTree()->GetEntries()) {
+		if (nmbEvents != (unsigned long) ampMetadata[i]->nmbAmplitudes()) {
 			printErr << "amplitude trees do not all have the same entry count." << endl;
 			return false;
 		}
 	}
+	if (startEvent >= nmbEvents) {
+		printErr << "start event " << startEvent << " is outside of the amplitude trees with "
+		         << nmbEvents << " entries. cannot calculate integral." << endl;
+		return false;
+	}
 	if (maxNmbEvents == 0)
-		_nmbEvents = nmbEvents;
+		_nmbEvents = nmbEvents - startEvent;
 	else
-		_nmbEvents = min(nmbEvents, maxNmbEvents);
-	// set amplitude tree leafs
-	vector<amplitudeTreeLeaf*> ampTreeLeafs(_nmbWaves);
-	for(size_t waveIndex = 0; waveIndex < _nmbWaves; waveIndex++) {
-		ampTreeLeafs[waveIndex] = NULL;
-		ampMetadata[waveIndex]->amplitudeTree()->SetBranchAddress(rpwa::amplitudeMetadata::amplitudeLeafName.c_str(), &ampTreeLeafs[waveIndex]);
+		_nmbEvents = min(nmbEvents - startEvent, maxNmbEvents);
+	if (acceptance and acceptance->size() < startEvent + _nmbEvents) {
+		printErr << "got acceptances for " << acceptance->size() << " events, "
+		         << "but need " << startEvent + _nmbEvents << ". cannot calculate integral." << endl;
+		return false;
 	}
-
 	// make sure that either all or none of the waves have description (needed?)
 	if (not allWavesHaveDesc())
 		_waveDescriptions.clear();
@@ -354,6 +564,117 @@ ampIntegralMatrix::integrate(const vector<const amplitudeMetadata*>& ampMetadata
 	//_integrals.clear();
 	_integrals.resize(extents[_nmbWaves][_nmbWaves]);
 
+	double weightSum = 0;
+	const bool success = sumAmplitudeProducts(ampMetadata, startEvent, weightFileName, 0, targetPrecision, false, weightSum,
+	                                          acceptance, acceptedIntegral);
+	_weightSum = weightSum;
+
+	printSucc << "calculated integrals of " << _nmbWaves << " amplitude(s) "
+	          << "for " << _nmbEvents << " events" << endl;
+	if (acceptedIntegral)
+		printSucc << "calculated integrals of accepted events for " << acceptedIntegral->nmbEvents() << " "
+		          << "accepted events" << endl;
+	if (targetPrecision > 0)
+		printInfo << "achieved relative precision of integrals is " << _precision << " "
+		          << "(target " << targetPrecision << ")" << endl;
+	return success;
+}
+
+
+bool
+ampIntegralMatrix::addWaves(const vector<const amplitudeMetadata*>& ampMetadata,
+                            const string&                           weightFileName,
+                            const unsigned long                     startEvent)
+{
+	const unsigned int nmbOldWaves = _nmbWaves;
+	if (nmbOldWaves == 0 or _nmbEvents == 0) {
+		printErr << "integral matrix is empty. cannot add waves." << endl;
+		return false;
+	}
+	if (ampMetadata.size() <= nmbOldWaves) {
+		printErr << "got " << ampMetadata.size() << " amplitudes for an integral matrix with "
+		         << nmbOldWaves << " waves. no waves to add." << endl;
+		return false;
+	}
+	for (size_t i = 0; i < ampMetadata.size(); ++i) {
+		const string waveName = ampMetadata[i]->objectBaseName();
+		if (i < nmbOldWaves and waveName != _waveNames[i]) {
+			printErr << "the amplitudes of the waves in the integral matrix have to be given first "
+			         << "and in the same order (expected '" << _waveNames[i] << "', got '" << waveName << "')." << endl;
+			return false;
+		}
+		if (i >= nmbOldWaves and containsWave(waveName)) {
+			printErr << "wave '" << waveName << "' is already in the integral matrix." << endl;
+			return false;
+		}
+		if ((unsigned long)ampMetadata[i]->nmbAmplitudes() < startEvent + _nmbEvents) {
+			printErr << "amplitudes of wave '" << waveName << "' do not cover the "
+			         << _nmbEvents << " events of the integral matrix starting at event " << startEvent << "." << endl;
+			return false;
+		}
+	}
+	printInfo << "adding " << ampMetadata.size() - nmbOldWaves << " wave(s) to integral matrix "
+	          << "of " << nmbOldWaves << " wave(s)" << endl;
+	// only the new rows and columns are calculated, resizing keeps the
+	// existing elements
+	const vector<string> oldWaveNames = _waveNames;
+	for (size_t i = nmbOldWaves; i < ampMetadata.size(); ++i)
+		_waveNames.push_back(ampMetadata[i]->objectBaseName());
+	_nmbWaves = _waveNames.size();
+	_integrals.resize(extents[_nmbWaves][_nmbWaves]);
+	double weightSum = 0;
+	// the precision of the new elements is estimated only if that of the
+	// existing ones is known
+	const double oldPrecision = _precision;
+	bool success = sumAmplitudeProducts(ampMetadata, startEvent, weightFileName, nmbOldWaves, 0, oldPrecision > 0,
+	                                    weightSum, 0, 0);
+	if (success and fabs(weightSum - _weightSum) > 1e-9 * _weightSum) {
+		printErr << "sum of weights of the events (" << weightSum << ") differs from that of the integral matrix "
+		         << "(" << _weightSum << "). events or weights do not match those the integral was calculated with." << endl;
+		success = false;
+	}
+	if (not success) {
+		_waveNames = oldWaveNames;
+		_nmbWaves  = nmbOldWaves;
+		_integrals.resize(extents[_nmbWaves][_nmbWaves]);
+		_precision = oldPrecision;
+		return false;
+	}
+	if (oldPrecision > 0)
+		_precision = max(oldPrecision, _precision);
+	// the descriptions of the new waves are not known
+	_waveDescriptions.clear();
+
+	printSucc << "calculated integrals of " << _nmbWaves - nmbOldWaves << " new amplitude(s) "
+	          << "for " << _nmbEvents << " events" << endl;
+	return true;
+}
+
+
+bool
+ampIntegralMatrix::sumAmplitudeProducts(const vector<const amplitudeMetadata*>& ampMetadata,
+                                        const unsigned long                     startEvent,
+                                        const string&                           weightFileName,
+                                        const unsigned int                      firstWave,
+                                        const double                            targetPrecision,
+                                        const bool                              estimatePrecision,
+                                        double&                                 weightSum,
+                                        const vector<double>*                   acceptance,
+                                        ampIntegralMatrix*                      acceptedIntegral)
+{
+	// set amplitude tree leafs; amplitudes of columnar files are read from the mapped data
+	vector<amplitudeTreeLeaf*> ampTreeLeafs(_nmbWaves);
+	vector<const complex<double>*> mappedAmps(_nmbWaves);
+	vector<const complex<float>*> mappedSinglePrecisionAmps(_nmbWaves);
+	for(size_t waveIndex = 0; waveIndex < _nmbWaves; waveIndex++) {
+		ampTreeLeafs[waveIndex] = NULL;
+		mappedAmps[waveIndex] = ampMetadata[waveIndex]->amplitudeData();
+		mappedSinglePrecisionAmps[waveIndex] = ampMetadata[waveIndex]->singlePrecisionAmplitudeData();
+		if (not mappedAmps[waveIndex] and not mappedSinglePrecisionAmps[waveIndex])
+			ampMetadata[waveIndex]->amplitudeTree()->SetBranchAddress(rpwa::amplitudeMetadata::amplitudeLeafName.c_str(), &ampTreeLeafs[waveIndex]);
+	}
+
+
 	// open importance sampling weight file
 	//!!! this should be provided as a friend tree for the amlitudes
 	ifstream weightFile;
@@ -368,17 +689,112 @@ ampIntegralMatrix::integrate(const vector<const amplitudeMetadata*>& ampMetadata
 			return false;
 		}
 		useWeight = true;
+		// skip the weights of the events before the start event
+		for (unsigned long iEvent = 0; iEvent < startEvent; ++iEvent) {
+			double w;
+			if (not (weightFile >> w)) {
+				printWarn << "weight file '" << weightFileName << "' ends before start event " << startEvent << ". "
+				          << "cannot calculate integral." << endl;
+				return false;
+			}
+		}
 	}
 
-	// loop over events and calculate integral matrix
+	// loop over events and calculate integral matrix; the amplitudes are
+	// collected in blocks of events (incoherent sub-amplitudes are treated
+	// like additional events) whose products are summed up for the upper
+	// triangle of the hermitian matrix and added to the accumulators.
+	// if the precision is estimated, also the sums of the squared
+	// magnitudes of the products are kept, from which the statistical
+	// uncertainties of the matrix elements are estimated. if acceptances
+	// are given, the products weighted with the acceptance of the events
+	// are summed up in the same pass for the integral of accepted events
 	accumulator_set<double, stats<tag::sum(compensated)> > weightAcc;
 	typedef accumulator_set<complex<double>, stats<tag::sum(compensated)> > complexAcc;
 	vector<vector<complexAcc> > ampProdAcc(_nmbWaves, vector<complexAcc>(_nmbWaves));
+	size_t                   blockSize = ampBlockSize;
+	vector<complex<double> > ampBlock(_nmbWaves * blockSize);
+	vector<complex<double> > weightedAmpBlock(useWeight ? _nmbWaves * blockSize : 0);
+	vector<const complex<double>*> ampRows(_nmbWaves);
+	vector<const complex<double>*> weightedAmpRows(_nmbWaves);
+	vector<complex<double> > blockProducts(_nmbWaves * _nmbWaves);
+	size_t                   nmbBlockAmps = 0;
+	const bool               integrateAccepted = (acceptance and acceptedIntegral);
+	accumulator_set<double, stats<tag::sum(compensated)> > accWeightAcc;
+	accumulator_set<double, stats<tag::sum(compensated)> > acceptanceAcc;
+	vector<vector<complexAcc> > accProdAcc(integrateAccepted ? _nmbWaves : 0, vector<complexAcc>(_nmbWaves));
+	vector<complex<double> > accWeightedAmpBlock(integrateAccepted ? _nmbWaves * blockSize : 0);
+	vector<const complex<double>*> accWeightedAmpRows(_nmbWaves);
+	const bool               trackPrecision = (targetPrecision > 0 or estimatePrecision);
+	vector<double>           absSqBlock(trackPrecision ? _nmbWaves * blockSize : 0);
+	vector<double>           absSqSums(trackPrecision ? _nmbWaves : 0, 0);
+	vector<const double*>    absSqRows(_nmbWaves);
+	vector<double>           absSqProducts(trackPrecision ? _nmbWaves * _nmbWaves : 0, 0);
+	unsigned long            nmbSummedAmps = 0;
+	// sums up the products of the amplitudes in the block
+	const auto addBlock = [&]() {
+		if (nmbBlockAmps == 0)
+			return;
+		for (unsigned int waveIndex = 0; waveIndex < _nmbWaves; ++waveIndex) {
+			ampRows[waveIndex] = &ampBlock[waveIndex * blockSize];
+			weightedAmpRows[waveIndex] = useWeight ? &weightedAmpBlock[waveIndex * blockSize] : ampRows[waveIndex];
+		}
+		fill(blockProducts.begin(), blockProducts.end(), complex<double>(0));
+		addHermitianProducts(ampRows, weightedAmpRows, nmbBlockAmps, firstWave, blockProducts);
+		for (unsigned int waveIndexI = 0; waveIndexI < _nmbWaves; ++waveIndexI)
+			for (unsigned int waveIndexJ = max(waveIndexI, firstWave); waveIndexJ < _nmbWaves; ++waveIndexJ)
+				ampProdAcc[waveIndexI][waveIndexJ](blockProducts[waveIndexI * _nmbWaves + waveIndexJ]);
+		if (integrateAccepted) {
+			for (unsigned int waveIndex = 0; waveIndex < _nmbWaves; ++waveIndex)
+				accWeightedAmpRows[waveIndex] = &accWeightedAmpBlock[waveIndex * blockSize];
+			fill(blockProducts.begin(), blockProducts.end(), complex<double>(0));
+			addHermitianProducts(ampRows, accWeightedAmpRows, nmbBlockAmps, firstWave, blockProducts);
+			for (unsigned int waveIndexI = 0; waveIndexI < _nmbWaves; ++waveIndexI)
+				for (unsigned int waveIndexJ = max(waveIndexI, firstWave); waveIndexJ < _nmbWaves; ++waveIndexJ)
+					accProdAcc[waveIndexI][waveIndexJ](blockProducts[waveIndexI * _nmbWaves + waveIndexJ]);
+		}
+		if (trackPrecision) {
+			// |w a_i a_j^*|^2 = (w |a_i|^2) (w |a_j|^2)
+			for (unsigned int waveIndex = 0; waveIndex < _nmbWaves; ++waveIndex) {
+				for (size_t ampIndex = 0; ampIndex < nmbBlockAmps; ++ampIndex) {
+					absSqBlock[waveIndex * blockSize + ampIndex] = real(weightedAmpRows[waveIndex][ampIndex] * conj(ampRows[waveIndex][ampIndex]));
+					absSqSums[waveIndex] += absSqBlock[waveIndex * blockSize + ampIndex];
+				}
+				absSqRows[waveIndex] = &absSqBlock[waveIndex * blockSize];
+			}
+			addSymmetricProducts(absSqRows, nmbBlockAmps, absSqProducts);
+		}
+		nmbSummedAmps += nmbBlockAmps;
+		nmbBlockAmps = 0;
+	};
+	// returns the largest estimated relative uncertainty of the calculated
+	// matrix elements; the uncertainties of the off-diagonal elements are taken
+	// relative to sqrt(I_ii I_jj), so that elements which are small compared
+	// to the diagonal do not need a high relative precision. waves with
+	// vanishing amplitudes are ignored
+	const auto relativeUncertainty = [&]() {
+		double maxUncertainty = 0;
+		const double n = nmbSummedAmps;
+		for (unsigned int waveIndexI = 0; waveIndexI < _nmbWaves; ++waveIndexI) {
+			const double meanI = absSqSums[waveIndexI] / n;
+			if (meanI <= 0)
+				continue;
+			for (unsigned int waveIndexJ = max(waveIndexI, firstWave); waveIndexJ < _nmbWaves; ++waveIndexJ) {
+				const double meanJ = absSqSums[waveIndexJ] / n;
+				if (meanJ <= 0)
+					continue;
+				const complex<double> mean     = sum(ampProdAcc[waveIndexI][waveIndexJ]) / n;
+				const double          variance = max(absSqProducts[waveIndexI * _nmbWaves + waveIndexJ] / n - norm(mean), 0.);
+				maxUncertainty = max(maxUncertainty, sqrt(variance / n / (meanI * meanJ)));
+			}
+		}
+		return maxUncertainty;
+	};
 	// process weight file and amplitudes
 	vector<vector<complex<double> > > amps(_nmbWaves);
 	progress_display progressIndicator(_nmbEvents, cout, "");
 	bool             success = true;
-	for (unsigned long iEvent = 0; iEvent < _nmbEvents; ++iEvent) {
+	for (unsigned long iEvent = startEvent; iEvent < startEvent + _nmbEvents; ++iEvent) {
 		++progressIndicator;
 
 		// sum up importance sampling weight
@@ -392,9 +808,23 @@ ampIntegralMatrix::integrate(const vector<const amplitudeMetadata*>& ampMetadata
 			}
 		const double weight = 1 / w; // we have to undo the weighting of the events!
 		weightAcc(weight);
+		const double accWeight = integrateAccepted ? (*acceptance)[iEvent] * weight : 0;
+		if (integrateAccepted) {
+			accWeightAcc(accWeight);
+			acceptanceAcc((*acceptance)[iEvent]);
+		}
 
 		// read amplitude values for this event from root trees
 		for (unsigned int waveIndex = 0; waveIndex < _nmbWaves; ++waveIndex) {
+			if (mappedAmps[waveIndex]) {
+				amps[waveIndex].assign(1, mappedAmps[waveIndex][iEvent]);
+				continue;
+			}
+			if (mappedSinglePrecisionAmps[waveIndex]) {
+				// single-precision amplitudes are accumulated in double precision
+				amps[waveIndex].assign(1, complex<double>(mappedSinglePrecisionAmps[waveIndex][iEvent]));
+				continue;
+			}
 			ampMetadata[waveIndex]->amplitudeTree()->GetEntry(iEvent);
 			const unsigned int nmbSubAmps = ampTreeLeafs[waveIndex]->nmbIncohSubAmps();
 			if (nmbSubAmps < 1) {
@@ -409,43 +839,104 @@ ampIntegralMatrix::integrate(const vector<const amplitudeMetadata*>& ampMetadata
 				amps[waveIndex][subAmpIndex] = ampTreeLeafs[waveIndex]->incohSubAmp(subAmpIndex);
 		}
 
-		// sum up integral matrix elements
-		for (unsigned int waveIndexI = 0; waveIndexI < _nmbWaves; ++waveIndexI)
-			for (unsigned int waveIndexJ = 0; waveIndexJ < _nmbWaves; ++waveIndexJ) {
-				// sum over incoherent subamps
-				const unsigned int nmbSubAmps = amps[waveIndexI].size();
-				if (nmbSubAmps != amps[waveIndexJ].size()) {
-					printErr << "number of incoherent sub-amplitudes for wave '"
-					         << _waveNames[waveIndexI] << "' = " << nmbSubAmps
-					         << " differs from that of wave '" << _waveNames[waveIndexJ] << "' = "
-					         << amps[waveIndexJ].size()
-					         << " at event " << iEvent << " of total " << _nmbEvents << ". Aborting... "
-					         << "be sure to use only .root amplitude files, "
-					         << "if your channel has sub-amplitudes." << endl;
-					throw;
-				}
-				complex<double> val = 0;
-				for (unsigned int subAmpIndex = 0; subAmpIndex < nmbSubAmps; ++subAmpIndex)
-					val += amps[waveIndexI][subAmpIndex] * conj(amps[waveIndexJ][subAmpIndex]);
+		// copy amplitudes into the block; the incoherent sub-amplitudes of
+		// all waves have to match, as they are summed over
+		const unsigned int nmbSubAmps = (_nmbWaves > 0) ? amps[0].size() : 0;
+		for (unsigned int waveIndex = 1; waveIndex < _nmbWaves; ++waveIndex)
+			if (nmbSubAmps != amps[waveIndex].size()) {
+				printErr << "number of incoherent sub-amplitudes for wave '"
+				         << _waveNames[0] << "' = " << nmbSubAmps
+				         << " differs from that of wave '" << _waveNames[waveIndex] << "' = "
+				         << amps[waveIndex].size()
+				         << " at event " << iEvent << " of total " << _nmbEvents << ". Aborting... "
+				         << "be sure to use only .root amplitude files, "
+				         << "if your channel has sub-amplitudes." << endl;
+				throw;
+			}
+		if (nmbBlockAmps + nmbSubAmps > blockSize) {
+			addBlock();
+			if (nmbSubAmps > blockSize) {
+				blockSize = nmbSubAmps;
+				ampBlock.resize(_nmbWaves * blockSize);
+				if (useWeight)
+					weightedAmpBlock.resize(_nmbWaves * blockSize);
+				if (trackPrecision)
+					absSqBlock.resize(_nmbWaves * blockSize);
+				if (integrateAccepted)
+					accWeightedAmpBlock.resize(_nmbWaves * blockSize);
+			}
+		}
+		for (unsigned int waveIndex = 0; waveIndex < _nmbWaves; ++waveIndex)
+			for (unsigned int subAmpIndex = 0; subAmpIndex < nmbSubAmps; ++subAmpIndex) {
+				const size_t blockIndex = waveIndex * blockSize + nmbBlockAmps + subAmpIndex;
+				ampBlock[blockIndex] = amps[waveIndex][subAmpIndex];
 				if (useWeight)
-					val *= weight;
-				ampProdAcc[waveIndexI][waveIndexJ](val);
+					weightedAmpBlock[blockIndex] = weight * amps[waveIndex][subAmpIndex];
+				if (integrateAccepted)
+					accWeightedAmpBlock[blockIndex] = accWeight * amps[waveIndex][subAmpIndex];
+			}
+		nmbBlockAmps += nmbSubAmps;
+
+		// stop as soon as the target precision is reached
+		if (targetPrecision > 0 and nmbBlockAmps >= blockSize) {
+			addBlock();
+			const unsigned long nmbProcessedEvents = iEvent + 1 - startEvent;
+			if (nmbProcessedEvents >= minNmbEventsPrecision and nmbProcessedEvents < _nmbEvents
+			    and relativeUncertainty() <= targetPrecision) {
+				printInfo << "reached target precision " << targetPrecision << " "
+				          << "after " << nmbProcessedEvents << " of " << _nmbEvents << " events." << endl;
+				_nmbEvents = nmbProcessedEvents;
+				break;
 			}
+		}
 	}  // event loop
-
-	// copy values from accumulators and (if necessary) renormalize to
-	// integral of importance sampling weights
+	addBlock();
+	_precision = (trackPrecision and nmbSummedAmps > 0) ? relativeUncertainty() : 0;
+	if (targetPrecision > 0 and _precision > targetPrecision)
+		printWarn << "target precision " << targetPrecision << " not reached with "
+		          << _nmbEvents << " events (achieved " << _precision << ")." << endl;
+
+	// copy values from accumulators, fill the lower triangle of the
+	// hermitian matrix and (if necessary) renormalize to integral of
+	// importance sampling weights
 	const double weightNorm = sum(weightAcc) / (double)_nmbEvents;
 	for (unsigned int waveIndexI = 0; waveIndexI < _nmbWaves; ++waveIndexI)
-		for (unsigned int waveIndexJ = 0; waveIndexJ < _nmbWaves; ++waveIndexJ) {
-			_integrals[waveIndexI][waveIndexJ] = sum(ampProdAcc[waveIndexI][waveIndexJ]);
+		for (unsigned int waveIndexJ = max(waveIndexI, firstWave); waveIndexJ < _nmbWaves; ++waveIndexJ) {
+			complex<double> val = sum(ampProdAcc[waveIndexI][waveIndexJ]);
+			if (waveIndexI == waveIndexJ)
+				val = val.real();
 			if (useWeight)
-				_integrals[waveIndexI][waveIndexJ] *= 1 / weightNorm;
+				val *= 1 / weightNorm;
+			_integrals[waveIndexI][waveIndexJ] = val;
+			_integrals[waveIndexJ][waveIndexI] = conj(val);
 		}
-
-	printSucc << "calculated integrals of " << _nmbWaves << " amplitude(s) "
-	          << "for " << _nmbEvents << " events" << endl;
+	weightSum = sum(weightAcc);
+
+	// the integral of the accepted events counts the sum of the acceptances
+	// as number of events and is normalized to the sum of their weights like
+	// an integral calculated from a sample of accepted events
+	if (integrateAccepted) {
+		acceptedIntegral->clear();
+		acceptedIntegral->_nmbWaves         = _nmbWaves;
+		acceptedIntegral->_waveNames        = _waveNames;
+		acceptedIntegral->_waveDescriptions = _waveDescriptions;
+		acceptedIntegral->_nmbEvents        = (unsigned long)(sum(acceptanceAcc) + 0.5);
+		acceptedIntegral->_weightSum        = sum(accWeightAcc);
+		acceptedIntegral->_integrals.resize(extents[_nmbWaves][_nmbWaves]);
+		const double accWeightNorm = (acceptedIntegral->_nmbEvents > 0) ? acceptedIntegral->_weightSum / acceptedIntegral->_nmbEvents : 0;
+		for (unsigned int waveIndexI = 0; waveIndexI < _nmbWaves; ++waveIndexI)
+			for (unsigned int waveIndexJ = waveIndexI; waveIndexJ < _nmbWaves; ++waveIndexJ) {
+				complex<double> val = sum(accProdAcc[waveIndexI][waveIndexJ]);
+				if (waveIndexI == waveIndexJ)
+					val = val.real();
+				if (accWeightNorm > 0)
+					val *= 1 / accWeightNorm;
+				acceptedIntegral->_integrals[waveIndexI][waveIndexJ] = val;
+				acceptedIntegral->_integrals[waveIndexJ][waveIndexI] = conj(val);
+			}
+	}
 	return success;
+
 }
 
 
@@ -492,6 +983,7 @@ ampIntegralMatrix::readAscii(istream& in)
 		printWarn << "could not read number of waves and events" << endl;
 		return false;
 	}
+	_weightSum = _nmbEvents;
 	// read matrix elements
 	unsigned int nmbRows, nmbCols;
 	if (not (in >> nmbRows >> nmbCols)) {
@@ -648,6 +1140,9 @@ ampIntegralMatrix::Streamer(TBuffer& R__b)
 	if (R__b.IsReading()) {
 		R__b.ReadClassBuffer(rpwa::ampIntegralMatrix::Class(), this);
 		readMultiArray();
+		// integrals written before version 2 do not have the sum of weights
+		if (_weightSum == 0)
+			_weightSum = _nmbEvents;
 	} else {
 		storeMultiArray();
 		R__b.WriteClassBuffer(rpwa::ampIntegralMatrix::Class(), this);
@@ -96,9 +96,12 @@ namespace rpwa {
 		// accessors
 		unsigned int  nmbWaves () const { return _nmbWaves;  }  ///< returns number of waves in integral
 		unsigned long nmbEvents() const { return _nmbEvents; }  ///< returns number of events in integral
+		double        weightSum() const { return _weightSum; }  ///< returns sum of importance sampling weights of the events (equals number of events for unweighted integrals)
+		double        precision() const { return _precision; }  ///< returns the estimated relative uncertainty of the integrals after integrate() with a target precision, kept by addWaves() (0 if not estimated)
 
 		void setNmbWaves (const unsigned int  nmbWaves)  { _nmbWaves  = nmbWaves;  }  ///< sets number of waves in integral
 		void setNmbEvents(const unsigned long nmbEvents) { _nmbEvents = nmbEvents; }  ///< sets number of events in integral
+		void setPrecision(const double        precision) { _precision = precision; }  ///< sets the estimated relative uncertainty of the integrals, e.g. from the metadata of an integral file
 
 		bool               containsWave(const std::string& waveName ) const;  ///< returns whether wave is in integral matrix
 		unsigned int       waveIndex   (const std::string& waveName ) const;  ///< returns wave index for a wave name
@@ -122,11 +125,24 @@ namespace rpwa {
 
 		bool setWaveNames(const std::vector<std::string> &waveNames);
 		bool addEvent(std::map<std::string, std::complex<double> > &amplitudes);
+		bool addEvents(const std::vector<std::vector<std::complex<double> > >& amplitudes);  ///< adds several events; amplitudes holds one vector of event amplitudes per wave in the order of the wave names
+		bool merge(const ampIntegralMatrix& integral);  ///< adds the events of an integral matrix over the same waves, taking into account the normalization to the importance sampling weights
 
 
 		bool integrate(const std::vector<const rpwa::amplitudeMetadata*>& ampMetadata,
 		               const unsigned long                                maxNmbEvents   = 0,
-		               const std::string&                                 weightFileName = "");
+		               const std::string&                                 weightFileName = "",
+		               const unsigned long                                startEvent     = 0,
+		               const double                                       targetPrecision = 0);  ///< if targetPrecision > 0, the integration stops as soon as the estimated relative uncertainty of all elements is below it
+		bool integrateWithAcceptance(const std::vector<const rpwa::amplitudeMetadata*>& ampMetadata,
+		                             const std::vector<double>&                         acceptance,  ///< acceptance flag or weight of each amplitude entry
+		                             ampIntegralMatrix&                                 acceptedIntegral,
+		                             const unsigned long                                maxNmbEvents   = 0,
+		                             const std::string&                                 weightFileName = "",
+		                             const unsigned long                                startEvent     = 0);  ///< integrates all events and, in the same pass, the events weighted with their acceptance into acceptedIntegral
+		bool addWaves(const std::vector<const rpwa::amplitudeMetadata*>& ampMetadata,
+		              const std::string&                                 weightFileName = "",
+		              const unsigned long                                startEvent     = 0);  ///< calculates the rows and columns of new waves; ampMetadata has to start with the waves already in the integral matrix, in the same order
 
 		void renormalize(const unsigned long nmbEventsRenorm);
 
@@ -146,6 +162,25 @@ namespace rpwa {
 	private:
 
 		bool hasIdenticalWaveSet(const ampIntegralMatrix& integral) const;  ///< checks whether other integral matrix has exactly the same set of waves
+		void addProducts(const std::vector<const std::complex<double>*>& amps,
+		                 const std::vector<const std::complex<double>*>& weightedAmps,
+		                 const size_t                                    nmbAmps);  ///< adds the products of nmbAmps amplitudes per wave to the integral matrix
+		bool integrateEvents(const std::vector<const rpwa::amplitudeMetadata*>& ampMetadata,
+		                     const unsigned long                                maxNmbEvents,
+		                     const std::string&                                 weightFileName,
+		                     const unsigned long                                startEvent,
+		                     const double                                       targetPrecision,
+		                     const std::vector<double>*                         acceptance,
+		                     ampIntegralMatrix*                                 acceptedIntegral);
+		bool sumAmplitudeProducts(const std::vector<const rpwa::amplitudeMetadata*>& ampMetadata,
+		                          const unsigned long                                startEvent,
+		                          const std::string&                                 weightFileName,
+		                          const unsigned int                                 firstWave,
+		                          const double                                       targetPrecision,
+		                          const bool                                         estimatePrecision,
+		                          double&                                            weightSum,
+		                          const std::vector<double>*                         acceptance,
+		                          ampIntegralMatrix*                                 acceptedIntegral);  ///< calculates the integral matrix elements involving at least one wave with index >= firstWave; their precision is estimated if a target precision is given or estimatePrecision is set
 
 
 		static bool _debug;  ///< if set to true, debug messages are printed
@@ -153,6 +188,8 @@ namespace rpwa {
 		unsigned int                        _nmbWaves;            ///< number of waves in integral
 		std::vector<std::string>            _waveNames;           ///< maps wave indices to wave names
 		unsigned long                       _nmbEvents;           ///< number of events in integral matrix
+		double                              _weightSum;           ///< sum of importance sampling weights of all events
+		double                              _precision;           //! ///< estimated relative uncertainty of the integrals (0 if not estimated)
 
 		void storeMultiArray();  ///< copies multiarray into storage variables written to ROOT file
 		void readMultiArray ();  ///< rebuilds multiarray from storage variables read from ROOT file
@@ -166,7 +203,7 @@ namespace rpwa {
 		std::vector<rpwa::waveDescription> _waveDescriptions;  ///< wave descriptions of all waves
 
 
-		ClassDef(ampIntegralMatrix,1)
+		ClassDef(ampIntegralMatrix,2)
 
 	};
 
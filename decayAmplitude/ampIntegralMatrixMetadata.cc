@@ -3,6 +3,8 @@
 #include"waveDescription.h"
 #include"hashCalculator.h"
 
+#include<cmath>
+
 #include<TFile.h>
 
 
@@ -15,6 +17,9 @@ rpwa::ampIntegralMatrixMetadata::ampIntegralMatrixMetadata()
 	  _rootpwaGitHash(""),
 	  _objectBaseName(""),
 	  _allZeroHash(""),
+	  _precision(0),
+	  _acceptanceVariable(""),
+	  _nmbProcessedEvents(0),
 	  _ampIntegralMatrix(0),
 	  _amplitudeHashes(),
 	  _keyFileContents(),
@@ -23,12 +28,21 @@ rpwa::ampIntegralMatrixMetadata::ampIntegralMatrixMetadata()
 rpwa::ampIntegralMatrixMetadata::~ampIntegralMatrixMetadata() { }
 
 
+unsigned long rpwa::ampIntegralMatrixMetadata::nmbProcessedEvents() const {
+	if (_nmbProcessedEvents > 0 or not _ampIntegralMatrix) {
+		return _nmbProcessedEvents;
+	}
+	return _ampIntegralMatrix->nmbEvents();
+}
+
+
 string rpwa::ampIntegralMatrixMetadata::recalculateHash() const {
 	if (not _ampIntegralMatrix) {
 		printWarn << "trying to calculate hash without an integral matrix." << endl;
 		return "";
 	}
-	hashCalculator hashor;
+	// a hash that was already set is recalculated with the same algorithm
+	hashCalculator hashor(_contentHash.empty() ? hashCalculator::defaultAlgorithm() : hashCalculator::algorithmOfHash(_contentHash));
 	size_t nWaves = _ampIntegralMatrix->nmbWaves();
 	for (size_t i = 0; i < nWaves; ++i) {
 		for (size_t j = 0; j < nWaves; ++j) {
@@ -44,6 +58,12 @@ ostream& rpwa::ampIntegralMatrixMetadata::print(ostream& out) const {
 	    << "    contentHash ......... '" << _contentHash << "'"        << endl
 	    << "    object base name .... '" << _objectBaseName << "'"     << endl
 	    << "    rootpwa git hash .... '" << _rootpwaGitHash << "'"     << endl;
+	if(_precision > 0) {
+		out << "    precision ........... " << _precision << endl;
+	}
+	if(not _acceptanceVariable.empty()) {
+		out << "    acceptance variable . '" << _acceptanceVariable << "'" << endl;
+	}
 	if(_ampIntegralMatrix) {
 		out << "    nmbwaves ... "  << _ampIntegralMatrix->nmbWaves()  << endl;
 	}
@@ -52,6 +72,15 @@ ostream& rpwa::ampIntegralMatrixMetadata::print(ostream& out) const {
 }
 
 
+void rpwa::ampIntegralMatrixMetadata::setNmbProcessedEvents(const unsigned long nmbProcessedEvents) {
+	_nmbProcessedEvents = nmbProcessedEvents;
+	// the hash of all-zero amplitudes depends on the number of events
+	if (_ampIntegralMatrix) {
+		setAllZeroHash();
+	}
+}
+
+
 const rpwa::ampIntegralMatrixMetadata*
 rpwa::ampIntegralMatrixMetadata::readIntegralFile(TFile* inputFile,
                                                   const bool& quiet)
@@ -70,10 +99,35 @@ rpwa::ampIntegralMatrixMetadata::readIntegralFile(TFile* inputFile,
 		}
 		return 0;
 	}
+	integralMeta->convertInclusiveEventRanges();
 	return integralMeta;
 }
 
 
+void rpwa::ampIntegralMatrixMetadata::convertInclusiveEventRanges() {
+	// older integral files store the event ranges including their last
+	// event. such ranges are one event shorter than the integrated events
+	// per range, while ranges excluding the last event add up to exactly
+	// the number of integrated events
+	size_t nmbEventsInRanges = 0;
+	size_t nmbRanges = 0;
+	for (size_t meta_i = 0; meta_i < _evtMetas.size(); ++meta_i) {
+		for (size_t range_i = 0; range_i < _evtMetas[meta_i].second.size(); ++range_i) {
+			nmbEventsInRanges += _evtMetas[meta_i].second[range_i].second - _evtMetas[meta_i].second[range_i].first;
+			++nmbRanges;
+		}
+	}
+	if (nmbRanges == 0 or nmbEventsInRanges + nmbRanges != nmbProcessedEvents()) {
+		return;
+	}
+	for (size_t meta_i = 0; meta_i < _evtMetas.size(); ++meta_i) {
+		for (size_t range_i = 0; range_i < _evtMetas[meta_i].second.size(); ++range_i) {
+			++_evtMetas[meta_i].second[range_i].second;
+		}
+	}
+}
+
+
 Int_t rpwa::ampIntegralMatrixMetadata::Write(const char* name, Int_t option, Int_t bufsize) const {
 	Int_t retval = 0;
 	if(_ampIntegralMatrix) {
@@ -85,6 +139,10 @@ Int_t rpwa::ampIntegralMatrixMetadata::Write(const char* name, Int_t option, Int
 
 bool rpwa::ampIntegralMatrixMetadata::mergeIntegralMatrix(const ampIntegralMatrixMetadata& second) {
 	const ampIntegralMatrix* secondMatrix = second.getAmpIntegralMatrix();
+	if (not _ampIntegralMatrix or not secondMatrix) {
+		printErr << "integral matrix has not been set." << endl;
+		return false;
+	}
 	if (secondMatrix->nmbWaves() != _ampIntegralMatrix->nmbWaves()) {
 		printErr << "mismatch in number of waves (" << secondMatrix->nmbWaves()
 		         << "!=" << _ampIntegralMatrix->nmbWaves() << ")." << endl;
@@ -95,6 +153,12 @@ bool rpwa::ampIntegralMatrixMetadata::mergeIntegralMatrix(const ampIntegralMatri
 		return false;
 
 	}
+	if (not _acceptanceVariable.empty() or not second.acceptanceVariable().empty()) {
+		// their numbers of events are the sums of the acceptances, the
+		// integrals would not be weighted with the processed events
+		printErr << "cannot merge integrals of accepted events weighted with an acceptance variable." << endl;
+		return false;
+	}
 	{
 		const vector<string> secondKeyFileContents = second.getKeyFileContents();
 		for (size_t keyfiles_i = 0; keyfiles_i < secondKeyFileContents.size(); ++keyfiles_i) {
@@ -105,8 +169,13 @@ bool rpwa::ampIntegralMatrixMetadata::mergeIntegralMatrix(const ampIntegralMatri
 		}
 	}
 	{
+		// integrals over different event ranges of the same amplitude files
+		// have the same amplitude hashes, which are kept only once
 		const vector<string> secondAmplitudeHashes = second.getAmplitudeHashes();
 		for (size_t hash_i = 0; hash_i < secondAmplitudeHashes.size(); ++hash_i) {
+			if (hasAmplitudeHash(secondAmplitudeHashes[hash_i])) {
+				continue;
+			}
 			if (not addAmplitudeHash(secondAmplitudeHashes[hash_i])) {
 				printErr << "could not add amplitude hash." << endl;
 				return false;
@@ -132,7 +201,19 @@ bool rpwa::ampIntegralMatrixMetadata::mergeIntegralMatrix(const ampIntegralMatri
 			}
 		}
 	}
-	*_ampIntegralMatrix += *secondMatrix;
+	// the statistical uncertainties of integrals over independent events
+	// combine like those of independent measurements; an unknown precision
+	// stays unknown
+	if (_precision > 0 and second.precision() > 0) {
+		_precision = 1. / sqrt(1. / (_precision * _precision) + 1. / (second.precision() * second.precision()));
+	} else {
+		_precision = 0;
+	}
+	_nmbProcessedEvents = nmbProcessedEvents() + second.nmbProcessedEvents();
+	if (not _ampIntegralMatrix->merge(*secondMatrix)) {
+		printErr << "could not merge integral matrices." << endl;
+		return false;
+	}
 	if (not setHash()) {
 		printErr << "could not set hash." << endl;
 		return false;
@@ -201,6 +282,12 @@ bool rpwa::ampIntegralMatrixMetadata::mergeBinningMap(const map<string, pair<dou
 
 
 bool rpwa::ampIntegralMatrixMetadata::addAmplitudeHash(const string& hash) {
+	// the hash of all-zero amplitudes has to be calculated with the algorithm
+	// of the amplitude hashes, which is known with the first one
+	if (_ampIntegralMatrix and _amplitudeHashes.empty()
+	    and hashCalculator::algorithmOfHash(hash) != hashCalculator::algorithmOfHash(_allZeroHash)) {
+		_allZeroHash = calcAllZeroHash(hashCalculator::algorithmOfHash(hash));
+	}
 	if (hash == _allZeroHash) {
 		return true;  // Do not add the allZerohash, but allow it
 	}
@@ -219,12 +306,20 @@ bool rpwa::ampIntegralMatrixMetadata::setAllZeroHash() {
 		printErr << "integral matrix has not been set." << endl;
 		return false;
 	}
-	hashCalculator hashor;
-	for (size_t i = 0; i < _ampIntegralMatrix->nmbEvents(); ++i) {
+	_allZeroHash = calcAllZeroHash(_amplitudeHashes.empty() ? hashCalculator::defaultAlgorithm()
+	                                                        : hashCalculator::algorithmOfHash(_amplitudeHashes[0]));
+	return true;
+}
+
+
+string rpwa::ampIntegralMatrixMetadata::calcAllZeroHash(const hashCalculator::hashAlgorithm algorithm) const {
+	hashCalculator hashor(algorithm);
+	// the amplitude hashes cover all processed events
+	const unsigned long nmbEvents = nmbProcessedEvents();
+	for (size_t i = 0; i < nmbEvents; ++i) {
 		hashor.Update(complex<double>(0.,0.));
 	}
-	_allZeroHash = hashor.hash();
-	return true;
+	return hashor.hash();
 }
 
 
@@ -3,6 +3,7 @@
 
 #include"eventMetadata.h"
 #include"ampIntegralMatrix.h"
+#include"hashCalculator.h"
 #include<TObject.h>
 #include<map>
 
@@ -21,6 +22,10 @@ namespace rpwa {
 			const std::string& contentHash()       const { return _contentHash; }
 			const std::string& rootpwaGitHash()    const { return _rootpwaGitHash; }
 			const std::string& objectBaseName()    const { return _objectBaseName; }
+			double             precision()         const { return _precision; }  ///< estimated relative uncertainty of the integrals (0 if unknown)
+			const std::string& allZeroHash()       const { return _allZeroHash; }  ///< hash of amplitudes which are all zero, which is not stored in the amplitude hashes
+			const std::string& acceptanceVariable() const { return _acceptanceVariable; }  ///< variable of the event file the accepted events were weighted with (empty if the integral was calculated from a sample of events)
+			unsigned long      nmbProcessedEvents() const;  ///< number of events in the event ranges, which differs from that of the integral matrix for integrals weighted with an acceptance variable
 			const std::map<std::string, std::pair<double, double> >& binningMap() const { return _binningMap; }
 			const std::vector<std::pair<rpwa::eventMetadata, std::vector<std::pair<size_t, size_t> > > > evtMetas() const { return _evtMetas; }
 
@@ -44,6 +49,9 @@ namespace rpwa {
 			bool setHash();
 			void setGitHash(const std::string& gitHash) { _rootpwaGitHash = gitHash; }
 			void setObjectBaseName(const std::string& baseName) { _objectBaseName = baseName; }
+			void setPrecision(const double precision) { _precision = precision; }
+			void setAcceptanceVariable(const std::string& acceptanceVariable) { _acceptanceVariable = acceptanceVariable; }
+			void setNmbProcessedEvents(const unsigned long nmbProcessedEvents);
 			void setBinningMap(const std::map<std::string, std::pair<double, double> >& binningMap) { _binningMap = binningMap; }
 			bool addKeyFileContent(const std::string& content);
 			bool mergeBinningMap(const std::map<std::string, std::pair<double, double> >& binnignMapIn);
@@ -59,10 +67,16 @@ namespace rpwa {
 
 			static const std::string objectNameInFile;
 		private:
+			void convertInclusiveEventRanges();
+			std::string calcAllZeroHash(const rpwa::hashCalculator::hashAlgorithm algorithm) const;
+
 			std::string                          _contentHash;
 			std::string                          _rootpwaGitHash;
 			std::string                          _objectBaseName;
 			std::string                          _allZeroHash;
+			double                               _precision;
+			std::string                          _acceptanceVariable;
+			unsigned long                        _nmbProcessedEvents;  // 0 for files without it, in which it is the number of events of the integral matrix
 			mutable ampIntegralMatrix*           _ampIntegralMatrix; //!
 
 			std::vector<std::string>             _amplitudeHashes;
@@ -71,7 +85,7 @@ namespace rpwa {
 			std::map<std::string, std::pair<double, double> > _binningMap;
 			std::vector<std::pair<rpwa::eventMetadata, std::vector<std::pair<size_t, size_t> > > > _evtMetas;
 
-			ClassDef(ampIntegralMatrixMetadata, 1);
+			ClassDef(ampIntegralMatrixMetadata, 3);
 	};  // class ampIntegralMatrixMetadata
 
 	inline
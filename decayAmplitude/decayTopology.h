@@ -143,6 +143,8 @@ namespace rpwa {
 
 		void fillKinematicsDataCache();  ///< copies kinematics data into cache; needed for Bose symmetrization
 
+		const std::map<unsigned int, unsigned int>& fsDataPartIndexMap() const { return _fsDataPartIndexMap; }  ///< returns map of final-state particle indices to indices in input data array
+
 		bool revertMomenta();  ///< resets momenta to the values of last event read
 		bool revertMomenta(const std::vector<unsigned int>& fsPartPermMap);  ///< resets momenta to the values of last event read, but reordering them according to index map
 
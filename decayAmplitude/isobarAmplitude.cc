@@ -33,6 +33,8 @@
 
 #include <algorithm>
 #include <cassert>
+#include <limits>
+#include <sstream>
 
 #include "TLorentzRotation.h"
 #include "TMath.h"
@@ -109,6 +111,7 @@ isobarAmplitude::init()
 		printErr << "Could not initialize amplitude symetrization maps." << endl;
 		throw;
 	}
+	initCacheKeys();
 }
 
 
@@ -233,6 +236,16 @@ complex<double>
 isobarAmplitude::twoBodyDecayAmplitudeSum(const isobarDecayVertexPtr& vertex,           // current vertex
                                           const bool                  topVertex) const  // switches special treatment of X decay vertex; needed for reflectivity basis
 {
+	// amplitudes of isobar sub-decays may have been calculated already
+	// for this event by this or another amplitude
+	isobarAmplitudeCache::keyType cacheKey;
+	const bool useCache = _cache and not topVertex and subDecayCacheKey(vertex, cacheKey);
+	if (useCache) {
+		complex<double> cachedAmp;
+		if (_cache->find(cacheKey, cachedAmp))
+			return cachedAmp;
+	}
+
 	const particlePtr& parent    = vertex->parent();
 	const particlePtr& daughter1 = vertex->daughter1();
 	const particlePtr& daughter2 = vertex->daughter2();
@@ -273,6 +286,8 @@ isobarAmplitude::twoBodyDecayAmplitudeSum(const isobarDecayVertexPtr& vertex,
 	}
 	if (_debug)
 		printDebug << "decay amplitude for " << *vertex << " = " << maxPrecisionDouble(ampSum) << endl;
+	if (useCache)
+		_cache->insert(cacheKey, ampSum);
 	return ampSum;
 }
 
@@ -286,6 +301,16 @@ isobarAmplitude::symTermAmp(const vector<unsigned int>& fsPartPermMap) const
 		         << "returning 0." << endl;
 		return 0;
 	}
+	// identify final-state particles by name and index in input data for the cache keys
+	_fsCodes.clear();
+	if (_cache) {
+		const map<unsigned int, unsigned int>& fsDataPartIndexMap = _decay->fsDataPartIndexMap();
+		if (fsDataPartIndexMap.size() == fsPartPermMap.size()) {
+			_fsCodes.resize(fsPartPermMap.size());
+			for (unsigned int i = 0; i < fsPartPermMap.size(); ++i)
+				_fsCodes[i] = (fsDataPartIndexMap.find(fsPartPermMap[i])->second << 16) + _fsNameIds[i];
+		}
+	}
 	// transform daughters into their respective RFs
 	transformDaughters();
 	// calculate amplitude
@@ -402,6 +427,115 @@ isobarAmplitude::initSymTermMaps()
 };
 
 
+void
+isobarAmplitude::initCacheKeys()
+{
+	_vertexIndices.clear();
+	_vertexCacheIds.clear();
+	_vertexFsIndices.clear();
+	_vertexParents.clear();
+	_fsNameIds.clear();
+	_fsCodes.clear();
+	const vector<isobarDecayVertexPtr>& vertices = _decay->isobarDecayVertices();
+	for (unsigned int i = 0; i < vertices.size(); ++i)
+		_vertexIndices[vertices[i].get()] = i;
+	_vertexCacheIds.resize(vertices.size());
+	_vertexFsIndices.resize(vertices.size());
+	_vertexParents.resize(vertices.size());
+	// vertices are ordered depth-first, so parents are processed before their children
+	for (unsigned int i = 0; i < vertices.size(); ++i) {
+		ostringstream key;
+		key << name() << "|" << _doSpaceInversion << _doReflection << "|" << subDecayContent(vertices[i]);
+		_vertexCacheIds[i] = isobarAmplitudeCache::subDecayId(key.str());
+		for (unsigned int j = 0; j < 2; ++j) {
+			const particlePtr&          daughter       = (j == 0) ? vertices[i]->daughter1() : vertices[i]->daughter2();
+			const isobarDecayVertexPtr& daughterVertex = dynamic_pointer_cast<isobarDecayVertex>(_decay->toVertex(daughter));
+			if (daughterVertex) {
+				const unsigned int daughterIndex = _vertexIndices[daughterVertex.get()];
+				_vertexParents[daughterIndex] = _vertexParents[i];
+				_vertexParents[daughterIndex].push_back(i);
+			}
+		}
+	}
+	// final-state particles below each vertex in the order daughter 1 before
+	// daughter 2, so that the same sub-decay content gives the same ordering;
+	// vertices are processed in reverse order so that children come first
+	for (int i = vertices.size() - 1; i >= 0; --i) {
+		for (unsigned int j = 0; j < 2; ++j) {
+			const particlePtr&          daughter       = (j == 0) ? vertices[i]->daughter1() : vertices[i]->daughter2();
+			const isobarDecayVertexPtr& daughterVertex = dynamic_pointer_cast<isobarDecayVertex>(_decay->toVertex(daughter));
+			if (daughterVertex) {
+				const vector<unsigned int>& daughterFsIndices = _vertexFsIndices[_vertexIndices[daughterVertex.get()]];
+				_vertexFsIndices[i].insert(_vertexFsIndices[i].end(), daughterFsIndices.begin(), daughterFsIndices.end());
+			} else
+				_vertexFsIndices[i].push_back(_decay->fsParticlesIndex(daughter));
+		}
+	}
+	for (unsigned int i = 0; i < _decay->nmbFsParticles(); ++i)
+		_fsNameIds.push_back(isobarAmplitudeCache::particleNameId(_decay->fsParticles()[i]->name()));
+}
+
+
+string
+isobarAmplitude::subDecayContent(const isobarDecayVertexPtr& vertex) const
+{
+	ostringstream content;
+	content.precision(17);
+	const particlePtr& parent = vertex->parent();
+	content << parent->particleProperties::qnSummary()
+	        << "[m=" << parent->mass() << ",w=" << parent->width() << "]"
+	        << "{L=" << vertex->L() << ",S=" << vertex->S() << "," << *(vertex->massDependence()) << "}(";
+	for (unsigned int i = 0; i < 2; ++i) {
+		const particlePtr&          daughter       = (i == 0) ? vertex->daughter1() : vertex->daughter2();
+		const isobarDecayVertexPtr& daughterVertex = dynamic_pointer_cast<isobarDecayVertex>(_decay->toVertex(daughter));
+		if (i > 0)
+			content << ",";
+		if (daughterVertex)
+			content << subDecayContent(daughterVertex);
+		else
+			content << daughter->name();
+	}
+	content << ")";
+	return content.str();
+}
+
+
+// the amplitude of a sub-decay depends on the momenta of the final-state
+// particles below the vertex and on the frames they were transformed into,
+// which are defined by the final-state particles below all vertices above
+// the given one
+bool
+isobarAmplitude::subDecayCacheKey(const isobarDecayVertexPtr&    vertex,
+                                  isobarAmplitudeCache::keyType& key) const
+{
+	if (_fsCodes.empty())
+		return false;
+	map<const isobarDecayVertex*, unsigned int>::const_iterator entry = _vertexIndices.find(vertex.get());
+	if (entry == _vertexIndices.end())
+		return false;
+	const unsigned int vertexIndex = entry->second;
+	key.first = _vertexCacheIds[vertexIndex];
+	vector<unsigned int>& codes = key.second;
+	codes.clear();
+	const vector<unsigned int>& parents = _vertexParents[vertexIndex];
+	for (unsigned int i = 0; i < parents.size(); ++i) {
+		const vector<unsigned int>& fsIndices = _vertexFsIndices[parents[i]];
+		const size_t                first     = codes.size();
+		for (unsigned int j = 0; j < fsIndices.size(); ++j)
+			codes.push_back(_fsCodes[fsIndices[j]]);
+		sort(codes.begin() + first, codes.end());
+		codes.push_back(numeric_limits<unsigned int>::max());
+	}
+	// the final-state particles below the vertex itself are not sorted,
+	// because their assignment to the daughters matters
+	const vector<unsigned int>& fsIndices = _vertexFsIndices[vertexIndex];
+	for (unsigned int j = 0; j < fsIndices.size(); ++j)
+		codes.push_back(_fsCodes[fsIndices[j]]);
+	codes.push_back(static_cast<unsigned int>(vertex->parent()->spinProj()));
+	return true;
+}
+
+
 ostream&
 isobarAmplitude::printParameters(ostream& out) const
 {
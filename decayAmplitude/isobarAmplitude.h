@@ -39,6 +39,7 @@
 #include <map>
 #include <vector>
 
+#include "isobarAmplitudeCache.h"
 #include "isobarDecayTopology.h"
 
 
@@ -74,6 +75,9 @@ namespace rpwa {
 		void enableSpaceInversion(const bool flag = true) { _doSpaceInversion = flag; }  ///< en/disables parity transformation of decay
 		void enableReflection    (const bool flag = true) { _doReflection     = flag; }  ///< en/disables reflection of decay through production plane
 
+		const isobarAmplitudeCachePtr& cache   () const                                { return _cache;  }  ///< returns cache for sub-decay amplitudes
+		void                           setCache(const isobarAmplitudeCachePtr& cache) { _cache = cache; }  ///< sets cache for sub-decay amplitudes that may be shared with other amplitudes; the cache has to be cleared for every new event
+
 		static TLorentzRotation gjTransform(const TLorentzVector& beamLv,
 		                                    const TLorentzVector& XLv);  ///< constructs Lorentz-transformation to X Gottfried-Jackson frame
 
@@ -107,6 +111,11 @@ namespace rpwa {
 
 		virtual bool initSymTermMaps();
 
+		void        initCacheKeys();                                                   ///< precalculates the static parts of the cache keys of all isobar decay vertices as unique numbers
+		std::string subDecayContent(const isobarDecayVertexPtr& vertex) const;          ///< returns string that uniquely describes the sub-decay below the given vertex
+		bool        subDecayCacheKey(const isobarDecayVertexPtr&    vertex,
+		                             isobarAmplitudeCache::keyType& key) const;         ///< constructs cache key of the sub-decay amplitude below the given vertex for the current event and symmetrization term
+
 		isobarDecayTopologyPtr  _decay;                 ///< isobar decay topology with all external information
 		bool                    _useReflectivityBasis;  ///< if set, reflectivity basis is used to calculate the X decay node
 		bool                    _boseSymmetrize;        ///< if set, amplitudes are Bose symmetrized
@@ -115,6 +124,14 @@ namespace rpwa {
 		bool                    _doReflection;          ///< is set, all three-momenta of the decay particles are reflected through production plane (for test purposes)
 		std::vector<symTermMap> _symTermMaps;           ///< array of factors and permutation maps for symmetrization terms
 
+		isobarAmplitudeCachePtr                          _cache;            ///< optional cache for sub-decay amplitudes
+		std::map<const isobarDecayVertex*, unsigned int> _vertexIndices;    ///< indices of isobar decay vertices in isobarDecayVertices()
+		std::vector<unsigned int>                        _vertexCacheIds;   ///< static part of the cache keys for each isobar decay vertex
+		std::vector<std::vector<unsigned int> >          _vertexFsIndices;  ///< indices of final-state particles below each isobar decay vertex; ordered depth-first
+		std::vector<std::vector<unsigned int> >          _vertexParents;    ///< indices of isobar decay vertices above each isobar decay vertex; starting with X-decay vertex
+		std::vector<unsigned int>                        _fsNameIds;        ///< particle name ids of final-state particles
+		mutable std::vector<unsigned int>                _fsCodes;          ///< for the current symmetrization term, combines name of each final-state particle with index of its momentum in the input data
+
 		static bool _debug;  ///< if set to true, debug messages are printed
 
 	};
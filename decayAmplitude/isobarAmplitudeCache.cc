@@ -0,0 +1,82 @@
+#include "isobarAmplitudeCache.h"
+
+#include <iostream>
+
+using namespace std;
+using namespace rpwa;
+
+
+map<string, unsigned int> isobarAmplitudeCache::_particleNameIds;
+map<string, unsigned int> isobarAmplitudeCache::_subDecayIds;
+
+
+isobarAmplitudeCache::isobarAmplitudeCache()
+	: _amps     (),
+	  _nmbHits  (0),
+	  _nmbMisses(0)
+{ }
+
+
+isobarAmplitudeCache::~isobarAmplitudeCache()
+{ }
+
+
+bool
+isobarAmplitudeCache::find(const keyType&   key,
+                           complex<double>& amp) const
+{
+	map<keyType, complex<double> >::const_iterator entry = _amps.find(key);
+	if (entry == _amps.end()) {
+		++_nmbMisses;
+		return false;
+	}
+	++_nmbHits;
+	amp = entry->second;
+	return true;
+}
+
+
+void
+isobarAmplitudeCache::insert(const keyType&         key,
+                             const complex<double>& amp)
+{
+	_amps[key] = amp;
+}
+
+
+unsigned int
+isobarAmplitudeCache::particleNameId(const string& name)
+{
+	map<string, unsigned int>::const_iterator entry = _particleNameIds.find(name);
+	if (entry != _particleNameIds.end())
+		return entry->second;
+	const unsigned int id = _particleNameIds.size();
+	_particleNameIds[name] = id;
+	return id;
+}
+
+
+unsigned int
+isobarAmplitudeCache::subDecayId(const string& description)
+{
+	map<string, unsigned int>::const_iterator entry = _subDecayIds.find(description);
+	if (entry != _subDecayIds.end())
+		return entry->second;
+	const unsigned int id = _subDecayIds.size();
+	_subDecayIds[description] = id;
+	return id;
+}
+
+
+ostream&
+isobarAmplitudeCache::print(ostream& out) const
+{
+	const unsigned long int nmbLookUps = _nmbHits + _nmbMisses;
+	out << "isobar amplitude cache:" << endl
+	    << "    number of look-ups ... " << nmbLookUps << endl
+	    << "    number of hits ....... " << _nmbHits;
+	if (nmbLookUps > 0)
+		out << " (" << 100. * _nmbHits / nmbLookUps << " %)";
+	out << endl;
+	return out;
+}
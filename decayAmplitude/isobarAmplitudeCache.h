@@ -0,0 +1,78 @@
+#ifndef ISOBARAMPLITUDECACHE_H
+#define ISOBARAMPLITUDECACHE_H
+
+#include <complex>
+#include <map>
+#include <ostream>
+#include <string>
+#include <utility>
+#include <vector>
+
+#include <boost/shared_ptr.hpp>
+
+
+namespace rpwa {
+
+
+	class isobarAmplitudeCache;
+	typedef boost::shared_ptr<rpwa::isobarAmplitudeCache> isobarAmplitudeCachePtr;
+
+
+	// per-event cache for the amplitudes of isobar sub-decays, which can be
+	// shared by several isobarAmplitude objects that are evaluated for the
+	// same event; the key consists of a static part describing the sub-decay
+	// (topology, quantum numbers, mass dependences), which is interned as a
+	// unique number by subDecayId() when the amplitude is initialized, and a
+	// dynamic part
+	// describing which final-state particles of the event enter the sub-decay
+	// and the frames it has been transformed into; clear() has to be called
+	// for every new event
+	class isobarAmplitudeCache {
+
+	public:
+
+		typedef std::pair<unsigned int, std::vector<unsigned int> > keyType;
+
+		isobarAmplitudeCache();
+		~isobarAmplitudeCache();
+
+		void clear() { _amps.clear(); }  ///< removes all cached amplitudes; to be called for every new event
+
+		bool find(const keyType& key, std::complex<double>& amp) const;   ///< returns whether an amplitude with the given key is cached and sets amp to its value
+		void insert(const keyType& key, const std::complex<double>& amp);  ///< adds an amplitude to the cache
+
+		size_t             size     () const { return _amps.size(); }  ///< returns number of currently cached amplitudes
+		unsigned long int  nmbHits  () const { return _nmbHits;     }  ///< returns number of successful look-ups since construction
+		unsigned long int  nmbMisses() const { return _nmbMisses;   }  ///< returns number of failed look-ups since construction
+
+		static unsigned int particleNameId(const std::string& name);        ///< returns a unique number for each particle name
+		static unsigned int subDecayId    (const std::string& description);  ///< returns a unique number for each sub-decay description
+
+		std::ostream& print(std::ostream& out) const;  ///< prints cache statistics in human-readable form
+
+	private:
+
+		std::map<keyType, std::complex<double> > _amps;  ///< cached amplitudes of current event
+
+		mutable unsigned long int _nmbHits;
+		mutable unsigned long int _nmbMisses;
+
+		static std::map<std::string, unsigned int> _particleNameIds;  ///< maps particle names to unique numbers
+		static std::map<std::string, unsigned int> _subDecayIds;      ///< maps sub-decay descriptions to unique numbers
+
+	};
+
+
+	inline
+	std::ostream&
+	operator <<(std::ostream&               out,
+	            const isobarAmplitudeCache& cache)
+	{
+		return cache.print(out);
+	}
+
+
+} // namespace rpwa
+
+
+#endif  // ISOBARAMPLITUDECACHE_H
@@ -89,6 +89,14 @@ binnedMassDependence::amp(const isobarDecayVertex& v)
 }
 
 
+ostream&
+binnedMassDependence::print(ostream& out) const
+{
+	out << name() << "[" << _mMin << ", " << _mMax << "]";
+	return out;
+}
+
+
 ////////////////////////////////////////////////////////////////////////////////
 complex<double>
 sawtoothMassDependence::amp(const isobarDecayVertex& v)
@@ -114,6 +122,14 @@ sawtoothMassDependence::amp(const isobarDecayVertex& v)
 }
 
 
+ostream&
+sawtoothMassDependence::print(ostream& out) const
+{
+	out << name() << "[" << _mMin << ", " << _mMax << "]";
+	return out;
+}
+
+
 ////////////////////////////////////////////////////////////////////////////////
 complex<double>
 polynomialMassDependence::amp(const isobarDecayVertex& v)
@@ -145,6 +161,17 @@ polynomialMassDependence::amp(const isobarDecayVertex& v)
 }
 
 
+ostream&
+polynomialMassDependence::print(ostream& out) const
+{
+	out << name() << "[" << _mMin << ", " << _mMax << ";";
+	for (size_t i = 0; i < _coefficients.size(); ++i)
+		out << " " << _coefficients[i];
+	out << "]";
+	return out;
+}
+
+
 ////////////////////////////////////////////////////////////////////////////////
 complex<double>
 complexExponentialMassDependence::amp(const isobarDecayVertex& v)
@@ -168,6 +195,14 @@ complexExponentialMassDependence::amp(const isobarDecayVertex& v)
 }
 
 
+ostream&
+complexExponentialMassDependence::print(ostream& out) const
+{
+	out << name() << "[" << _degree << "; " << _mMin << ", " << _mMax << "]";
+	return out;
+}
+
+
 ////////////////////////////////////////////////////////////////////////////////
 complex<double>
 arbitraryFunctionMassDependence::amp(const isobarDecayVertex& v)
@@ -190,6 +225,14 @@ arbitraryFunctionMassDependence::amp(const isobarDecayVertex& v)
 }
 
 
+ostream&
+arbitraryFunctionMassDependence::print(ostream& out) const
+{
+	out << name() << "[" << _name << "; " << _realFunctionString << "; " << _imagFunctionString << "]";
+	return out;
+}
+
+
 ////////////////////////////////////////////////////////////////////////////////
 complex<double>
 relativisticBreitWigner::amp(const isobarDecayVertex& v)
@@ -138,6 +138,8 @@ namespace rpwa {
 
 		virtual std::string name() const { return "binned"; }  ///< returns label used in graph visualization, reporting, and key file
 
+		virtual std::ostream& print(std::ostream& out) const;  ///< prints name and parameters; used to distinguish differently parametrized mass dependences
+
 		double getMassMin() const { return _mMin; }
 		double getMassMax() const { return _mMax; }
 
@@ -173,6 +175,8 @@ namespace rpwa {
 
 		virtual std::string name() const { return "sawtooth"; }  ///< returns label used in graph visualization, reporting, and key file
 
+		virtual std::ostream& print(std::ostream& out) const;  ///< prints name and parameters; used to distinguish differently parametrized mass dependences
+
 		double getMassMin() const { return _mMin; }
 		double getMassMax() const { return _mMax; }
 
@@ -211,6 +215,8 @@ namespace rpwa {
 
 		virtual std::string name() const { return "polynomial"; } ///< returns label used in graph visualization, reporting, and key file
 
+		virtual std::ostream& print(std::ostream& out) const;  ///< prints name and parameters; used to distinguish differently parametrized mass dependences
+
 		const std::vector<std::complex<double> >& getCoefficients() const { return _coefficients; }
 		double                                    getMassMin()         const { return _mMin; }
 		double                                    getMassMax()         const { return _mMax; }
@@ -248,6 +254,8 @@ namespace rpwa {
 
 		virtual std::string name() const { return "complexExponential"; } ///< returns label used in graph visualization, reporting, and key file
 
+		virtual std::ostream& print(std::ostream& out) const;  ///< prints name and parameters; used to distinguish differently parametrized mass dependences
+
 		int    getDegree()  const { return _degree; }
 		double getMassMin() const { return _mMin;   }
 		double getMassMax() const { return _mMax;   }
@@ -289,6 +297,8 @@ namespace rpwa {
 
 		virtual std::string name() const { return "arbitraryFunction"; } ///< returns label used in graph visualization, reporting, and key file
 
+		virtual std::ostream& print(std::ostream& out) const;  ///< prints name and parameters; used to distinguish differently parametrized mass dependences
+
 		std::string getName              () const { return _name;               }
 		std::string getRealFunctionString() const { return _realFunctionString; }
 		std::string getImagFunctionString() const { return _imagFunctionString; }
@@ -0,0 +1,164 @@
+///////////////////////////////////////////////////////////////////////////
+//
+//    Copyright 2010
+//
+//    This file is part of rootpwa
+//
+//    rootpwa is free software: you can redistribute it and/or modify
+//    it under the terms of the GNU General Public License as published by
+//    the Free Software Foundation, either version 3 of the License, or
+//    (at your option) any later version.
+//
+//    rootpwa is distributed in the hope that it will be useful,
+//    but WITHOUT ANY WARRANTY; without even the implied warranty of
+//    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+//    GNU General Public License for more details.
+//
+//    You should have received a copy of the GNU General Public License
+//    along with rootpwa. If not, see <http://www.gnu.org/licenses/>.
+//
+///////////////////////////////////////////////////////////////////////////
+//-------------------------------------------------------------------------
+//
+// Description:
+//      checks that amplitudes calculated with a shared cache for the
+//      sub-decay amplitudes agree with the ones calculated without cache
+//      for a wave set with shared isobars
+//
+//
+//-------------------------------------------------------------------------
+
+
+#include <sstream>
+
+#include "TRandom3.h"
+#include "TVector3.h"
+
+#include "reportingUtilsEnvironment.h"
+#include "particleDataTable.h"
+#include "waveDescription.h"
+#include "isobarAmplitude.h"
+#include "isobarAmplitudeCache.h"
+
+
+using namespace std;
+using namespace rpwa;
+
+
+namespace {
+
+	// key file content for the decay X^- -> isobar pi-, isobar -> pi+ pi-
+	string
+	keyFileContent(const int     J,
+	               const int     P,
+	               const string& isobar,
+	               const int     isobarL,
+	               const int     L,
+	               const int     S)
+	{
+		ostringstream key;
+		key << "productionVertex : { type = \"diffractiveDissVertex\"; beam : { name = \"pi-\"; }; target : { name = \"p+\"; }; };" << endl
+		    << "decayVertex : {" << endl
+		    << "  XQuantumNumbers : { isospin = 2; G = -1; J = " << 2 * J << "; P = " << P << "; M = 0; refl = 1; };" << endl
+		    << "  XDecay : {" << endl
+		    << "    isobars = ( { name = \"" << isobar << "\"; L = " << 2 * isobarL << "; S = 0;" << endl
+		    << "                  fsParticles = ( { name = \"pi+\"; }, { name = \"pi-\"; } ); } );" << endl
+		    << "    L = " << 2 * L << "; S = " << 2 * S << ";" << endl
+		    << "    fsParticles = ( { name = \"pi-\"; } );" << endl
+		    << "  };" << endl
+		    << "};" << endl;
+		return key.str();
+	}
+
+
+	vector<isobarAmplitudePtr>
+	constructAmplitudes(const vector<string>& keyFileContents)
+	{
+		vector<isobarAmplitudePtr> amps;
+		for (size_t i = 0; i < keyFileContents.size(); ++i) {
+			const vector<waveDescriptionPtr> waveDescs = waveDescription::parseKeyFileContent(keyFileContents[i]);
+			isobarAmplitudePtr amp;
+			if (waveDescs.size() != 1 or not waveDescs[0]->constructAmplitude(amp)) {
+				printErr << "problems constructing amplitude " << i << ". Aborting..." << endl;
+				exit(1);
+			}
+			amp->init();
+			const vector<string> prodKinParticles (1, "pi-");
+			const vector<string> decayKinParticles = {"pi-", "pi+", "pi-"};
+			if (not amp->decayTopology()->initKinematicsData(prodKinParticles, decayKinParticles)) {
+				printErr << "problems initializing input data of amplitude " << i << ". Aborting..." << endl;
+				exit(1);
+			}
+			amps.push_back(amp);
+		}
+		return amps;
+	}
+
+}
+
+
+int
+main()
+{
+	printCompilerInfo();
+	printGitHash();
+
+	rpwa::particleDataTable& pdt = rpwa::particleDataTable::instance();
+	pdt.readFile();
+
+	// the waves share the rho(770) and f2(1270) sub-decays
+	vector<string> keyFileContents;
+	keyFileContents.push_back(keyFileContent(1, +1, "rho(770)0",  1, 0, 1));
+	keyFileContents.push_back(keyFileContent(1, +1, "rho(770)0",  1, 2, 1));
+	keyFileContents.push_back(keyFileContent(2, -1, "rho(770)0",  1, 1, 1));
+	keyFileContents.push_back(keyFileContent(2, -1, "f2(1270)0", 2, 0, 2));
+	keyFileContents.push_back(keyFileContent(2, -1, "f2(1270)0", 2, 2, 2));
+	const vector<isobarAmplitudePtr> uncachedAmps = constructAmplitudes(keyFileContents);
+	const vector<isobarAmplitudePtr> cachedAmps   = constructAmplitudes(keyFileContents);
+	const isobarAmplitudeCachePtr    cache(new isobarAmplitudeCache());
+	for (size_t i = 0; i < cachedAmps.size(); ++i)
+		cachedAmps[i]->setCache(cache);
+
+	const unsigned int nmbEvents     = 1000;
+	const double       maxRelDelta   = 1e-12;
+	double             maxDelta      = 0;
+	unsigned int       nmbMismatches = 0;
+	TRandom3 random(12345);
+	for (unsigned int eventIndex = 0; eventIndex < nmbEvents; ++eventIndex) {
+		const vector<TVector3> prodKinMomenta(1, TVector3(0, 0, 190));
+		vector<TVector3> decayKinMomenta;
+		for (unsigned int i = 0; i < 3; ++i)
+			decayKinMomenta.push_back(TVector3(random.Gaus(0, 0.4), random.Gaus(0, 0.4), random.Uniform(10, 120)));
+		cache->clear();
+		for (size_t i = 0; i < keyFileContents.size(); ++i) {
+			if (   not uncachedAmps[i]->decayTopology()->readKinematicsData(prodKinMomenta, decayKinMomenta)
+			    or not cachedAmps  [i]->decayTopology()->readKinematicsData(prodKinMomenta, decayKinMomenta)) {
+				printErr << "problems reading event " << eventIndex << ". Aborting..." << endl;
+				exit(1);
+			}
+			const complex<double> uncachedAmp = (*uncachedAmps[i])();
+			const complex<double> cachedAmp   = (*cachedAmps  [i])();
+			const double          delta       = abs(cachedAmp - uncachedAmp) / max(abs(uncachedAmp), 1e-300);
+			maxDelta = max(maxDelta, delta);
+			if (delta > maxRelDelta) {
+				printWarn << "event " << eventIndex << ", wave " << i << ": amplitude with cache " << cachedAmp
+				          << " differs from amplitude without cache " << uncachedAmp << "." << endl;
+				++nmbMismatches;
+			}
+		}
+	}
+	printInfo << *cache;
+
+	if (cache->nmbHits() == 0) {
+		printErr << "no sub-decay amplitude was taken from the cache." << endl;
+		return 1;
+	}
+	if (nmbMismatches > 0) {
+		printErr << nmbMismatches << " amplitudes calculated with cache differ from the ones without cache "
+		         << "(maximum relative deviation " << maxDelta << ")." << endl;
+		return 1;
+	}
+	printSucc << "amplitudes with and without cache agree for " << nmbEvents << " events "
+	          << "(maximum relative deviation " << maxDelta << ")." << endl;
+	return 0;
+}
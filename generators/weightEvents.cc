@@ -99,6 +99,10 @@ openRootAmpFiles(const string&               ampDirName,
 			continue;
 		}
 		TTree* ampTree = ampMeta->amplitudeTree();
+		if (not ampTree) {
+			printErr << "amplitude file '" << ampFilePath << "' is columnar, which is not supported here. skipping wave." << endl;
+			continue;
+		}
 
 		// check that all tree have the same number of entries
 		const unsigned long nmbEntries = ampTree->GetEntriesFast();
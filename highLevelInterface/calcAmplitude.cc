@@ -1,12 +1,15 @@
 
 #include "calcAmplitude.h"
 
+#include <functional>
+
 #include <boost/progress.hpp>
 
 #include <TClonesArray.h>
 #include <TTree.h>
 #include <TTreePerfStats.h>
 
+#include <hashCalculator.h>
 #include <reportingUtils.hpp>
 
 using namespace std;
@@ -19,80 +22,325 @@ rpwa::hli::calcAmplitude(const eventMetadata&      eventMeta,
                          const long int            maxNmbEvents,
                          const bool                printProgress,
                          const string&             treePerfStatOutFileName,         // root file name for tree performance result
-                         const long int            treeCacheSize)
+                         const long int            treeCacheSize,
+                         const long int            startEvent)
 {
-	vector<complex<double> > retval;
-
 	if(not amplitude) {
 		printWarn << "null pointer to isobar decay amplitude. cannot process tree." << endl;
-		return retval;
+		return vector<complex<double> >();
 	}
-	// initialize amplitude
-	amplitude->init();
-	const isobarDecayTopologyPtr& decayTopo = amplitude->decayTopology();
-
-	TTree* tree = eventMeta.eventTree();
-	if(not tree) {
-		printErr << "event tree not found." << endl;
-		return retval;
+	vector<vector<complex<double> > > retval = calcAmplitudes(eventMeta,
+	                                                          vector<isobarAmplitudePtr>(1, amplitude),
+	                                                          maxNmbEvents,
+	                                                          printProgress,
+	                                                          treePerfStatOutFileName,
+	                                                          treeCacheSize,
+	                                                          startEvent);
+	if(retval.size() != 1) {
+		return vector<complex<double> >();
 	}
+	return retval[0];
+}
 
-	// create branch pointers and leaf variables
-	TBranch*      prodKinMomentaBr  = 0;
-	TBranch*      decayKinMomentaBr = 0;
-	TClonesArray* prodKinMomenta    = 0;
-	TClonesArray* decayKinMomenta   = 0;
-
-	// connect leaf variables to tree branches
-	tree->SetBranchAddress(eventMetadata::productionKinematicsMomentaBranchName.c_str(),  &prodKinMomenta,  &prodKinMomentaBr );
-	tree->SetBranchAddress(eventMetadata::decayKinematicsMomentaBranchName.c_str(), &decayKinMomenta, &decayKinMomentaBr);
-	tree->SetCacheSize(treeCacheSize);
-	tree->AddBranchToCache(eventMetadata::productionKinematicsMomentaBranchName.c_str(),  true);
-	tree->AddBranchToCache(eventMetadata::decayKinematicsMomentaBranchName.c_str(), true);
-	tree->StopCacheLearningPhase();
-	TTreePerfStats* treePerfStats = 0;
-	if(treePerfStatOutFileName != "") {
-		treePerfStats = new TTreePerfStats("ioPerf", tree);
-	}
 
-	// loop over events
-	if(not decayTopo->initKinematicsData(eventMeta.productionKinematicsParticleNames(), eventMeta.decayKinematicsParticleNames())) {
-		printWarn << "problems initializing input data. cannot read input data." << endl;
-		return retval;
-	}
-	const long int    nmbEventsTree     = tree->GetEntries();
-	const long int    nmbEvents         = ((maxNmbEvents > 0) ? min(maxNmbEvents, nmbEventsTree)
-	                                       : nmbEventsTree);
-	boost::progress_display* progressIndicator = (printProgress) ? new boost::progress_display(nmbEvents, cout, "") : 0;
-	for (long int eventIndex = 0; eventIndex < nmbEvents; ++eventIndex) {
-		if(progressIndicator) {
-			++(*progressIndicator);
+namespace {
+
+	// shares one cache for sub-decay amplitudes among all given amplitudes
+	// and detaches it again when going out of scope
+	class sharedAmplitudeCache {
+
+	public:
+
+		sharedAmplitudeCache(const vector<isobarAmplitudePtr>& amplitudes)
+			: _amplitudes(amplitudes),
+			  _cache     (new isobarAmplitudeCache())
+		{
+			for(size_t ampIndex = 0; ampIndex < _amplitudes.size(); ++ampIndex) {
+				_amplitudes[ampIndex]->setCache(_cache);
+			}
+		}
+
+		~sharedAmplitudeCache()
+		{
+			for(size_t ampIndex = 0; ampIndex < _amplitudes.size(); ++ampIndex) {
+				_amplitudes[ampIndex]->setCache(isobarAmplitudeCachePtr());
+			}
+		}
+
+		const isobarAmplitudeCachePtr& cache() const { return _cache; }
+
+	private:
+
+		const vector<isobarAmplitudePtr>& _amplitudes;
+		isobarAmplitudeCachePtr           _cache;
+
+	};
+
+
+	// reads the event tree once and evaluates all amplitudes for the events in
+	// [startEvent, startEvent + maxNmbEvents) whose binning variables lie within
+	// binningMap (all events if it is empty); the amplitude values are handed to
+	// processChunk whenever chunkSize values have been buffered for all amplitudes
+	// together (only once at the end if chunkSize is 0) and the buffer is cleared
+	// afterwards, so that memory usage is bounded by the chunk size independent of
+	// the number of amplitudes
+	bool
+	loopOverEvents(const eventMetadata&                                               eventMeta,
+	               const vector<isobarAmplitudePtr>&                                  amplitudes,
+	               const long int                                                     maxNmbEvents,
+	               const bool                                                         printProgress,
+	               const string&                                                      treePerfStatOutFileName,
+	               const long int                                                     treeCacheSize,
+	               const long int                                                     startEvent,
+	               const long int                                                     chunkSize,
+	               const eventMetadata::binningMapType&                               binningMap,
+	               const function<bool(vector<vector<complex<double> > >& chunk)>&    processChunk)
+	{
+		if(amplitudes.empty()) {
+			printWarn << "no isobar decay amplitudes given. cannot process tree." << endl;
+			return false;
+		}
+		for(size_t ampIndex = 0; ampIndex < amplitudes.size(); ++ampIndex) {
+			if(not amplitudes[ampIndex]) {
+				printWarn << "null pointer to isobar decay amplitude at index " << ampIndex << ". cannot process tree." << endl;
+				return false;
+			}
+		}
+
+		TTree* tree = eventMeta.eventTree();
+		if(not tree) {
+			printErr << "event tree not found." << endl;
+			return false;
+		}
+
+		// isobar sub-decays that appear in several amplitudes are calculated only once per event
+		const sharedAmplitudeCache ampCache(amplitudes);
+
+		// initialize amplitudes and their decay topologies
+		for(size_t ampIndex = 0; ampIndex < amplitudes.size(); ++ampIndex) {
+			amplitudes[ampIndex]->init();
+			if(not amplitudes[ampIndex]->decayTopology()->initKinematicsData(eventMeta.productionKinematicsParticleNames(),
+			                                                                 eventMeta.decayKinematicsParticleNames())) {
+				printWarn << "problems initializing input data for amplitude at index " << ampIndex << ". cannot read input data." << endl;
+				return false;
+			}
 		}
 
-		tree->GetEntry(eventIndex);
+		// create branch pointers and leaf variables
+		TBranch*      prodKinMomentaBr  = 0;
+		TBranch*      decayKinMomentaBr = 0;
+		TClonesArray* prodKinMomenta    = 0;
+		TClonesArray* decayKinMomenta   = 0;
 
-		if(not prodKinMomenta or not decayKinMomenta) {
-			printWarn << "at least one of the input data arrays is a null pointer: "
-			          << "        production kinematics: " << "momenta = " << prodKinMomenta  << endl
-			          << "        decay kinematics:      " << "momenta = " << decayKinMomenta << endl
-			          << "skipping event." << endl;
-			return vector<complex<double> >();
+		// connect leaf variables to tree branches
+		tree->SetBranchAddress(eventMetadata::productionKinematicsMomentaBranchName.c_str(),  &prodKinMomenta,  &prodKinMomentaBr );
+		tree->SetBranchAddress(eventMetadata::decayKinematicsMomentaBranchName.c_str(), &decayKinMomenta, &decayKinMomentaBr);
+		tree->SetCacheSize(treeCacheSize);
+		tree->AddBranchToCache(eventMetadata::productionKinematicsMomentaBranchName.c_str(),  true);
+		tree->AddBranchToCache(eventMetadata::decayKinematicsMomentaBranchName.c_str(), true);
+		map<string, double> binningVariables;
+		for(eventMetadata::binningMapType::const_iterator it = binningMap.begin(); it != binningMap.end(); ++it) {
+			const string& binningVar = it->first;
+			if(not tree->GetBranch(binningVar.c_str())) {
+				printWarn << "binning variable '" << binningVar << "' not found in event tree. cannot process tree." << endl;
+				return false;
+			}
+			tree->SetBranchAddress(binningVar.c_str(), &binningVariables[binningVar]);
+			tree->AddBranchToCache(binningVar.c_str(), true);
+		}
+		tree->StopCacheLearningPhase();
+		TTreePerfStats* treePerfStats = 0;
+		if(treePerfStatOutFileName != "") {
+			treePerfStats = new TTreePerfStats("ioPerf", tree);
 		}
 
-		if(decayTopo->readKinematicsData(*prodKinMomenta, *decayKinMomenta)) {
-			retval.push_back((*amplitude)());
-		} else {
-			printWarn << "problems reading event[" << eventIndex << "]" << endl;
-			return vector<complex<double> >();
+		// loop over events
+		const long int    nmbEventsTree     = tree->GetEntries();
+		// an empty tree yields no amplitudes if it is read from its beginning
+		if(startEvent < 0 or (startEvent >= nmbEventsTree and not (startEvent == 0 and nmbEventsTree == 0))) {
+			printWarn << "start event " << startEvent << " is outside of the event tree with "
+			          << nmbEventsTree << " entries. cannot process tree." << endl;
+			return false;
 		}
-	}
+		const long int    nmbEvents         = ((maxNmbEvents > 0) ? min(maxNmbEvents, nmbEventsTree - startEvent)
+		                                       : nmbEventsTree - startEvent);
+		if(startEvent > 0) {
+			tree->SetCacheEntryRange(startEvent, startEvent + nmbEvents);
+		}
+		const long int    chunkEvents       = max(chunkSize / (long int)amplitudes.size(), 1L);  // events per chunk
+		const long int    bufferSize        = ((chunkSize > 0) ? min(chunkEvents, nmbEvents) : nmbEvents);
+		vector<vector<complex<double> > > chunk(amplitudes.size());
+		for(size_t ampIndex = 0; ampIndex < amplitudes.size(); ++ampIndex) {
+			chunk[ampIndex].reserve(bufferSize);
+		}
+		boost::progress_display* progressIndicator = (printProgress) ? new boost::progress_display(nmbEvents, cout, "") : 0;
+		long int nmbRejectedEvents = 0;
+		for (long int eventIndex = startEvent; eventIndex < startEvent + nmbEvents; ++eventIndex) {
+			if(progressIndicator) {
+				++(*progressIndicator);
+			}
+
+			tree->GetEntry(eventIndex);
 
-	if(printProgress) {
-		tree->PrintCacheStats();
+			bool inBin = true;
+			for(eventMetadata::binningMapType::const_iterator it = binningMap.begin(); it != binningMap.end(); ++it) {
+				const double binningValue = binningVariables[it->first];
+				if(binningValue < it->second.first or binningValue >= it->second.second) {
+					inBin = false;
+					break;
+				}
+			}
+			if(not inBin) {
+				++nmbRejectedEvents;
+				continue;
+			}
+
+			if(not prodKinMomenta or not decayKinMomenta) {
+				printWarn << "at least one of the input data arrays is a null pointer: "
+				          << "        production kinematics: " << "momenta = " << prodKinMomenta  << endl
+				          << "        decay kinematics:      " << "momenta = " << decayKinMomenta << endl
+				          << "skipping event." << endl;
+				return false;
+			}
+
+			// the event is read and decompressed only once, all amplitudes are evaluated from it
+			ampCache.cache()->clear();
+			for(size_t ampIndex = 0; ampIndex < amplitudes.size(); ++ampIndex) {
+				const isobarAmplitudePtr& amplitude = amplitudes[ampIndex];
+				if(amplitude->decayTopology()->readKinematicsData(*prodKinMomenta, *decayKinMomenta)) {
+					chunk[ampIndex].push_back((*amplitude)());
+				} else {
+					printWarn << "problems reading event[" << eventIndex << "] for amplitude at index " << ampIndex << endl;
+					return false;
+				}
+			}
+
+			if((long int)chunk[0].size() == bufferSize) {
+				if(not processChunk(chunk)) {
+					printWarn << "problems processing amplitudes of events up to event[" << eventIndex << "]." << endl;
+					return false;
+				}
+				for(size_t ampIndex = 0; ampIndex < amplitudes.size(); ++ampIndex) {
+					chunk[ampIndex].clear();
+				}
+			}
+		}
+		// the last chunk is incomplete if the number of events is no multiple of the
+		// chunk size or if events were rejected
+		if(not chunk[0].empty() and not processChunk(chunk)) {
+			printWarn << "problems processing amplitudes of the last events." << endl;
+			return false;
+		}
+		if(not binningMap.empty()) {
+			printInfo << nmbRejectedEvents << " of " << nmbEvents << " events rejected because they are outside the binning." << endl;
+		}
+
+		if(printProgress) {
+			tree->PrintCacheStats();
+			printInfo << *(ampCache.cache());
+		}
+		if(treePerfStats) {
+			treePerfStats->SaveAs(treePerfStatOutFileName.c_str());
+			delete treePerfStats;
+		}
+		return true;
 	}
-	if(treePerfStats) {
-		treePerfStats->SaveAs(treePerfStatOutFileName.c_str());
-		delete treePerfStats;
+
+}
+
+
+vector<vector<complex<double> > >
+rpwa::hli::calcAmplitudes(const eventMetadata&              eventMeta,
+                          const vector<isobarAmplitudePtr>& amplitudes,
+                          const long int                    maxNmbEvents,
+                          const bool                        printProgress,
+                          const string&                     treePerfStatOutFileName,         // root file name for tree performance result
+                          const long int                    treeCacheSize,
+                          const long int                    startEvent)
+{
+	vector<vector<complex<double> > > retval;
+	// all events in one chunk, which is taken over without copying
+	const bool success = loopOverEvents(eventMeta, amplitudes, maxNmbEvents, printProgress,
+	                                    treePerfStatOutFileName, treeCacheSize, startEvent, 0, eventMetadata::binningMapType(),
+	                                    [&retval](vector<vector<complex<double> > >& chunk) {
+	                                        retval.swap(chunk);
+	                                        chunk.resize(retval.size());
+	                                        return true;
+	                                    });
+	if(not success) {
+		return vector<vector<complex<double> > >();
 	}
 	return retval;
 }
+
+
+bool
+rpwa::hli::calcAmplitudes(const eventMetadata&                eventMeta,
+                          const vector<isobarAmplitudePtr>&   amplitudes,
+                          const vector<amplitudeFileWriter*>& ampFileWriters,
+                          const long int                      maxNmbEvents,
+                          const bool                          printProgress,
+                          const string&                       treePerfStatOutFileName,         // root file name for tree performance result
+                          const long int                      treeCacheSize,
+                          const long int                      startEvent,
+                          const long int                      chunkSize)
+{
+	if(ampFileWriters.size() != amplitudes.size()) {
+		printWarn << "number of amplitude file writers (" << ampFileWriters.size() << ") does not match "
+		          << "number of amplitudes (" << amplitudes.size() << "). cannot process tree." << endl;
+		return false;
+	}
+	for(size_t ampIndex = 0; ampIndex < ampFileWriters.size(); ++ampIndex) {
+		if(not ampFileWriters[ampIndex] or not ampFileWriters[ampIndex]->initialized()) {
+			printWarn << "amplitude file writer at index " << ampIndex << " is not initialized. cannot process tree." << endl;
+			return false;
+		}
+	}
+	return loopOverEvents(eventMeta, amplitudes, maxNmbEvents, printProgress,
+	                      treePerfStatOutFileName, treeCacheSize, startEvent, chunkSize, eventMetadata::binningMapType(),
+	                      [&ampFileWriters](vector<vector<complex<double> > >& chunk) {
+	                          for(size_t ampIndex = 0; ampIndex < chunk.size(); ++ampIndex) {
+	                              ampFileWriters[ampIndex]->addAmplitudes(chunk[ampIndex]);
+	                          }
+	                          return true;
+	                      });
+}
+
+
+bool
+rpwa::hli::calcIntegralOnTheFly(ampIntegralMatrix&                   integralMatrix,
+                                vector<string>&                      ampHashes,
+                                const eventMetadata&                 eventMeta,
+                                const vector<isobarAmplitudePtr>&    amplitudes,
+                                const eventMetadata::binningMapType& binningMap,
+                                const long int                       maxNmbEvents,
+                                const bool                           printProgress,
+                                const long int                       treeCacheSize,
+                                const long int                       startEvent,
+                                const long int                       chunkSize)
+{
+	if(integralMatrix.nmbWaves() != amplitudes.size()) {
+		printWarn << "integral matrix has " << integralMatrix.nmbWaves() << " waves, but got "
+		          << amplitudes.size() << " amplitudes. cannot process tree." << endl;
+		return false;
+	}
+	vector<hashCalculator> hashers(amplitudes.size());
+	const bool success = loopOverEvents(eventMeta, amplitudes, maxNmbEvents, printProgress,
+	                                    "", treeCacheSize, startEvent, chunkSize, binningMap,
+	                                    [&integralMatrix, &hashers](vector<vector<complex<double> > >& chunk) {
+	                                        for(size_t ampIndex = 0; ampIndex < chunk.size(); ++ampIndex) {
+	                                            for(size_t eventIndex = 0; eventIndex < chunk[ampIndex].size(); ++eventIndex) {
+	                                                hashers[ampIndex].Update(chunk[ampIndex][eventIndex]);
+	                                            }
+	                                        }
+	                                        return integralMatrix.addEvents(chunk);
+	                                    });
+	if(not success) {
+		return false;
+	}
+	ampHashes.clear();
+	for(size_t ampIndex = 0; ampIndex < hashers.size(); ++ampIndex) {
+		ampHashes.push_back(hashers[ampIndex].hash());
+	}
+	return true;
+}
@@ -3,6 +3,8 @@
 
 #include <complex>
 
+#include <ampIntegralMatrix.h>
+#include <amplitudeFileWriter.h>
 #include <eventMetadata.h>
 #include <isobarAmplitude.h>
 
@@ -16,7 +18,48 @@ namespace rpwa {
 		                                                 const long int                  maxNmbEvents            = -1,
 		                                                 const bool                      printProgress           = true,
 		                                                 const std::string&              treePerfStatOutFileName = "",         // root file name for tree performance result
-		                                                 const long int                  treeCacheSize           = 25000000);
+		                                                 const long int                  treeCacheSize           = 25000000,
+		                                                 const long int                  startEvent              = 0);
+
+		// reads the event tree only once and evaluates all given amplitudes for every event
+		// in the range [startEvent, startEvent + maxNmbEvents) (to the end of the tree if maxNmbEvents <= 0)
+		// returns one vector of amplitude values per given amplitude (same ordering)
+		std::vector<std::vector<std::complex<double> > > calcAmplitudes(const rpwa::eventMetadata&                    eventMeta,
+		                                                                const std::vector<rpwa::isobarAmplitudePtr>& amplitudes,
+		                                                                const long int                                maxNmbEvents            = -1,
+		                                                                const bool                                    printProgress           = true,
+		                                                                const std::string&                            treePerfStatOutFileName = "",         // root file name for tree performance result
+		                                                                const long int                                treeCacheSize           = 25000000,
+		                                                                const long int                                startEvent              = 0);
+
+		// same as above, but instead of collecting all amplitude values in memory they are
+		// passed to the given (initialized) amplitude file writers in chunks of chunkSize
+		// amplitude values for all amplitudes together, so that the memory usage depends
+		// neither on the number of events nor on the number of amplitudes
+		bool calcAmplitudes(const rpwa::eventMetadata&                    eventMeta,
+		                    const std::vector<rpwa::isobarAmplitudePtr>& amplitudes,
+		                    const std::vector<rpwa::amplitudeFileWriter*>& ampFileWriters,
+		                    const long int                                maxNmbEvents            = -1,
+		                    const bool                                    printProgress           = true,
+		                    const std::string&                            treePerfStatOutFileName = "",         // root file name for tree performance result
+		                    const long int                                treeCacheSize           = 25000000,
+		                    const long int                                startEvent              = 0,
+		                    const long int                                chunkSize               = 100000);
+
+		// evaluates the amplitudes for the events in [startEvent, startEvent + maxNmbEvents)
+		// whose binning variables lie within binningMap (all events if it is empty) and adds
+		// them to integralMatrix, whose wave names have to be set in the order of the
+		// amplitudes; ampHashes is set to the hashes of the amplitude values of each wave
+		bool calcIntegralOnTheFly(rpwa::ampIntegralMatrix&                   integralMatrix,
+		                          std::vector<std::string>&                  ampHashes,
+		                          const rpwa::eventMetadata&                 eventMeta,
+		                          const std::vector<rpwa::isobarAmplitudePtr>& amplitudes,
+		                          const rpwa::eventMetadata::binningMapType& binningMap,
+		                          const long int                             maxNmbEvents  = -1,
+		                          const bool                                 printProgress = true,
+		                          const long int                             treeCacheSize = 25000000,
+		                          const long int                             startEvent    = 0,
+		                          const long int                             chunkSize     = 100000);
 
 	}
 
@@ -35,20 +35,23 @@
 
 #include "pwaLikelihood.h"
 
+#include <atomic>
 #include <iomanip>
 #include <fstream>
 #include <complex>
 #include <cassert>
 #include <limits>
+#include <mutex>
+#include <thread>
 
+#include "RVersion.h"
+#include "TROOT.h"
 #include "TString.h"
 #include "TSystem.h"
 #include "TStopwatch.h"
-#include "TTree.h"
 
 #include "amplitudeMetadata.h"
 #include "eventMetadata.h"
-#include "amplitudeTreeLeaf.h"
 #include "complexMatrix.h"
 #include "conversionUtils.hpp"
 #include "fileUtils.hpp"
@@ -70,6 +73,8 @@ namespace bt = boost::tuples;
 
 
 template<typename complexT> bool pwaLikelihood<complexT>::_debug = true;
+template<typename complexT> const unsigned int pwaLikelihood<complexT>::nmbLanes;
+template<typename complexT> const unsigned int pwaLikelihood<complexT>::eventBlockSize;
 
 
 namespace {
@@ -100,6 +105,65 @@ namespace {
 		return gamma2 / ((gamma2 + x2) * (gamma2 + x2)) * (-2. + 8. * x2 / (gamma2 + x2));
 	}
 
+	// calls function(range, firstEvt, endEvt) for nmbRanges contiguous ranges
+	// of the events, each range in its own thread. the ranges depend only on
+	// the number of events and of ranges, so that partial results combined in
+	// the order of the ranges do not depend on the timing of the threads
+	template<typename functionT>
+	void forEventRanges(const unsigned int nmbEvents, const unsigned int nmbRanges, const functionT& function)
+	{
+		if (nmbRanges <= 1) {
+			function(0, 0, nmbEvents);
+			return;
+		}
+		vector<std::thread> threads;
+		for (unsigned int iRange = 0; iRange < nmbRanges; ++iRange) {
+			const unsigned int firstEvt = ((unsigned long)iRange       * nmbEvents) / nmbRanges;
+			const unsigned int endEvt   = ((unsigned long)(iRange + 1) * nmbEvents) / nmbRanges;
+			threads.push_back(std::thread(function, iRange, firstEvt, endEvt));
+		}
+		for (unsigned int iRange = 0; iRange < nmbRanges; ++iRange)
+			threads[iRange].join();
+	}
+
+	// switches ROOT to thread-safe mode, which is needed before amplitude
+	// trees are read by several threads. the mode cannot be switched off
+	// again and applies to the whole process, so it is enabled only once and
+	// only when trees are actually read in parallel. returns false if the
+	// ROOT version does not provide a thread-safe mode (ROOT < 6.06)
+	bool enableRootThreadSafety()
+	{
+#if ROOT_VERSION_CODE >= ROOT_VERSION(6, 6, 0)
+		static std::once_flag enabled;
+		std::call_once(enabled, []() {
+			ROOT::EnableThreadSafety();
+			printInfo << "enabled thread-safe mode of ROOT." << endl;
+		});
+		return true;
+#else
+		return false;
+#endif
+	}
+
+	template<typename T>
+	T compensatedSum(const vector<T>& values)
+	{
+		accumulator_set<T, stats<tag::sum(compensated)> > acc;
+		for (size_t i = 0; i < values.size(); ++i)
+			acc(values[i]);
+		return sum(acc);
+	}
+
+	// sums values[i][index] over i
+	template<typename T>
+	T compensatedSum(const vector<vector<T> >& values, const size_t index)
+	{
+		accumulator_set<T, stats<tag::sum(compensated)> > acc;
+		for (size_t i = 0; i < values.size(); ++i)
+			acc(values[i][index]);
+		return sum(acc);
+	}
+
 }
 
 
@@ -120,7 +184,9 @@ pwaLikelihood<complexT>::pwaLikelihood()
 	  _useNormalizedAmps(true),
 	  _priorType        (FLAT),
 	  _cauchyWidth      (0.5),
-	  _numbAccEvents    (0)
+	  _nmbThreads       (1),
+	  _numbAccEvents    (0),
+	  _decayAmpsStride  (0)
 {
 	_nmbWavesRefl[0] = 0;
 	_nmbWavesRefl[1] = 0;
@@ -165,7 +231,6 @@ pwaLikelihood<complexT>::FdF
 	value_type        prodAmpFlat;
 	prodAmpsArrayType prodAmps;
 	copyFromParArray(par, prodAmps, prodAmpFlat);
-	const value_type prodAmpFlat2 = prodAmpFlat * prodAmpFlat;
 
 	// create array of likelihood derivatives w.r.t. real and imaginary
 	// parts of the production amplitudes
@@ -179,112 +244,44 @@ pwaLikelihood<complexT>::FdF
 	// as well as derivatives with respect to parameters
 	TStopwatch timer;
 	timer.Start();
-	accumulator_set<value_type, stats<tag::sum(compensated)> > logLikelihoodAcc;
-	accumulator_set<value_type, stats<tag::sum(compensated)> > derivativeFlatAcc;
-	multi_array<accumulator_set<complexT, stats<tag::sum(compensated)> >, 3>
-		derivativesAcc(derivShape);
-	for (unsigned int iEvt = 0; iEvt < _nmbEvents; ++iEvt) {
-		accumulator_set<value_type, stats<tag::sum(compensated)> > likelihoodAcc;
-		prodAmpsArrayType derivative(derivShape);  // likelihood derivatives for this event
-		for (unsigned int iRank = 0; iRank < _rank; ++iRank) {  // incoherent sum over ranks
-			for (unsigned int iRefl = 0; iRefl < 2; ++iRefl) {  // incoherent sum over reflectivities
-				accumulator_set<complexT, stats<tag::sum(compensated)> > ampProdAcc;
-				for (unsigned int iWave = 0; iWave < _nmbWavesRefl[iRefl]; ++iWave) {  // coherent sum over waves
-					ampProdAcc(prodAmps[iRank][iRefl][iWave] * _decayAmps[iRefl][iEvt][iWave]);
-				}
-				const complexT ampProdSum = sum(ampProdAcc);
-				likelihoodAcc(norm(ampProdSum));
-				// set derivative term that is independent on derivative wave index
-				for (unsigned int iWave = 0; iWave < _nmbWavesRefl[iRefl]; ++iWave)
-					// amplitude sums for current rank and for waves with same reflectivity
-					derivative[iRank][iRefl][iWave] = ampProdSum;
-			}
-			// loop again over waves for current rank and multiply with complex conjugate
-			// of decay amplitude of the wave with the derivative wave index
-			for (unsigned int iRefl = 0; iRefl < 2; ++iRefl)
-				for (unsigned int iWave = 0; iWave < _nmbWavesRefl[iRefl]; ++iWave)
-					derivative[iRank][iRefl][iWave] *= conj(_decayAmps[iRefl][iEvt][iWave]);
-		}  // end loop over rank
-		likelihoodAcc   (prodAmpFlat2            );
-		logLikelihoodAcc(-log(sum(likelihoodAcc)));
-		// incorporate factor 2 / sigma
-		const value_type factor = 2. / sum(likelihoodAcc);
-		for (unsigned int iRank = 0; iRank < _rank; ++iRank)
-			for (unsigned int iRefl = 0; iRefl < 2; ++iRefl)
-				for (unsigned int iWave = 0; iWave < _nmbWavesRefl[iRefl]; ++iWave)
-					derivativesAcc[iRank][iRefl][iWave](-factor * derivative[iRank][iRefl][iWave]);
-		derivativeFlatAcc(-factor * prodAmpFlat);
-	}  // end loop over events
-	for (unsigned int iRank = 0; iRank < _rank; ++iRank)
-		for (unsigned int iRefl = 0; iRefl < 2; ++iRefl)
-			for (unsigned int iWave = 0; iWave < _nmbWavesRefl[iRefl]; ++iWave)
-				derivatives[iRank][iRefl][iWave] = sum(derivativesAcc[iRank][iRefl][iWave]);
-	derivativeFlat = sum(derivativeFlatAcc);
+	const unsigned int        nmbRanges = nmbEventRanges();
+	vector<value_type>        logLikelihoodParts (nmbRanges, 0);
+	vector<prodAmpsArrayType> derivativesParts   (nmbRanges, derivatives);
+	vector<value_type>        derivativeFlatParts(nmbRanges, 0);
+	forEventRanges(_nmbEvents, nmbRanges,
+	               [&](const unsigned int iRange, const unsigned int firstEvt, const unsigned int endEvt) {
+		               sumLogLikelihoodDerivatives(prodAmps, prodAmpFlat, firstEvt, endEvt, &logLikelihoodParts[iRange],
+		                                           derivativesParts[iRange], derivativeFlatParts[iRange]);
+	               });
+	const value_type logLikelihood = compensatedSum(logLikelihoodParts);
+	sumDerivativesParts(derivativesParts, derivatives);
+	derivativeFlat = compensatedSum(derivativeFlatParts);
 	// log time needed for likelihood calculation
 	timer.Stop();
 	_funcCallInfo[FDF].funcTime(timer.RealTime());
 
-	// compute normalization term of log likelihood and normalize derivatives w.r.t. parameters
+	// compute normalization term and prior of log likelihood and normalize derivatives w.r.t. parameters
 	timer.Start();
-	accumulator_set<value_type, stats<tag::sum(compensated)> > normFactorAcc;
-	const value_type nmbEvt      = (_useNormalizedAmps) ? 1 : _nmbEvents;
-	const value_type twiceNmbEvt = 2 * nmbEvt;
-	for (unsigned int iRank = 0; iRank < _rank; ++iRank)
-		for (unsigned int iRefl = 0; iRefl < 2; ++iRefl)
-			for (unsigned int iWave = 0; iWave < _nmbWavesRefl[iRefl]; ++iWave) {
-				accumulator_set<complexT, stats<tag::sum(compensated)> > normFactorDerivAcc;
-				for (unsigned int jWave = 0; jWave < _nmbWavesRefl[iRefl]; ++jWave) {  // inner loop over waves with same reflectivity
-					const complexT I = _accMatrix[iRefl][iWave][iRefl][jWave];
-					normFactorAcc(real((prodAmps[iRank][iRefl][iWave] * conj(prodAmps[iRank][iRefl][jWave]))
-					                   * I));
-					normFactorDerivAcc(prodAmps[iRank][iRefl][jWave] * conj(I));
-				}
-				derivatives[iRank][iRefl][iWave] += sum(normFactorDerivAcc) * twiceNmbEvt;  // account for 2 * nmbEvents
-			}
-	// take care of flat wave
-	normFactorAcc(prodAmpFlat2 * _totAcc);
-	derivativeFlat += prodAmpFlat * twiceNmbEvt * _totAcc;
+	const double normAndPrior = normalizationAndPrior(prodAmps, prodAmpFlat, &derivatives, &derivativeFlat);
 	// log time needed for normalization
 	timer.Stop();
 	_funcCallInfo[FDF].normTime(timer.RealTime());
 
-	double priorValue = 0.;
-	switch(_priorType)
-	{
-		case FLAT:
-			break;
-		case HALF_CAUCHY:
-			for (unsigned int iRank = 0; iRank < _rank; ++iRank) {  // incoherent sum over ranks
-				for (unsigned int iRefl = 0; iRefl < 2; ++iRefl) {  // incoherent sum over reflectivities
-					for (unsigned int iWave = 0; iWave < _nmbWavesRefl[iRefl]; ++iWave) {  // coherent sum over waves
-						const double r = abs(prodAmps[iRank][iRefl][iWave]);
-						const double cauchyFunctionValue = cauchyFunction(r, _cauchyWidth);
-						const double factor = (1./(r*cauchyFunctionValue)) * cauchyFunctionDerivative(r, _cauchyWidth);
-						complexT derivative(factor*prodAmps[iRank][iRefl][iWave].real(), factor*prodAmps[iRank][iRefl][iWave].imag());
-						priorValue -= log(cauchyFunctionValue);
-						derivatives[iRank][iRefl][iWave] -= derivative;
-					}
-				}
-			}
-			break;
-	}
-
 	// sort derivative results into output array and cache
 	copyToParArray(derivatives, derivativeFlat, gradient);
 	copyToParArray(derivatives, derivativeFlat, _derivCache.data());
 
 	// calculate log likelihood value
-	funcVal = sum(logLikelihoodAcc) + nmbEvt * sum(normFactorAcc) + priorValue;
+	funcVal = logLikelihood + normAndPrior;
 
 	// log total consumed time
 	timerTot.Stop();
 	_funcCallInfo[FDF].totalTime(timerTot.RealTime());
 
 	if (_debug)
-		printDebug << "raw log likelihood = "        << maxPrecisionAlign(sum(logLikelihoodAcc)) << ", "
-		           << "normalization = "             << maxPrecisionAlign(sum(normFactorAcc)   ) << ", "
-		           << "prior = "                     << maxPrecisionAlign(priorValue           ) << ", "
-		           << "normalized log likelihood = " << maxPrecisionAlign(funcVal              ) << endl;
+		printDebug << "raw log likelihood = "        << maxPrecisionAlign(logLikelihood) << ", "
+		           << "normalization and prior = "   << maxPrecisionAlign(normAndPrior ) << ", "
+		           << "normalized log likelihood = " << maxPrecisionAlign(funcVal      ) << endl;
 }
 
 
@@ -330,77 +327,36 @@ pwaLikelihood<complexT>::DoEval(const double* par) const
 	} else
 #endif
 	{
-		accumulator_set<value_type, stats<tag::sum(compensated)> > logLikelihoodAcc;
-		for (unsigned int iEvt = 0; iEvt < _nmbEvents; ++iEvt) {
-			accumulator_set<value_type, stats<tag::sum(compensated)> > likelihoodAcc;
-			for (unsigned int iRank = 0; iRank < _rank; ++iRank) {  // incoherent sum over ranks
-				for (unsigned int iRefl = 0; iRefl < 2; ++iRefl) {  // incoherent sum over reflectivities
-					accumulator_set<complexT, stats<tag::sum(compensated)> > ampProdAcc;
-					for (unsigned int iWave = 0; iWave < _nmbWavesRefl[iRefl]; ++iWave) {  // coherent sum over waves
-						ampProdAcc(prodAmps[iRank][iRefl][iWave] * _decayAmps[iRefl][iEvt][iWave]);
-					}
-					const complexT ampProdSum = sum(ampProdAcc);
-					likelihoodAcc(norm(ampProdSum));
-				}
-			}  // end loop over rank
-			likelihoodAcc   (prodAmpFlat2            );
-			logLikelihoodAcc(-log(sum(likelihoodAcc)));
-		}  // end loop over events
-		logLikelihood = sum(logLikelihoodAcc);
+		const unsigned int nmbRanges = nmbEventRanges();
+		vector<value_type> logLikelihoodParts(nmbRanges, 0);
+		forEventRanges(_nmbEvents, nmbRanges,
+		               [&](const unsigned int iRange, const unsigned int firstEvt, const unsigned int endEvt) {
+			               logLikelihoodParts[iRange] = sumLogLikelihood(prodAmps, prodAmpFlat2, firstEvt, endEvt);
+		               });
+		logLikelihood = compensatedSum(logLikelihoodParts);
 	}
 	// log time needed for likelihood calculation
 	timer.Stop();
 	_funcCallInfo[DOEVAL].funcTime(timer.RealTime());
 
-	// compute normalization term of log likelihood
+	// compute normalization term and prior of log likelihood
 	timer.Start();
-	accumulator_set<value_type, stats<tag::sum(compensated)> > normFactorAcc;
-	const value_type nmbEvt = (_useNormalizedAmps) ? 1 : _nmbEvents;
-	for (unsigned int iRank = 0; iRank < _rank; ++iRank)
-		for (unsigned int iRefl = 0; iRefl < 2; ++iRefl)
-			for (unsigned int iWave = 0; iWave < _nmbWavesRefl[iRefl]; ++iWave) {
-				for (unsigned int jWave = 0; jWave < _nmbWavesRefl[iRefl]; ++jWave) {  // inner loop over waves with same reflectivity
-					const complexT I = _accMatrix[iRefl][iWave][iRefl][jWave];
-					normFactorAcc(real((prodAmps[iRank][iRefl][iWave] * conj(prodAmps[iRank][iRefl][jWave]))
-					                   * I));
-				}
-			}
-	// take care of flat wave
-	normFactorAcc(prodAmpFlat2 * _totAcc);
+	const double normAndPrior = normalizationAndPrior(prodAmps, prodAmpFlat, 0, 0);
 	// log time needed for normalization
 	timer.Stop();
 	_funcCallInfo[DOEVAL].normTime(timer.RealTime());
 
-	double priorValue = 0.;
-	switch(_priorType)
-	{
-		case FLAT:
-			break;
-		case HALF_CAUCHY:
-			for (unsigned int iRank = 0; iRank < _rank; ++iRank) {  // incoherent sum over ranks
-				for (unsigned int iRefl = 0; iRefl < 2; ++iRefl) {  // incoherent sum over reflectivities
-					for (unsigned int iWave = 0; iWave < _nmbWavesRefl[iRefl]; ++iWave) {  // coherent sum over waves
-						const double r = abs(prodAmps[iRank][iRefl][iWave]);
-						const double cauchyFunctionValue = cauchyFunction(r, _cauchyWidth);
-						priorValue -= log(cauchyFunctionValue);
-					}
-				}
-			}
-			break;
-	}
-
 	// calculate log likelihood value
-	const double funcVal = logLikelihood + nmbEvt * sum(normFactorAcc) + priorValue;
+	const double funcVal = logLikelihood + normAndPrior;
 
 	// log total consumed time
 	timerTot.Stop();
 	_funcCallInfo[DOEVAL].totalTime(timerTot.RealTime());
 
 	if (_debug)
-		printDebug << "raw log likelihood = "        << maxPrecisionAlign(logLikelihood     ) << ", "
-		           << "normalization = "             << maxPrecisionAlign(sum(normFactorAcc)) << ", "
-		           << "prior = "                     << maxPrecisionAlign(priorValue        ) << ", "
-		           << "normalized log likelihood = " << maxPrecisionAlign(funcVal           ) << endl;
+		printDebug << "raw log likelihood = "        << maxPrecisionAlign(logLikelihood) << ", "
+		           << "normalization and prior = "   << maxPrecisionAlign(normAndPrior ) << ", "
+		           << "normalized log likelihood = " << maxPrecisionAlign(funcVal      ) << endl;
 
 	return funcVal;
 
@@ -513,53 +469,192 @@ pwaLikelihood<complexT>::Gradient
 	} else
 #endif
 	{
-		accumulator_set<value_type, stats<tag::sum(compensated)> > derivativeFlatAcc;
-		multi_array<accumulator_set<complexT, stats<tag::sum(compensated)> >, 3>
-			derivativesAcc(derivShape);
-		const value_type prodAmpFlat2 = prodAmpFlat * prodAmpFlat;
-		for (unsigned int iEvt = 0; iEvt < _nmbEvents; ++iEvt) {
-			accumulator_set<value_type, stats<tag::sum(compensated)> > likelihoodAcc;
-			prodAmpsArrayType derivative(derivShape);  // likelihood derivatives for this event
-			for (unsigned int iRank = 0; iRank < _rank; ++iRank) {  // incoherent sum over ranks
-				for (unsigned int iRefl = 0; iRefl < 2; ++iRefl) {  // incoherent sum over reflectivities
-					accumulator_set<complexT, stats<tag::sum(compensated)> > ampProdAcc;
-					for (unsigned int iWave = 0; iWave < _nmbWavesRefl[iRefl]; ++iWave) {  // coherent sum over waves
-						ampProdAcc(prodAmps[iRank][iRefl][iWave] * _decayAmps[iRefl][iEvt][iWave]);
-					}
-					const complexT ampProdSum = sum(ampProdAcc);
-					likelihoodAcc(norm(ampProdSum));
-					// set derivative term that is independent on derivative wave index
-					for (unsigned int iWave = 0; iWave < _nmbWavesRefl[iRefl]; ++iWave)
-						// amplitude sums for current rank and for waves with same reflectivity
-						derivative[iRank][iRefl][iWave] = ampProdSum;
-				}
-				// loop again over waves for current rank and multiply with complex conjugate
-				// of decay amplitude of the wave with the derivative wave index
-				for (unsigned int iRefl = 0; iRefl < 2; ++iRefl)
-					for (unsigned int iWave = 0; iWave < _nmbWavesRefl[iRefl]; ++iWave)
-						derivative[iRank][iRefl][iWave] *= conj(_decayAmps[iRefl][iEvt][iWave]);
-			}  // end loop over rank
-			likelihoodAcc(prodAmpFlat2);
-			// incorporate factor 2 / sigma
-			const value_type factor = 2. / sum(likelihoodAcc);
-			for (unsigned int iRank = 0; iRank < _rank; ++iRank)
-				for (unsigned int iRefl = 0; iRefl < 2; ++iRefl)
-					for (unsigned int iWave = 0; iWave < _nmbWavesRefl[iRefl]; ++iWave)
-						derivativesAcc[iRank][iRefl][iWave](-factor * derivative[iRank][iRefl][iWave]);
-			derivativeFlatAcc(-factor * prodAmpFlat);
-		}  // end loop over events
-		for (unsigned int iRank = 0; iRank < _rank; ++iRank)
-			for (unsigned int iRefl = 0; iRefl < 2; ++iRefl)
-				for (unsigned int iWave = 0; iWave < _nmbWavesRefl[iRefl]; ++iWave)
-					derivatives[iRank][iRefl][iWave] = sum(derivativesAcc[iRank][iRefl][iWave]);
-		derivativeFlat = sum(derivativeFlatAcc);
+		const unsigned int        nmbRanges = nmbEventRanges();
+		vector<prodAmpsArrayType> derivativesParts   (nmbRanges, derivatives);
+		vector<value_type>        derivativeFlatParts(nmbRanges, 0);
+		forEventRanges(_nmbEvents, nmbRanges,
+		               [&](const unsigned int iRange, const unsigned int firstEvt, const unsigned int endEvt) {
+			               sumLogLikelihoodDerivatives(prodAmps, prodAmpFlat, firstEvt, endEvt, 0,
+			                                           derivativesParts[iRange], derivativeFlatParts[iRange]);
+		               });
+		sumDerivativesParts(derivativesParts, derivatives);
+		derivativeFlat = compensatedSum(derivativeFlatParts);
 	}
 	// log time needed for likelihood calculation
 	timer.Stop();
 	_funcCallInfo[GRADIENT].funcTime(timer.RealTime());
 
-	// normalize derivatives w.r.t. parameters
+	// normalize derivatives w.r.t. parameters and add derivatives of prior
+	timer.Start();
+	normalizationAndPrior(prodAmps, prodAmpFlat, &derivatives, &derivativeFlat);
+	// log time needed for normalization
+	timer.Stop();
+	_funcCallInfo[GRADIENT].normTime(timer.RealTime());
+
+	// sort derivative results into output array and cache
+	copyToParArray(derivatives, derivativeFlat, gradient);
+	copyToParArray(derivatives, derivativeFlat, _derivCache.data());
+
+	// log total consumed time
+	timerTot.Stop();
+	_funcCallInfo[GRADIENT].totalTime(timerTot.RealTime());
+
+#endif  // USE_FDF
+}
+
+
+// calculates function values at nmbPoints points; par contains the
+// parameter arrays of the points one after the other. the event loop is
+// shared by all points
+template<typename complexT>
+void
+pwaLikelihood<complexT>::DoEvalBatch
+(const double*      par,             // parameter arrays [point][parameter]; reduced by rank conditions
+ const unsigned int nmbPoints,       // number of points
+ double*            funcVals) const  // function values [point]
+{
+	if (not _initFinished) {
+		printErr << "pwaLikelihood::finishInit has not been called. Aborting..." << endl;
+		throw;
+	}
+#ifdef USE_CUDA
+	if (_cudaEnabled) {
+		for (unsigned int iPoint = 0; iPoint < nmbPoints; ++iPoint)
+			funcVals[iPoint] = DoEval(par + iPoint * _nmbPars);
+		return;
+	}
+#endif
+	++(_funcCallInfo[DOEVALBATCH].nmbCalls);
+
+	// timer for total time
+	TStopwatch timerTot;
+	timerTot.Start();
+
+	// build complex production amplitudes from function parameters taking into account rank restrictions
+	vector<value_type>        prodAmpFlats (nmbPoints);
+	vector<value_type>        prodAmpFlat2s(nmbPoints);
+	vector<prodAmpsArrayType> prodAmps     (nmbPoints);
+	for (unsigned int iPoint = 0; iPoint < nmbPoints; ++iPoint) {
+		copyFromParArray(par + iPoint * _nmbPars, prodAmps[iPoint], prodAmpFlats[iPoint]);
+		prodAmpFlat2s[iPoint] = prodAmpFlats[iPoint] * prodAmpFlats[iPoint];
+	}
+
+	// loop over events and calculate real-data term of log likelihood
+	// for all points
+	TStopwatch timer;
+	timer.Start();
+	const unsigned int          nmbRanges = nmbEventRanges();
+	vector<vector<value_type> > logLikelihoodParts(nmbRanges);
+	forEventRanges(_nmbEvents, nmbRanges,
+	               [&](const unsigned int iRange, const unsigned int firstEvt, const unsigned int endEvt) {
+		               sumLogLikelihoodBatch(prodAmps, prodAmpFlat2s, firstEvt, endEvt, logLikelihoodParts[iRange]);
+	               });
+	// log time needed for likelihood calculation
+	timer.Stop();
+	_funcCallInfo[DOEVALBATCH].funcTime(timer.RealTime());
+
+	// add normalization term and prior
+	timer.Start();
+	for (unsigned int iPoint = 0; iPoint < nmbPoints; ++iPoint)
+		funcVals[iPoint] = compensatedSum(logLikelihoodParts, iPoint)
+		                   + normalizationAndPrior(prodAmps[iPoint], prodAmpFlats[iPoint], 0, 0);
+	// log time needed for normalization
+	timer.Stop();
+	_funcCallInfo[DOEVALBATCH].normTime(timer.RealTime());
+
+	// log total consumed time
+	timerTot.Stop();
+	_funcCallInfo[DOEVALBATCH].totalTime(timerTot.RealTime());
+}
+
+
+// calculates function values and gradients at nmbPoints points; par
+// contains the parameter arrays of the points one after the other, the
+// gradients are stored in the same way. the event loop is shared by all
+// points. unlike FdF() the derivative cache is not updated
+template<typename complexT>
+void
+pwaLikelihood<complexT>::FdFBatch
+(const double*      par,              // parameter arrays [point][parameter]; reduced by rank conditions
+ const unsigned int nmbPoints,        // number of points
+ double*            funcVals,         // function values [point]
+ double*            gradients) const  // arrays of derivatives [point][parameter]
+{
+	if (not _initFinished) {
+		printErr << "pwaLikelihood::finishInit has not been called. Aborting..." << endl;
+		throw;
+	}
+#ifdef USE_CUDA
+	if (_cudaEnabled) {
+		for (unsigned int iPoint = 0; iPoint < nmbPoints; ++iPoint)
+			FdF(par + iPoint * _nmbPars, funcVals[iPoint], gradients + iPoint * _nmbPars);
+		return;
+	}
+#endif
+	++(_funcCallInfo[FDFBATCH].nmbCalls);
+
+	// timer for total time
+	TStopwatch timerTot;
+	timerTot.Start();
+
+	// build complex production amplitudes from function parameters taking into account rank restrictions
+	vector<value_type>        prodAmpFlats(nmbPoints);
+	vector<prodAmpsArrayType> prodAmps    (nmbPoints);
+	for (unsigned int iPoint = 0; iPoint < nmbPoints; ++iPoint)
+		copyFromParArray(par + iPoint * _nmbPars, prodAmps[iPoint], prodAmpFlats[iPoint]);
+
+	// loop over events and calculate real-data term of log likelihood
+	// as well as derivatives with respect to parameters for all points
+	TStopwatch timer;
 	timer.Start();
+	boost::array<typename prodAmpsArrayType::index, 3> derivShape = {{ _rank, 2, _nmbWavesReflMax }};
+	const unsigned int                  nmbRanges = nmbEventRanges();
+	vector<vector<value_type> >         logLikelihoodParts (nmbRanges);
+	vector<vector<prodAmpsArrayType> >  derivativesParts   (nmbRanges, vector<prodAmpsArrayType>(nmbPoints, prodAmpsArrayType(derivShape)));
+	vector<vector<value_type> >         derivativeFlatParts(nmbRanges);
+	forEventRanges(_nmbEvents, nmbRanges,
+	               [&](const unsigned int iRange, const unsigned int firstEvt, const unsigned int endEvt) {
+		               sumLogLikelihoodDerivativesBatch(prodAmps, prodAmpFlats, firstEvt, endEvt, &logLikelihoodParts[iRange],
+		                                                derivativesParts[iRange], derivativeFlatParts[iRange]);
+	               });
+	// log time needed for likelihood calculation
+	timer.Stop();
+	_funcCallInfo[FDFBATCH].funcTime(timer.RealTime());
+
+	// add normalization term and prior
+	timer.Start();
+	for (unsigned int iPoint = 0; iPoint < nmbPoints; ++iPoint) {
+		vector<prodAmpsArrayType> pointDerivativesParts;
+		for (unsigned int iRange = 0; iRange < nmbRanges; ++iRange)
+			pointDerivativesParts.push_back(derivativesParts[iRange][iPoint]);
+		prodAmpsArrayType derivatives(derivShape);
+		sumDerivativesParts(pointDerivativesParts, derivatives);
+		value_type derivativeFlat = compensatedSum(derivativeFlatParts, iPoint);
+		funcVals[iPoint] = compensatedSum(logLikelihoodParts, iPoint)
+		                   + normalizationAndPrior(prodAmps[iPoint], prodAmpFlats[iPoint], &derivatives, &derivativeFlat);
+		copyToParArray(derivatives, derivativeFlat, gradients + iPoint * _nmbPars);
+	}
+	// log time needed for normalization
+	timer.Stop();
+	_funcCallInfo[FDFBATCH].normTime(timer.RealTime());
+
+	// log total consumed time
+	timerTot.Stop();
+	_funcCallInfo[FDFBATCH].totalTime(timerTot.RealTime());
+}
+
+
+// normalization term and prior of the log likelihood; their derivatives
+// are added to derivatives and derivativeFlat unless these are NULL
+template<typename complexT>
+double
+pwaLikelihood<complexT>::normalizationAndPrior
+(const prodAmpsArrayType& prodAmps,              // production amplitudes [rank][reflectivity][wave index]
+ const value_type         prodAmpFlat,           // production amplitude of flat wave
+ prodAmpsArrayType*       derivatives,           // derivatives [rank][reflectivity][wave index]
+ value_type*              derivativeFlat) const  // derivative w.r.t. flat wave
+{
+	accumulator_set<value_type, stats<tag::sum(compensated)> > normFactorAcc;
 	const value_type nmbEvt      = (_useNormalizedAmps) ? 1 : _nmbEvents;
 	const value_type twiceNmbEvt = 2 * nmbEvt;
 	for (unsigned int iRank = 0; iRank < _rank; ++iRank)
@@ -568,16 +663,19 @@ pwaLikelihood<complexT>::Gradient
 				accumulator_set<complexT, stats<tag::sum(compensated)> > normFactorDerivAcc;
 				for (unsigned int jWave = 0; jWave < _nmbWavesRefl[iRefl]; ++jWave) {  // inner loop over waves with same reflectivity
 					const complexT I = _accMatrix[iRefl][iWave][iRefl][jWave];
+					normFactorAcc(real((prodAmps[iRank][iRefl][iWave] * conj(prodAmps[iRank][iRefl][jWave]))
+					                   * I));
 					normFactorDerivAcc(prodAmps[iRank][iRefl][jWave] * conj(I));
 				}
-				derivatives[iRank][iRefl][iWave] += sum(normFactorDerivAcc) * twiceNmbEvt;  // account for 2 * nmbEvents
+				if (derivatives)
+					(*derivatives)[iRank][iRefl][iWave] += sum(normFactorDerivAcc) * twiceNmbEvt;  // account for 2 * nmbEvents
 			}
 	// take care of flat wave
-	derivativeFlat += prodAmpFlat * twiceNmbEvt * _totAcc;
-	// log time needed for normalization
-	timer.Stop();
-	_funcCallInfo[GRADIENT].normTime(timer.RealTime());
+	normFactorAcc(prodAmpFlat * prodAmpFlat * _totAcc);
+	if (derivativeFlat)
+		*derivativeFlat += prodAmpFlat * twiceNmbEvt * _totAcc;
 
+	double priorValue = 0.;
 	switch(_priorType)
 	{
 		case FLAT:
@@ -588,24 +686,268 @@ pwaLikelihood<complexT>::Gradient
 					for (unsigned int iWave = 0; iWave < _nmbWavesRefl[iRefl]; ++iWave) {  // coherent sum over waves
 						const double r = abs(prodAmps[iRank][iRefl][iWave]);
 						const double cauchyFunctionValue = cauchyFunction(r, _cauchyWidth);
-						const double factor = (1./(r*cauchyFunctionValue)) * cauchyFunctionDerivative(r, _cauchyWidth);
-						complexT derivative(factor*prodAmps[iRank][iRefl][iWave].real(), factor*prodAmps[iRank][iRefl][iWave].imag());
-						derivatives[iRank][iRefl][iWave] -= derivative;
+						priorValue -= log(cauchyFunctionValue);
+						if (derivatives) {
+							const double factor = (1./(r*cauchyFunctionValue)) * cauchyFunctionDerivative(r, _cauchyWidth);
+							complexT derivative(factor*prodAmps[iRank][iRefl][iWave].real(), factor*prodAmps[iRank][iRefl][iWave].imag());
+							(*derivatives)[iRank][iRefl][iWave] -= derivative;
+						}
 					}
 				}
 			}
 			break;
 	}
 
-	// sort derivative results into output array and cache
-	copyToParArray(derivatives, derivativeFlat, gradient);
-	copyToParArray(derivatives, derivativeFlat, _derivCache.data());
+	return nmbEvt * sum(normFactorAcc) + priorValue;
+}
 
-	// log total consumed time
-	timerTot.Stop();
-	_funcCallInfo[GRADIENT].totalTime(timerTot.RealTime());
 
-#endif  // USE_FDF
+// amplitude sums [rank][reflectivity] and likelihoods of the nmbEvts
+// events starting at blockStart; blockStart and nmbEvts are multiples of
+// nmbLanes. the amplitude sums are written to buffer with layout
+// [rank][reflectivity][real/imaginary part][event]
+template<typename complexT>
+void
+pwaLikelihood<complexT>::blockLikelihoods
+(const prodAmpsArrayType& prodAmps,      // production amplitudes [rank][reflectivity][wave index]
+ const value_type         prodAmpFlat2,  // squared production amplitude of flat wave
+ const unsigned int       blockStart,
+ const unsigned int       nmbEvts,
+ decayAmpsArrayType&      buffer,
+ value_type*              likelihoods) const
+{
+	buffer.resize((4 * _rank + 2) * eventBlockSize);
+	value_type* compensationsRe = &buffer[4 * _rank * eventBlockSize];
+	value_type* compensationsIm = compensationsRe + eventBlockSize;
+	for (unsigned int iEvt = 0; iEvt < nmbEvts; ++iEvt)
+		likelihoods[iEvt] = prodAmpFlat2;
+	for (unsigned int iRank = 0; iRank < _rank; ++iRank)  // incoherent sum over ranks
+		for (unsigned int iRefl = 0; iRefl < 2; ++iRefl) {  // incoherent sum over reflectivities
+			value_type* ampSumsRe = &buffer[(2 * (2 * iRank + iRefl)) * eventBlockSize];
+			value_type* ampSumsIm = ampSumsRe + eventBlockSize;
+			for (unsigned int iEvt = 0; iEvt < nmbEvts; ++iEvt) {
+				ampSumsRe      [iEvt] = 0;
+				ampSumsIm      [iEvt] = 0;
+				compensationsRe[iEvt] = 0;
+				compensationsIm[iEvt] = 0;
+			}
+			for (unsigned int iWave = 0; iWave < _nmbWavesRefl[iRefl]; ++iWave) {  // coherent sum over waves
+				const value_type  prodAmpRe = prodAmps[iRank][iRefl][iWave].real();
+				const value_type  prodAmpIm = prodAmps[iRank][iRefl][iWave].imag();
+				const value_type* ampsRe    = &_decayAmpsRe[iRefl][iWave * _decayAmpsStride + blockStart];
+				const value_type* ampsIm    = &_decayAmpsIm[iRefl][iWave * _decayAmpsStride + blockStart];
+				// compensated sums of real and imaginary parts; the loop runs
+				// over contiguous memory and is vectorized by the compiler
+				for (unsigned int iEvt = 0; iEvt < nmbEvts; ++iEvt) {
+					const value_type termRe = (prodAmpRe * ampsRe[iEvt] - prodAmpIm * ampsIm[iEvt]) - compensationsRe[iEvt];
+					const value_type termIm = (prodAmpRe * ampsIm[iEvt] + prodAmpIm * ampsRe[iEvt]) - compensationsIm[iEvt];
+					const value_type sumRe  = ampSumsRe[iEvt] + termRe;
+					const value_type sumIm  = ampSumsIm[iEvt] + termIm;
+					compensationsRe[iEvt] = (sumRe - ampSumsRe[iEvt]) - termRe;
+					compensationsIm[iEvt] = (sumIm - ampSumsIm[iEvt]) - termIm;
+					ampSumsRe      [iEvt] = sumRe;
+					ampSumsIm      [iEvt] = sumIm;
+				}
+			}
+			for (unsigned int iEvt = 0; iEvt < nmbEvts; ++iEvt)
+				likelihoods[iEvt] += ampSumsRe[iEvt] * ampSumsRe[iEvt] + ampSumsIm[iEvt] * ampSumsIm[iEvt];
+		}
+}
+
+
+// real-data term of log likelihood summed over the events [firstEvt, endEvt)
+template<typename complexT>
+typename pwaLikelihood<complexT>::value_type
+pwaLikelihood<complexT>::sumLogLikelihood
+(const prodAmpsArrayType& prodAmps,      // production amplitudes [rank][reflectivity][wave index]
+ const value_type         prodAmpFlat2,  // squared production amplitude of flat wave
+ const unsigned int       firstEvt,
+ const unsigned int       endEvt) const
+{
+	vector<value_type> logLikelihoods(1, 0);
+	sumLogLikelihoodBatch(vector<prodAmpsArrayType>(1, prodAmps), vector<value_type>(1, prodAmpFlat2),
+	                      firstEvt, endEvt, logLikelihoods);
+	return logLikelihoods[0];
+}
+
+
+// real-data terms of log likelihood for several sets of production
+// amplitudes summed over the events [firstEvt, endEvt); the decay
+// amplitudes of each block of events are used for all sets before
+// moving on to the next block, so that they are read from memory only
+// once
+template<typename complexT>
+void
+pwaLikelihood<complexT>::sumLogLikelihoodBatch
+(const vector<prodAmpsArrayType>& prodAmps,              // production amplitudes [point][rank][reflectivity][wave index]
+ const vector<value_type>&        prodAmpFlat2s,         // squared production amplitudes of flat wave [point]
+ const unsigned int               firstEvt,
+ const unsigned int               endEvt,
+ vector<value_type>&              logLikelihoods) const  // real-data terms of log likelihood [point]
+{
+	const size_t nmbPoints = prodAmps.size();
+	vector<accumulator_set<value_type, stats<tag::sum(compensated)> > > logLikelihoodAccs(nmbPoints);
+	decayAmpsArrayType buffer;
+	decayAmpsArrayType likelihoods(eventBlockSize);
+	// loop over blocks of events aligned to nmbLanes
+	const unsigned int endBlocks = ((endEvt + nmbLanes - 1) / nmbLanes) * nmbLanes;
+	for (unsigned int blockStart = (firstEvt / nmbLanes) * nmbLanes; blockStart < endEvt; blockStart += eventBlockSize) {
+		const unsigned int nmbBlockEvts = min(eventBlockSize, endBlocks - blockStart);
+		const unsigned int blockEnd     = min(endEvt, blockStart + nmbBlockEvts);
+		for (size_t iPoint = 0; iPoint < nmbPoints; ++iPoint) {
+			blockLikelihoods(prodAmps[iPoint], prodAmpFlat2s[iPoint], blockStart, nmbBlockEvts, buffer, likelihoods.data());
+			for (unsigned int iEvt = max(firstEvt, blockStart); iEvt < blockEnd; ++iEvt)
+				logLikelihoodAccs[iPoint](-log(likelihoods[iEvt - blockStart]));
+		}
+	}  // end loop over blocks
+	logLikelihoods.resize(nmbPoints);
+	for (size_t iPoint = 0; iPoint < nmbPoints; ++iPoint)
+		logLikelihoods[iPoint] = sum(logLikelihoodAccs[iPoint]);
+}
+
+
+// derivatives of real-data term of log likelihood with respect to
+// production amplitudes summed over the events [firstEvt, endEvt); the
+// log likelihood term is summed as well unless logLikelihood is NULL
+template<typename complexT>
+void
+pwaLikelihood<complexT>::sumLogLikelihoodDerivatives
+(const prodAmpsArrayType& prodAmps,              // production amplitudes [rank][reflectivity][wave index]
+ const value_type         prodAmpFlat,           // production amplitude of flat wave
+ const unsigned int       firstEvt,
+ const unsigned int       endEvt,
+ value_type*              logLikelihood,         // real-data term of log likelihood
+ prodAmpsArrayType&       derivatives,           // derivatives [rank][reflectivity][wave index]
+ value_type&              derivativeFlat) const  // derivative w.r.t. flat wave
+{
+	vector<value_type>        logLikelihoods;
+	vector<prodAmpsArrayType> derivativesBatch(1, derivatives);
+	vector<value_type>        derivativeFlats;
+	sumLogLikelihoodDerivativesBatch(vector<prodAmpsArrayType>(1, prodAmps), vector<value_type>(1, prodAmpFlat),
+	                                 firstEvt, endEvt, (logLikelihood) ? &logLikelihoods : 0,
+	                                 derivativesBatch, derivativeFlats);
+	derivatives    = derivativesBatch[0];
+	derivativeFlat = derivativeFlats[0];
+	if (logLikelihood)
+		*logLikelihood = logLikelihoods[0];
+}
+
+
+// derivatives of real-data term of log likelihood with respect to
+// production amplitudes for several sets of production amplitudes
+// summed over the events [firstEvt, endEvt); the log likelihood terms
+// are summed as well unless logLikelihoods is NULL. derivatives has to
+// contain one array of the shape of the production amplitudes for each
+// set
+template<typename complexT>
+void
+pwaLikelihood<complexT>::sumLogLikelihoodDerivativesBatch
+(const vector<prodAmpsArrayType>& prodAmps,               // production amplitudes [point][rank][reflectivity][wave index]
+ const vector<value_type>&        prodAmpFlats,           // production amplitudes of flat wave [point]
+ const unsigned int               firstEvt,
+ const unsigned int               endEvt,
+ vector<value_type>*              logLikelihoods,         // real-data terms of log likelihood [point]
+ vector<prodAmpsArrayType>&       derivatives,            // derivatives [point][rank][reflectivity][wave index]
+ vector<value_type>&              derivativeFlats) const  // derivatives w.r.t. flat wave [point]
+{
+	const size_t nmbPoints = prodAmps.size();
+	vector<accumulator_set<value_type, stats<tag::sum(compensated)> > > logLikelihoodAccs (nmbPoints);
+	vector<accumulator_set<value_type, stats<tag::sum(compensated)> > > derivativeFlatAccs(nmbPoints);
+	// compensated sums of the derivatives for each of the nmbLanes events
+	// in a row [point][rank][reflectivity][wave index][lane]
+	const size_t nmbDerivativeSums = _rank * 2 * _nmbWavesReflMax * nmbLanes;
+	decayAmpsArrayType derivativeSumsRe(nmbPoints * nmbDerivativeSums, 0);
+	decayAmpsArrayType derivativeSumsIm(nmbPoints * nmbDerivativeSums, 0);
+	decayAmpsArrayType compensationsRe (nmbPoints * nmbDerivativeSums, 0);
+	decayAmpsArrayType compensationsIm (nmbPoints * nmbDerivativeSums, 0);
+	decayAmpsArrayType buffer;
+	decayAmpsArrayType likelihoods     (eventBlockSize);
+	decayAmpsArrayType factors         (eventBlockSize);
+	// loop over blocks of events aligned to nmbLanes
+	const unsigned int endBlocks = ((endEvt + nmbLanes - 1) / nmbLanes) * nmbLanes;
+	for (unsigned int blockStart = (firstEvt / nmbLanes) * nmbLanes; blockStart < endEvt; blockStart += eventBlockSize) {
+		const unsigned int nmbBlockEvts = min(eventBlockSize, endBlocks - blockStart);
+		for (size_t iPoint = 0; iPoint < nmbPoints; ++iPoint) {
+			blockLikelihoods(prodAmps[iPoint], prodAmpFlats[iPoint] * prodAmpFlats[iPoint], blockStart, nmbBlockEvts,
+			                 buffer, likelihoods.data());
+			// factor -2 / sigma; zero for the events of the block outside of the range
+			for (unsigned int iEvt = 0; iEvt < nmbBlockEvts; ++iEvt) {
+				if (blockStart + iEvt < firstEvt or blockStart + iEvt >= endEvt) {
+					factors[iEvt] = 0;
+					continue;
+				}
+				if (logLikelihoods)
+					logLikelihoodAccs[iPoint](-log(likelihoods[iEvt]));
+				factors[iEvt] = -2. / likelihoods[iEvt];
+				derivativeFlatAccs[iPoint](factors[iEvt] * prodAmpFlats[iPoint]);
+			}
+			// multiply amplitude sums with complex conjugate of decay amplitude
+			// of the wave with the derivative wave index
+			for (unsigned int iRank = 0; iRank < _rank; ++iRank)
+				for (unsigned int iRefl = 0; iRefl < 2; ++iRefl) {
+					const value_type* ampSumsRe = &buffer[(2 * (2 * iRank + iRefl)) * eventBlockSize];
+					const value_type* ampSumsIm = ampSumsRe + eventBlockSize;
+					for (unsigned int iWave = 0; iWave < _nmbWavesRefl[iRefl]; ++iWave) {
+						const value_type* ampsRe  = &_decayAmpsRe[iRefl][iWave * _decayAmpsStride + blockStart];
+						const value_type* ampsIm  = &_decayAmpsIm[iRefl][iWave * _decayAmpsStride + blockStart];
+						const size_t      offset  = iPoint * nmbDerivativeSums
+						                            + ((iRank * 2 + iRefl) * _nmbWavesReflMax + iWave) * nmbLanes;
+						value_type*       sumsRe  = &derivativeSumsRe[offset];
+						value_type*       sumsIm  = &derivativeSumsIm[offset];
+						value_type*       compsRe = &compensationsRe [offset];
+						value_type*       compsIm = &compensationsIm [offset];
+						for (unsigned int iEvt = 0; iEvt < nmbBlockEvts; iEvt += nmbLanes)
+							for (unsigned int iLane = 0; iLane < nmbLanes; ++iLane) {
+								const unsigned int i      = iEvt + iLane;
+								const value_type   termRe = factors[i] * (ampSumsRe[i] * ampsRe[i] + ampSumsIm[i] * ampsIm[i]) - compsRe[iLane];
+								const value_type   termIm = factors[i] * (ampSumsIm[i] * ampsRe[i] - ampSumsRe[i] * ampsIm[i]) - compsIm[iLane];
+								const value_type   sumRe  = sumsRe[iLane] + termRe;
+								const value_type   sumIm  = sumsIm[iLane] + termIm;
+								compsRe[iLane] = (sumRe - sumsRe[iLane]) - termRe;
+								compsIm[iLane] = (sumIm - sumsIm[iLane]) - termIm;
+								sumsRe [iLane] = sumRe;
+								sumsIm [iLane] = sumIm;
+							}
+					}
+				}
+		}
+	}  // end loop over blocks
+	// combine the lanes in a fixed order
+	derivativeFlats.resize(nmbPoints);
+	if (logLikelihoods)
+		logLikelihoods->resize(nmbPoints);
+	for (size_t iPoint = 0; iPoint < nmbPoints; ++iPoint) {
+		for (unsigned int iRank = 0; iRank < _rank; ++iRank)
+			for (unsigned int iRefl = 0; iRefl < 2; ++iRefl)
+				for (unsigned int iWave = 0; iWave < _nmbWavesRefl[iRefl]; ++iWave) {
+					const size_t offset = iPoint * nmbDerivativeSums
+					                      + ((iRank * 2 + iRefl) * _nmbWavesReflMax + iWave) * nmbLanes;
+					accumulator_set<complexT, stats<tag::sum(compensated)> > derivativeAcc;
+					for (unsigned int iLane = 0; iLane < nmbLanes; ++iLane)
+						derivativeAcc(complexT(derivativeSumsRe[offset + iLane], derivativeSumsIm[offset + iLane]));
+					derivatives[iPoint][iRank][iRefl][iWave] = sum(derivativeAcc);
+				}
+		derivativeFlats[iPoint] = sum(derivativeFlatAccs[iPoint]);
+		if (logLikelihoods)
+			(*logLikelihoods)[iPoint] = sum(logLikelihoodAccs[iPoint]);
+	}
+}
+
+
+// combines the derivatives of the event ranges in the order of the ranges
+template<typename complexT>
+void
+pwaLikelihood<complexT>::sumDerivativesParts(const vector<prodAmpsArrayType>& derivativesParts,
+                                             prodAmpsArrayType&               derivatives) const
+{
+	for (unsigned int iRank = 0; iRank < _rank; ++iRank)
+		for (unsigned int iRefl = 0; iRefl < 2; ++iRefl)
+			for (unsigned int iWave = 0; iWave < _nmbWavesRefl[iRefl]; ++iWave) {
+				accumulator_set<complexT, stats<tag::sum(compensated)> > derivativeAcc;
+				for (size_t iRange = 0; iRange < derivativesParts.size(); ++iRange)
+					derivativeAcc(derivativesParts[iRange][iRank][iRefl][iWave]);
+				derivatives[iRank][iRefl][iWave] = sum(derivativeAcc);
+			}
 }
 
 
@@ -656,7 +998,7 @@ pwaLikelihood<complexT>::Hessian
 			for (unsigned int iRefl = 0; iRefl < 2; ++iRefl) {  // incoherent sum over reflectivities
 				accumulator_set<complexT, stats<tag::sum(compensated)> > ampProdAcc;
 				for (unsigned int iWave = 0; iWave < _nmbWavesRefl[iRefl]; ++iWave) {  // coherent sum over waves
-					ampProdAcc(prodAmps[iRank][iRefl][iWave] * _decayAmps[iRefl][iEvt][iWave]);
+					ampProdAcc(prodAmps[iRank][iRefl][iWave] * decayAmp(iRefl, iEvt, iWave));
 				}
 				const complexT ampProdSum = sum(ampProdAcc);
 				likelihoodAcc(norm(ampProdSum));
@@ -669,7 +1011,7 @@ pwaLikelihood<complexT>::Hessian
 			// of decay amplitude of the wave with the derivative wave index
 			for (unsigned int iRefl = 0; iRefl < 2; ++iRefl)
 				for (unsigned int iWave = 0; iWave < _nmbWavesRefl[iRefl]; ++iWave)
-					derivative[iRank][iRefl][iWave] *= conj(_decayAmps[iRefl][iEvt][iWave]);
+					derivative[iRank][iRefl][iWave] *= conj(decayAmp(iRefl, iEvt, iWave));
 		}  // end loop over rank
 		likelihoodAcc(prodAmpFlat2);
 		// incorporate factor 2 / sigma
@@ -688,7 +1030,7 @@ pwaLikelihood<complexT>::Hessian
 								// last array index 2 indicates derivative w.r.t. imaginary part of first prodAmp and imaginary part of the second prodAmp
 								hessianAcc[iRank][iRefl][iWave][jRank][jRefl][jWave][2](factor2 * derivative[jRank][jRefl][jWave].imag() * derivative[iRank][iRefl][iWave].imag());
 								if(iRank == jRank and iRefl == jRefl) {
-									const complexT uPrime = conj(_decayAmps[jRefl][iEvt][jWave]) * _decayAmps[iRefl][iEvt][iWave];
+									const complexT uPrime = conj(decayAmp(jRefl, iEvt, jWave)) * decayAmp(iRefl, iEvt, iWave);
 									hessianAcc[iRank][iRefl][iWave][jRank][jRefl][jWave][0](-factor * uPrime.real());
 									hessianAcc[iRank][iRefl][iWave][jRank][jRefl][jWave][1](-factor * uPrime.imag());
 									hessianAcc[iRank][iRefl][iWave][jRank][jRefl][jWave][2](-factor * uPrime.real());
@@ -1020,6 +1362,24 @@ pwaLikelihood<complexT>::cudaEnabled() const
 }
 
 
+template<typename complexT>
+void
+pwaLikelihood<complexT>::setNmbThreads(const unsigned int nmbThreads)
+{
+	_nmbThreads = (nmbThreads > 0) ? nmbThreads : std::thread::hardware_concurrency();
+	if (_nmbThreads == 0)
+		_nmbThreads = 1;
+}
+
+
+template<typename complexT>
+unsigned int
+pwaLikelihood<complexT>::nmbEventRanges() const
+{
+	return std::max(1u, std::min(_nmbThreads, _nmbEvents));
+}
+
+
 template<typename complexT>
 bool
 pwaLikelihood<complexT>::init(const vector<waveDescThresType>& waveDescThresType,
@@ -1083,6 +1443,14 @@ pwaLikelihood<complexT>::addAccIntegral(ampIntegralMatrix& accMatrix,
 template<typename complexT>
 bool
 pwaLikelihood<complexT>::addAmplitude(const vector<const amplitudeMetadata*>& ampMetas)
+{
+	return addAmplitudes(vector<vector<const amplitudeMetadata*> >(1, ampMetas));
+}
+
+
+template<typename complexT>
+bool
+pwaLikelihood<complexT>::addAmplitudes(const vector<vector<const amplitudeMetadata*> >& ampMetas)
 {
 	if (not _accIntAdded) {
 		printErr << "no acceptance integral found. "
@@ -1090,6 +1458,82 @@ pwaLikelihood<complexT>::addAmplitude(const vector<const amplitudeMetadata*>& am
 		         << "Aborting..." << endl;
 		return false;
 	}
+
+	// the metadata of all waves are checked before any amplitude is read
+	bool allColumnar = true;
+	for (size_t iWave = 0; iWave < ampMetas.size(); ++iWave) {
+		size_t totalEvents = 0;
+		if (not checkAmplitudeMetadata(ampMetas[iWave], totalEvents))
+			return false;
+		if (_nmbEvents == 0) {
+			// first amplitude file read
+			_nmbEvents = totalEvents;
+			_decayAmpsStride = ((_nmbEvents + nmbLanes - 1) / nmbLanes) * nmbLanes;
+			for (unsigned int iRefl = 0; iRefl < 2; ++iRefl) {
+				_decayAmpsRe[iRefl].assign(_nmbWavesRefl[iRefl] * _decayAmpsStride, 0);
+				_decayAmpsIm[iRefl].assign(_nmbWavesRefl[iRefl] * _decayAmpsStride, 0);
+			}
+		}
+		if (totalEvents != _nmbEvents) {
+			printWarn << "size mismatch in amplitude files: this file contains " << totalEvents
+			          << " events, previous file had " << _nmbEvents << " events." << endl;
+			return false;
+		}
+		for (size_t iAmpMeta = 0; iAmpMeta < ampMetas[iWave].size(); ++iAmpMeta)
+			if (not ampMetas[iWave][iAmpMeta]->isColumnar())
+				allColumnar = false;
+	}
+
+	// the waves are distributed dynamically over the threads; each thread
+	// writes the decay amplitudes of its waves into their own rows of the
+	// arrays, which were allocated above
+	size_t nmbWorkers = std::max((size_t)1, std::min((size_t)_nmbThreads, ampMetas.size()));
+	if (nmbWorkers > 1 and not allColumnar and not enableRootThreadSafety()) {
+		// amplitude trees are read by ROOT, which has to be prepared for being
+		// used by several threads
+		printWarn << "ROOT version " << gROOT->GetVersion() << " does not provide a thread-safe mode. "
+		          << "reading amplitude trees with a single thread." << endl;
+		nmbWorkers = 1;
+	}
+	vector<char> waveRead(ampMetas.size(), false);
+	std::atomic<size_t> nextWave(0);
+	auto readWaves = [this, &ampMetas, &waveRead, &nextWave]() {
+		vector<complex<double> > amps;
+		for (size_t iWave = nextWave++; iWave < ampMetas.size(); iWave = nextWave++)
+			waveRead[iWave] = readDecayAmplitudes(ampMetas[iWave], amps)
+			                  and storeDecayAmplitudes(ampMetas[iWave][0]->objectBaseName(), amps);
+	};
+	if (nmbWorkers == 1)
+		readWaves();
+	else {
+		vector<std::thread> workers;
+		for (size_t iWorker = 0; iWorker < nmbWorkers; ++iWorker)
+			workers.push_back(std::thread(readWaves));
+		for (size_t iWorker = 0; iWorker < nmbWorkers; ++iWorker)
+			workers[iWorker].join();
+	}
+
+	bool success = true;
+	for (size_t iWave = 0; iWave < ampMetas.size(); ++iWave) {
+		const string& waveName = ampMetas[iWave][0]->objectBaseName();
+		if (not waveRead[iWave]) {
+			printErr << "could not read decay amplitudes for wave '" << waveName << "'." << endl;
+			success = false;
+			continue;
+		}
+		const pair<unsigned int, unsigned int>& waveParams = _waveParams[waveName];
+		_waveAmpAdded[waveParams.first][waveParams.second] = true; // note that this amplitude has been added to the likelihood
+		printInfo << "read decay amplitudes of " << _nmbEvents << " events for wave '" << waveName << "' into memory" << endl;
+	}
+	return success;
+}
+
+
+template<typename complexT>
+bool
+pwaLikelihood<complexT>::checkAmplitudeMetadata(const vector<const amplitudeMetadata*>& ampMetas,
+                                                size_t&                                 totalEvents)
+{
 	if (ampMetas.size() == 0) {
 		printErr << "no amplitudeMetadata given. Aborting..." << endl;
 		return false;
@@ -1112,9 +1556,35 @@ pwaLikelihood<complexT>::addAmplitude(const vector<const amplitudeMetadata*>& am
 		return false;
 	}
 
-	// counting all events
+	// check ordering of event files
+	const bool eventFileHashOrderWasEmpty = _eventFileHashOrder.empty();
 	const bool onTheFlyBinning = not _eventFileProperties.empty();
-	size_t totalEvents = 0;
+	size_t runningEventFileIndex = 0;
+	for(size_t iAmpMeta = 0; iAmpMeta < ampMetas.size(); ++iAmpMeta) {
+		const amplitudeMetadata* ampMeta = ampMetas[iAmpMeta];
+		for(size_t iEvtMeta = 0; iEvtMeta < ampMeta->eventMetadata().size(); ++iEvtMeta) {
+			const string& eventFileHash = ampMeta->eventMetadata()[iEvtMeta].contentHash();
+			if(eventFileHashOrderWasEmpty) {
+				_eventFileHashOrder.push_back(eventFileHash);
+			} else {
+				if (runningEventFileIndex >= _eventFileHashOrder.size() or _eventFileHashOrder[runningEventFileIndex] != eventFileHash) {
+					printErr << "order of event files differs between corresponding amplitude files. Aborting..." << endl;
+					return false;
+				}
+				++runningEventFileIndex;
+			}
+			if(onTheFlyBinning) {
+				if(_eventFileProperties.count(eventFileHash) == 0) {
+					printErr << "event file hash from amplitude metadata not in "
+					         << "on-the-fly binning information. Aborting..." << endl;
+					return false;
+				}
+			}
+		}
+	}
+
+	// counting all events
+	totalEvents = 0;
 	for (size_t iAmpMeta = 0; iAmpMeta < ampMetas.size(); ++iAmpMeta) {
 		if (onTheFlyBinning) {
 			const vector<eventMetadata>& evtMetas = ampMetas[iAmpMeta]->eventMetadata();
@@ -1122,112 +1592,82 @@ pwaLikelihood<complexT>::addAmplitude(const vector<const amplitudeMetadata*>& am
 				totalEvents += _eventFileProperties[evtMetas[iEvtMeta].contentHash()].second.size();
 			}
 		} else {
-			totalEvents += ampMetas[iAmpMeta]->amplitudeTree()->GetEntriesFast();
+			totalEvents += ampMetas[iAmpMeta]->nmbAmplitudes();
 		}
 	}
 	if (totalEvents == 0) {
 		printErr << "no events to load. Aborting..." << endl;
 		return false;
 	}
+	return true;
+}
 
-	{
-		// check ordering of event files
-		const bool eventFileHashOrderWasEmpty = _eventFileHashOrder.empty();
-		size_t runningEventFileIndex = 0;
-		for(size_t iAmpMeta = 0; iAmpMeta < ampMetas.size(); ++iAmpMeta) {
-			const amplitudeMetadata* ampMeta = ampMetas[iAmpMeta];
-			for(size_t iEvtMeta = 0; iEvtMeta < ampMeta->eventMetadata().size(); ++iEvtMeta) {
-				const string& eventFileHash = ampMeta->eventMetadata()[iEvtMeta].contentHash();
-				if(eventFileHashOrderWasEmpty) {
-					_eventFileHashOrder.push_back(eventFileHash);
-				} else {
-					if (runningEventFileIndex >= _eventFileHashOrder.size() or _eventFileHashOrder[runningEventFileIndex] != eventFileHash) {
-						printErr << "order of event files differs between corresponding amplitude files. Aborting..." << endl;
-						return false;
-					}
-					++runningEventFileIndex;
-				}
-				if(onTheFlyBinning) {
-					if(_eventFileProperties.count(eventFileHash) == 0) {
-						printErr << "event file hash from amplitude metadata not in "
-						         << "on-the-fly binning information. Aborting..." << endl;
-						return false;
-					}
-				}
-			}
-		}
-	}
 
-	vector<complexT> amps(totalEvents);
-	size_t eventCount = 0; // Running count for event number over all single files
+template<typename complexT>
+bool
+pwaLikelihood<complexT>::readDecayAmplitudes(const vector<const amplitudeMetadata*>& ampMetas,
+                                             vector<complex<double> >&              amps) const
+{
+	amps.clear();
+	vector<complex<double> > fileAmps;
+	vector<long>             entries;
 	for (size_t iAmpMeta = 0; iAmpMeta < ampMetas.size(); ++iAmpMeta) {
 		const amplitudeMetadata* ampMeta = ampMetas[iAmpMeta];
-		// connect tree leaf
-		amplitudeTreeLeaf* ampTreeLeaf = 0;
-		ampMeta->amplitudeTree()->SetBranchAddress(amplitudeMetadata::amplitudeLeafName.c_str(), &ampTreeLeaf);
-		if (not ampTreeLeaf) {
-			printWarn << "null pointer to amplitude leaf. Aborting..." << endl;
-			return false;
-		}
-
-		if (onTheFlyBinning) {
-			size_t skipEvents  = 0;
-			for(size_t iEvtMeta = 0; iEvtMeta < ampMeta->eventMetadata().size(); ++iEvtMeta) {
-				const string& eventFileHash = ampMeta->eventMetadata()[iEvtMeta].contentHash();
-				const vector<size_t>& entriesInBin = _eventFileProperties[eventFileHash].second;
-				for(size_t iEvent = 0; iEvent < entriesInBin.size(); ++iEvent, ++eventCount) {
-					ampMeta->amplitudeTree()->GetEntry(skipEvents + entriesInBin[iEvent]);
-					assert(ampTreeLeaf->nmbIncohSubAmps() == 1);
-					complexT amp(ampTreeLeaf->incohSubAmp(0).real(), ampTreeLeaf->incohSubAmp(0).imag());
-					amps[eventCount] = amp;
-				}
-				skipEvents += _eventFileProperties[eventFileHash].first;
-			}
+		if (_eventFileProperties.empty()) {
+			if (not ampMeta->readAmplitudes(fileAmps))
+				return false;
 		} else {
-			for(long iEvent = 0; iEvent < ampMeta->amplitudeTree()->GetEntriesFast(); ++iEvent, ++eventCount) {
-				ampMeta->amplitudeTree()->GetEntry(iEvent);
-				assert(ampTreeLeaf->nmbIncohSubAmps() == 1);
-				complexT amp(ampTreeLeaf->incohSubAmp(0).real(), ampTreeLeaf->incohSubAmp(0).imag());
-				amps[eventCount] = amp;
+			// with on-the-fly binning only the entries of the events in the bin
+			// are read
+			entries.clear();
+			size_t skipEvents = 0;
+			for(size_t iEvtMeta = 0; iEvtMeta < ampMeta->eventMetadata().size(); ++iEvtMeta) {
+				const pair<size_t, vector<size_t> >& eventFileProperties
+					= _eventFileProperties.find(ampMeta->eventMetadata()[iEvtMeta].contentHash())->second;
+				for(size_t iEvent = 0; iEvent < eventFileProperties.second.size(); ++iEvent)
+					entries.push_back(skipEvents + eventFileProperties.second[iEvent]);
+				skipEvents += eventFileProperties.first;
 			}
+			if (not ampMeta->readAmplitudes(fileAmps, entries))
+				return false;
 		}
+		amps.insert(amps.end(), fileAmps.begin(), fileAmps.end());
 	}
+	return amps.size() == _nmbEvents;
+}
 
-	if (_nmbEvents == 0) {
-		// first amplitude file read
-		_nmbEvents = totalEvents;
-		_decayAmps[0].resize(extents[_nmbEvents][_nmbWavesRefl[0]]);
-		_decayAmps[1].resize(extents[_nmbEvents][_nmbWavesRefl[1]]);
-	}
-	if (totalEvents != _nmbEvents) {
-		printWarn << "size mismatch in amplitude files: this file contains " << totalEvents
-		          << " events, previous file had " << _nmbEvents << " events." << endl;
-		return false;
-	}
 
-	const unsigned int refl = _waveParams[waveName].first;
-	const unsigned int waveIndex = _waveParams[waveName].second;
+template<typename complexT>
+bool
+pwaLikelihood<complexT>::storeDecayAmplitudes(const string&                   waveName,
+                                              const vector<complex<double> >& amps)
+{
+	const pair<unsigned int, unsigned int>& waveParams = _waveParams.find(waveName)->second;
+	const unsigned int refl = waveParams.first;
+	const unsigned int waveIndex = waveParams.second;
 
 	// get normalization
 	const complexT normInt = _normMatrix[refl][waveIndex][refl][waveIndex];
 
-	// copy decay amplitudes into array that is indexed [event index][reflectivity][wave index]
-	// this index scheme ensures a more linear memory access pattern in the likelihood function
+	// copy real and imaginary parts of decay amplitudes into arrays that are
+	// indexed [reflectivity][wave index][event index]
+	// this index scheme lets the event loops in the likelihood function run
+	// over contiguous memory
+	value_type* decayAmpsRe = &_decayAmpsRe[refl][waveIndex * _decayAmpsStride];
+	value_type* decayAmpsIm = &_decayAmpsIm[refl][waveIndex * _decayAmpsStride];
 	for (unsigned int iEvt = 0; iEvt < _nmbEvents; ++iEvt) {
+		complexT amp(amps[iEvt].real(), amps[iEvt].imag());
 		if (_useNormalizedAmps) {  // normalize data, if option is switched on
-			if (normInt == (value_type)0. && amps[iEvt] != (value_type)0.) {
+			if (normInt == (value_type)0. && amp != (value_type)0.) {
 				printErr << "normalization integral for wave '" << waveName << "' is zero, but the amplitude is not. Aborting...";
 				return false;
 			}
 			if (normInt != (value_type)0.)
-				amps[iEvt] /= sqrt(normInt.real());  // rescale decay amplitude
+				amp /= sqrt(normInt.real());  // rescale decay amplitude
 		}
-		_decayAmps[refl][iEvt][waveIndex] = amps[iEvt];
+		decayAmpsRe[iEvt] = amp.real();
+		decayAmpsIm[iEvt] = amp.imag();
 	}
-
-	_waveAmpAdded[refl][waveIndex] = true; // note that this amplitude has been added to the likelihood
-
-	printInfo << "read decay amplitudes of " << totalEvents << " events for wave '" << waveName << "' into memory" << endl;
 	return true;
 }
 
@@ -1583,8 +2023,11 @@ template<typename complexT>
 void
 pwaLikelihood<complexT>::clear()
 {
-	_decayAmps[0].resize(extents[0][0]);
-	_decayAmps[1].resize(extents[0][0]);
+	for (unsigned int iRefl = 0; iRefl < 2; ++iRefl) {
+		decayAmpsArrayType().swap(_decayAmpsRe[iRefl]);
+		decayAmpsArrayType().swap(_decayAmpsIm[iRefl]);
+	}
+	_decayAmpsStride = 0;
 }
 
 
@@ -1662,6 +2105,7 @@ pwaLikelihood<complexT>::print(ostream& out) const
 	    << "use CUDA kernels ........................ " << _cudaEnabled       << endl
 #endif
 	    << "use normalized amplitudes ............... " << _useNormalizedAmps << endl
+	    << "number of threads ....................... " << _nmbThreads        << endl
 	    << "list of waves: " << endl;
 	for (unsigned int iRefl = 0; iRefl < 2; ++iRefl)
 		for (unsigned int iWave = 0; iWave < _nmbWavesRefl[iRefl]; ++iWave)
@@ -1680,7 +2124,7 @@ template<typename complexT>
 ostream&
 pwaLikelihood<complexT>::printFuncInfo(ostream& out) const
 {
-	const string funcNames[NMB_FUNCTIONCALLENUM] = {"FdF", "Gradient", "DoEval", "DoDerivative", "Hessian"};
+	const string funcNames[NMB_FUNCTIONCALLENUM] = {"FdF", "Gradient", "DoEval", "DoDerivative", "Hessian", "DoEvalBatch", "FdFBatch"};
 	for (unsigned int i = 0; i < NMB_FUNCTIONCALLENUM; ++i)
 		if (_funcCallInfo[i].nmbCalls > 0)
 			out << "    " << _funcCallInfo[i].nmbCalls
@@ -43,6 +43,7 @@
 #define BOOST_DISABLE_ASSERTS
 #include "boost/multi_array.hpp"
 #include "boost/tuple/tuple.hpp"
+#include "boost/align/aligned_allocator.hpp"
 
 #include "Math/IFunction.h"
 #include "TMatrixT.h"
@@ -74,8 +75,8 @@ namespace rpwa {
 		typedef boost::multi_array<double,                                    2> waveThrArrayType;      // array for wave thresholds
 		typedef boost::multi_array<unsigned int,                              2> waveToIntMapType;      // array for mapping of waves to integral indices
 		typedef boost::multi_array<boost::tuples::tuple<int, int>,            3> ampToParMapType;       // array for mapping of amplitudes to parameters
-		typedef boost::multi_array<complexT,                                  3> prodAmpsArrayType;     // array for production and decay amplitudes
-		typedef boost::multi_array<complexT,                                  2> decayAmpsArrayType;    // with memory layout to save memory
+		typedef boost::multi_array<complexT,                                  3> prodAmpsArrayType;     // array for production amplitudes
+		typedef std::vector<value_type, boost::alignment::aligned_allocator<value_type, 64> > decayAmpsArrayType;  // array for real or imaginary parts of decay amplitudes
 		typedef boost::multi_array<complexT,                                  4> normMatrixArrayType;   // array for normalization matrices
 		typedef boost::multi_array<value_type,                                2> phaseSpaceIntType;     // array for phase space integrals
 		typedef boost::multi_array<bool,                                      2> waveAmpAddedArrayType; // array for wave amplitudes read
@@ -92,7 +93,9 @@ namespace rpwa {
 			DOEVAL               = 2,
 			DODERIVATIVE         = 3,
 			HESSIAN              = 4,
-			NMB_FUNCTIONCALLENUM = 5
+			DOEVALBATCH          = 5,
+			FDFBATCH             = 6,
+			NMB_FUNCTIONCALLENUM = 7
 		};
 
 		struct functionCallInfo {
@@ -131,6 +134,16 @@ namespace rpwa {
 		virtual double DoDerivative(const double* par,
 		                            unsigned int  derivativeIndex) const;
 
+		/// calculates function values at nmbPoints points; par contains the parameters of one point after the other
+		void DoEvalBatch(const double*      par,
+		                 const unsigned int nmbPoints,
+		                 double*            funcVals) const;
+		/// calculates function values and gradients at nmbPoints points; par and gradients contain the values of one point after the other
+		void FdFBatch(const double*      par,
+		              const unsigned int nmbPoints,
+		              double*            funcVals,
+		              double*            gradients) const;
+
 		/// calculates Hessian of function at point defined by par
 		TMatrixT<double> Hessian(const double* par) const;
 		/// calculates eigenvectors/-values of Hessian
@@ -170,6 +183,8 @@ namespace rpwa {
 		priorEnum     priorType        () const                            { return _priorType;              }
 		void          setCauchyWidth   (const double&   cauchyWidth)       { _cauchyWidth = cauchyWidth;     }
 		const double& cauchyWidth      () const                            { return _cauchyWidth;            }
+		void          setNmbThreads    (const unsigned int nmbThreads = 0);                                   ///< sets number of threads for the event loops on the CPU (0 for the number of cores); results are reproducible for a fixed number of threads
+		unsigned int  nmbThreads       () const                            { return _nmbThreads;             }
 		static void   setQuiet         (const bool      flag       = true) { _debug             = !flag;     }
 
 		// operations
@@ -182,6 +197,7 @@ namespace rpwa {
 		bool addAccIntegral(rpwa::ampIntegralMatrix& accMatrix, unsigned int accEventsOverride = 0);
 
 		bool addAmplitude(const std::vector<const rpwa::amplitudeMetadata*>& meta);
+		bool addAmplitudes(const std::vector<std::vector<const rpwa::amplitudeMetadata*> >& metas);  ///< adds the amplitudes of several waves, which are read in parallel by nmbThreads() threads; reading amplitude trees in parallel switches ROOT to thread-safe mode for the whole process
 
 		bool finishInit();
 
@@ -214,9 +230,66 @@ namespace rpwa {
 		bool buildParDataStruct(const unsigned int rank,
 		                        const double       massBinCenter);                     ///< builds parameter data structures
 
+		double normalizationAndPrior(const prodAmpsArrayType& prodAmps,
+		                             const value_type         prodAmpFlat,
+		                             prodAmpsArrayType*       derivatives,
+		                             value_type*              derivativeFlat) const;  ///< normalization term and prior of log likelihood
+
+		bool checkAmplitudeMetadata(const std::vector<const rpwa::amplitudeMetadata*>& ampMetas,
+		                            size_t&                                            totalEvents);  ///< checks the amplitude files of one wave and counts their events
+		bool readDecayAmplitudes(const std::vector<const rpwa::amplitudeMetadata*>& ampMetas,
+		                         std::vector<std::complex<double> >&                amps) const;  ///< reads the decay amplitudes of one wave
+		bool storeDecayAmplitudes(const std::string&                        waveName,
+		                          const std::vector<std::complex<double> >& amps);  ///< normalizes the decay amplitudes of one wave and copies them into the decay amplitude arrays
+
 		void reorderIntegralMatrix(const rpwa::ampIntegralMatrix& integral,
 		                           normMatrixArrayType&           reorderedMatrix) const;
 
+		// event loops of the real-data term of the log likelihood and its
+		// derivatives over the events [firstEvt, endEvt); the events are split
+		// into one range per thread, each range is processed in blocks of
+		// eventBlockSize events
+		unsigned int nmbEventRanges() const;
+		void blockLikelihoods(const prodAmpsArrayType& prodAmps,
+		                      const value_type         prodAmpFlat2,
+		                      const unsigned int       blockStart,
+		                      const unsigned int       nmbEvts,
+		                      decayAmpsArrayType&      buffer,
+		                      value_type*              likelihoods) const;
+		value_type sumLogLikelihood(const prodAmpsArrayType& prodAmps,
+		                            const value_type         prodAmpFlat2,
+		                            const unsigned int       firstEvt,
+		                            const unsigned int       endEvt) const;
+		void sumLogLikelihoodBatch(const std::vector<prodAmpsArrayType>& prodAmps,
+		                           const std::vector<value_type>&        prodAmpFlat2s,
+		                           const unsigned int                    firstEvt,
+		                           const unsigned int                    endEvt,
+		                           std::vector<value_type>&              logLikelihoods) const;
+		void sumLogLikelihoodDerivatives(const prodAmpsArrayType& prodAmps,
+		                                 const value_type         prodAmpFlat,
+		                                 const unsigned int       firstEvt,
+		                                 const unsigned int       endEvt,
+		                                 value_type*              logLikelihood,
+		                                 prodAmpsArrayType&       derivatives,
+		                                 value_type&              derivativeFlat) const;
+		void sumLogLikelihoodDerivativesBatch(const std::vector<prodAmpsArrayType>& prodAmps,
+		                                      const std::vector<value_type>&        prodAmpFlats,
+		                                      const unsigned int                    firstEvt,
+		                                      const unsigned int                    endEvt,
+		                                      std::vector<value_type>*              logLikelihoods,
+		                                      std::vector<prodAmpsArrayType>&       derivatives,
+		                                      std::vector<value_type>&              derivativeFlats) const;
+		// decay amplitude of event iEvt and wave iWave with reflectivity iRefl
+		complexT decayAmp(const unsigned int iRefl,
+		                  const unsigned int iEvt,
+		                  const unsigned int iWave) const
+		{
+			const size_t offset = (size_t)iWave * _decayAmpsStride + iEvt;
+			return complexT(_decayAmpsRe[iRefl][offset], _decayAmpsIm[iRefl][offset]);
+		}
+		void sumDerivativesParts(const std::vector<prodAmpsArrayType>& derivativesParts,
+		                         prodAmpsArrayType&                    derivatives) const;
+
 	public:
 
 		void copyFromParArray(const double*      inPar,              // input parameter array
@@ -248,6 +321,7 @@ namespace rpwa {
 		bool                _useNormalizedAmps;  // if true normalized amplitudes are used
 		priorEnum           _priorType;          // which prior to apply to parameters
 		double              _cauchyWidth;        // width for the half-Cauchy prior
+		unsigned int        _nmbThreads;         // number of threads for the event loops on the CPU
 		static bool         _debug;              // if true debug messages are printed
 
 		unsigned int _numbAccEvents; // number of input events used for acceptance integrals (accepted + rejected!)
@@ -266,7 +340,15 @@ namespace rpwa {
 		                                                // array; negative indices mean that the parameter
 		                                                // is not existing due to rank restrictions
 
-		decayAmpsArrayType _decayAmps[2];  // precalculated decay amplitudes [event index][reflectivity][wave index]
+		// precalculated decay amplitudes with real and imaginary parts in
+		// separate arrays [reflectivity][wave index][event index]; the events
+		// of each wave are contiguous and padded to a multiple of nmbLanes, so
+		// that the event loops run over aligned blocks of nmbLanes events
+		static const unsigned int nmbLanes       = 64 / sizeof(value_type);  // number of values in 64 bytes
+		static const unsigned int eventBlockSize = 32 * nmbLanes;            // number of events processed in one block
+		decayAmpsArrayType _decayAmpsRe[2];
+		decayAmpsArrayType _decayAmpsIm[2];
+		size_t             _decayAmpsStride;  // number of events plus padding for each wave
 
 		mutable std::vector<double> _parCache;    // parameter cache for derivative calc.
 		mutable std::vector<double> _derivCache;  // cache for derivatives
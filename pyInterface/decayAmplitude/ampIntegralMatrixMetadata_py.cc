@@ -33,6 +33,21 @@ namespace {
 		return retval;
 	}
 
+	bp::list ampIntegralMatrixMetadata_eventRanges(const rpwa::ampIntegralMatrixMetadata& self) {
+		// event metadata objects cannot be copied to python, so only their
+		// content hashes are returned together with the event ranges
+		bp::list retval;
+		const std::vector<std::pair<rpwa::eventMetadata, std::vector<std::pair<size_t, size_t> > > > evtMetas = self.evtMetas();
+		for (size_t i = 0; i < evtMetas.size(); ++i) {
+			bp::list ranges;
+			for (size_t j = 0; j < evtMetas[i].second.size(); ++j) {
+				ranges.append(bp::make_tuple(evtMetas[i].second[j].first, evtMetas[i].second[j].second));
+			}
+			retval.append(bp::make_tuple(evtMetas[i].first.contentHash(), ranges));
+		}
+		return retval;
+	}
+
 	void ampIntegralMatrixMetadata_setBinningMap(rpwa::ampIntegralMatrixMetadata& self, bp::dict pyBinningMap) {
 		std::map<std::string, std::pair<double, double> > binningMap;
 		const bp::list keys = pyBinningMap.keys();
@@ -102,11 +117,19 @@ void rpwa::py::exportAmpIntegralMatrixMetadata() {
 
 		.def("contentHash", &rpwa::ampIntegralMatrixMetadata::contentHash, bp::return_value_policy<bp::return_by_value>())
 		.def("rootpwaGitHash", &rpwa::ampIntegralMatrixMetadata::rootpwaGitHash, bp::return_value_policy<bp::return_by_value>())
+		.def("allZeroHash", &rpwa::ampIntegralMatrixMetadata::allZeroHash, bp::return_value_policy<bp::return_by_value>())
 		.def("mergeIntegralMatrix", &rpwa::ampIntegralMatrixMetadata::mergeIntegralMatrix, bp::arg("secondMatrix"))
 
 		.def("objectBaseName", &rpwa::ampIntegralMatrixMetadata::objectBaseName, bp::return_value_policy<bp::return_by_value>())
 		.def("binningMap", &ampIntegralMatrixMetadata_binningMap)
+		.def("eventRanges", &ampIntegralMatrixMetadata_eventRanges)
 		.def("setObjectBaseName", &ampIntegralMatrixMetadata::setObjectBaseName, bp::arg("objectBaseName"))
+		.def("precision", &rpwa::ampIntegralMatrixMetadata::precision)
+		.def("setPrecision", &ampIntegralMatrixMetadata::setPrecision, bp::arg("precision"))
+		.def("acceptanceVariable", &rpwa::ampIntegralMatrixMetadata::acceptanceVariable, bp::return_value_policy<bp::return_by_value>())
+		.def("setAcceptanceVariable", &ampIntegralMatrixMetadata::setAcceptanceVariable, bp::arg("acceptanceVariable"))
+		.def("nmbProcessedEvents", &rpwa::ampIntegralMatrixMetadata::nmbProcessedEvents)
+		.def("setNmbProcessedEvents", &ampIntegralMatrixMetadata::setNmbProcessedEvents, bp::arg("nmbProcessedEvents"))
 		.def("addEventMetadata", &ampIntegralMatrixMetadata::addEventMetadata, (bp::arg("eventMetadata"), bp::arg("minEvent"), bp::arg("maxEvent")))
 		.def("addAmplitudeHash", &ampIntegralMatrixMetadata::addAmplitudeHash, bp::arg("amplitudehash"))
 		.def("setHash",  &ampIntegralMatrixMetadata::setHash)
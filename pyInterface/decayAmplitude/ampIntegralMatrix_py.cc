@@ -47,14 +47,50 @@ namespace {
 	bool ampIntegralMatrix_integrate(rpwa::ampIntegralMatrix& self,
 	                                 const bp::object& pyAmplitudeMetadata,
 	                                 const unsigned long maxNmbEvents,
-	                                 const std::string& weightFileName)
+	                                 const std::string& weightFileName,
+	                                 const unsigned long startEvent,
+	                                 const double targetPrecision)
 	{
 		std::vector<const rpwa::amplitudeMetadata*> amplitudeMeta;
 		if(not rpwa::py::convertBPObjectToVector<const rpwa::amplitudeMetadata*>(pyAmplitudeMetadata, amplitudeMeta)) {
 			PyErr_SetString(PyExc_TypeError, "Got invalid input for amplitudeMetadata when executing rpwa::ampIntegralMatrix::integrate()");
 			bp::throw_error_already_set();
 		}
-		return self.integrate(amplitudeMeta, maxNmbEvents, weightFileName);
+		return self.integrate(amplitudeMeta, maxNmbEvents, weightFileName, startEvent, targetPrecision);
+	}
+
+	bool ampIntegralMatrix_integrateWithAcceptance(rpwa::ampIntegralMatrix& self,
+	                                               const bp::object& pyAmplitudeMetadata,
+	                                               const bp::object& pyAcceptance,
+	                                               rpwa::ampIntegralMatrix& acceptedIntegral,
+	                                               const unsigned long maxNmbEvents,
+	                                               const std::string& weightFileName,
+	                                               const unsigned long startEvent)
+	{
+		std::vector<const rpwa::amplitudeMetadata*> amplitudeMeta;
+		if(not rpwa::py::convertBPObjectToVector<const rpwa::amplitudeMetadata*>(pyAmplitudeMetadata, amplitudeMeta)) {
+			PyErr_SetString(PyExc_TypeError, "Got invalid input for amplitudeMetadata when executing rpwa::ampIntegralMatrix::integrateWithAcceptance()");
+			bp::throw_error_already_set();
+		}
+		std::vector<double> acceptance;
+		if(not rpwa::py::convertBPObjectToVector<double>(pyAcceptance, acceptance)) {
+			PyErr_SetString(PyExc_TypeError, "Got invalid input for acceptance when executing rpwa::ampIntegralMatrix::integrateWithAcceptance()");
+			bp::throw_error_already_set();
+		}
+		return self.integrateWithAcceptance(amplitudeMeta, acceptance, acceptedIntegral, maxNmbEvents, weightFileName, startEvent);
+	}
+
+	bool ampIntegralMatrix_addWaves(rpwa::ampIntegralMatrix& self,
+	                                const bp::object& pyAmplitudeMetadata,
+	                                const std::string& weightFileName,
+	                                const unsigned long startEvent)
+	{
+		std::vector<const rpwa::amplitudeMetadata*> amplitudeMeta;
+		if(not rpwa::py::convertBPObjectToVector<const rpwa::amplitudeMetadata*>(pyAmplitudeMetadata, amplitudeMeta)) {
+			PyErr_SetString(PyExc_TypeError, "Got invalid input for amplitudeMetadata when executing rpwa::ampIntegralMatrix::addWaves()");
+			bp::throw_error_already_set();
+		}
+		return self.addWaves(amplitudeMeta, weightFileName, startEvent);
 	}
 
 	bool ampIntegralMatrix_setWaveNames(rpwa::ampIntegralMatrix& self,
@@ -116,7 +152,10 @@ void rpwa::py::exportAmpIntegralMatrix() {
 		.def("clear", &rpwa::ampIntegralMatrix::clear)
 		.def("nmbWaves", &rpwa::ampIntegralMatrix::nmbWaves)
 		.def("nmbEvents", &rpwa::ampIntegralMatrix::nmbEvents)
+		.def("weightSum", &rpwa::ampIntegralMatrix::weightSum)
+		.def("precision", &rpwa::ampIntegralMatrix::precision)
 		.def("setNmbEvents", &rpwa::ampIntegralMatrix::setNmbEvents)
+		.def("setPrecision", &rpwa::ampIntegralMatrix::setPrecision, bp::arg("precision"))
 		.def("containsWave", &rpwa::ampIntegralMatrix::containsWave)
 		.def("waveIndex", &rpwa::ampIntegralMatrix::waveIndex)
 		.def(
@@ -149,8 +188,26 @@ void rpwa::py::exportAmpIntegralMatrix() {
 		     , &ampIntegralMatrix_integrate
 		     , (bp::arg("amplitudeMetadata"),
 		        bp::arg("maxNmbEvents")=0,
-		        bp::arg("weightFileName")="")
+		        bp::arg("weightFileName")="",
+		        bp::arg("startEvent")=0,
+		        bp::arg("targetPrecision")=0.)
+		)
+		.def("integrateWithAcceptance"
+		     , &ampIntegralMatrix_integrateWithAcceptance
+		     , (bp::arg("amplitudeMetadata"),
+		        bp::arg("acceptance"),
+		        bp::arg("acceptedIntegral"),
+		        bp::arg("maxNmbEvents")=0,
+		        bp::arg("weightFileName")="",
+		        bp::arg("startEvent")=0)
+		)
+		.def("addWaves"
+		     , &ampIntegralMatrix_addWaves
+		     , (bp::arg("amplitudeMetadata"),
+		        bp::arg("weightFileName")="",
+		        bp::arg("startEvent")=0)
 		)
+		.def("merge", &rpwa::ampIntegralMatrix::merge, bp::arg("integral"))
 		.def("setWaveNames"
 		     , &ampIntegralMatrix_setWaveNames
 		     , bp::arg("waveNames"))
@@ -3,25 +3,138 @@
 #include <boost/python.hpp>
 
 #include "calcAmplitude.h"
+#include "stlContainers_py.h"
 
 namespace bp = boost::python;
 
 
 namespace {
 
-	bp::list calcAmplitude(rpwa::eventMetadata&            eventMeta,
-	                       const rpwa::isobarAmplitudePtr& amplitude,
-	                       const long int                  maxNmbEvents,
-	                       const bool                      printProgress,
-	                       const std::string&              treePerfStatOutFileName,
-	                       const long int                  treeCacheSize)
+	bp::object calcAmplitude(rpwa::eventMetadata&            eventMeta,
+	                         const rpwa::isobarAmplitudePtr& amplitude,
+	                         const long int                  maxNmbEvents,
+	                         const bool                      printProgress,
+	                         const std::string&              treePerfStatOutFileName,
+	                         const long int                  treeCacheSize,
+	                         const long int                  startEvent,
+	                         const bool                      asNumpyArray)
 	{
-		return bp::list(rpwa::hli::calcAmplitude(eventMeta,
-		                                         amplitude,
-		                                         maxNmbEvents,
-		                                         printProgress,
-		                                         treePerfStatOutFileName,
-		                                         treeCacheSize));
+		const std::vector<std::complex<double> > amps = rpwa::hli::calcAmplitude(eventMeta,
+		                                                                         amplitude,
+		                                                                         maxNmbEvents,
+		                                                                         printProgress,
+		                                                                         treePerfStatOutFileName,
+		                                                                         treeCacheSize,
+		                                                                         startEvent);
+		if(asNumpyArray) {
+			return rpwa::py::convertComplexVectorToNumpyArray(amps);
+		}
+		return bp::list(amps);
+	}
+
+
+	bp::list calcAmplitudes(rpwa::eventMetadata&   eventMeta,
+	                        const bp::object&      pyAmplitudes,
+	                        const long int         maxNmbEvents,
+	                        const bool             printProgress,
+	                        const std::string&     treePerfStatOutFileName,
+	                        const long int         treeCacheSize,
+	                        const long int         startEvent,
+	                        const bool             asNumpyArray)
+	{
+		std::vector<rpwa::isobarAmplitudePtr> amplitudes;
+		if(not rpwa::py::convertBPObjectToVector<rpwa::isobarAmplitudePtr>(pyAmplitudes, amplitudes)) {
+			PyErr_SetString(PyExc_TypeError, "Got invalid input for amplitudes when executing rpwa::hli::calcAmplitudes()");
+			bp::throw_error_already_set();
+		}
+		const std::vector<std::vector<std::complex<double> > > amps = rpwa::hli::calcAmplitudes(eventMeta,
+		                                                                                        amplitudes,
+		                                                                                        maxNmbEvents,
+		                                                                                        printProgress,
+		                                                                                        treePerfStatOutFileName,
+		                                                                                        treeCacheSize,
+		                                                                                        startEvent);
+		bp::list retval;
+		for(size_t i = 0; i < amps.size(); ++i) {
+			if(asNumpyArray) {
+				retval.append(rpwa::py::convertComplexVectorToNumpyArray(amps[i]));
+			} else {
+				retval.append(bp::list(amps[i]));
+			}
+		}
+		return retval;
+	}
+
+
+	bool calcAmplitudesToFiles(rpwa::eventMetadata&   eventMeta,
+	                           const bp::object&      pyAmplitudes,
+	                           const bp::object&      pyAmpFileWriters,
+	                           const long int         maxNmbEvents,
+	                           const bool             printProgress,
+	                           const std::string&     treePerfStatOutFileName,
+	                           const long int         treeCacheSize,
+	                           const long int         startEvent,
+	                           const long int         chunkSize)
+	{
+		std::vector<rpwa::isobarAmplitudePtr> amplitudes;
+		if(not rpwa::py::convertBPObjectToVector<rpwa::isobarAmplitudePtr>(pyAmplitudes, amplitudes)) {
+			PyErr_SetString(PyExc_TypeError, "Got invalid input for amplitudes when executing rpwa::hli::calcAmplitudes()");
+			bp::throw_error_already_set();
+		}
+		std::vector<rpwa::amplitudeFileWriter*> ampFileWriters;
+		if(not rpwa::py::convertBPObjectToVector<rpwa::amplitudeFileWriter*>(pyAmpFileWriters, ampFileWriters)) {
+			PyErr_SetString(PyExc_TypeError, "Got invalid input for ampFileWriters when executing rpwa::hli::calcAmplitudes()");
+			bp::throw_error_already_set();
+		}
+		return rpwa::hli::calcAmplitudes(eventMeta,
+		                                 amplitudes,
+		                                 ampFileWriters,
+		                                 maxNmbEvents,
+		                                 printProgress,
+		                                 treePerfStatOutFileName,
+		                                 treeCacheSize,
+		                                 startEvent,
+		                                 chunkSize);
+	}
+
+
+	bp::object calcIntegralOnTheFly(rpwa::ampIntegralMatrix& integralMatrix,
+	                                rpwa::eventMetadata&     eventMeta,
+	                                const bp::object&        pyAmplitudes,
+	                                const bp::dict&          pyBinningMap,
+	                                const long int           maxNmbEvents,
+	                                const bool               printProgress,
+	                                const long int           treeCacheSize,
+	                                const long int           startEvent,
+	                                const long int           chunkSize)
+	{
+		std::vector<rpwa::isobarAmplitudePtr> amplitudes;
+		if(not rpwa::py::convertBPObjectToVector<rpwa::isobarAmplitudePtr>(pyAmplitudes, amplitudes)) {
+			PyErr_SetString(PyExc_TypeError, "Got invalid input for amplitudes when executing rpwa::hli::calcIntegralOnTheFly()");
+			bp::throw_error_already_set();
+		}
+		rpwa::eventMetadata::binningMapType binningMap;
+		const bp::list keys = pyBinningMap.keys();
+		for(int i = 0; i < bp::len(keys); ++i) {
+			const std::string binningVar = bp::extract<std::string>(keys[i]);
+			const double lowerBound = bp::extract<double>(pyBinningMap[binningVar][0]);
+			const double upperBound = bp::extract<double>(pyBinningMap[binningVar][1]);
+			binningMap[binningVar] = rpwa::eventMetadata::rangePairType(lowerBound, upperBound);
+		}
+		std::vector<std::string> ampHashes;
+		if(not rpwa::hli::calcIntegralOnTheFly(integralMatrix,
+		                                       ampHashes,
+		                                       eventMeta,
+		                                       amplitudes,
+		                                       binningMap,
+		                                       maxNmbEvents,
+		                                       printProgress,
+		                                       treeCacheSize,
+		                                       startEvent,
+		                                       chunkSize)) {
+			return bp::object();
+		}
+		return bp::list(ampHashes);
 	}
 
 }
@@ -38,7 +151,50 @@ void rpwa::py::exportCalcAmplitude()
 		   bp::arg("maxNmbEvents") = -1,
 		   bp::arg("printProgress") = true,
 		   bp::arg("treePerfStatOutFileName") = "",
-		   bp::arg("treeCacheSize") = 25000000)
+		   bp::arg("treeCacheSize") = 25000000,
+		   bp::arg("startEvent") = 0,
+		   bp::arg("asNumpyArray") = false)
+	);
+
+	bp::def(
+		"calcAmplitudes"
+		, &::calcAmplitudes
+		, (bp::arg("eventMeta"),
+		   bp::arg("amplitudes"),
+		   bp::arg("maxNmbEvents") = -1,
+		   bp::arg("printProgress") = true,
+		   bp::arg("treePerfStatOutFileName") = "",
+		   bp::arg("treeCacheSize") = 25000000,
+		   bp::arg("startEvent") = 0,
+		   bp::arg("asNumpyArray") = false)
+	);
+
+	bp::def(
+		"calcAmplitudesToFiles"
+		, &::calcAmplitudesToFiles
+		, (bp::arg("eventMeta"),
+		   bp::arg("amplitudes"),
+		   bp::arg("ampFileWriters"),
+		   bp::arg("maxNmbEvents") = -1,
+		   bp::arg("printProgress") = true,
+		   bp::arg("treePerfStatOutFileName") = "",
+		   bp::arg("treeCacheSize") = 25000000,
+		   bp::arg("startEvent") = 0,
+		   bp::arg("chunkSize") = 100000)
+	);
+
+	bp::def(
+		"calcIntegralOnTheFly"
+		, &::calcIntegralOnTheFly
+		, (bp::arg("integralMatrix"),
+		   bp::arg("eventMeta"),
+		   bp::arg("amplitudes"),
+		   bp::arg("binningMap") = bp::dict(),
+		   bp::arg("maxNmbEvents") = -1,
+		   bp::arg("printProgress") = true,
+		   bp::arg("treeCacheSize") = 25000000,
+		   bp::arg("startEvent") = 0,
+		   bp::arg("chunkSize") = 100000)
 	);
 
 }
@@ -1,25 +1,35 @@
 
 from _amplitude import calcAmplitude
+from _amplitude import calcAmplitudes
+from _amplitude import isAmplitudeFileComplete
+from _amplitude import amplitudeShardFilePath
+from _amplitude import amplitudeShardFileRange
+from _amplitude import mergeAmplitudeFiles
+from _amplitude import removeAmplitudeFile
+from _amplitudeCache import amplitudeCache
 from _config import rootPwaConfig
 from _fileManager import fileManager
 from _fileManager import saveFileManager
 from _fileManager import loadFileManager
 from _fit import pwaFit
 from _fit import pwaNloptFit
-from _integrals import calcIntegrals
+from _integrals import calcIntegrals, calcIntegralsWithAcceptance, mergeIntegralFiles, rebinIntegralFiles, updateIntegralFile, addWavesToIntegralFile, isIntegralFileUpToDate
 from _integralsOnTheFly import calcIntegralsOnTheFly
 from _likelihood import initLikelihood
+from _likelihoodServer import likelihoodServer, likelihoodClient, likelihoodConfiguration
 
 import utils
 ROOT = utils.ROOT
 
 # pylint: disable=E0602
 del _amplitude
+del _amplitudeCache
 del _config
 del _fileManager
 del _fit
 del _integrals
 del _integralsOnTheFly
 del _likelihood
+del _likelihoodServer
 
 config = None
@@ -5,12 +5,126 @@ import pyRootPwa.core
 import pyRootPwa.utils
 ROOT = pyRootPwa.utils.ROOT
 
+def _dataFileNames(ampFileName):
+	# maps the object base names of the columnar amplitudes in the amplitude
+	# file to the paths of the data files they are read from, which are taken
+	# from the metadata in the file
+	if not _os.path.isfile(ampFileName):
+		return {}
+	ampFile = ROOT.TFile.Open(ampFileName, "READ")
+	if not ampFile or ampFile.IsZombie():
+		return {}
+	dataFileNames = dict(pyRootPwa.core.amplitudeMetadata.amplitudeDataFilesInFile(ampFile))
+	ampFile.Close()
+	return dataFileNames
+
+
+def _dataFileName(ampFileName, objectBaseName):
+	# name of the data file the amplitudes of objectBaseName are written to
+	# for the amplitude file 'ampFileName'
+	return pyRootPwa.core.amplitudeMetadata.dataFileNameForAmplitudeFile(ampFileName, objectBaseName)
+
+
+def removeAmplitudeFile(ampFileName, objectBaseName=None):
+	# removes an amplitude file together with the columnar data files written
+	# for it. only the data files named after the amplitude file are removed,
+	# not those of another amplitude file it was copied from. objectBaseName
+	# gives the amplitudes of a file whose metadata were not written
+	objectBaseNames = set(_dataFileNames(ampFileName).keys())
+	if objectBaseName:
+		objectBaseNames.add(objectBaseName)
+	if _os.path.isfile(ampFileName):
+		_os.remove(ampFileName)
+	for name in objectBaseNames:
+		dataFileName = _dataFileName(ampFileName, name)
+		if _os.path.isfile(dataFileName):
+			_os.remove(dataFileName)
+
+
+def _removePartialFile(outputFile, outputFileName):
+	# closes and deletes an output file that could not be written completely
+	if outputFile:
+		outputFile.Close()
+	if _os.path.isfile(outputFileName):
+		pyRootPwa.utils.printWarn("removing incomplete output file '" + outputFileName + "'.")
+	removeAmplitudeFile(outputFileName)
+
+
+def _eventContentHashes(ampMeta):
+	return [ eventMeta.contentHash() for eventMeta in ampMeta.eventMetadata() ]
+
+
+def _nmbEventsInRange(nmbEventsTree, startEvent, maxNumberOfEvents):
+	# number of events in [startEvent, startEvent + maxNumberOfEvents) which are in the tree
+	if startEvent < 0 or startEvent >= nmbEventsTree:
+		return 0
+	nEvents = nmbEventsTree - startEvent
+	if maxNumberOfEvents > 0:
+		nEvents = min(nEvents, maxNumberOfEvents)
+	return nEvents
+
+
+def amplitudeShardFilePath(ampFileName, startEvent, nmbEvents):
+	# name of the file holding the amplitudes of events [startEvent, startEvent + nmbEvents)
+	# of the amplitude file 'ampFileName'
+	(base, ext) = _os.path.splitext(ampFileName)
+	return base + "_events-" + str(startEvent) + "-" + str(startEvent + nmbEvents) + ext
+
+
+def amplitudeShardFileRange(shardFileName):
+	# returns (startEvent, nmbEvents) encoded in the name of a shard file or None
+	base = _os.path.splitext(shardFileName)[0]
+	pos = base.rfind("_events-")
+	if pos < 0:
+		return None
+	try:
+		(startEvent, endEvent) = [ int(x) for x in base[pos + len("_events-"):].split("-") ]
+	except ValueError:
+		return None
+	return (startEvent, endEvent - startEvent)
+
+
+def isAmplitudeFileComplete(ampFileName, waveName, nmbEvents):
+	# an amplitude file is complete if its metadata (which is written last)
+	# exists and the amplitude tree or data file holds the expected number of
+	# entries. returns True or False, or None if this could not be determined,
+	# e.g. because the file could not be opened; such files must not be
+	# removed. only the number of entries is read, columnar data files are
+	# not mapped
+	if not _os.path.isfile(ampFileName):
+		return False
+	ampFile = ROOT.TFile.Open(ampFileName, "READ")
+	if not ampFile or ampFile.IsZombie():
+		return None
+	nmbAmplitudes = pyRootPwa.core.amplitudeMetadata.nmbAmplitudesInFile(ampFile, waveName)
+	ampFile.Close()
+	if nmbAmplitudes == -1:
+		return False
+	if nmbAmplitudes < 0:
+		return None
+	return nmbAmplitudes == nmbEvents
+
+
+def _watchEventTree(ioMonitor, eventMeta, treePerfStatOutFileName):
+	# the event loop attaches its own TTreePerfStats if a file name is given,
+	# and only one of them can be active at a time
+	if ioMonitor and not treePerfStatOutFileName:
+		ioMonitor.watchTree(eventMeta.eventTree())
+
+
 def calcAmplitude(inputFileName,
                   keyFileName,
                   waveDescriptionID,
                   outputFileName,
                   maxNumberOfEvents = -1,
-                  printProgress = True):
+                  printProgress = True,
+                  startEvent = 0,
+                  chunkSize = 100000,
+                  columnar = False,
+                  singlePrecision = False,
+                  treePerfStatOutFileName = "",
+                  treeCacheSize = 25000000,
+                  ioMonitor = None):
 
 	printInfo = pyRootPwa.utils.printInfo
 	printSucc = pyRootPwa.utils.printSucc
@@ -31,9 +145,10 @@ def calcAmplitude(inputFileName,
 	if not eventMeta:
 		printWarn("could not read metadata from input file '" + inputFileName + "'.")
 		return False
-	nEvents = eventMeta.eventTree().GetEntries()
-	if maxNumberOfEvents > 0:
-		nEvents = min(nEvents, maxNumberOfEvents)
+	nEvents = _nmbEventsInRange(eventMeta.eventTree().GetEntries(), startEvent, maxNumberOfEvents)
+	if nEvents <= 0:
+		printWarn("start event " + str(startEvent) + " is outside of the event tree in input file '" + inputFileName + "'.")
+		return False
 	outputFile = ROOT.TFile.Open(outputFileName, "NEW")
 	if not outputFile:
 		printWarn("could not open output file '" + outputFileName + "'.")
@@ -41,36 +156,237 @@ def calcAmplitude(inputFileName,
 
 	if not _os.path.isfile(keyFileName):
 		printWarn("key file '" + keyFileName + "' not found.")
-		outputFile.Close()
+		_removePartialFile(outputFile, outputFileName)
 		return False
 	waveDescription = pyRootPwa.core.waveDescription.parseKeyFile(keyFileName)[waveDescriptionID]
 	(result, amplitude) = waveDescription.constructAmplitude()
 	if not result:
 		printWarn("could not construct amplitude from keyfile '" + keyFileName + "' (index " + str(waveDescriptionID) + ").")
-		outputFile.Close()
+		_removePartialFile(outputFile, outputFileName)
 		return False
 
 	ampFileWriter = pyRootPwa.core.amplitudeFileWriter()
 	objectBaseName = waveDescription.waveNameFromTopology(amplitude.decayTopology())
-	if not ampFileWriter.initialize(outputFile, [eventMeta], waveDescription.keyFileContent(), objectBaseName):
+	if not ampFileWriter.initialize(outputFile, [eventMeta], waveDescription.keyFileContent(), objectBaseName,
+	                                columnar = columnar, singlePrecision = singlePrecision):
 		printWarn("could not initialize amplitudeFileWriter.")
-		outputFile.Close()
+		_removePartialFile(outputFile, outputFileName)
 		return False
-	amplitudes = pyRootPwa.core.calcAmplitude(eventMeta, amplitude, nEvents, printProgress)
-	if not amplitudes:
+	# amplitudes are written in chunks while the events are processed
+	_watchEventTree(ioMonitor, eventMeta, treePerfStatOutFileName)
+	if not pyRootPwa.core.calcAmplitudesToFiles(eventMeta, [amplitude], [ampFileWriter], nEvents, printProgress,
+	                                            treePerfStatOutFileName = treePerfStatOutFileName,
+	                                            treeCacheSize = treeCacheSize,
+	                                            startEvent = startEvent, chunkSize = chunkSize):
 		printWarn("could not calculate amplitudes.")
-		outputFile.Close()
+		ampFileWriter.reset()
+		_removePartialFile(outputFile, outputFileName)
 		return False
-	if nEvents != len(amplitudes):
-		printWarn("number of events (" + str(nEvents) +
-		          ") does not match with number of amplitudes (" + str(len(amplitudes)) + ").")
-		return False
-	ampFileWriter.addAmplitudes(amplitudes)
+	if ioMonitor:
+		ioMonitor.collectTree(eventMeta.eventTree())
+		ioMonitor.nmbEvents = nEvents
 	if not ampFileWriter.finalize():
 		printWarn("could not finalize amplitudeFileWriter.")
-		outputFile.Close()
+		_removePartialFile(outputFile, outputFileName)
 		return False
 
 	outputFile.Close()
 	printSucc("successfully calculated amplitude for " + str(nEvents) + " events.")
 	return True
+
+
+def calcAmplitudes(inputFileName,
+                   keyFiles,
+                   outputFileNames,
+                   maxNumberOfEvents = -1,
+                   printProgress = True,
+                   startEvent = 0,
+                   chunkSize = 100000,
+                   columnar = False,
+                   singlePrecision = False,
+                   treePerfStatOutFileName = "",
+                   treeCacheSize = 25000000,
+                   ioMonitor = None):
+	# keyFiles is a list of (keyFileName, waveDescriptionID) tuples,
+	# outputFileNames the list of output files in the same order
+	# the event file is read only once for all waves
+	# if columnar is set, the amplitudes are written to raw, memory-mappable
+	# data files next to the output files, which then only hold the metadata;
+	# singlePrecision stores them as complex<float> (columnar files only)
+	# treePerfStatOutFileName and treeCacheSize are passed to the event loop; an
+	# ioMonitor (utils.ioMonitor) collects the I/O statistics of the event tree
+
+	printInfo = pyRootPwa.utils.printInfo
+	printSucc = pyRootPwa.utils.printSucc
+	printWarn = pyRootPwa.utils.printWarn
+
+	if len(keyFiles) != len(outputFileNames):
+		printWarn("number of key files (" + str(len(keyFiles)) + ") does not match number of output files (" + str(len(outputFileNames)) + ").")
+		return False
+	if not keyFiles:
+		printWarn("no key files given.")
+		return False
+
+	printInfo("Calculating amplitudes for " + str(len(keyFiles)) + " waves with input file '" + inputFileName + "'.")
+
+	if 'ROOTPWA' not in _os.environ:
+		printWarn("$ROOTPWA not set.")
+		return False
+
+	inputFile = ROOT.TFile.Open(inputFileName, "READ")
+	if not inputFile:
+		printWarn("could not open input file '" + inputFileName + "'.")
+		return False
+	eventMeta = pyRootPwa.core.eventMetadata.readEventFile(inputFile, True)
+	if not eventMeta:
+		printWarn("could not read metadata from input file '" + inputFileName + "'.")
+		return False
+	nEvents = _nmbEventsInRange(eventMeta.eventTree().GetEntries(), startEvent, maxNumberOfEvents)
+	if nEvents <= 0:
+		printWarn("start event " + str(startEvent) + " is outside of the event tree in input file '" + inputFileName + "'.")
+		return False
+
+	waveDescriptions = []
+	amplitudes = []
+	for (keyFileName, waveDescriptionID) in keyFiles:
+		if not _os.path.isfile(keyFileName):
+			printWarn("key file '" + keyFileName + "' not found.")
+			return False
+		waveDescription = pyRootPwa.core.waveDescription.parseKeyFile(keyFileName)[waveDescriptionID]
+		(result, amplitude) = waveDescription.constructAmplitude()
+		if not result:
+			printWarn("could not construct amplitude from keyfile '" + keyFileName + "' (index " + str(waveDescriptionID) + ").")
+			return False
+		waveDescriptions.append(waveDescription)
+		amplitudes.append(amplitude)
+
+	# all output files are open at the same time and the amplitudes are written
+	# in chunks while the events are processed; chunkSize is the number of
+	# amplitude values buffered for all waves together
+	outputFiles = []
+	ampFileWriters = []
+	def cleanUp():
+		for ampFileWriter in ampFileWriters:
+			ampFileWriter.reset()
+		for outputFile, outputFileName in zip(outputFiles, outputFileNames):
+			_removePartialFile(outputFile, outputFileName)
+	for waveIndex, outputFileName in enumerate(outputFileNames):
+		outputFile = ROOT.TFile.Open(outputFileName, "NEW")
+		if not outputFile:
+			printWarn("could not open output file '" + outputFileName + "'.")
+			cleanUp()
+			return False
+		outputFiles.append(outputFile)
+		ampFileWriter = pyRootPwa.core.amplitudeFileWriter()
+		objectBaseName = waveDescriptions[waveIndex].waveNameFromTopology(amplitudes[waveIndex].decayTopology())
+		if not ampFileWriter.initialize(outputFile, [eventMeta], waveDescriptions[waveIndex].keyFileContent(), objectBaseName,
+		                                columnar = columnar, singlePrecision = singlePrecision):
+			printWarn("could not initialize amplitudeFileWriter for output file '" + outputFileName + "'.")
+			cleanUp()
+			return False
+		ampFileWriters.append(ampFileWriter)
+
+	_watchEventTree(ioMonitor, eventMeta, treePerfStatOutFileName)
+	if not pyRootPwa.core.calcAmplitudesToFiles(eventMeta, amplitudes, ampFileWriters, nEvents, printProgress,
+	                                            treePerfStatOutFileName = treePerfStatOutFileName,
+	                                            treeCacheSize = treeCacheSize,
+	                                            startEvent = startEvent, chunkSize = chunkSize):
+		printWarn("could not calculate amplitudes.")
+		cleanUp()
+		return False
+	if ioMonitor:
+		ioMonitor.collectTree(eventMeta.eventTree())
+		ioMonitor.nmbEvents = nEvents
+
+	success = True
+	for ampFileWriter, outputFile, outputFileName in zip(ampFileWriters, outputFiles, outputFileNames):
+		if not ampFileWriter.finalize():
+			printWarn("could not finalize amplitudeFileWriter for output file '" + outputFileName + "'.")
+			_removePartialFile(outputFile, outputFileName)
+			success = False
+			continue
+		outputFile.Close()
+
+	if success:
+		printSucc("successfully calculated amplitudes of " + str(len(amplitudes)) + " waves for " + str(nEvents) + " events.")
+	return success
+
+
+def mergeAmplitudeFiles(inputFileNames, outputFileName, objectBaseName):
+	# stitches the amplitude files 'inputFileNames' (in the given order) into a single
+	# amplitude file and calculates the content hash of the merged amplitudes
+	# the output file uses the storage backend and precision of the first input file
+
+	printInfo = pyRootPwa.utils.printInfo
+	printSucc = pyRootPwa.utils.printSucc
+	printWarn = pyRootPwa.utils.printWarn
+
+	if not inputFileNames:
+		printWarn("no input files given.")
+		return False
+
+	printInfo("Merging " + str(len(inputFileNames)) + " amplitude files for wave '" + objectBaseName + "' into output file '" + outputFileName + "'.")
+
+	inputFiles = []
+	ampMetas = []
+	for inputFileName in inputFileNames:
+		inputFile = ROOT.TFile.Open(inputFileName, "READ")
+		if not inputFile:
+			printWarn("could not open input file '" + inputFileName + "'.")
+			for openFile in inputFiles:
+				openFile.Close()
+			return False
+		inputFiles.append(inputFile)
+		ampMeta = pyRootPwa.core.amplitudeMetadata.readAmplitudeFile(inputFile, objectBaseName)
+		if not ampMeta:
+			printWarn("could not read amplitude metadata from input file '" + inputFileName + "'.")
+			for openFile in inputFiles:
+				openFile.Close()
+			return False
+		if ampMetas and ampMeta.keyfileContent() != ampMetas[0].keyfileContent():
+			printWarn("keyfile content of input file '" + inputFileName + "' differs from the one of input file '" + inputFileNames[0] + "'.")
+			for openFile in inputFiles:
+				openFile.Close()
+			return False
+		# the merged file takes the event metadata of the first input file, so all
+		# shards have to be calculated from the same event files
+		if ampMetas and _eventContentHashes(ampMeta) != _eventContentHashes(ampMetas[0]):
+			printWarn("event metadata of input file '" + inputFileName + "' differ from the ones of input file '" + inputFileNames[0] + "'.")
+			for openFile in inputFiles:
+				openFile.Close()
+			return False
+		ampMetas.append(ampMeta)
+
+	outputFile = ROOT.TFile.Open(outputFileName, "NEW")
+	if not outputFile:
+		printWarn("could not open output file '" + outputFileName + "'.")
+		for openFile in inputFiles:
+			openFile.Close()
+		return False
+
+	success = True
+	nmbEvents = 0
+	ampFileWriter = pyRootPwa.core.amplitudeFileWriter()
+	if not ampFileWriter.initialize(outputFile, ampMetas[0].eventMetadata(), ampMetas[0].keyfileContent(), objectBaseName,
+	                                columnar = ampMetas[0].isColumnar(), singlePrecision = ampMetas[0].singlePrecision()):
+		printWarn("could not initialize amplitudeFileWriter.")
+		success = False
+	if success:
+		for inputFileName, ampMeta in zip(inputFileNames, ampMetas):
+			if not ampFileWriter.appendAmplitudeTree(ampMeta):
+				printWarn("could not append amplitudes from input file '" + inputFileName + "'.")
+				success = False
+				break
+			nmbEvents += ampMeta.nmbAmplitudes()
+	if success and not ampFileWriter.finalize():
+		printWarn("could not finalize amplitudeFileWriter.")
+		success = False
+
+	for inputFile in inputFiles:
+		inputFile.Close()
+	if not success:
+		_removePartialFile(outputFile, outputFileName)
+		return False
+	outputFile.Close()
+	printSucc("successfully merged amplitudes of " + str(nmbEvents) + " events.")
+	return True
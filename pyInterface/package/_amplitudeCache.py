@@ -0,0 +1,161 @@
+import errno
+import hashlib
+import os
+import shutil
+
+import pyRootPwa.core
+import pyRootPwa.utils
+from _amplitude import _dataFileName, _dataFileNames
+
+
+def _linkOrCopy(sourceFileName, targetFileName):
+	# hard links share the data with the source file, copying is only
+	# needed if both are on different file systems
+	try:
+		os.link(sourceFileName, targetFileName)
+	except OSError as exc:
+		if exc.errno != errno.EXDEV:
+			raise
+		shutil.copy2(sourceFileName, targetFileName)
+
+
+class amplitudeCache(object):
+	# content-addressed store of amplitude files
+	#
+	# an entry is identified by a hash of everything that determines the
+	# amplitude values (keyfile content, content hash of the event file, the
+	# range of events, the precision and the rootpwa version) and of the
+	# storage backend (tree or columnar data file), so that it can be reused
+	# independent of where the amplitude file is located in an analysis.
+	# files are hard-linked into and out of the cache when possible. if the
+	# cache grows beyond maxSize bytes, the least recently used entries are
+	# removed.
+
+	entryFileStem = "amplitudes"
+
+	def __init__(self, cacheDirectory, maxSize = 0):
+		self.cacheDirectory = cacheDirectory
+		self.maxSize = maxSize  # in bytes, 0 for unlimited size
+
+
+	@staticmethod
+	def key(keyfileContent, eventContentHash, startEvent, nmbEvents, singlePrecision = False, columnar = False):
+		hashor = hashlib.sha1()
+		for item in (keyfileContent, eventContentHash, str(startEvent), str(nmbEvents), pyRootPwa.core.gitHash()):
+			hashor.update(item)
+			hashor.update("\0")
+		if singlePrecision:
+			hashor.update("singlePrecision\0")
+		if columnar:
+			hashor.update("columnar\0")
+		return hashor.hexdigest()
+
+
+	def entryDirectory(self, key):
+		return os.path.join(self.cacheDirectory, key[:2], key)
+
+
+	def fetch(self, key, ampFileName):
+		# provides the amplitude file for the given key as 'ampFileName'
+		# and returns whether it was found in the cache
+		entryDirectory = self.entryDirectory(key)
+		entryFileName = os.path.join(entryDirectory, amplitudeCache.entryFileStem + ".root")
+		if not os.path.isfile(entryFileName):
+			return False
+		fileNames = [ (entryFileName, ampFileName) ]
+		for (objectBaseName, dataFileName) in _dataFileNames(entryFileName).items():
+			fileNames.append((dataFileName, _dataFileName(ampFileName, objectBaseName)))
+		for (_, targetFileName) in fileNames:
+			if os.path.exists(targetFileName):
+				pyRootPwa.utils.printWarn("cannot fetch amplitude file '" + ampFileName + "' from cache, file '" + targetFileName + "' exists.")
+				return False
+		linkedFileNames = []
+		try:
+			for (sourceFileName, targetFileName) in fileNames:
+				_linkOrCopy(sourceFileName, targetFileName)
+				linkedFileNames.append(targetFileName)
+		except (IOError, OSError) as exc:
+			# e.g. the entry was evicted in the meantime
+			pyRootPwa.utils.printWarn("could not fetch amplitude file '" + ampFileName + "' from cache: " + str(exc))
+			for targetFileName in linkedFileNames:
+				os.remove(targetFileName)
+			return False
+		# the modification time of the entry directory marks its last use
+		try:
+			os.utime(entryDirectory, None)
+		except OSError:
+			pass
+		return True
+
+
+	def store(self, key, ampFileName):
+		# adds the amplitude file 'ampFileName' and its data files to the cache
+		entryDirectory = self.entryDirectory(key)
+		if os.path.isdir(entryDirectory):
+			os.utime(entryDirectory, None)
+			return True
+		# the entry is assembled in a temporary directory and moved into place in
+		# one step, so that concurrent readers never see an incomplete entry
+		tmpDirectory = os.path.join(self.cacheDirectory, "tmp-" + str(os.getpid()) + "-" + key)
+		try:
+			if not os.path.isdir(os.path.dirname(entryDirectory)):
+				os.makedirs(os.path.dirname(entryDirectory))
+			os.mkdir(tmpDirectory)
+			tmpEntryFileName = os.path.join(tmpDirectory, amplitudeCache.entryFileStem + ".root")
+			_linkOrCopy(ampFileName, tmpEntryFileName)
+			for (objectBaseName, dataFileName) in _dataFileNames(ampFileName).items():
+				_linkOrCopy(dataFileName, _dataFileName(tmpEntryFileName, objectBaseName))
+			os.rename(tmpDirectory, entryDirectory)
+		except (IOError, OSError) as exc:
+			if os.path.isdir(tmpDirectory):
+				shutil.rmtree(tmpDirectory, ignore_errors = True)
+			if os.path.isdir(entryDirectory):
+				# stored by another process in the meantime
+				return True
+			pyRootPwa.utils.printWarn("could not store amplitude file '" + ampFileName + "' in cache: " + str(exc))
+			return False
+		return True
+
+
+	def entries(self):
+		# returns a list of (last use, size in bytes, entry directory)
+		entries = []
+		if not os.path.isdir(self.cacheDirectory):
+			return entries
+		for prefix in os.listdir(self.cacheDirectory):
+			prefixDirectory = os.path.join(self.cacheDirectory, prefix)
+			if len(prefix) != 2 or not os.path.isdir(prefixDirectory):
+				continue
+			for key in os.listdir(prefixDirectory):
+				entryDirectory = os.path.join(prefixDirectory, key)
+				try:
+					size = sum(os.path.getsize(os.path.join(entryDirectory, fileName)) for fileName in os.listdir(entryDirectory))
+					entries.append((os.path.getmtime(entryDirectory), size, entryDirectory))
+				except OSError:
+					# removed in the meantime
+					continue
+		return entries
+
+
+	def size(self):
+		return sum(size for (_, size, _) in self.entries())
+
+
+	def evict(self):
+		# removes the least recently used entries until the cache fits into maxSize
+		# and returns the number of removed entries
+		if self.maxSize <= 0:
+			return 0
+		entries = sorted(self.entries())
+		totalSize = sum(size for (_, size, _) in entries)
+		nmbRemoved = 0
+		for (_, size, entryDirectory) in entries:
+			if totalSize <= self.maxSize:
+				break
+			shutil.rmtree(entryDirectory, ignore_errors = True)
+			totalSize -= size
+			nmbRemoved += 1
+		if nmbRemoved > 0:
+			pyRootPwa.utils.printInfo("evicted " + str(nmbRemoved) + " entries from amplitude cache '" + self.cacheDirectory
+			                          + "' (size now " + str(totalSize / 1024**2) + " MiB).")
+		return nmbRemoved
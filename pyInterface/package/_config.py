@@ -2,6 +2,7 @@
 import ConfigParser
 import os
 
+import pyRootPwa.core
 import pyRootPwa.utils
 
 class rootPwaConfig(object):
@@ -17,6 +18,9 @@ class rootPwaConfig(object):
 	ampDirectory                           = ""
 	intDirectory                           = ""
 	limitFilesPerDir                       = -1
+	ampCacheDirectory                      = ""
+	ampCacheMaxSize                        = 0.
+	hashAlgorithm                          = "md5"
 
 	# fit section
 	fitResultTreeName                      = ""
@@ -68,6 +72,17 @@ class rootPwaConfig(object):
 			else:
 				self.limitFilesPerDir                   = -1
 
+			# the amplitude cache is optional
+			if self.config.has_option('general', 'ampCacheDirectory'):
+				self.ampCacheDirectory = self.getPathFromConfig("general", "ampCacheDirectory", "")
+			if self.config.has_option('general', 'ampCacheMaxSize'):
+				self.ampCacheMaxSize = self.config.getfloat('general', 'ampCacheMaxSize')
+
+			# algorithm for the content hashes of newly written files; existing
+			# hashes are always verified with the algorithm they were calculated with
+			if self.config.has_option('general', 'hashAlgorithm'):
+				self.hashAlgorithm = self.config.get('general', 'hashAlgorithm').lower()
+
 			self.fitResultTreeName = self.config.get('fit', 'treeName')
 			self.fitResultBranchName = self.config.get('fit', 'fitResultBranch')
 
@@ -81,6 +96,12 @@ class rootPwaConfig(object):
 			pyRootPwa.utils.printErr("a required entry was missing from the config file ('" + str(exc) + "').")
 			return False
 
+		hashAlgorithms = { "md5": pyRootPwa.core.hashCalculator.MD5, "xxh64": pyRootPwa.core.hashCalculator.XXH64 }
+		if self.hashAlgorithm not in hashAlgorithms:
+			pyRootPwa.utils.printErr("unknown hash algorithm '" + self.hashAlgorithm + "' (valid: '" + "', '".join(sorted(hashAlgorithms)) + "').")
+			return False
+		pyRootPwa.core.hashCalculator.setDefaultAlgorithm(hashAlgorithms[self.hashAlgorithm])
+
 		if not os.path.isdir(self.dataDirectory):
 			os.mkdir(self.dataDirectory)
 			pyRootPwa.utils.printInfo("created data directory '" + self.dataDirectory + "'.")
@@ -19,7 +19,9 @@ def pwaFit(ampFileList,
            saveSpace=False,
            rank=1,
            verbose=False,
-           attempts=1
+           attempts=1,
+           ioMonitor=None,
+           nmbThreads=1
           ):
 
 	waveDescThres = pyRootPwa.utils.getWaveDescThresFromWaveList(waveListFileName, keyFiles)
@@ -34,7 +36,9 @@ def pwaFit(ampFileList,
 	                                      cauchy = cauchy,
 	                                      cauchyWidth = cauchyWidth,
 	                                      rank = rank,
-	                                      verbose = verbose)
+	                                      verbose = verbose,
+	                                      ioMonitor = ioMonitor,
+	                                      nmbThreads = nmbThreads)
 	if not likelihood:
 		pyRootPwa.utils.printErr("error while initializing likelihood. Aborting...")
 		return [ ]
@@ -85,7 +89,9 @@ def pwaNloptFit(ampFileList,
                 saveSpace=False,
                 rank=1,
                 verbose=False,
-                attempts=1
+                attempts=1,
+                ioMonitor=None,
+                nmbThreads=1
                ):
 
 	waveDescThres = pyRootPwa.utils.getWaveDescThresFromWaveList(waveListFileName, keyFiles)
@@ -100,7 +106,9 @@ def pwaNloptFit(ampFileList,
 	                                      cauchy = cauchy,
 	                                      cauchyWidth = cauchyWidth,
 	                                      rank = rank,
-	                                      verbose = verbose)
+	                                      verbose = verbose,
+	                                      ioMonitor = ioMonitor,
+	                                      nmbThreads = nmbThreads)
 	if not likelihood:
 		pyRootPwa.utils.printErr("error while initializing likelihood. Aborting...")
 		return [ ]
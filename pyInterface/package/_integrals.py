@@ -1,59 +1,68 @@
+import collections
+import os
+
 import pyRootPwa.core
 import pyRootPwa.utils
+from _amplitude import amplitudeShardFileRange
 ROOT = pyRootPwa.utils.ROOT
 
-def calcIntegrals(integralFileName, ampFileNameList, maxNmbEvents=0, weightFileName=""):
-	integralMatrix = pyRootPwa.core.ampIntegralMatrix()
+def _openAmplitudeFiles(ampFileNameList):
+	# returns the opened amplitude files (which have to be kept open while
+	# the amplitudes are used) and their metadata, or (None, None)
 	ampFiles = []
 	ampMetas = []
-	outputFile = pyRootPwa.ROOT.TFile.Open(integralFileName, "NEW")
-	if not outputFile:
-		pyRootPwa.utils.printWarn("cannot open output file '" + integralFileName + "'. Aborting...")
-		return False
 	for waveName in ampFileNameList:
 		ampFileName = ampFileNameList[waveName]
 		ampFile = ROOT.TFile.Open(ampFileName, "READ")
-		ampFiles.append(ampFile)
 		if not ampFile:
-			pyRootPwa.utils.printErr("could not open amplitude file '" + ampFileName + "'. Aborting...")
-			return False
+			pyRootPwa.utils.printErr("could not open amplitude file '" + ampFileName + "'.")
+			return (None, None)
+		ampFiles.append(ampFile)
 		ampMeta = pyRootPwa.core.amplitudeMetadata.readAmplitudeFile(ampFile, waveName)
-		ampMetas.append(ampMeta)
 		if not ampMeta:
 			pyRootPwa.utils.printErr("could not read amplitude file '" + ampFileName + "'.")
-	if not integralMatrix.integrate(ampMetas, maxNmbEvents, weightFileName):
-		pyRootPwa.utils.printErr("could not run integration. Aborting...")
-		del ampFiles
-		return False
+			return (None, None)
+		ampMetas.append(ampMeta)
+	return (ampFiles, ampMetas)
+
+
+def _integralMetadata(integralMatrix, ampMetas, ampFileNameList, startEvent, nmbEvents, acceptanceVariable=""):
+	# returns the metadata of an integral over the amplitudes [startEvent,
+	# startEvent + nmbEvents) of the amplitude files or None. for an integral
+	# weighted with an acceptance variable, the number of events of the matrix
+	# differs from nmbEvents
 	integralMetaData = pyRootPwa.core.ampIntegralMatrixMetadata()
+	integralMetaData.setPrecision(integralMatrix.precision())
+	integralMetaData.setAcceptanceVariable(acceptanceVariable)
+	integralMetaData.setNmbProcessedEvents(nmbEvents)
 	first = True
 	for ampMeta in ampMetas:
 		integralMetaData.addKeyFileContent(ampMeta.keyfileContent())
 		eventMetas = ampMeta.eventMetadata()
-		if len(eventMetas) == 0:
-			pyRootPwa.utils.printErr("no event metadata found. Aborting...")
-			return False
+		if not eventMetas:
+			pyRootPwa.utils.printErr("no event metadata found.")
+			return None
 		if len(eventMetas) > 1:
-			pyRootPwa.utils.printErr("more than one event file per amplitude file not implemented at the moment. Aborting...")
-			return False
+			pyRootPwa.utils.printErr("more than one event file per amplitude file not implemented at the moment.")
+			return None
 		if first:
 			eventMeta = eventMetas[0]
 			binningMap  = eventMeta.binningMap()
-			nmbEvents = ampMeta.amplitudeTree().GetEntries()
-			startEvent = 0 # No start Event given at the moment, but you never know what the future brings
-			if maxNmbEvents == 0:
-				stopEvent = nmbEvents - 1
-			else:
-				stopEvent  = min(maxNmbEvents, nmbEvents) - 1
-			if not 	integralMetaData.addEventMetadata(eventMeta, startEvent, stopEvent):
-				pyRootPwa.utils.printErr("could not add event metadata to integral metadata. Aborting...")
-				return False
+			# the event range excludes stopEvent, so that ranges of integrals
+			# over consecutive events can be merged; the amplitudes of shard
+			# files start at the first event of the shard
+			shardRange = amplitudeShardFileRange(ampFileNameList[ampMeta.objectBaseName()])
+			firstEvent = startEvent + (shardRange[0] if shardRange else 0)
+			stopEvent = firstEvent + nmbEvents
+			if not integralMetaData.addEventMetadata(eventMeta, firstEvent, stopEvent):
+				pyRootPwa.utils.printErr("could not add event metadata to integral metadata.")
+				return None
 			integralMetaData.setBinningMap(binningMap)
 			first = False
 		else:
 			if not eventMetas[0] == eventMeta:
-				pyRootPwa.utils.printErr("amplitude files with non-matching event metadatas. Aborting...")
-				return False
+				pyRootPwa.utils.printErr("amplitude files with non-matching event metadatas.")
+				return None
 		if not integralMetaData.addAmplitudeHash(ampMeta.contentHash()):
 			pyRootPwa.utils.printWarn("could not add the amplitude hash.")
 			# This error is not fatal, since in special cases the same hash can appear twice:
@@ -61,7 +70,37 @@ def calcIntegrals(integralFileName, ampFileNameList, maxNmbEvents=0, weightFileN
 			# and the shape is either 0 or 1. If two such waves accidentally have the same number
 			# of events, both will also have the same hash.
 	if not integralMetaData.setAmpIntegralMatrix(integralMatrix):
-		pyRootPwa.utils.printErr("could not add the integral matrix to the metadata object. Aborting...")
+		pyRootPwa.utils.printErr("could not add the integral matrix to the metadata object.")
+		return None
+	return integralMetaData
+
+
+def calcIntegrals(integralFileName, ampFileNameList, maxNmbEvents=0, weightFileName="", ioMonitor=None, startEvent=0, targetPrecision=0.):
+	# integrates the events [startEvent, startEvent + maxNmbEvents) of the
+	# amplitude files (all events from startEvent on if maxNmbEvents is 0).
+	# if targetPrecision is given, the integration stops as soon as the
+	# estimated relative uncertainty of the integrals is below it
+	integralMatrix = pyRootPwa.core.ampIntegralMatrix()
+	outputFile = pyRootPwa.ROOT.TFile.Open(integralFileName, "NEW")
+	if not outputFile:
+		pyRootPwa.utils.printWarn("cannot open output file '" + integralFileName + "'. Aborting...")
+		return False
+	(ampFiles, ampMetas) = _openAmplitudeFiles(ampFileNameList)
+	if not ampMetas:
+		pyRootPwa.utils.printErr("could not read amplitude files. Aborting...")
+		return False
+	if not integralMatrix.integrate(ampMetas, maxNmbEvents, weightFileName, startEvent, targetPrecision):
+		pyRootPwa.utils.printErr("could not run integration. Aborting...")
+		del ampFiles
+		return False
+	if ioMonitor:
+		for ampMeta in ampMetas:
+			if ampMeta.amplitudeTree():
+				ioMonitor.collectTree(ampMeta.amplitudeTree())
+		ioMonitor.nmbEvents = integralMatrix.nmbEvents()
+	integralMetaData = _integralMetadata(integralMatrix, ampMetas, ampFileNameList, startEvent, integralMatrix.nmbEvents())
+	if not integralMetaData:
+		pyRootPwa.utils.printErr("could not create integral metadata. Aborting...")
 		return False
 	del ampFiles
 	if not integralMetaData.writeToFile(outputFile):
@@ -69,3 +108,421 @@ def calcIntegrals(integralFileName, ampFileNameList, maxNmbEvents=0, weightFileN
 		return False
 	outputFile.Close()
 	return True
+
+
+def readEventVariable(eventFileName, variableName, firstEvent=0, nmbEvents=-1):
+	# returns the values of an additional variable saved in the event file
+	# for the events [firstEvent, firstEvent + nmbEvents) or None
+	eventFile = ROOT.TFile.Open(eventFileName, "READ")
+	if not eventFile:
+		pyRootPwa.utils.printErr("could not open event file '" + eventFileName + "'.")
+		return None
+	eventMeta = pyRootPwa.core.eventMetadata.readEventFile(eventFile)
+	if not eventMeta:
+		pyRootPwa.utils.printErr("could not read event file '" + eventFileName + "'.")
+		eventFile.Close()
+		return None
+	if variableName not in eventMeta.additionalSavedVariableLables():
+		pyRootPwa.utils.printErr("event file '" + eventFileName + "' does not contain variable '" + variableName + "'.")
+		eventFile.Close()
+		return None
+	eventTree = eventMeta.eventTree()
+	if nmbEvents < 0:
+		nmbEvents = eventTree.GetEntries() - firstEvent
+	if firstEvent + nmbEvents > eventTree.GetEntries():
+		pyRootPwa.utils.printErr("event file '" + eventFileName + "' contains only " + str(eventTree.GetEntries()) + " events.")
+		eventFile.Close()
+		return None
+	# TTree::Draw loops over the events in compiled code
+	eventTree.SetEstimate(nmbEvents + 1)
+	nmbValues = eventTree.Draw(variableName, "", "goff", nmbEvents, firstEvent)
+	if nmbValues != nmbEvents:
+		pyRootPwa.utils.printErr("could not read variable '" + variableName + "' from event file '" + eventFileName + "'.")
+		eventFile.Close()
+		return None
+	drawnValues = eventTree.GetV1()
+	values = [ drawnValues[i] for i in xrange(nmbValues) ]
+	eventFile.Close()
+	return values
+
+
+def calcIntegralsWithAcceptance(integralFileName, accIntegralFileName, ampFileNameList, eventFileName, acceptanceVariable,
+                                maxNmbEvents=0, weightFileName=""):
+	# integrates the amplitudes of generated events and, in the same pass,
+	# the amplitudes weighted with the acceptance of the events, which is
+	# taken from an additional variable (flag or weight) in the event file.
+	# this replaces the calculation of amplitudes and integrals for a
+	# separate sample of accepted events
+	integralMatrix = pyRootPwa.core.ampIntegralMatrix()
+	accIntegralMatrix = pyRootPwa.core.ampIntegralMatrix()
+	for fileName in (integralFileName, accIntegralFileName):
+		if os.path.exists(fileName):
+			pyRootPwa.utils.printErr("output file '" + fileName + "' exists. Aborting...")
+			return False
+	(ampFiles, ampMetas) = _openAmplitudeFiles(ampFileNameList)
+	if not ampMetas:
+		pyRootPwa.utils.printErr("could not read amplitude files. Aborting...")
+		return False
+	# the amplitudes of shard files start at the first event of the shard
+	shardRange = amplitudeShardFileRange(ampFileNameList[ampMetas[0].objectBaseName()])
+	acceptance = readEventVariable(eventFileName, acceptanceVariable, shardRange[0] if shardRange else 0, ampMetas[0].nmbAmplitudes())
+	if acceptance is None:
+		pyRootPwa.utils.printErr("could not read acceptance of the events. Aborting...")
+		return False
+	if not integralMatrix.integrateWithAcceptance(ampMetas, acceptance, accIntegralMatrix, maxNmbEvents, weightFileName):
+		pyRootPwa.utils.printErr("could not run integration. Aborting...")
+		del ampFiles
+		return False
+	# both integrals cover the same range of events
+	integralMetas = []
+	for (matrix, variable) in ((integralMatrix, ""), (accIntegralMatrix, acceptanceVariable)):
+		integralMetaData = _integralMetadata(matrix, ampMetas, ampFileNameList, 0, integralMatrix.nmbEvents(), variable)
+		if not integralMetaData:
+			pyRootPwa.utils.printErr("could not create integral metadata. Aborting...")
+			return False
+		integralMetas.append(integralMetaData)
+	del ampFiles
+	for (fileName, integralMetaData) in zip((integralFileName, accIntegralFileName), integralMetas):
+		outputFile = ROOT.TFile.Open(fileName, "NEW")
+		if not outputFile:
+			pyRootPwa.utils.printErr("cannot open output file '" + fileName + "'. Aborting...")
+			return False
+		if not integralMetaData.writeToFile(outputFile):
+			pyRootPwa.utils.printErr("could not write integral objects to file. Aborting...")
+			outputFile.Close()
+			return False
+		outputFile.Close()
+	return True
+
+
+def mergeIntegralFiles(inputFileNames, outputFileName):
+	# merges integral files of the same waves over disjoint event ranges, e.g.
+	# from parallel calcIntegrals jobs, into one integral file
+	if not inputFileNames:
+		pyRootPwa.utils.printErr("no integral files to merge given.")
+		return False
+	outputFile = ROOT.TFile.Open(outputFileName, "NEW")
+	if not outputFile:
+		pyRootPwa.utils.printErr("cannot open output file '" + outputFileName + "'.")
+		return False
+	def removeOutputFile():
+		outputFile.Close()
+		os.remove(outputFileName)
+	inputFiles = []
+	mergedMeta = None
+	for inputFileName in inputFileNames:
+		inputFile = ROOT.TFile.Open(inputFileName, "READ")
+		if not inputFile:
+			pyRootPwa.utils.printErr("could not open integral file '" + inputFileName + "'.")
+			removeOutputFile()
+			return False
+		inputFiles.append(inputFile)
+		integralMeta = pyRootPwa.core.ampIntegralMatrixMetadata.readIntegralFile(inputFile)
+		if not integralMeta:
+			pyRootPwa.utils.printErr("could not read integral file '" + inputFileName + "'.")
+			removeOutputFile()
+			return False
+		if integralMeta.acceptanceVariable():
+			pyRootPwa.utils.printErr("integral file '" + inputFileName + "' of accepted events is weighted with acceptance variable '"
+			                         + integralMeta.acceptanceVariable() + "' and cannot be merged.")
+			removeOutputFile()
+			return False
+		if mergedMeta is None:
+			mergedMeta = integralMeta
+		elif not mergedMeta.mergeIntegralMatrix(integralMeta):
+			pyRootPwa.utils.printErr("could not merge integral file '" + inputFileName + "'.")
+			removeOutputFile()
+			return False
+	if not mergedMeta.writeToFile(outputFile):
+		pyRootPwa.utils.printErr("could not write merged integral to file '" + outputFileName + "'.")
+		removeOutputFile()
+		return False
+	outputFile.Close()
+	return True
+
+
+def _unionBinningMap(binningMaps):
+	# returns the binning map of the union of the bins or None if the bins
+	# overlap or do not fill a box without gaps
+	binningVariables = sorted(binningMaps[0].keys())
+	for binningMap in binningMaps[1:]:
+		if sorted(binningMap.keys()) != binningVariables:
+			pyRootPwa.utils.printErr("bins have different binning variables.")
+			return None
+	unionMap = {}
+	for binningVariable in binningVariables:
+		unionMap[binningVariable] = (min(binningMap[binningVariable][0] for binningMap in binningMaps),
+		                             max(binningMap[binningVariable][1] for binningMap in binningMaps))
+	def volume(binningMap):
+		result = 1.
+		for binningVariable in binningVariables:
+			result *= binningMap[binningVariable][1] - binningMap[binningVariable][0]
+		return result
+	for i in range(len(binningMaps)):
+		for j in range(i + 1, len(binningMaps)):
+			overlap = True
+			for binningVariable in binningVariables:
+				if binningMaps[i][binningVariable][1] <= binningMaps[j][binningVariable][0] \
+				   or binningMaps[j][binningVariable][1] <= binningMaps[i][binningVariable][0]:
+					overlap = False
+					break
+			if overlap:
+				pyRootPwa.utils.printErr("bins " + str(binningMaps[i]) + " and " + str(binningMaps[j]) + " overlap.")
+				return None
+	# non-overlapping bins fill their bounding box if their volumes add up to its volume
+	unionVolume = volume(unionMap)
+	if abs(sum(volume(binningMap) for binningMap in binningMaps) - unionVolume) > 1e-9 * abs(unionVolume):
+		pyRootPwa.utils.printErr("bins do not fill the range " + str(unionMap) + " without gaps.")
+		return None
+	return unionMap
+
+
+def rebinIntegralFiles(inputFileNames, outputFileName):
+	# combines the integral files of adjacent bins into the integral of the
+	# union bin. the events of all bins are summed up, i.e. the integrals are
+	# weighted with their numbers of events, which assumes that the Monte
+	# Carlo events of all bins were generated with the same density in phase
+	# space, e.g. by splitting one sample into the bins
+	binningMaps = []
+	for inputFileName in inputFileNames:
+		inputFile = ROOT.TFile.Open(inputFileName, "READ")
+		if not inputFile:
+			pyRootPwa.utils.printErr("could not open integral file '" + inputFileName + "'.")
+			return False
+		integralMeta = pyRootPwa.core.ampIntegralMatrixMetadata.readIntegralFile(inputFile)
+		if not integralMeta:
+			pyRootPwa.utils.printErr("could not read integral file '" + inputFileName + "'.")
+			inputFile.Close()
+			return False
+		binningMaps.append(integralMeta.binningMap())
+		inputFile.Close()
+	unionMap = _unionBinningMap(binningMaps)
+	if unionMap is None:
+		pyRootPwa.utils.printErr("integral files cannot be combined into one bin.")
+		return False
+	if not mergeIntegralFiles(inputFileNames, outputFileName):
+		return False
+	pyRootPwa.utils.printInfo("combined " + str(len(inputFileNames)) + " integral files into bin " + str(unionMap) + ".")
+	return True
+
+
+def _integralAcceptanceVariable(integralFileName):
+	# returns the acceptance variable the integral was weighted with ("" if
+	# none) or None if the integral file cannot be read
+	integralFile = ROOT.TFile.Open(integralFileName, "READ")
+	if not integralFile:
+		return None
+	integralMeta = pyRootPwa.core.ampIntegralMatrixMetadata.readIntegralFile(integralFile)
+	acceptanceVariable = integralMeta.acceptanceVariable() if integralMeta else None
+	integralFile.Close()
+	return acceptanceVariable
+
+
+def updateIntegralFile(integralFileName, ampFileNameList, weightFileName="", outputFileName=""):
+	# adds the events of the amplitude files, e.g. of newly generated MC events,
+	# to an existing integral file; only the new events are integrated. the
+	# integral file is replaced if no outputFileName is given
+	replace = not outputFileName
+	(stem, ext) = os.path.splitext(outputFileName if outputFileName else integralFileName)
+	updateFileName = stem + ".update" + ext
+	mergedFileName = stem + ".merged" + ext if replace else outputFileName
+	for fileName in (updateFileName, mergedFileName):
+		if os.path.exists(fileName):
+			pyRootPwa.utils.printErr("file '" + fileName + "' exists. Aborting...")
+			return False
+	acceptanceVariable = _integralAcceptanceVariable(integralFileName)
+	if acceptanceVariable is None:
+		pyRootPwa.utils.printErr("could not read integral file '" + integralFileName + "'. Aborting...")
+		return False
+	if acceptanceVariable:
+		# the new events would have to be weighted with their acceptance as well
+		pyRootPwa.utils.printErr("integral file '" + integralFileName + "' of accepted events is weighted with acceptance variable '"
+		                         + acceptanceVariable + "' and cannot be updated. Aborting...")
+		return False
+	if not calcIntegrals(updateFileName, ampFileNameList, 0, weightFileName):
+		pyRootPwa.utils.printErr("could not integrate the new events. Aborting...")
+		if os.path.exists(updateFileName):
+			os.remove(updateFileName)
+		return False
+	success = mergeIntegralFiles([ integralFileName, updateFileName ], mergedFileName)
+	os.remove(updateFileName)
+	if not success:
+		pyRootPwa.utils.printErr("could not add the new events to integral file '" + integralFileName + "'. Aborting...")
+		return False
+	if replace:
+		os.rename(mergedFileName, integralFileName)
+	return True
+
+
+def _contiguousEventRange(integralMeta, integralFileName):
+	# returns the content hash of the event file and the range [first, stop)
+	# of the events of the integral or (None, None) if they are not a single
+	# range of events of one file
+	eventRanges = integralMeta.eventRanges()
+	if len(eventRanges) != 1:
+		pyRootPwa.utils.printErr("adding waves to integrals over more than one event file not implemented at the moment.")
+		return (None, None)
+	(eventContentHash, ranges) = eventRanges[0]
+	# the ranges of merged integrals have to join up to a single range
+	ranges = sorted(ranges)
+	for i in range(1, len(ranges)):
+		if ranges[i][0] != ranges[i - 1][1]:
+			pyRootPwa.utils.printErr("events of integral file '" + integralFileName + "' are not contiguous.")
+			return (None, None)
+	return (eventContentHash, (ranges[0][0], ranges[-1][1]))
+
+
+def _openAmplitudeFilesOfIntegral(integralMeta, ampFileNameList, waveNames, eventContentHash):
+	# opens the amplitude files of the waves like _openAmplitudeFiles and
+	# checks that they were calculated from the events of the integral
+	(ampFiles, ampMetas) = _openAmplitudeFiles(collections.OrderedDict((waveName, ampFileNameList[waveName]) for waveName in waveNames))
+	if not ampMetas:
+		return (None, None)
+	integralHashes = integralMeta.getKeyAmplitudeHashes()
+	integralMatrix = integralMeta.getAmpIntegralMatrix()
+	for (waveName, ampMeta) in zip(waveNames, ampMetas):
+		ampFileName = ampFileNameList[waveName]
+		eventMetas = ampMeta.eventMetadata()
+		if len(eventMetas) != 1 or eventMetas[0].contentHash() != eventContentHash:
+			pyRootPwa.utils.printErr("amplitude file '" + ampFileName + "' was not calculated from the events of the integral.")
+			return (None, None)
+		if integralMatrix.containsWave(waveName) and not ampMeta.contentHash() in integralHashes:
+			# e.g. if the amplitudes were recalculated for a different range of events
+			pyRootPwa.utils.printWarn("amplitudes in file '" + ampFileName + "' differ from those the integral was calculated with.")
+	return (ampFiles, ampMetas)
+
+
+def addWavesToIntegralFile(integralFileName, ampFileNameList, weightFileName="", outputFileName=""):
+	# adds the waves of the amplitude files that are not yet in the integral
+	# file; only the matrix elements involving a new wave are calculated. the
+	# amplitude files have to cover the events of the integral, also for the
+	# waves already in it. the integral file is replaced if no outputFileName
+	# is given
+	replace = not outputFileName
+	if replace:
+		(stem, ext) = os.path.splitext(integralFileName)
+		outputFileName = stem + ".addWaves" + ext
+	if os.path.exists(outputFileName):
+		pyRootPwa.utils.printErr("file '" + outputFileName + "' exists. Aborting...")
+		return False
+	integralFile = ROOT.TFile.Open(integralFileName, "READ")
+	if not integralFile:
+		pyRootPwa.utils.printErr("could not open integral file '" + integralFileName + "'. Aborting...")
+		return False
+	integralMeta = pyRootPwa.core.ampIntegralMatrixMetadata.readIntegralFile(integralFile)
+	if not integralMeta:
+		pyRootPwa.utils.printErr("could not read integral file '" + integralFileName + "'. Aborting...")
+		return False
+	if integralMeta.acceptanceVariable():
+		pyRootPwa.utils.printErr("cannot add waves to integral file '" + integralFileName + "' of accepted events weighted with "
+		                         + "acceptance variable '" + integralMeta.acceptanceVariable() + "'. Aborting...")
+		return False
+	integralMatrix = integralMeta.getAmpIntegralMatrix()
+	oldWaveNames = [ integralMatrix.waveName(i) for i in range(integralMatrix.nmbWaves()) ]
+	missingWaveNames = [ waveName for waveName in oldWaveNames if waveName not in ampFileNameList ]
+	if missingWaveNames:
+		pyRootPwa.utils.printErr("no amplitude files given for waves '" + "', '".join(missingWaveNames) + "' of the integral. Aborting...")
+		return False
+	newWaveNames = sorted([ waveName for waveName in ampFileNameList if waveName not in oldWaveNames ])
+	if not newWaveNames:
+		pyRootPwa.utils.printInfo("integral file '" + integralFileName + "' already contains all waves.")
+		return True
+	(eventContentHash, eventRange) = _contiguousEventRange(integralMeta, integralFileName)
+	if eventContentHash is None:
+		pyRootPwa.utils.printErr("cannot add waves to integral file '" + integralFileName + "'. Aborting...")
+		return False
+	(ampFiles, ampMetas) = _openAmplitudeFilesOfIntegral(integralMeta, ampFileNameList, oldWaveNames + newWaveNames, eventContentHash)
+	if not ampMetas:
+		pyRootPwa.utils.printErr("could not read amplitude files. Aborting...")
+		return False
+	# the amplitudes of shard files start at the first event of the shard
+	shardRange = amplitudeShardFileRange(ampFileNameList[oldWaveNames[0]])
+	startEvent = eventRange[0] - (shardRange[0] if shardRange else 0)
+	if startEvent < 0:
+		pyRootPwa.utils.printErr("amplitude files do not contain the events of the integral. Aborting...")
+		return False
+	# the precision is not stored with the matrix; the matrix keeps the
+	# larger of the precisions of the existing and of the new elements
+	integralMatrix.setPrecision(integralMeta.precision())
+	if not integralMatrix.addWaves(ampMetas, weightFileName, startEvent):
+		pyRootPwa.utils.printErr("could not add waves to integral matrix. Aborting...")
+		return False
+	integralMeta.setPrecision(integralMatrix.precision())
+	for ampMeta in ampMetas[len(oldWaveNames):]:
+		integralMeta.addKeyFileContent(ampMeta.keyfileContent())
+		if not integralMeta.addAmplitudeHash(ampMeta.contentHash()):
+			pyRootPwa.utils.printWarn("could not add the amplitude hash.")
+	del ampFiles
+	outputFile = ROOT.TFile.Open(outputFileName, "NEW")
+	if not outputFile:
+		pyRootPwa.utils.printErr("cannot open output file '" + outputFileName + "'. Aborting...")
+		return False
+	success = integralMeta.writeToFile(outputFile)
+	outputFile.Close()
+	integralFile.Close()
+	if not success:
+		pyRootPwa.utils.printErr("could not write integral objects to file. Aborting...")
+		os.remove(outputFileName)
+		return False
+	if replace:
+		os.rename(outputFileName, integralFileName)
+	return True
+
+
+def isIntegralFileUpToDate(integralFileName, ampFileNameList, maxNmbEvents=0, targetPrecision=0.):
+	# returns whether the integral file exists and was calculated from exactly
+	# the waves and amplitudes of the amplitude files over the events that
+	# calcIntegrals() would integrate with maxNmbEvents and targetPrecision,
+	# comparing the content hashes of the amplitudes and the event ranges with
+	# those stored in the integral metadata. returns None if the integral
+	# covers more events than that, e.g. after events were added with
+	# updateIntegralFile(), so that it must not be replaced. changes of the MC
+	# weights are not detected
+	if not os.path.isfile(integralFileName):
+		return False
+	integralFile = ROOT.TFile.Open(integralFileName, "READ")
+	if not integralFile:
+		return False
+	integralMeta = pyRootPwa.core.ampIntegralMatrixMetadata.readIntegralFile(integralFile, True)
+	if not integralMeta:
+		integralFile.Close()
+		return False
+	integralMatrix = integralMeta.getAmpIntegralMatrix()
+	waveNames = set(integralMatrix.waveName(i) for i in range(integralMatrix.nmbWaves()))
+	integralNmbEvents = integralMeta.nmbProcessedEvents()
+	integralHashes = set(integralMeta.getKeyAmplitudeHashes())
+	allZeroHash = integralMeta.allZeroHash()
+	precision = integralMeta.precision()
+	eventRanges = integralMeta.eventRanges()
+	integralFile.Close()
+	if waveNames != set(ampFileNameList.keys()):
+		return False
+	(ampFiles, ampMetas) = _openAmplitudeFiles(ampFileNameList)
+	if not ampMetas:
+		return False
+	ampHashes = set(ampMeta.contentHash() for ampMeta in ampMetas)
+	eventMetas = ampMetas[0].eventMetadata()
+	eventContentHash = eventMetas[0].contentHash() if len(eventMetas) == 1 else None
+	nmbEvents = ampMetas[0].nmbAmplitudes()
+	del ampFiles
+	if maxNmbEvents > 0:
+		nmbEvents = min(nmbEvents, maxNmbEvents)
+	if integralNmbEvents > nmbEvents:
+		return None
+	# the integral has to cover the events [firstEvent, firstEvent + nmbEvents)
+	# or, with a target precision, their beginning if it reached the precision
+	if len(eventRanges) != 1 or eventRanges[0][0] != eventContentHash:
+		return False
+	ranges = sorted(eventRanges[0][1])
+	for i in range(1, len(ranges)):
+		if ranges[i][0] != ranges[i - 1][1]:
+			return False
+	# the amplitudes of shard files start at the first event of the shard
+	shardRange = amplitudeShardFileRange(ampFileNameList[ampMetas[0].objectBaseName()])
+	firstEvent = shardRange[0] if shardRange else 0
+	if ranges[0][0] != firstEvent or ranges[-1][1] - ranges[0][0] != integralNmbEvents:
+		return False
+	if integralNmbEvents != nmbEvents and not (targetPrecision > 0. and 0. < precision <= targetPrecision):
+		return False
+	# amplitudes which are zero for all events may not be stored in the hashes
+	return integralHashes == ampHashes or integralHashes == ampHashes - set([allZeroHash])
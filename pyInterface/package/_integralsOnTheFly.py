@@ -1,4 +1,3 @@
-import numpy
 import pyRootPwa.utils
 import pyRootPwa.core
 
@@ -25,45 +24,19 @@ def _getAmplitudes(keyFileNameList, prodNames, decayNames, integralMetaData):
 	return amplitudes, waveNames
 
 
-def _integrate(amplitudes, eventTree, waveNames, minEvent, maxEvent, binningMap):
-	prodKinMomenta  = pyRootPwa.ROOT.TClonesArray("TVector3")
-	decayKinMomenta = pyRootPwa.ROOT.TClonesArray("TVector3")
-	eventTree.SetBranchAddress(pyRootPwa.core.eventMetadata.productionKinematicsMomentaBranchName, prodKinMomenta)
-	eventTree.SetBranchAddress(pyRootPwa.core.eventMetadata.decayKinematicsMomentaBranchName, decayKinMomenta)
+def _integrate(amplitudes, eventMeta, waveNames, minEvent, maxEvent, binningMap):
+	# the event loop, the binning cut and the summation run in compiled code
 	integralMatrix = pyRootPwa.core.ampIntegralMatrix()
-	hashers = [pyRootPwa.core.hashCalculator() for _ in range(len(amplitudes))]
-	integralMatrix.setWaveNames(waveNames)
-	ampWaveNameMap   = {}
-	binningVariables = {}
-	for key in binningMap:
-		binningVariables[key] = numpy.array(1, dtype = float)
-		eventTree.SetBranchAddress(key, binningVariables[key])
-	for waveName in waveNames:
-		ampWaveNameMap[waveName] = 0.+0.j
+	if not integralMatrix.setWaveNames(waveNames):
+		pyRootPwa.utils.printErr("could not set wave names of integral matrix. Aborting...")
+		return False, False
 	pyRootPwa.utils.printInfo("starting event loop.")
-	skippedEvents = 0
-	progressBar = pyRootPwa.utils.progressBar(minEvent, maxEvent)
-	progressBar.start()
-	for evt_i in range(minEvent, maxEvent):
-		progressBar.update(evt_i)
-		eventTree.GetEvent(evt_i)
-		for key in binningMap:
-			if binningVariables[key] < binningMap[key][0] or  binningVariables[key] >= binningMap[key][1]:
-				skippedEvents += 1
-				continue
-		for amp_i, amplitude in enumerate(amplitudes):
-			topo = amplitude.decayTopology()
-			if not topo.readKinematicsData(prodKinMomenta, decayKinMomenta):
-				pyRootPwa.utils.printErr("could not load kinematics data. Aborting...")
-				return False, False
-			ampl = amplitude()
-			hashers[amp_i].Update(ampl)
-			ampWaveNameMap[waveNames[amp_i]] = ampl
-		if not integralMatrix.addEvent(ampWaveNameMap):
-			pyRootPwa.utils.printErr("could not add event to integral matrix. Aborting...")
-			return False, False
-	pyRootPwa.utils.printInfo(str(skippedEvents) + " events rejected because they are outside the binning.")
-	return integralMatrix, hashers
+	ampHashes = pyRootPwa.core.calcIntegralOnTheFly(integralMatrix, eventMeta, amplitudes, binningMap,
+	                                                maxNmbEvents = maxEvent - minEvent, startEvent = minEvent)
+	if ampHashes is None:
+		pyRootPwa.utils.printErr("could not calculate integral matrix. Aborting...")
+		return False, False
+	return integralMatrix, ampHashes
 
 
 def calcIntegralsOnTheFly(integralFileName, eventFileName, keyFileNameList, binningMap = None, maxNmbEvents = -1, startEvent = 0):
@@ -102,15 +75,18 @@ def calcIntegralsOnTheFly(integralFileName, eventFileName, keyFileNameList, binn
 		if binningMap["mass"][0] > 200.:
 			binningMap["mass"] = (binningMap["mass"][0]/1000.,binningMap["mass"][1]/1000.)
 	metadataObject.setBinningMap(binningMap)
-	integralMatrix, hashers = _integrate(amplitudes, eventTree, waveNames, minEvent, maxEvent, binningMap)
-	if not integralMatrix or not hashers:
+	if maxEvent <= minEvent:
+		pyRootPwa.utils.printErr("no events in range [" + str(minEvent) + ", " + str(maxEvent) + "). Aborting...")
+		return False
+	integralMatrix, ampHashes = _integrate(amplitudes, eventMeta, waveNames, minEvent, maxEvent, binningMap)
+	if not integralMatrix or not ampHashes:
 		pyRootPwa.utils.printErr("could not integrate. Aborting...")
 		return False
 	if not metadataObject.setAmpIntegralMatrix(integralMatrix):
 		pyRootPwa.utils.printErr("could not add the integral matrix to the metadata object. Aborting...")
 		return False
-	for hasher in hashers:
-		if not metadataObject.addAmplitudeHash(hasher.hash()):
+	for ampHash in ampHashes:
+		if not metadataObject.addAmplitudeHash(ampHash):
 			pyRootPwa.utils.printWarn("could not add the amplitude hash.")
 			# This error is not fatal, since in special cases the same hash can appear twice:
 			# e.g. in freed-isobar analyses with spin zero, the angular dependences are constant
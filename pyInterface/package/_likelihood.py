@@ -10,10 +10,15 @@ def initLikelihood(waveDescThres,
                    cauchy = False,
                    cauchyWidth = 0.5,
                    rank = 1,
-                   verbose = False
+                   verbose = False,
+                   ioMonitor = None,
+                   nmbThreads = 1
                   ):
+	# nmbThreads gives the number of threads for the event loops of the
+	# likelihood (0 for the number of cores)
 	likelihood = pyRootPwa.core.pwaLikelihood()
 	likelihood.useNormalizedAmps(True)
+	likelihood.setNmbThreads(nmbThreads)
 	if not verbose:
 		likelihood.setQuiet()
 	if cauchy:
@@ -40,6 +45,10 @@ def initLikelihood(waveDescThres,
 		return None
 	accIntFile.Close()
 
+	# the amplitudes of all waves are added at once, so that they are read in
+	# parallel by nmbThreads threads
+	ampFiles = []
+	metas = []
 	for wave in waveDescThres:
 		waveName = wave[0]
 		ampFileName = ampFileList[waveName]
@@ -51,11 +60,21 @@ def initLikelihood(waveDescThres,
 		if not meta:
 			pyRootPwa.utils.printErr("could not get metadata for waveName '" + waveName + "'.")
 			return None
-		if not likelihood.addAmplitude([meta]):
-			pyRootPwa.utils.printErr("could not add amplitude '" + waveName + "'. Aborting...")
-			return None
+		ampFiles.append(ampFile)
+		metas.append([meta])
+	if not likelihood.addAmplitudes(metas):
+		pyRootPwa.utils.printErr("could not add amplitudes. Aborting...")
+		return None
+	if ioMonitor:
+		for meta in metas:
+			if meta[0].amplitudeTree():
+				ioMonitor.collectTree(meta[0].amplitudeTree())
+	for ampFile in ampFiles:
+		ampFile.Close()
 	if not likelihood.finishInit():
 		pyRootPwa.utils.printErr("could not finish initialization of likelihood. Aborting...")
 		return None
+	if ioMonitor:
+		ioMonitor.nmbEvents = likelihood.nmbEvents()
 
 	return likelihood
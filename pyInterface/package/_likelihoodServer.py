@@ -0,0 +1,428 @@
+import collections
+import cPickle
+import errno
+import hashlib
+import os
+import socket
+import stat
+import struct
+import threading
+
+import numpy
+
+import pyRootPwa.core
+import pyRootPwa.utils
+from _likelihood import initLikelihood
+ROOT = pyRootPwa.utils.ROOT
+
+
+def _sendMessage(connection, message):
+	# messages are pickled objects preceded by their length
+	data = cPickle.dumps(message, cPickle.HIGHEST_PROTOCOL)
+	connection.sendall(struct.pack("!Q", len(data)) + data)
+
+
+def _receiveBytes(connection, nmbBytes):
+	chunks = []
+	while nmbBytes > 0:
+		chunk = connection.recv(min(nmbBytes, 1 << 20))
+		if not chunk:
+			return None
+		chunks.append(chunk)
+		nmbBytes -= len(chunk)
+	return "".join(chunks)
+
+
+def _receiveMessage(connection):
+	# returns None if the connection was closed
+	header = _receiveBytes(connection, 8)
+	if header is None:
+		return None
+	data = _receiveBytes(connection, struct.unpack("!Q", header)[0])
+	if data is None:
+		return None
+	return cPickle.loads(data)
+
+
+def _matrixToList(matrix):
+	return [ [ matrix[i][j] for j in xrange(matrix.GetNcols()) ] for i in xrange(matrix.GetNrows()) ]
+
+
+def _listToMatrix(values):
+	matrix = ROOT.TMatrixD(len(values), len(values[0]) if values else 0)
+	for i in xrange(len(values)):
+		for j in xrange(len(values[i])):
+			matrix[i][j] = values[i][j]
+	return matrix
+
+
+def _listToVector(values):
+	vector = ROOT.TVectorD(len(values))
+	for i in xrange(len(values)):
+		vector[i] = values[i]
+	return vector
+
+
+def likelihoodConfiguration(waveDescThres,
+                            massBinCenter,
+                            ampFileList,
+                            normIntegralFileName,
+                            accIntegralFileName,
+                            accEventsOverride = 0,
+                            cauchy = False,
+                            cauchyWidth = 0.5,
+                            rank = 1
+                           ):
+	# describes the likelihood built by initLikelihood() with the same
+	# arguments; the wave descriptions are replaced by the contents of their
+	# key files and all paths are absolute, so that the configuration can be
+	# sent to a likelihood server
+	waveNames = [ waveName for (waveName, _, _) in waveDescThres ]
+	return { "waves":                [ (waveName, waveDesc.keyFileContent(), float(threshold)) for (waveName, waveDesc, threshold) in waveDescThres ],
+	         "massBinCenter":        float(massBinCenter),
+	         "ampFileList":          dict((waveName, os.path.abspath(ampFileList[waveName])) for waveName in waveNames),
+	         "normIntegralFileName": os.path.abspath(normIntegralFileName),
+	         "accIntegralFileName":  os.path.abspath(accIntegralFileName),
+	         "accEventsOverride":    int(accEventsOverride),
+	         "cauchy":               bool(cauchy),
+	         "cauchyWidth":          float(cauchyWidth),
+	         "rank":                 int(rank) }
+
+
+class likelihoodServer(object):
+	# keeps likelihoods in memory and answers requests to evaluate them
+	#
+	# clients connect to a Unix socket and register the configuration of a
+	# likelihood (see likelihoodConfiguration()) once; the server returns a
+	# handle, with which the later requests refer to the likelihood. each
+	# configuration is loaded once and kept for later requests; if the
+	# estimated memory of the loaded likelihoods exceeds maxMemory bytes, the
+	# least recently used ones are dropped and reloaded when they are needed
+	# again. the input files are checked for changes when a configuration is
+	# registered and when its likelihood is reloaded, not for each request.
+	# each connection is served by its own thread, the requests themselves
+	# are handled one after the other. requests are unpickled, so the socket
+	# is accessible only for the user running the server.
+
+	def __init__(self, socketPath, maxMemory = 0, nmbThreads = 1, verbose = False):
+		self.socketPath = socketPath
+		self.maxMemory = maxMemory  # in bytes, 0 for unlimited memory
+		self.nmbThreads = nmbThreads
+		self.verbose = verbose
+		self._configurations = {}  # handle -> configuration
+		self._likelihoods = collections.OrderedDict()  # handle -> (likelihood, estimated memory in bytes), least recently used first
+		self._lock = threading.Lock()
+		self._running = False
+
+
+	@staticmethod
+	def key(configuration):
+		# the modification times and sizes of the input files are part of the
+		# key, so that a likelihood is reloaded if one of its files changed
+		hashor = hashlib.sha1()
+		hashor.update(repr(( configuration["waves"],
+		                     configuration["massBinCenter"],
+		                     sorted(configuration["ampFileList"].items()),
+		                     configuration["normIntegralFileName"],
+		                     configuration["accIntegralFileName"],
+		                     configuration["accEventsOverride"],
+		                     configuration["cauchy"],
+		                     configuration["cauchyWidth"],
+		                     configuration["rank"] )))
+		fileNames = sorted(configuration["ampFileList"].values()) + [ configuration["normIntegralFileName"],
+		                                                              configuration["accIntegralFileName"] ]
+		for fileName in fileNames:
+			fileStat = os.stat(fileName)
+			hashor.update(repr((fileName, fileStat.st_mtime, fileStat.st_size)))
+		return hashor.hexdigest()
+
+
+	@staticmethod
+	def estimateMemory(likelihood):
+		# the decay amplitudes dominate the memory of a likelihood
+		return likelihood.nmbEvents() * likelihood.nmbWaves() * 16
+
+
+	def memory(self):
+		return sum(memory for (_, memory) in self._likelihoods.values())
+
+
+	def register(self, configuration):
+		# returns the handle of the configuration; its key is used as handle
+		handle = likelihoodServer.key(configuration)
+		self._configurations[handle] = configuration
+		return handle
+
+
+	def likelihood(self, handle):
+		# returns the likelihood registered with the handle and loads it if needed
+		if handle in self._likelihoods:
+			# move to the end of the list of recently used likelihoods
+			entry = self._likelihoods.pop(handle)
+			self._likelihoods[handle] = entry
+			return entry[0]
+		if handle not in self._configurations:
+			pyRootPwa.utils.printErr("unknown likelihood handle '" + str(handle) + "'.")
+			return None
+		configuration = self._configurations[handle]
+		if likelihoodServer.key(configuration) != handle:
+			pyRootPwa.utils.printErr("input files of the likelihood changed since it was registered.")
+			return None
+		waveDescThres = []
+		for (waveName, keyFileContent, threshold) in configuration["waves"]:
+			waveDescs = pyRootPwa.core.waveDescription.parseKeyFileContent(keyFileContent)
+			if len(waveDescs) != 1:
+				pyRootPwa.utils.printErr("could not parse key file content of wave '" + waveName + "'.")
+				return None
+			waveDescThres.append( (waveName, waveDescs[0], threshold) )
+		pyRootPwa.utils.printInfo("loading likelihood with " + str(len(waveDescThres)) + " waves for mass bin center "
+		                          + str(configuration["massBinCenter"]) + " and rank " + str(configuration["rank"]) + ".")
+		likelihood = initLikelihood(waveDescThres = waveDescThres,
+		                            massBinCenter = configuration["massBinCenter"],
+		                            ampFileList = configuration["ampFileList"],
+		                            normIntegralFileName = configuration["normIntegralFileName"],
+		                            accIntegralFileName = configuration["accIntegralFileName"],
+		                            accEventsOverride = configuration["accEventsOverride"],
+		                            cauchy = configuration["cauchy"],
+		                            cauchyWidth = configuration["cauchyWidth"],
+		                            rank = configuration["rank"],
+		                            verbose = self.verbose,
+		                            nmbThreads = self.nmbThreads)
+		if not likelihood:
+			return None
+		self._likelihoods[handle] = (likelihood, likelihoodServer.estimateMemory(likelihood))
+		self.evict()
+		return likelihood
+
+
+	def evict(self):
+		# drops the least recently used likelihoods until the loaded ones fit
+		# into maxMemory; the most recently used one is always kept
+		if self.maxMemory <= 0:
+			return
+		while len(self._likelihoods) > 1 and self.memory() > self.maxMemory:
+			self._likelihoods.popitem(last = False)
+			pyRootPwa.utils.printInfo("dropped least recently used likelihood (memory now "
+			                          + str(self.memory() / 1024**2) + " MiB).")
+
+
+	def handleRequest(self, request):
+		command = request["command"]
+		if command == "register":
+			return self.register(request["configuration"])
+		likelihood = self.likelihood(request["handle"])
+		if not likelihood:
+			raise RuntimeError("could not load likelihood")
+		if command == "info":
+			return { "nmbPars":       likelihood.nmbPars(),
+			         "nmbParsFixed":  likelihood.nmbParsFixed(),
+			         "nmbEvents":     likelihood.nmbEvents(),
+			         "nmbWaves":      likelihood.nmbWaves(),
+			         "rank":          likelihood.rank(),
+			         "parNames":      [ likelihood.parName(i) for i in xrange(likelihood.nmbPars()) ],
+			         "parThresholds": [ likelihood.parThreshold(i) for i in xrange(likelihood.nmbPars()) ],
+			         "parFixed":      [ likelihood.parFixed(i) for i in xrange(likelihood.nmbPars()) ] }
+		if command == "evaluate":
+			return likelihood.DoEvalBatch(request["pars"])
+		if command == "gradient":
+			return likelihood.FdFBatch(request["pars"])
+		if command == "hessian":
+			return _matrixToList(likelihood.Hessian(request["pars"]))
+		if command == "hessianEigenVectors":
+			eigenVectors = likelihood.HessianEigenVectors(_listToMatrix(request["hessian"]))
+			return [ ([ vector[i] for i in xrange(vector.GetNrows()) ], value) for (vector, value) in eigenVectors ]
+		if command == "covariance":
+			if "hessian" in request:
+				return _matrixToList(likelihood.CovarianceMatrix(_listToMatrix(request["hessian"])))
+			return _matrixToList(likelihood.CovarianceMatrix(request["pars"]))
+		raise ValueError("unknown command '" + str(command) + "'")
+
+
+	def serve(self):
+		# serves requests until a client sends the 'shutdown' command
+		if os.path.exists(self.socketPath):
+			if not stat.S_ISSOCK(os.stat(self.socketPath).st_mode):
+				pyRootPwa.utils.printErr("'" + self.socketPath + "' exists and is not a socket.")
+				return False
+			probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+			try:
+				probe.connect(self.socketPath)
+				probe.close()
+				pyRootPwa.utils.printErr("another server is listening on socket '" + self.socketPath + "'.")
+				return False
+			except socket.error:
+				# left over by a server that was killed
+				os.remove(self.socketPath)
+		server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+		oldUmask = os.umask(0077)
+		try:
+			server.bind(self.socketPath)
+		finally:
+			os.umask(oldUmask)
+		server.listen(16)
+		# wake up regularly to check whether a shutdown was requested
+		server.settimeout(1.)
+		pyRootPwa.utils.printInfo("serving likelihoods on socket '" + self.socketPath + "'.")
+		self._running = True
+		try:
+			while self._running:
+				try:
+					(connection, _) = server.accept()
+				except socket.timeout:
+					continue
+				# the connection must not inherit the timeout of the server socket
+				connection.settimeout(None)  # pylint: disable=no-member
+				thread = threading.Thread(target = self.serveConnection, args = (connection, ))
+				thread.daemon = True
+				thread.start()
+		finally:
+			server.close()
+			os.remove(self.socketPath)
+		pyRootPwa.utils.printSucc("likelihood server shut down.")
+		return True
+
+
+	def serveConnection(self, connection):
+		try:
+			while True:
+				request = _receiveMessage(connection)
+				if request is None:
+					return
+				if request.get("command") == "shutdown":
+					self._running = False
+					_sendMessage(connection, { "result": None })
+					return
+				try:
+					with self._lock:
+						response = { "result": self.handleRequest(request) }
+				except Exception as exc:  # pylint: disable=broad-except
+					pyRootPwa.utils.printWarn("request '" + str(request.get("command")) + "' failed: " + str(exc))
+					response = { "error": str(exc) }
+				_sendMessage(connection, response)
+		except socket.error as exc:
+			if exc.errno != errno.EPIPE:
+				pyRootPwa.utils.printWarn("lost connection to client: " + str(exc))
+		finally:
+			connection.close()
+
+
+class likelihoodClient(object):
+	# evaluates a likelihood served by a likelihoodServer; provides the
+	# functions of pwaLikelihood that are used to evaluate a likelihood
+
+	def __init__(self, socketPath, configuration):
+		self._handle = None
+		self._connection = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+		self._connection.connect(socketPath)
+		# the configuration is sent only once, later requests refer to it by
+		# the handle returned by the server
+		self._handle = self.sendRequest("register", configuration = configuration)
+		# loads the likelihood on the server, if it is not loaded yet
+		self._info = self.sendRequest("info")
+
+
+	@staticmethod
+	def connect(socketPath, **kwargs):
+		# kwargs are the arguments of likelihoodConfiguration(); returns None
+		# if the server cannot be reached or cannot load the likelihood
+		try:
+			return likelihoodClient(socketPath, likelihoodConfiguration(**kwargs))
+		except (socket.error, IOError, OSError, RuntimeError) as exc:
+			pyRootPwa.utils.printWarn("could not get likelihood from server at '" + socketPath + "': " + str(exc))
+			return None
+
+
+	@staticmethod
+	def shutdownServer(socketPath):
+		connection = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+		connection.connect(socketPath)
+		_sendMessage(connection, { "command": "shutdown" })
+		_receiveMessage(connection)
+		connection.close()
+
+
+	def sendRequest(self, command, **kwargs):
+		request = dict(kwargs)
+		request["command"] = command
+		request["handle"] = self._handle
+		_sendMessage(self._connection, request)
+		response = _receiveMessage(self._connection)
+		if response is None:
+			raise IOError("connection to likelihood server was closed")
+		if "error" in response:
+			raise RuntimeError(response["error"])
+		return response["result"]
+
+
+	def close(self):
+		self._connection.close()
+
+
+	def nmbPars(self):
+		return self._info["nmbPars"]
+
+
+	def nmbParsFixed(self):
+		return self._info["nmbParsFixed"]
+
+
+	def nmbEvents(self):
+		return self._info["nmbEvents"]
+
+
+	def nmbWaves(self):
+		return self._info["nmbWaves"]
+
+
+	def rank(self):
+		return self._info["rank"]
+
+
+	def parName(self, parIndex):
+		return self._info["parNames"][parIndex]
+
+
+	def parThreshold(self, parIndex):
+		return self._info["parThresholds"][parIndex]
+
+
+	def parFixed(self, parIndex):
+		return self._info["parFixed"][parIndex]
+
+
+	# the following methods have the names of those of pwaLikelihood
+	# pylint: disable=invalid-name
+	def DoEval(self, pars):
+		return self.DoEvalBatch([ list(pars) ])[0]
+
+
+	def DoEvalBatch(self, pars):
+		return self.sendRequest("evaluate", pars = numpy.array(pars, dtype = numpy.float64, ndmin = 2))
+
+
+	def FdF(self, pars):
+		(values, gradients) = self.FdFBatch([ list(pars) ])
+		return (values[0], list(gradients[0]))
+
+
+	def FdFBatch(self, pars):
+		return self.sendRequest("gradient", pars = numpy.array(pars, dtype = numpy.float64, ndmin = 2))
+
+
+	def Gradient(self, pars):
+		return self.FdF(pars)[1]
+
+
+	def Hessian(self, pars):
+		return _listToMatrix(self.sendRequest("hessian", pars = [ float(par) for par in pars ]))
+
+
+	def HessianEigenVectors(self, hessian):
+		eigenVectors = self.sendRequest("hessianEigenVectors", hessian = _matrixToList(hessian))
+		return [ (_listToVector(vector), value) for (vector, value) in eigenVectors ]
+
+
+	def CovarianceMatrix(self, parsOrHessian):
+		if hasattr(parsOrHessian, "GetNcols"):
+			return _listToMatrix(self.sendRequest("covariance", hessian = _matrixToList(parsOrHessian)))
+		return _listToMatrix(self.sendRequest("covariance", pars = [ float(par) for par in parsOrHessian ]))
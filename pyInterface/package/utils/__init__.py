@@ -2,6 +2,7 @@
 from _printingUtils import *
 from _progressBar import progressBar
 from _silencer import silencer
+from _ioMonitor import ioMonitor, appendIoReport
 from _binningMapFromArgList import binningMapFromArgList
 from _fitTreeUtils import getFitResultFromFile, getBestFitResultsFromFile, getBestFitResultFromFile
 from _waveDescThresUtils import getWaveDescThresFromFitResult, getWaveDescThresFromWaveList
@@ -13,6 +14,7 @@ ROOT = _root.ROOT
 del _printingUtils
 del _progressBar
 del _silencer
+del _ioMonitor
 del _binningMapFromArgList
 del _fitTreeUtils
 del _waveDescThresUtils
@@ -0,0 +1,104 @@
+
+import json
+import os
+import socket
+import sys
+import time
+
+import _root
+ROOT = _root.ROOT
+
+
+class ioMonitor(object):
+	# collects I/O and timing figures of one job (wall-clock and CPU time,
+	# bytes and read calls from ROOT files, TTree cache efficiency and
+	# decompression time) into a dictionary that can be written to a report
+	#
+	# the byte counters of ROOT are process-wide, so a monitor only gives
+	# meaningful numbers if one job at a time is running in a process.
+	# amplitudes read from memory-mapped columnar data files do not go through
+	# ROOT and do not show up in the byte counters.
+
+	def __init__(self, jobName, **jobInfo):
+		self.record = { "job": jobName,
+		                "script": os.path.basename(sys.argv[0]),
+		                "host": socket.gethostname(),
+		                "pid": os.getpid() }
+		self.record.update(jobInfo)
+		self.nmbEvents = None
+		self._trees = []
+		self._perfStats = []
+		self._startTime = None
+		self._startTimes = None
+		self._startBytesRead = None
+		self._startReadCalls = None
+
+
+	def start(self):
+		self.record["timestamp"] = time.strftime("%Y-%m-%dT%H:%M:%S")
+		self._startTime = time.time()
+		self._startTimes = os.times()
+		self._startBytesRead = ROOT.TFile.GetFileBytesRead()
+		self._startReadCalls = ROOT.TFile.GetFileReadCalls()
+
+
+	def watchTree(self, tree):
+		# attaches a TTreePerfStats to the tree to measure the decompression
+		# time. ROOT supports only one TTreePerfStats per process at a time, so
+		# only the tree that dominates the I/O of the job should be watched.
+		# the objects are kept alive until the monitor is deleted, as the tree
+		# keeps a pointer to them
+		perfStats = ROOT.TTreePerfStats("ioMonitor_" + tree.GetName(), tree)
+		self._perfStats.append((tree.GetName(), perfStats))
+
+
+	def collectTree(self, tree):
+		# records the cache statistics of a tree after it has been read; has to
+		# be called before the file of the tree is closed
+		treeRecord = { "tree": tree.GetName(),
+		               "cacheSize": tree.GetCacheSize() }
+		treeFile = tree.GetCurrentFile()
+		cache = treeFile.GetCacheRead(tree) if treeFile else None
+		if cache:
+			treeRecord["cacheEfficiency"] = cache.GetEfficiency()
+			treeRecord["cacheEfficiencyRel"] = cache.GetEfficiencyRel()
+			treeRecord["cacheReadCalls"] = cache.GetReadCalls()
+		for (treeName, perfStats) in self._perfStats:
+			if treeName == tree.GetName():
+				perfStats.Finish()
+				treeRecord["bytesRead"] = perfStats.GetBytesRead()
+				treeRecord["readCalls"] = perfStats.GetReadCalls()
+				treeRecord["unzipTime"] = perfStats.GetUnzipTime()
+				treeRecord["diskTime"] = perfStats.GetDiskTime()
+		self._trees.append(treeRecord)
+
+
+	def stop(self):
+		if self._startTime is None:
+			raise RuntimeError("ioMonitor.stop() called before start().")
+		wallTime = time.time() - self._startTime
+		stopTimes = os.times()
+		self.record["wallTime"] = wallTime
+		self.record["cpuUser"] = stopTimes[0] - self._startTimes[0]
+		self.record["cpuSystem"] = stopTimes[1] - self._startTimes[1]
+		self.record["bytesRead"] = ROOT.TFile.GetFileBytesRead() - self._startBytesRead
+		self.record["readCalls"] = ROOT.TFile.GetFileReadCalls() - self._startReadCalls
+		if self.nmbEvents is not None:
+			self.record["nmbEvents"] = self.nmbEvents
+			self.record["eventsPerSecond"] = self.nmbEvents / wallTime if wallTime > 0. else None
+		if self._trees:
+			self.record["trees"] = self._trees
+			efficiencies = [ treeRecord["cacheEfficiency"] for treeRecord in self._trees if "cacheEfficiency" in treeRecord ]
+			if efficiencies:
+				self.record["meanCacheEfficiency"] = sum(efficiencies) / len(efficiencies)
+			unzipTimes = [ treeRecord["unzipTime"] for treeRecord in self._trees if "unzipTime" in treeRecord ]
+			if unzipTimes:
+				self.record["unzipTime"] = sum(unzipTimes)
+		return self.record
+
+
+def appendIoReport(reportFileName, records):
+	# appends the records as one JSON object per line
+	with open(reportFileName, "a") as reportFile:
+		for record in records:
+			reportFile.write(json.dumps(record, sort_keys = True) + "\n")
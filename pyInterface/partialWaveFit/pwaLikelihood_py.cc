@@ -67,6 +67,21 @@ namespace {
 	}
 
 
+	bool
+	pwaLikelihood_addAmplitudes(rpwa::pwaLikelihood<std::complex<double> >& self,
+	                            bp::list                                    pyMetas)
+	{
+		std::vector<std::vector<const rpwa::amplitudeMetadata*> > metas(bp::len(pyMetas));
+		for (unsigned int i = 0; i < metas.size(); ++i) {
+			if (not rpwa::py::convertBPObjectToVector<const rpwa::amplitudeMetadata*>(pyMetas[i], metas[i])){
+				PyErr_SetString(PyExc_TypeError, "could not extract vector of amplitude metadata");
+				bp::throw_error_already_set();
+			}
+		}
+		return self.addAmplitudes(metas);
+	}
+
+
 	bool
 	pwaLikelihood_addAccIntegral(rpwa::pwaLikelihood<std::complex<double> >& self,
 	                             PyObject*                                   pyAccMatrix,
@@ -125,6 +140,54 @@ namespace {
 	}
 
 
+	// reads the parameter arrays of several points from the rows of a
+	// two-dimensional numpy array
+	void
+	pwaLikelihood_parsFromNumpyArray(const rpwa::pwaLikelihood<std::complex<double> >& self,
+	                                 const bp::object&                                 pyPars,
+	                                 std::vector<double>&                              pars,
+	                                 size_t&                                           nmbPoints)
+	{
+		size_t nmbPar = 0;
+		if(not rpwa::py::convertNumpyArrayToDoubleMatrix(pyPars, pars, nmbPoints, nmbPar)) {
+			PyErr_SetString(PyExc_TypeError, "Got invalid input for pars when executing rpwa::pwaLikelihood::DoEvalBatch() or rpwa::pwaLikelihood::FdFBatch()");
+			bp::throw_error_already_set();
+		}
+		if(nmbPar != self.nmbPars()) {
+			PyErr_SetString(PyExc_ValueError, "Number of columns of pars does not match number of parameters of likelihood");
+			bp::throw_error_already_set();
+		}
+	}
+
+
+	bp::object
+	pwaLikelihood_DoEvalBatch(rpwa::pwaLikelihood<std::complex<double> >& self,
+	                          const bp::object&                           pyPars)
+	{
+		std::vector<double> pars;
+		size_t nmbPoints = 0;
+		pwaLikelihood_parsFromNumpyArray(self, pyPars, pars, nmbPoints);
+		std::vector<double> funcVals(nmbPoints, 0.);
+		self.DoEvalBatch(pars.data(), nmbPoints, funcVals.data());
+		return rpwa::py::convertDoubleVectorToNumpyArray(funcVals, nmbPoints);
+	}
+
+
+	bp::tuple
+	pwaLikelihood_FdFBatch(rpwa::pwaLikelihood<std::complex<double> >& self,
+	                       const bp::object&                           pyPars)
+	{
+		std::vector<double> pars;
+		size_t nmbPoints = 0;
+		pwaLikelihood_parsFromNumpyArray(self, pyPars, pars, nmbPoints);
+		std::vector<double> funcVals (nmbPoints, 0.);
+		std::vector<double> gradients(nmbPoints * self.nmbPars(), 0.);
+		self.FdFBatch(pars.data(), nmbPoints, funcVals.data(), gradients.data());
+		return bp::make_tuple(rpwa::py::convertDoubleVectorToNumpyArray(funcVals, nmbPoints),
+		                      rpwa::py::convertDoubleVectorToNumpyArray(gradients, nmbPoints, self.nmbPars()));
+	}
+
+
 	double
 	pwaLikelihood_DoDerivative(rpwa::pwaLikelihood<std::complex<double> >& self,
 	                           const bp::list&                             pyPar,
@@ -258,11 +321,14 @@ void rpwa::py::exportPwaLikelihood() {
 			   bp::arg("accEventsOverride") = 0)
 		)
 		.def("addAmplitude", ::pwaLikelihood_addAmplitude)
+		.def("addAmplitudes", ::pwaLikelihood_addAmplitudes)
 		.def("setOnTheFlyBinning", ::pwaLikelihood_setOnTheFlyBinning)
 		.def("finishInit", &rpwa::pwaLikelihood<std::complex<double> >::finishInit)
 		.def("Gradient", ::pwaLikelihood_Gradient)
 		.def("FdF", ::pwaLikelihood_FdF)
 		.def("DoEval", ::pwaLikelihood_DoEval)
+		.def("DoEvalBatch", ::pwaLikelihood_DoEvalBatch, (bp::arg("pars")))
+		.def("FdFBatch", ::pwaLikelihood_FdFBatch, (bp::arg("pars")))
 		.def("DoDerivative", ::pwaLikelihood_DoDerivative)
 		.def("Hessian", ::pwaLikelihood_Hessian)
 		.def("HessianEigenVectors", ::pwaLikelihood_HessianEigenVectors)
@@ -285,6 +351,8 @@ void rpwa::py::exportPwaLikelihood() {
 		.def("setPriorType", &rpwa::pwaLikelihood<std::complex<double> >::setPriorType)
 		.def("priorType", &rpwa::pwaLikelihood<std::complex<double> >::priorType)
 		.def("setCauchyWidth", &rpwa::pwaLikelihood<std::complex<double> >::setCauchyWidth)
+		.def("setNmbThreads", &rpwa::pwaLikelihood<std::complex<double> >::setNmbThreads, (bp::arg("nmbThreads") = 0))
+		.def("nmbThreads", &rpwa::pwaLikelihood<std::complex<double> >::nmbThreads)
 		.def(
 			"cauchyWidth"
 			, &rpwa::pwaLikelihood<std::complex<double> >::cauchyWidth
@@ -65,3 +65,112 @@ void rpwa::py::exportStlContainers() {
 		.def(bp::vector_indexing_suite<std::vector<rpwa::waveDescriptionPtr>, true>());
 
 }
+
+
+bp::object rpwa::py::convertComplexVectorToNumpyArray(const std::vector<std::complex<double> >& vector)
+{
+	bp::object numpy = bp::import("numpy");
+	if(vector.empty()) {
+		return numpy.attr("zeros")(0, numpy.attr("complex128"));
+	}
+	// the array keeps a reference to the byte array, which holds the only copy of the values
+	PyObject* byteArray = PyByteArray_FromStringAndSize(reinterpret_cast<const char*>(&vector[0]),
+	                                                    vector.size() * sizeof(std::complex<double>));
+	if(not byteArray) {
+		bp::throw_error_already_set();
+	}
+	return numpy.attr("frombuffer")(bp::object(bp::handle<>(byteArray)), numpy.attr("complex128"));
+}
+
+
+bool rpwa::py::convertNumpyArrayToComplexVector(const bp::object& pyArray, std::vector<std::complex<double> >& vector)
+{
+	bp::object array;
+	try {
+		// does not copy if the input already is a contiguous complex128 array
+		bp::object numpy = bp::import("numpy");
+		array = numpy.attr("ascontiguousarray")(pyArray, numpy.attr("complex128"));
+	} catch(const bp::error_already_set&) {
+		PyErr_Clear();
+		printWarn<<"cannot convert boost::python::object to numpy array of complex numbers."<<std::endl;
+		return false;
+	}
+	Py_buffer view;
+	if(PyObject_GetBuffer(array.ptr(), &view, PyBUF_C_CONTIGUOUS) < 0) {
+		PyErr_Clear();
+		printWarn<<"cannot get buffer of numpy array."<<std::endl;
+		return false;
+	}
+	if(view.len % sizeof(std::complex<double>) != 0) {
+		printWarn<<"size of buffer ("<<view.len<<" bytes) is not a multiple of the size of a complex number."<<std::endl;
+		PyBuffer_Release(&view);
+		return false;
+	}
+	const std::complex<double>* data = static_cast<const std::complex<double>*>(view.buf);
+	vector.assign(data, data + view.len / sizeof(std::complex<double>));
+	PyBuffer_Release(&view);
+	return true;
+}
+
+
+bp::object rpwa::py::convertDoubleVectorToNumpyArray(const std::vector<double>& vector,
+                                                     const size_t               nmbRows,
+                                                     const size_t               nmbColumns)
+{
+	bp::object numpy = bp::import("numpy");
+	bp::object array;
+	if(vector.empty()) {
+		array = numpy.attr("zeros")(0, numpy.attr("float64"));
+	} else {
+		// the array keeps a reference to the byte array, which holds the only copy of the values
+		PyObject* byteArray = PyByteArray_FromStringAndSize(reinterpret_cast<const char*>(&vector[0]),
+		                                                    vector.size() * sizeof(double));
+		if(not byteArray) {
+			bp::throw_error_already_set();
+		}
+		array = numpy.attr("frombuffer")(bp::object(bp::handle<>(byteArray)), numpy.attr("float64"));
+	}
+	if(nmbColumns == 0) {
+		return array;
+	}
+	return array.attr("reshape")(nmbRows, nmbColumns);
+}
+
+
+bool rpwa::py::convertNumpyArrayToDoubleMatrix(const bp::object&    pyArray,
+                                               std::vector<double>& vector,
+                                               size_t&              nmbRows,
+                                               size_t&              nmbColumns)
+{
+	bp::object array;
+	try {
+		// does not copy if the input already is a contiguous float64 array
+		bp::object numpy = bp::import("numpy");
+		array = numpy.attr("ascontiguousarray")(pyArray, numpy.attr("float64"));
+	} catch(const bp::error_already_set&) {
+		PyErr_Clear();
+		printWarn<<"cannot convert boost::python::object to numpy array of floating point numbers."<<std::endl;
+		return false;
+	}
+	const bp::tuple shape = bp::extract<bp::tuple>(array.attr("shape"));
+	if(bp::len(shape) == 1) {
+		nmbRows    = 1;
+		nmbColumns = bp::extract<size_t>(shape[0]);
+	} else if(bp::len(shape) == 2) {
+		nmbRows    = bp::extract<size_t>(shape[0]);
+		nmbColumns = bp::extract<size_t>(shape[1]);
+	} else {
+		printWarn<<"numpy array has "<<bp::len(shape)<<" dimensions, expected 1 or 2."<<std::endl;
+		return false;
+	}
+	Py_buffer view;
+	if(PyObject_GetBuffer(array.ptr(), &view, PyBUF_C_CONTIGUOUS) < 0) {
+		PyErr_Clear();
+		printWarn<<"cannot get buffer of numpy array."<<std::endl;
+		return false;
+	}
+	const double* data = static_cast<const double*>(view.buf);
+	vector.assign(data, data + nmbRows * nmbColumns);
+	PyBuffer_Release(&view);
+	return true;
+}
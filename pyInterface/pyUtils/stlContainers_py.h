@@ -1,6 +1,7 @@
 #ifndef STLCONTAINERS_PY_H
 #define STLCONTAINERS_PY_H
 
+#include <complex>
 #include <map>
 #include <set>
 #include <utility>
@@ -17,6 +18,28 @@ namespace rpwa {
 
 		void exportStlContainers();
 
+		// copies the values into a contiguous numpy.complex128 array (one memcpy,
+		// no Python object per value); numpy is imported only when called
+		boost::python::object convertComplexVectorToNumpyArray(const std::vector<std::complex<double> >& vector);
+
+		// reads a numpy array (or anything numpy can convert to a complex128 array)
+		// via the buffer protocol
+		bool convertNumpyArrayToComplexVector(const boost::python::object& pyArray, std::vector<std::complex<double> >& vector);
+
+		// copies nmbRows * nmbColumns values into a contiguous numpy.float64 array of
+		// that shape; a one-dimensional array is returned for nmbColumns == 0
+		boost::python::object convertDoubleVectorToNumpyArray(const std::vector<double>& vector,
+		                                                      const size_t               nmbRows,
+		                                                      const size_t               nmbColumns = 0);
+
+		// reads a two-dimensional numpy array (or anything numpy can convert to a
+		// float64 array) row by row via the buffer protocol; a one-dimensional
+		// array is read as a single row
+		bool convertNumpyArrayToDoubleMatrix(const boost::python::object& pyArray,
+		                                     std::vector<double>&         vector,
+		                                     size_t&                      nmbRows,
+		                                     size_t&                      nmbColumns);
+
 		template<typename T>
 		bool convertBPObjectToSet(const boost::python::object& pyList, std::set<T>& set) {
 			boost::python::extract<boost::python::list> getList(pyList);
@@ -17,7 +17,9 @@ namespace {
 	                                    const std::string&         keyfileContent,
 	                                    const std::string&         objectBasename,
 	                                    const int&                 splitlevel = 99,
-	                                    const int&                 buffsize = 256000)
+	                                    const int&                 buffsize = 256000,
+	                                    const bool&                columnar = false,
+	                                    const bool&                singlePrecision = false)
 	{
 		TFile* outputFile = rpwa::py::convertFromPy<TFile*>(pyOutputFile);
 		std::vector<const rpwa::eventMetadata*> eventMeta;
@@ -26,14 +28,18 @@ namespace {
 			PyErr_SetString(PyExc_TypeError, "Got invalid input for eventMetadata when executing rpwa::amplitudeFileWriter::initialize()");
 			bp::throw_error_already_set();
 		}
-		return self.initialize(*outputFile, eventMeta, keyfileContent, objectBasename, splitlevel, buffsize);
+		return self.initialize(*outputFile, eventMeta, keyfileContent, objectBasename, splitlevel, buffsize, columnar, singlePrecision);
 	}
 
 	void amplitudeFileWriter_addAmplitudes(rpwa::amplitudeFileWriter& self,
-	                                       bp::list pyAmplitudes)
+	                                       bp::object pyAmplitudes)
 	{
+		// accept lists as well as numpy arrays, the latter without creating a Python object per amplitude
 		std::vector<std::complex<double> > amplitudes;
-		if(not rpwa::py::convertBPObjectToVector<std::complex<double> >(pyAmplitudes, amplitudes))
+		const bool success = bp::extract<bp::list>(pyAmplitudes).check()
+		                     ? rpwa::py::convertBPObjectToVector<std::complex<double> >(pyAmplitudes, amplitudes)
+		                     : rpwa::py::convertNumpyArrayToComplexVector(pyAmplitudes, amplitudes);
+		if(not success)
 		{
 			PyErr_SetString(PyExc_TypeError, "Got invalid input for eventMetadata when executing rpwa::amplitudeFileWriter::addAmplitudes()");
 			bp::throw_error_already_set();
@@ -55,11 +61,14 @@ void rpwa::py::exportAmplitudeFileWriter() {
 			   bp::arg("keyfileContent"),
 			   bp::arg("objectBaseName"),
 			   bp::arg("splitlevel")=99,
-			   bp::arg("buffsize")=256000)
+			   bp::arg("buffsize")=256000,
+			   bp::arg("columnar")=false,
+			   bp::arg("singlePrecision")=false)
 		)
 
 		.def("addAmplitude", &rpwa::amplitudeFileWriter::addAmplitude)
 		.def("addAmplitudes", &amplitudeFileWriter_addAmplitudes)
+		.def("appendAmplitudeTree", &rpwa::amplitudeFileWriter::appendAmplitudeTree)
 		.def("reset", &rpwa::amplitudeFileWriter::reset)
 		.def("finalize", &rpwa::amplitudeFileWriter::finalize)
 		.def(
@@ -5,8 +5,10 @@
 #include <TPython.h>
 #include <TTree.h>
 
+#include "amplitudeDataFile.h"
 #include "amplitudeMetadata.h"
 #include "rootConverters_py.h"
+#include "stlContainers_py.h"
 
 namespace bp = boost::python;
 
@@ -23,24 +25,66 @@ namespace {
 		return retval;
 	}
 
-	const rpwa::amplitudeMetadata* amplitudeMetadata_readAmplitudeFile(PyObject* pyInputFile,
-	                                                                   const std::string& objectBaseName,
-	                                                                   const bool& quiet = false)
+	// the returned metadata are owned by Python, so that they and the mapping
+	// of the amplitude data file are released with the Python object
+	rpwa::amplitudeMetadata* amplitudeMetadata_readAmplitudeFile(PyObject* pyInputFile,
+	                                                             const std::string& objectBaseName,
+	                                                             const bool& quiet = false)
 	{
 		TFile* inputFile = rpwa::py::convertFromPy<TFile*>(pyInputFile);
 		if(not inputFile) {
 			PyErr_SetString(PyExc_TypeError, "Got invalid input for inputFile when executing rpwa::amplitudeMetadata::readAmplitudeFile()");
 			bp::throw_error_already_set();
 		}
-		return rpwa::amplitudeMetadata::readAmplitudeFile(inputFile, objectBaseName, quiet);
+		return const_cast<rpwa::amplitudeMetadata*>(rpwa::amplitudeMetadata::readAmplitudeFile(inputFile, objectBaseName, quiet));
+	}
+
+	long amplitudeMetadata_nmbAmplitudesInFile(PyObject* pyInputFile, const std::string& objectBaseName)
+	{
+		TFile* inputFile = rpwa::py::convertFromPy<TFile*>(pyInputFile);
+		if(not inputFile) {
+			PyErr_SetString(PyExc_TypeError, "Got invalid input for inputFile when executing rpwa::amplitudeMetadata::nmbAmplitudesInFile()");
+			bp::throw_error_already_set();
+		}
+		return rpwa::amplitudeMetadata::nmbAmplitudesInFile(inputFile, objectBaseName);
+	}
+
+	bp::dict amplitudeMetadata_amplitudeDataFilesInFile(PyObject* pyInputFile)
+	{
+		TFile* inputFile = rpwa::py::convertFromPy<TFile*>(pyInputFile);
+		if(not inputFile) {
+			PyErr_SetString(PyExc_TypeError, "Got invalid input for inputFile when executing rpwa::amplitudeMetadata::amplitudeDataFilesInFile()");
+			bp::throw_error_already_set();
+		}
+		bp::dict retval;
+		const std::map<std::string, std::string> dataFiles = rpwa::amplitudeMetadata::amplitudeDataFilesInFile(inputFile);
+		for(std::map<std::string, std::string>::const_iterator it = dataFiles.begin(); it != dataFiles.end(); ++it) {
+			retval[it->first] = it->second;
+		}
+		return retval;
 	}
 
 	PyObject* amplitudeMetadata_amplitudeTree(rpwa::amplitudeMetadata& self)
 	{
 		TTree* tree = self.amplitudeTree();
+		if(not tree) {
+			// amplitudes are stored in a columnar data file
+			Py_RETURN_NONE;
+		}
 		return TPython::ObjectProxy_FromVoidPtr(tree, tree->ClassName());
 	}
 
+	bp::object amplitudeMetadata_readAmplitudes(const rpwa::amplitudeMetadata& self,
+	                                            const long                     firstEntry = 0,
+	                                            const long                     nmbEntries = -1)
+	{
+		std::vector<std::complex<double> > amplitudes;
+		if(not self.readAmplitudes(amplitudes, firstEntry, nmbEntries)) {
+			return bp::object();
+		}
+		return rpwa::py::convertComplexVectorToNumpyArray(amplitudes);
+	}
+
 }
 
 
@@ -69,6 +113,19 @@ void rpwa::py::exportAmplitudeMetadata() {
 			, &rpwa::amplitudeMetadata::objectBaseName
 			, bp::return_value_policy<bp::copy_const_reference>()
 		)
+		.def(
+			"amplitudeDataFileName"
+			, &rpwa::amplitudeMetadata::amplitudeDataFileName
+			, bp::return_value_policy<bp::copy_const_reference>()
+		)
+		.def("isColumnar", &rpwa::amplitudeMetadata::isColumnar)
+		.def("singlePrecision", &rpwa::amplitudeMetadata::singlePrecision)
+		.def("nmbAmplitudes", &rpwa::amplitudeMetadata::nmbAmplitudes)
+		.def(
+			"readAmplitudes"
+			, &amplitudeMetadata_readAmplitudes
+			, (bp::arg("firstEntry")=0, bp::arg("nmbEntries")=-1)
+		)
 		.def(
 			"recalculateHash"
 			, &rpwa::amplitudeMetadata::recalculateHash
@@ -78,11 +135,30 @@ void rpwa::py::exportAmplitudeMetadata() {
 			"readAmplitudeFile"
 			, &amplitudeMetadata_readAmplitudeFile
 			, (bp::arg("inputFile"), bp::arg("objectBaseName"), bp::arg("quiet")=false)
-			, bp::return_value_policy<bp::reference_existing_object>()
+			, bp::return_value_policy<bp::manage_new_object>()
 		)
 		.staticmethod("readAmplitudeFile")
+		.def(
+			"nmbAmplitudesInFile"
+			, &amplitudeMetadata_nmbAmplitudesInFile
+			, (bp::arg("inputFile"), bp::arg("objectBaseName"))
+		)
+		.staticmethod("nmbAmplitudesInFile")
+		.def(
+			"amplitudeDataFilesInFile"
+			, &amplitudeMetadata_amplitudeDataFilesInFile
+			, bp::arg("inputFile")
+		)
+		.staticmethod("amplitudeDataFilesInFile")
+		.def(
+			"dataFileNameForAmplitudeFile"
+			, &rpwa::amplitudeDataFile::dataFileName
+			, (bp::arg("ampFileName"), bp::arg("objectBaseName"))
+		)
+		.staticmethod("dataFileNameForAmplitudeFile")
 		.def("amplitudeTree", &amplitudeMetadata_amplitudeTree)
 		.def_readonly("amplitudeLeafName", &rpwa::amplitudeMetadata::amplitudeLeafName)
+		.def_readonly("amplitudeDataFileExtension", &rpwa::amplitudeDataFile::fileExtension)
 		;
 
 }
@@ -20,10 +20,27 @@ namespace {
 
 void rpwa::py::exportHashCalculator() {
 
-	bp::class_<rpwa::hashCalculator>("hashCalculator")
+	bp::scope theScope = bp::class_<rpwa::hashCalculator>("hashCalculator")
 		.def(bp::init<const  rpwa::hashCalculator&>())
+		.def(bp::init<rpwa::hashCalculator::hashAlgorithm>(bp::arg("algorithm")))
 		.def("hash", &rpwa::hashCalculator::hash)
 		.def("Update", &::hashCalculator_Update1, bp::arg("value"))
 		.def("Update", &::hashCalculator_Update2, bp::arg("value"))
+		.def("algorithm", &rpwa::hashCalculator::algorithm)
+		.def("defaultAlgorithm", &rpwa::hashCalculator::defaultAlgorithm)
+		.staticmethod("defaultAlgorithm")
+		.def("setDefaultAlgorithm", &rpwa::hashCalculator::setDefaultAlgorithm, bp::arg("algorithm"))
+		.staticmethod("setDefaultAlgorithm")
+		.def("algorithmOfHash", &rpwa::hashCalculator::algorithmOfHash, bp::arg("hash"))
+		.staticmethod("algorithmOfHash")
 	;
+
+	bp::enum_<rpwa::hashCalculator::hashAlgorithm>("hashAlgorithm")
+		.value("MD5", rpwa::hashCalculator::MD5)
+		.value("XXH64", rpwa::hashCalculator::XXH64)
+		.export_values();
+
+	theScope.attr("MD5") = rpwa::hashCalculator::MD5;
+	theScope.attr("XXH64") = rpwa::hashCalculator::XXH64;
+
 };
@@ -1,12 +1,77 @@
 #!/usr/bin/env python
 
 import argparse
+import math
+import multiprocessing
+import os
 import sys
 
 import pyRootPwa
 import pyRootPwa.core
 
 
+def calcAmplitudesJob(job):
+	(dataFileName, keyFiles, outputFileNames, waveNames, nmbEvents, maxNmbEvents, startEvent, printProgress, columnar, singlePrecision,
+	 treeCacheSize, treePerfStatOutFileName, monitorIo) = job
+	ioMonitor = None
+	if monitorIo:
+		ioMonitor = pyRootPwa.utils.ioMonitor("calcAmplitudes", dataFile = dataFileName, nmbWaves = len(keyFiles), startEvent = startEvent,
+		                                      columnar = columnar, singlePrecision = singlePrecision, treeCacheSize = treeCacheSize)
+		ioMonitor.start()
+	try:
+		success = pyRootPwa.calcAmplitudes(dataFileName, keyFiles, outputFileNames, maxNmbEvents, printProgress, startEvent,
+		                                   columnar = columnar, singlePrecision = singlePrecision,
+		                                   treePerfStatOutFileName = treePerfStatOutFileName, treeCacheSize = treeCacheSize,
+		                                   ioMonitor = ioMonitor)
+	except KeyboardInterrupt:
+		success = False
+	except Exception as exc: # pylint: disable=broad-except
+		pyRootPwa.utils.printErr("caught exception while calculating amplitudes for data file '" + dataFileName + "': " + str(exc))
+		success = False
+	if not success:
+		# remove whatever was left behind by this job, so that a rerun picks it up again
+		for waveName, outputFileName in zip(waveNames, outputFileNames):
+			if not os.path.isfile(outputFileName):
+				continue
+			complete = pyRootPwa.isAmplitudeFileComplete(outputFileName, waveName, nmbEvents)
+			if complete is None:
+				pyRootPwa.utils.printWarn("could not check amplitude file '" + outputFileName + "'. not removing it.")
+			elif not complete:
+				pyRootPwa.utils.printWarn("removing incomplete amplitude file '" + outputFileName + "'.")
+				pyRootPwa.removeAmplitudeFile(outputFileName, waveName)
+	ioRecord = None
+	if ioMonitor:
+		ioRecord = ioMonitor.stop()
+		ioRecord["success"] = success
+	return (dataFileName, len(keyFiles), success, ioRecord)
+
+
+def getEventFileInfo(dataFileName, maxNmbEvents, startEvent):
+	# returns the number of events to process and the content hash of the data file
+	dataFile = pyRootPwa.ROOT.TFile.Open(dataFileName, "READ")
+	if not dataFile:
+		return (-1, "")
+	eventMeta = pyRootPwa.core.eventMetadata.readEventFile(dataFile, True)
+	if not eventMeta:
+		dataFile.Close()
+		return (-1, "")
+	nmbEvents = eventMeta.eventTree().GetEntries() - startEvent
+	contentHash = eventMeta.contentHash()
+	dataFile.Close()
+	if maxNmbEvents > 0:
+		nmbEvents = min(nmbEvents, maxNmbEvents)
+	return (max(nmbEvents, 0), contentHash)
+
+
+def getKeyfileContent(keyFile, keyfileContents):
+	# keyFile is a (keyFileName, waveDescriptionID) tuple, keyfileContents
+	# the dictionary of already parsed key files
+	if keyFile not in keyfileContents:
+		(keyFileName, waveDescriptionID) = keyFile
+		keyfileContents[keyFile] = pyRootPwa.core.waveDescription.parseKeyFile(keyFileName)[waveDescriptionID].keyFileContent()
+	return keyfileContents[keyFile]
+
+
 if __name__ == "__main__":
 
 	# parse command line arguments
@@ -19,14 +84,41 @@ if __name__ == "__main__":
 
 	parser.add_argument("-c", type=str, metavar="configFileName", default="rootpwa.config", dest="configFileName", help="path to config file (default: ./rootpwa.config)")
 	parser.add_argument("-n", type=int, metavar="#", default=-1, dest="maxNmbEvents",  help="maximum number of events to read (default: all)")
+	parser.add_argument("-s", type=int, metavar="#", default=-1, dest="startEvent",
+	                    help="calculate only the events starting at this event (up to -n events) and write them to shard files "
+	                         "which can be combined with mergeAmplitudes.py (default: no sharding)")
 	parser.add_argument("-b", type=int, metavar="massBin", default=-1, dest="massBin", help="mass bin to be calculated (default: all)")
 	parser.add_argument("-e", type=str, metavar="eventsType", default="all", dest="eventsType", help="events type to be calculated ('real', 'generated' or 'accepted', default: all)")
 	parser.add_argument("-f", "--no-progress-bar", action="store_true", dest="noProgressBar", help="disable progress bars (decreases computing time)")
 	parser.add_argument("-k", "--keyfileIndex", type=int, metavar="#", default=-1,
 	                    help="keyfile index to calculate amplitude for (overrides settings from the config file, index from 0 to number of keyfiles - 1)")
 	parser.add_argument("-w", type=str, metavar="wavelistFileName", default="", dest="wavelistFileName", help="path to wavelist file (default: none)")
+	parser.add_argument("--columnar", action="store_true", dest="columnar",
+	                    help="store amplitudes in raw, memory-mappable data files next to the amplitude files, which then only hold the metadata")
+	parser.add_argument("--single-precision", action="store_true", dest="singlePrecision",
+	                    help="store amplitudes in single precision (requires --columnar)")
+	parser.add_argument("--no-cache", action="store_true", dest="noCache",
+	                    help="neither take amplitudes from nor add them to the amplitude cache given in the config file")
+	parser.add_argument("-j", type=int, metavar="#", default=1, dest="nJobs", help="number of parallel worker processes (default: 1)")
+	parser.add_argument("--tree-cache-size", type=int, metavar="#", default=25000000, dest="treeCacheSize",
+	                    help="size of the TTree cache for reading the event trees in bytes (default: 25000000)")
+	parser.add_argument("--tree-perf-stats", type=str, metavar="prefix", default="", dest="treePerfStatPrefix",
+	                    help="write the TTreePerfStats of the event tree of each job to '<prefix>.<job index>.root' (default: none)")
+	parser.add_argument("--io-report", type=str, metavar="reportFileName", default="", dest="ioReportFileName",
+	                    help="append I/O statistics (bytes read, cache efficiency, decompression, CPU and wall time, events/s) "
+	                         "of each job as JSON lines to this file (default: none)")
 	args = parser.parse_args()
 
+	if args.startEvent < -1:
+		pyRootPwa.utils.printErr("start event has to be non-negative (got " + str(args.startEvent) + "). Aborting...")
+		sys.exit(1)
+	if args.singlePrecision and not args.columnar:
+		pyRootPwa.utils.printErr("single-precision amplitudes can only be stored in columnar files (option --columnar). Aborting...")
+		sys.exit(1)
+	if args.nJobs < 1:
+		pyRootPwa.utils.printErr("number of jobs has to be positive (got " + str(args.nJobs) + "). Aborting...")
+		sys.exit(1)
+
 	config = pyRootPwa.rootPwaConfig()
 	if not config.initialize(args.configFileName):
 		pyRootPwa.utils.printErr("loading config file '" + args.configFileName + "' failed. Aborting...")
@@ -73,12 +165,146 @@ if __name__ == "__main__":
 		pyRootPwa.utils.printErr("Invalid events type given ('" + args.eventsType + "'). Aborting...")
 		sys.exit(1)
 
+	ampCache = None
+	if config.ampCacheDirectory and not args.noCache:
+		ampCache = pyRootPwa.amplitudeCache(config.ampCacheDirectory, int(config.ampCacheMaxSize * 1024**3))
+		pyRootPwa.utils.printInfo("using amplitude cache '" + config.ampCacheDirectory + "'.")
+
+	# collect the waves that still have to be calculated for each data file
+	pendingWaves = {}
+	nmbEventsInFile = {}
+	nmbSkipped = 0
+	nmbFromCache = 0
+	uncheckedFiles = []  # files that could not be checked are neither removed nor recalculated
+	cacheKeys = {}
+	keyfileContents = {}
 	for binID in binIDList:
-		for waveName in waveList:
-			for eventsType in eventsTypes:
-				dataFile = fileManager.getDataFile(binID, eventsType)
-				if not dataFile:
-					continue
-				if not pyRootPwa.calcAmplitude(dataFile.dataFileName, fileManager.getKeyFile(waveName)[0], fileManager.getKeyFile(waveName)[1],
-				                               fileManager.getAmplitudeFilePath(binID, waveName, eventsType), args.maxNmbEvents, not args.noProgressBar):
-					pyRootPwa.utils.printWarn("could not calculate amplitude.")
+		for eventsType in eventsTypes:
+			dataFile = fileManager.getDataFile(binID, eventsType)
+			if not dataFile:
+				continue
+			startEvent = max(args.startEvent, 0)
+			(nmbEvents, eventContentHash) = getEventFileInfo(dataFile.dataFileName, args.maxNmbEvents, startEvent)
+			if nmbEvents < 0:
+				pyRootPwa.utils.printWarn("could not read number of events from data file '" + dataFile.dataFileName + "'.")
+				continue
+			if nmbEvents == 0:
+				pyRootPwa.utils.printWarn("no events to process in data file '" + dataFile.dataFileName + "' (start event " + str(startEvent) + ").")
+				continue
+			for waveName in waveList:
+				outputFileName = fileManager.getAmplitudeFilePath(binID, waveName, eventsType)
+				if args.startEvent >= 0:
+					outputFileName = pyRootPwa.amplitudeShardFilePath(outputFileName, startEvent, nmbEvents)
+				if os.path.isfile(outputFileName):
+					complete = pyRootPwa.isAmplitudeFileComplete(outputFileName, waveName, nmbEvents)
+					if complete:
+						nmbSkipped += 1
+						continue
+					if complete is None:
+						uncheckedFiles.append(outputFileName)
+						continue
+					pyRootPwa.utils.printWarn("removing incomplete amplitude file '" + outputFileName + "'.")
+					pyRootPwa.removeAmplitudeFile(outputFileName, waveName)
+				if ampCache:
+					cacheKey = pyRootPwa.amplitudeCache.key(getKeyfileContent(fileManager.getKeyFile(waveName), keyfileContents),
+					                                        eventContentHash, startEvent, nmbEvents, args.singlePrecision,
+					                                        args.columnar)
+					if ampCache.fetch(cacheKey, outputFileName):
+						complete = pyRootPwa.isAmplitudeFileComplete(outputFileName, waveName, nmbEvents)
+						if complete:
+							nmbFromCache += 1
+							continue
+						if complete is None:
+							uncheckedFiles.append(outputFileName)
+							continue
+						pyRootPwa.utils.printWarn("amplitude file '" + outputFileName + "' taken from cache is not valid. Recalculating...")
+						pyRootPwa.removeAmplitudeFile(outputFileName, waveName)
+					cacheKeys[outputFileName] = cacheKey
+				if dataFile.dataFileName not in pendingWaves:
+					pendingWaves[dataFile.dataFileName] = []
+					nmbEventsInFile[dataFile.dataFileName] = nmbEvents
+				pendingWaves[dataFile.dataFileName].append((waveName, outputFileName))
+	if nmbSkipped > 0:
+		pyRootPwa.utils.printInfo("skipping " + str(nmbSkipped) + " amplitude files which are already complete.")
+	if nmbFromCache > 0:
+		pyRootPwa.utils.printInfo("took " + str(nmbFromCache) + " amplitude files from the amplitude cache.")
+	for outputFileName in uncheckedFiles:
+		pyRootPwa.utils.printErr("could not check whether amplitude file '" + outputFileName + "' is complete. "
+		                         + "leaving it untouched.")
+	if not pendingWaves:
+		if uncheckedFiles:
+			sys.exit(1)
+		pyRootPwa.utils.printSucc("all amplitude files are already complete.")
+		sys.exit(0)
+
+	# split the waves of each data file into enough jobs to keep all workers busy
+	# and interleave the jobs of different data files to spread the I/O load
+	nmbChunksPerFile = int(math.ceil(float(args.nJobs) / len(pendingWaves)))
+	jobsPerFile = []
+	for dataFileName in sorted(pendingWaves):
+		waves = pendingWaves[dataFileName]
+		nmbChunks = min(nmbChunksPerFile, len(waves))
+		chunks = []
+		for chunkIndex in range(nmbChunks):
+			chunk = waves[chunkIndex::nmbChunks]
+			chunks.append((dataFileName,
+			               [ fileManager.getKeyFile(waveName) for (waveName, _) in chunk ],
+			               [ outputFileName for (_, outputFileName) in chunk ],
+			               [ waveName for (waveName, _) in chunk ],
+			               nmbEventsInFile[dataFileName],
+			               args.maxNmbEvents,
+			               max(args.startEvent, 0),
+			               (not args.noProgressBar) and args.nJobs == 1,
+			               args.columnar,
+			               args.singlePrecision,
+			               args.treeCacheSize))
+		jobsPerFile.append(chunks)
+	jobs = []
+	while jobsPerFile:
+		for chunks in list(jobsPerFile):
+			treePerfStatOutFileName = ""
+			if args.treePerfStatPrefix:
+				treePerfStatOutFileName = args.treePerfStatPrefix + "." + str(len(jobs)) + ".root"
+			jobs.append(chunks.pop(0) + (treePerfStatOutFileName, args.ioReportFileName != ""))
+			if not chunks:
+				jobsPerFile.remove(chunks)
+	pyRootPwa.utils.printInfo("calculating amplitudes in " + str(len(jobs)) + " jobs using " + str(args.nJobs) + " worker process(es).")
+
+	results = []
+	if args.nJobs == 1:
+		for job in jobs:
+			results.append(calcAmplitudesJob(job))
+	else:
+		pool = multiprocessing.Pool(args.nJobs)
+		try:
+			results = pool.map_async(calcAmplitudesJob, jobs, chunksize = 1).get(2**31 - 1)
+			pool.close()
+		except KeyboardInterrupt:
+			pyRootPwa.utils.printErr("received keyboard interrupt. Aborting...")
+			pool.terminate()
+			pool.join()
+			sys.exit(1)
+		pool.join()
+
+	if args.ioReportFileName:
+		pyRootPwa.utils.appendIoReport(args.ioReportFileName, [ ioRecord for (_, _, _, ioRecord) in results if ioRecord ])
+		pyRootPwa.utils.printInfo("appended I/O statistics of " + str(len(results)) + " jobs to '" + args.ioReportFileName + "'.")
+
+	nmbFailed = 0
+	for (job, (dataFileName, nmbWaves, success, _)) in zip(jobs, results):
+		if not success:
+			nmbFailed += 1
+			pyRootPwa.utils.printWarn("could not calculate amplitudes of " + str(nmbWaves) + " waves for data file '" + dataFileName + "'.")
+			continue
+		if ampCache:
+			for outputFileName in job[2]:
+				ampCache.store(cacheKeys[outputFileName], outputFileName)
+	if ampCache:
+		ampCache.evict()
+	if nmbFailed > 0:
+		pyRootPwa.utils.printErr(str(nmbFailed) + " of " + str(len(jobs)) + " jobs failed.")
+		sys.exit(1)
+	if uncheckedFiles:
+		pyRootPwa.utils.printErr("could not check " + str(len(uncheckedFiles)) + " amplitude files.")
+		sys.exit(1)
+	pyRootPwa.utils.printSucc("successfully finished " + str(len(jobs)) + " jobs.")
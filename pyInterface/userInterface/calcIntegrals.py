@@ -1,11 +1,160 @@
 #!/usr/bin/env python
 
 import argparse
+import glob
+import multiprocessing
+import os
 import sys
+import time
 
 import pyRootPwa
 import pyRootPwa.core
 
+
+def calcIntegralsJob(job):
+	(outputFileName, ampFileList, startEvent, nmbEvents, weightsFileName, targetPrecision, monitorIo, jobInfo) = job
+	pyRootPwa.utils.printInfo("calculating integral matrix '" + outputFileName + "' from " + str(len(ampFileList)) + " amplitude files.")
+	ioMonitor = None
+	if monitorIo:
+		ioMonitor = pyRootPwa.utils.ioMonitor("calcIntegrals", nmbWaves = len(ampFileList), startEvent = startEvent, **jobInfo)
+		ioMonitor.start()
+	try:
+		success = pyRootPwa.calcIntegrals(outputFileName, ampFileList, nmbEvents, weightsFileName,
+		                                  ioMonitor = ioMonitor, startEvent = startEvent, targetPrecision = targetPrecision)
+	except KeyboardInterrupt:
+		success = False
+	except Exception as exc: # pylint: disable=broad-except
+		pyRootPwa.utils.printErr("caught exception while calculating integral '" + outputFileName + "': " + str(exc))
+		success = False
+	if not success and os.path.isfile(outputFileName):
+		os.remove(outputFileName)
+	ioRecord = None
+	if ioMonitor:
+		ioRecord = ioMonitor.stop()
+		ioRecord["success"] = success
+	return (outputFileName, success, ioRecord)
+
+
+# rough memory needed by one integral job: every amplitude file is kept open
+# with its buffers, and the integral matrix is accumulated with compensated
+# sums and copied into the metadata. pages of memory-mapped amplitude data
+# files are shared between processes and not counted
+memoryPerAmpFile       = 4.              # in MiB
+memoryPerMatrixElement = 64. / 1024**2  # in MiB
+
+
+def estimateIntegralMemory(ampFileList):
+	# returns the estimated memory in MiB needed to calculate the integral of the waves
+	nmbWaves = len(ampFileList)
+	return nmbWaves * memoryPerAmpFile + nmbWaves**2 * memoryPerMatrixElement
+
+
+def scheduledIntegralJob(job):
+	# calculates one integral of the scheduler mode unless the existing integral
+	# file is up to date; the integral is written to a temporary file first, so
+	# that an existing integral file is only replaced by a complete one
+	(outputFileName, ampFileList, nmbEvents, weightsFileName, targetPrecision, monitorIo, jobInfo) = job
+	try:
+		upToDate = pyRootPwa.isIntegralFileUpToDate(outputFileName, ampFileList, nmbEvents, targetPrecision)
+	except Exception as exc: # pylint: disable=broad-except
+		pyRootPwa.utils.printWarn("could not check whether integral file '" + outputFileName + "' is up to date: " + str(exc))
+		upToDate = False
+	if upToDate is None:
+		# e.g. events were added to the integral with --update-from-event
+		pyRootPwa.utils.printErr("integral file '" + outputFileName + "' covers more events than would be integrated. "
+		                         "Not replacing it; remove it to recalculate the integral.")
+		return (outputFileName, "failed", None)
+	if upToDate:
+		return (outputFileName, "skipped", None)
+	(outputStem, outputExt) = os.path.splitext(outputFileName)
+	tmpFileName = outputStem + ".tmp" + str(os.getpid()) + outputExt
+	if os.path.isfile(tmpFileName):
+		os.remove(tmpFileName)
+	(_, success, ioRecord) = calcIntegralsJob((tmpFileName, ampFileList, 0, nmbEvents, weightsFileName, targetPrecision, monitorIo, jobInfo))
+	if success:
+		try:
+			os.rename(tmpFileName, outputFileName)
+		except OSError as exc:
+			pyRootPwa.utils.printErr("could not move integral file '" + tmpFileName + "' to '" + outputFileName + "': " + str(exc))
+			os.remove(tmpFileName)
+			success = False
+	return (outputFileName, "done" if success else "failed", ioRecord)
+
+
+def runScheduledJobs(jobs, nmbWorkers, memoryBudget, pollInterval = 0.5):
+	# runs the jobs in a pool of worker processes. a job is only started if the
+	# estimated memory of all running jobs stays within memoryBudget (in MiB);
+	# a job that does not fit into the budget at all runs alone. the largest
+	# jobs are started first. returns the list of job results
+	pending = sorted(((job, estimateIntegralMemory(job[1])) for job in jobs), key = lambda item: item[1], reverse = True)
+	running = []
+	results = []
+	pool = multiprocessing.Pool(nmbWorkers)
+	try:
+		while pending or running:
+			stillRunning = []
+			for (asyncResult, memory) in running:
+				if asyncResult.ready():
+					results.append(asyncResult.get())
+				else:
+					stillRunning.append((asyncResult, memory))
+			running = stillRunning
+			usedMemory = sum(memory for (_, memory) in running)
+			while pending and len(running) < nmbWorkers:
+				index = None
+				for (i, (_, memory)) in enumerate(pending):
+					if usedMemory + memory <= memoryBudget:
+						index = i
+						break
+				if index is None:
+					if running:
+						break
+					index = 0
+					pyRootPwa.utils.printWarn("estimated memory of " + str(int(pending[0][1])) + " MiB for integral '" + pending[0][0][0]
+					                          + "' exceeds the memory budget of " + str(int(memoryBudget)) + " MiB. Running it alone.")
+				(job, memory) = pending.pop(index)
+				running.append((pool.apply_async(scheduledIntegralJob, (job, )), memory))
+				usedMemory += memory
+			if running:
+				time.sleep(pollInterval)
+	except KeyboardInterrupt:
+		pool.terminate()
+		pool.join()
+		raise
+	pool.close()
+	pool.join()
+	return results
+
+
+def getNmbAmplitudes(ampFileList):
+	# returns the number of amplitudes in the amplitude file of the first wave
+	waveName = sorted(ampFileList)[0]
+	ampFile = pyRootPwa.ROOT.TFile.Open(ampFileList[waveName], "READ")
+	if not ampFile:
+		return -1
+	ampMeta = pyRootPwa.core.amplitudeMetadata.readAmplitudeFile(ampFile, waveName)
+	if not ampMeta:
+		ampFile.Close()
+		return -1
+	nmbAmplitudes = ampMeta.nmbAmplitudes()
+	ampFile.Close()
+	return nmbAmplitudes
+
+def getShardAmplitudeFiles(ampFileList, startEvent):
+	# returns the amplitude shard files of all waves starting at the given event
+	# or None if a wave has not exactly one such shard file
+	shardFileList = {}
+	for waveName in ampFileList:
+		(base, ext) = os.path.splitext(ampFileList[waveName])
+		shardFileNames = glob.glob(base + "_events-" + str(startEvent) + "-*" + ext)
+		if len(shardFileNames) != 1:
+			pyRootPwa.utils.printErr("found " + str(len(shardFileNames)) + " amplitude shard files starting at event "
+			                         + str(startEvent) + " for wave '" + waveName + "', expected one.")
+			return None
+		shardFileList[waveName] = shardFileNames[0]
+	return shardFileList
+
+
 if __name__ == "__main__":
 
 	parser = argparse.ArgumentParser(
@@ -17,7 +166,55 @@ if __name__ == "__main__":
 	parser.add_argument("-b", type=int, metavar="massBin", default=-1, dest="massBin", help="mass bin to be calculated (default: all)")
 	parser.add_argument("-e", type=str, metavar="eventsType", default="all", dest="eventsType", help="events type to be calculated ('generated' or 'accepted', default: both)")
 	parser.add_argument("-w", type=str, metavar="path", dest="weightsFileName", default="", help="path to MC weight file for de-weighting (default: none)")
+	parser.add_argument("-j", type=int, metavar="#", default=1, dest="nJobs",
+	                    help="number of parallel worker processes; the events of each integral are split into this many ranges, "
+	                         "which are integrated separately and merged (default: 1)")
+	parser.add_argument("-p", type=float, metavar="precision", default=0., dest="targetPrecision",
+	                    help="stop integrating as soon as the estimated relative statistical uncertainty of the diagonal elements "
+	                         "and of the off-diagonal elements relative to the diagonal is below this value; "
+	                         "the achieved precision is stored in the integral metadata (default: integrate all events)")
+	parser.add_argument("--acceptance-variable", type=str, metavar="variableName", default="", dest="acceptanceVariable",
+	                    help="calculate the integrals of generated and accepted events in one pass over the amplitudes of the "
+	                         "generated events, taking the acceptance flag or weight of each event from this additional "
+	                         "variable of the generated event files; no accepted event files are needed (default: off)")
+	parser.add_argument("--update-from-event", type=int, metavar="#", default=-1, dest="updateStartEvent",
+	                    help="add the events of the amplitude shard files starting at this event (see calcAmplitudes.py -s) "
+	                         "to the existing integral files instead of recalculating them; -w then has to give the weights "
+	                         "of the new events only (default: off)")
+	parser.add_argument("--add-waves", action="store_true", dest="addWaves",
+	                    help="add the waves of the file manager which are missing in the existing integral files to them "
+	                         "instead of recalculating the integrals; only the new matrix elements are calculated (default: off)")
+	parser.add_argument("--schedule", action="store_true", dest="schedule",
+	                    help="run the integral of each bin and events type as one job in a pool of -j worker processes, skip "
+	                         "integral files which are up to date with the amplitude files, -n and -p, keep integral files covering "
+	                         "more events, and report all failed integrals at the end instead of aborting at the first failure "
+	                         "(default: off)")
+	parser.add_argument("--memory-per-worker", type=float, metavar="MiB", default=2048., dest="memoryPerWorker",
+	                    help="memory budget per worker process in the scheduler mode; fewer jobs than workers run in parallel "
+	                         "if their estimated memory exceeds the total budget (default: 2048)")
+	parser.add_argument("--io-report", type=str, metavar="reportFileName", default="", dest="ioReportFileName",
+	                    help="append I/O statistics (bytes read, cache efficiency, CPU and wall time, events/s) "
+	                         "of each integral as JSON lines to this file (default: none)")
 	args = parser.parse_args()
+	if args.nJobs < 1:
+		pyRootPwa.utils.printErr("number of jobs has to be positive (got " + str(args.nJobs) + "). Aborting...")
+		sys.exit(1)
+	if args.targetPrecision < 0.:
+		pyRootPwa.utils.printErr("target precision has to be positive (got " + str(args.targetPrecision) + "). Aborting...")
+		sys.exit(1)
+	if args.acceptanceVariable and (args.nJobs > 1 or args.targetPrecision > 0.):
+		pyRootPwa.utils.printErr("integrating with acceptance variable cannot be combined with several jobs or a target precision. Aborting...")
+		sys.exit(1)
+	if args.schedule and (args.acceptanceVariable or args.updateStartEvent >= 0 or args.addWaves):
+		pyRootPwa.utils.printErr("the scheduler mode cannot be combined with an acceptance variable, updating or adding waves. Aborting...")
+		sys.exit(1)
+	if args.memoryPerWorker <= 0.:
+		pyRootPwa.utils.printErr("memory per worker has to be positive (got " + str(args.memoryPerWorker) + "). Aborting...")
+		sys.exit(1)
+	if args.targetPrecision > 0. and args.nJobs > 1 and not args.schedule:
+		# the events of the parts would not join up if a part stops early
+		pyRootPwa.utils.printErr("a target precision cannot be combined with several jobs. Aborting...")
+		sys.exit(1)
 
 	printErr  = pyRootPwa.utils.printErr
 	printWarn = pyRootPwa.utils.printWarn
@@ -51,6 +248,100 @@ if __name__ == "__main__":
 		pyRootPwa.utils.printErr("Invalid events type given ('" + args.eventsType + "'). Aborting...")
 		sys.exit(1)
 
+	if args.acceptanceVariable:
+		for binID in binIDList:
+			integralFileName = fileManager.getIntegralFilePath(binID, pyRootPwa.core.eventMetadata.GENERATED)
+			accIntegralFileName = fileManager.getIntegralFilePath(binID, pyRootPwa.core.eventMetadata.ACCEPTED)
+			ampFileList = fileManager.getAmplitudeFilePaths(binID, pyRootPwa.core.eventMetadata.GENERATED)
+			dataFile = fileManager.getDataFile(binID, pyRootPwa.core.eventMetadata.GENERATED)
+			if not ampFileList or not dataFile:
+				printErr("could not retrieve amplitude files or event file of generated events for bin " + str(binID) + ". Aborting...")
+				sys.exit(1)
+			if not pyRootPwa.calcIntegralsWithAcceptance(integralFileName, accIntegralFileName, ampFileList, dataFile.dataFileName,
+			                                             args.acceptanceVariable, args.nEvents, args.weightsFileName):
+				printErr("could not calculate integrals for bin " + str(binID) + ". Aborting...")
+				sys.exit(1)
+			printSucc("wrote integrals of generated and accepted events to files '" + integralFileName + "' and '"
+			          + accIntegralFileName + "'")
+		sys.exit(0)
+
+	if args.updateStartEvent >= 0:
+		for binID in binIDList:
+			for eventsType in eventsTypes:
+				integralFileName = fileManager.getIntegralFilePath(binID, eventsType)
+				if not os.path.isfile(integralFileName):
+					printErr("integral file '" + integralFileName + "' to update does not exist. Aborting...")
+					sys.exit(1)
+				shardFileList = getShardAmplitudeFiles(fileManager.getAmplitudeFilePaths(binID, eventsType), args.updateStartEvent)
+				if not shardFileList:
+					printErr("could not find amplitude files of the new events. Aborting...")
+					sys.exit(1)
+				if not pyRootPwa.updateIntegralFile(integralFileName, shardFileList, args.weightsFileName):
+					printErr("could not update integral file '" + integralFileName + "'. Aborting...")
+					sys.exit(1)
+				printSucc("added events of amplitude shards starting at event " + str(args.updateStartEvent)
+				          + " to integral file '" + integralFileName + "'")
+		sys.exit(0)
+
+	if args.addWaves:
+		for binID in binIDList:
+			for eventsType in eventsTypes:
+				integralFileName = fileManager.getIntegralFilePath(binID, eventsType)
+				if not os.path.isfile(integralFileName):
+					printErr("integral file '" + integralFileName + "' to add waves to does not exist. Aborting...")
+					sys.exit(1)
+				ampFileList = fileManager.getAmplitudeFilePaths(binID, eventsType)
+				if not ampFileList:
+					printErr("could not retrieve valid amplitude file list. Aborting...")
+					sys.exit(1)
+				if not pyRootPwa.addWavesToIntegralFile(integralFileName, ampFileList, args.weightsFileName):
+					printErr("could not add waves to integral file '" + integralFileName + "'. Aborting...")
+					sys.exit(1)
+				printSucc("added missing waves to integral file '" + integralFileName + "'")
+		sys.exit(0)
+
+	if args.schedule:
+		monitorIo = args.ioReportFileName != ""
+		jobs = []
+		failed = []
+		for binID in binIDList:
+			for eventsType in eventsTypes:
+				outputFileName = fileManager.getIntegralFilePath(binID, eventsType)
+				ampFileList = fileManager.getAmplitudeFilePaths(binID, eventsType)
+				if not ampFileList:
+					printErr("could not retrieve valid amplitude file list for integral '" + outputFileName + "'.")
+					failed.append(outputFileName)
+					continue
+				jobInfo = { "binID": binID, "eventsType": str(eventsType) }
+				jobs.append((outputFileName, ampFileList, args.nEvents, args.weightsFileName, args.targetPrecision, monitorIo, jobInfo))
+		printInfo("scheduling " + str(len(jobs)) + " integral matrices on " + str(args.nJobs) + " worker process(es) "
+		          + "with a memory budget of " + str(int(args.memoryPerWorker)) + " MiB per worker.")
+		try:
+			results = runScheduledJobs(jobs, args.nJobs, args.nJobs * args.memoryPerWorker)
+		except KeyboardInterrupt:
+			printErr("received keyboard interrupt. Aborting...")
+			sys.exit(1)
+		if args.ioReportFileName:
+			pyRootPwa.utils.appendIoReport(args.ioReportFileName, [ ioRecord for (_, _, ioRecord) in results if ioRecord ])
+		for (outputFileName, status, _) in sorted(results):
+			if status == "skipped":
+				printInfo("integral file '" + outputFileName + "' is up to date.")
+			elif status == "done":
+				printSucc("wrote integral to file '" + outputFileName + "'")
+			else:
+				failed.append(outputFileName)
+		printInfo(str(len([ result for result in results if result[1] == "done" ])) + " integral(s) calculated, "
+		          + str(len([ result for result in results if result[1] == "skipped" ])) + " up to date, "
+		          + str(len(failed)) + " failed.")
+		if failed:
+			printErr("integral calculation failed for '" + "', '".join(sorted(failed)) + "'.")
+			sys.exit(1)
+		sys.exit(0)
+
+	# with several workers the events of each integral are split into ranges
+	# which are integrated into partial files and merged afterwards
+	jobs = []
+	partialFileNames = {}
 	for binID in binIDList:
 		for eventsType in eventsTypes:
 			outputFileName = fileManager.getIntegralFilePath(binID, eventsType)
@@ -58,9 +349,68 @@ if __name__ == "__main__":
 			if not ampFileList:
 				printErr("could not retrieve valid amplitude file list. Aborting...")
 				sys.exit(1)
-			printInfo("calculating integral matrix from " + str(len(ampFileList)) + " amplitude files:")
-			if not pyRootPwa.calcIntegrals(outputFileName, ampFileList, args.nEvents, args.weightsFileName):
-				printErr("integral calculation failed. Aborting...")
+			jobInfo = { "binID": binID, "eventsType": str(eventsType) }
+			monitorIo = args.ioReportFileName != ""
+			if args.nJobs == 1:
+				jobs.append((outputFileName, ampFileList, 0, args.nEvents, args.weightsFileName, args.targetPrecision, monitorIo, jobInfo))
+				continue
+			nmbEvents = getNmbAmplitudes(ampFileList)
+			if nmbEvents <= 0:
+				printErr("could not read number of amplitudes for bin " + str(binID) + ". Aborting...")
 				sys.exit(1)
+			if args.nEvents > 0:
+				nmbEvents = min(nmbEvents, args.nEvents)
+			nmbParts = min(args.nJobs, nmbEvents)
+			(outputStem, outputExt) = os.path.splitext(outputFileName)
+			partialFileNames[outputFileName] = []
+			for part in range(nmbParts):
+				startEvent = (part * nmbEvents) // nmbParts
+				stopEvent = ((part + 1) * nmbEvents) // nmbParts
+				partialFileName = outputStem + ".part" + str(part) + outputExt
+				partialFileNames[outputFileName].append(partialFileName)
+				jobs.append((partialFileName, ampFileList, startEvent, stopEvent - startEvent, args.weightsFileName, 0., monitorIo, jobInfo))
+	printInfo("calculating " + str(len(jobs)) + " integral matrices using " + str(args.nJobs) + " worker process(es).")
+
+	results = []
+	if args.nJobs == 1:
+		for job in jobs:
+			results.append(calcIntegralsJob(job))
+			if not results[-1][1]:
+				break
+	else:
+		pool = multiprocessing.Pool(args.nJobs)
+		try:
+			results = pool.map_async(calcIntegralsJob, jobs, chunksize = 1).get(2**31 - 1)
+			pool.close()
+		except KeyboardInterrupt:
+			printErr("received keyboard interrupt. Aborting...")
+			pool.terminate()
+			pool.join()
+			sys.exit(1)
+		pool.join()
+
+	if args.ioReportFileName:
+		pyRootPwa.utils.appendIoReport(args.ioReportFileName, [ ioRecord for (_, _, ioRecord) in results if ioRecord ])
+
+	failed = [ outputFileName for (outputFileName, success, _) in results if not success ]
+	if failed:
+		for partialFileList in partialFileNames.values():
+			for partialFileName in partialFileList:
+				if os.path.isfile(partialFileName):
+					os.remove(partialFileName)
+		printErr("integral calculation failed for '" + "', '".join(failed) + "'. Aborting...")
+		sys.exit(1)
+	for outputFileName in sorted(partialFileNames):
+		success = pyRootPwa.mergeIntegralFiles(partialFileNames[outputFileName], outputFileName)
+		for partialFileName in partialFileNames[outputFileName]:
+			os.remove(partialFileName)
+		if not success:
+			printErr("could not merge partial integrals into '" + outputFileName + "'. Aborting...")
+			sys.exit(1)
+	for (outputFileName, _, _) in results:
+		if outputFileName not in partialFileNames:
 			printSucc("wrote integral to TKey '" + pyRootPwa.core.ampIntegralMatrix.integralObjectName + "' "
-				        + "in file '" + outputFileName + "'")
+			          + "in file '" + outputFileName + "'")
+	for outputFileName in sorted(partialFileNames):
+		printSucc("wrote integral merged from " + str(len(partialFileNames[outputFileName])) + " parts "
+		          + "to file '" + outputFileName + "'")
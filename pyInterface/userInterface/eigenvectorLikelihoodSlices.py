@@ -4,6 +4,8 @@ import argparse
 import math
 import sys
 
+import numpy
+
 import pyRootPwa
 import pyRootPwa.core
 ROOT = pyRootPwa.ROOT
@@ -24,6 +26,8 @@ if __name__ == "__main__":
 	parser.add_argument("-P", "--cauchyPriorWidth", type=float, metavar ="WIDTH", default=0.5, help="width of half-Cauchy prior (default: 0.5)")
 	parser.add_argument("-A", type=int, metavar="#", dest="accEventsOverride", default=0,
 	                    help="number of input events to normalize acceptance to (default: use number of events from normalization integral file)")
+	parser.add_argument("--server", type=str, metavar="socket", dest="serverSocket", default="",
+	                    help="evaluate the likelihood with the server listening on this socket (see likelihoodServer.py) instead of loading it")
 	parser.add_argument("-v", "--verbose", help="verbose; print debug output (default: false)", action="store_true")
 	args = parser.parse_args()
 
@@ -58,23 +62,33 @@ if __name__ == "__main__":
 		pyRootPwa.utils.printErr("error while getting wave names, descriptions and thresholds. Aborting...")
 		sys.exit(1)
 
-	likelihood = pyRootPwa.initLikelihood(waveDescThres = waveDescThres,
-	                                      massBinCenter = result.massBinCenter(),
-	                                      ampFileList = ampFileList,
-	                                      normIntegralFileName = psIntegralPath,
-	                                      accIntegralFileName = accIntegralPath,
-	                                      accEventsOverride = args.accEventsOverride,
-	                                      cauchy = args.cauchyPriors,
-	                                      cauchyWidth = args.cauchyPriorWidth,
-	                                      rank = result.rank(),
-	                                      verbose = args.verbose)
+	likelihoodArguments = { "waveDescThres":        waveDescThres,
+	                        "massBinCenter":        result.massBinCenter(),
+	                        "ampFileList":          ampFileList,
+	                        "normIntegralFileName": psIntegralPath,
+	                        "accIntegralFileName":  accIntegralPath,
+	                        "accEventsOverride":    args.accEventsOverride,
+	                        "cauchy":               args.cauchyPriors,
+	                        "cauchyWidth":          args.cauchyPriorWidth,
+	                        "rank":                 result.rank() }
+	likelihood = None
+	if args.serverSocket:
+		likelihood = pyRootPwa.likelihoodClient.connect(args.serverSocket, **likelihoodArguments)
+		if not likelihood:
+			pyRootPwa.utils.printWarn("loading likelihood without server.")
+	if not likelihood:
+		likelihood = pyRootPwa.initLikelihood(verbose = args.verbose, **likelihoodArguments)
+		if not likelihood:
+			pyRootPwa.utils.printErr("could not initialize likelihood. Aborting...")
+			sys.exit(1)
 
 	minimum = ROOT.TVectorD(likelihood.nmbPars())
 	for i in range(likelihood.nmbPars()):
 		parName = likelihood.parName(i)
 		minimum[i] = result.fitParameter(parName)
 
-	minimumLikelihood = likelihood.DoEval( [ minimum[i] for i in xrange(minimum.GetNrows()) ] )
+	minimumArray = numpy.array([ minimum[i] for i in xrange(minimum.GetNrows()) ])
+	minimumLikelihood = likelihood.DoEvalBatch(minimumArray)[0]
 	pyRootPwa.utils.printInfo("likelihood at minimum is {: .15e}.".format(minimumLikelihood))
 
 	covMatrixMinuit = result.fitParCovMatrix()
@@ -128,15 +142,13 @@ if __name__ == "__main__":
 		# This ideal parabola is drawn for a x between -sqrt(l) and
 		# +sqrt(l) using x = r * sqrt(l).
 
+		# all points of the slice are evaluated in one pass over the events
+		ratios = (numpy.arange(-50, 51) / 50.0) * math.sqrt(eigenVectorsMinuit[par][1])
+		eigenVector = numpy.array([ eigenVectorsMinuit[par][0][i] for i in xrange(eigenVectorsMinuit[par][0].GetNrows()) ])
+		likelis = likelihood.DoEvalBatch(minimumArray + numpy.outer(ratios, eigenVector)) - minimumLikelihood
 		graphLikeli = ROOT.TGraph()
-		for p in xrange(-50, 51):
-			ratio = (p/50.0) * math.sqrt(eigenVectorsMinuit[par][1])
-			# TODO: Fix this once root get's their operators in working order
-			step = ROOT.TVectorD(eigenVectorsMinuit[par][0])
-			step *= ratio
-			pars = minimum + step
-			likeli = likelihood.DoEval( [ pars[i] for i in xrange(pars.GetNrows()) ] ) - minimumLikelihood
-			graphLikeli.SetPoint(p + 50, ratio, likeli)
+		for p in xrange(len(ratios)):
+			graphLikeli.SetPoint(p, ratios[p], likelis[p])
 
 		lowerLimit = -1.2 * math.sqrt(eigenVectorsMinuit[par][1])
 		upperLimit =  1.2 * math.sqrt(eigenVectorsMinuit[par][1])
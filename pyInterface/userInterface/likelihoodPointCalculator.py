@@ -21,6 +21,8 @@ if __name__ == "__main__":
 	parser.add_argument("-P", "--cauchyPriorWidth", type=float, metavar ="WIDTH", default=0.5, help="width of half-Cauchy prior (default: 0.5)")
 	parser.add_argument("-A", type=int, metavar="#", dest="accEventsOverride", default=0,
 	                    help="number of input events to normalize acceptance to (default: use number of events from normalization integral file)")
+	parser.add_argument("--server", type=str, metavar="socket", dest="serverSocket", default="",
+	                    help="evaluate the likelihood with the server listening on this socket (see likelihoodServer.py) instead of loading it")
 	parser.add_argument("-v", "--verbose", help="verbose; print debug output (default: false)", action="store_true")
 	args = parser.parse_args()
 
@@ -55,16 +57,25 @@ if __name__ == "__main__":
 		pyRootPwa.utils.printErr("error while getting wave names, descriptions and thresholds. Aborting...")
 		sys.exit(1)
 
-	likelihood = pyRootPwa.initLikelihood(waveDescThres = waveDescThres,
-	                                      massBinCenter = result.massBinCenter(),
-	                                      ampFileList = ampFileList,
-	                                      normIntegralFileName = psIntegralPath,
-	                                      accIntegralFileName = accIntegralPath,
-	                                      accEventsOverride = args.accEventsOverride,
-	                                      cauchy = args.cauchyPriors,
-	                                      cauchyWidth = args.cauchyPriorWidth,
-	                                      rank = result.rank(),
-	                                      verbose = args.verbose)
+	likelihoodArguments = { "waveDescThres":        waveDescThres,
+	                        "massBinCenter":        result.massBinCenter(),
+	                        "ampFileList":          ampFileList,
+	                        "normIntegralFileName": psIntegralPath,
+	                        "accIntegralFileName":  accIntegralPath,
+	                        "accEventsOverride":    args.accEventsOverride,
+	                        "cauchy":               args.cauchyPriors,
+	                        "cauchyWidth":          args.cauchyPriorWidth,
+	                        "rank":                 result.rank() }
+	likelihood = None
+	if args.serverSocket:
+		likelihood = pyRootPwa.likelihoodClient.connect(args.serverSocket, **likelihoodArguments)
+		if not likelihood:
+			pyRootPwa.utils.printWarn("loading likelihood without server.")
+	if not likelihood:
+		likelihood = pyRootPwa.initLikelihood(verbose = args.verbose, **likelihoodArguments)
+		if not likelihood:
+			pyRootPwa.utils.printErr("could not initialize likelihood. Aborting...")
+			sys.exit(1)
 
 	pars = []
 	for i in range(likelihood.nmbPars()):
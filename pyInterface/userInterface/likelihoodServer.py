@@ -0,0 +1,48 @@
+#!/usr/bin/env python
+
+import argparse
+import sys
+
+import pyRootPwa
+import pyRootPwa.core
+
+
+if __name__ == "__main__":
+
+	parser = argparse.ArgumentParser(
+	                                 description="keeps likelihoods in memory and evaluates them for "
+	                                             "likelihoodPointCalculator.py, calcCovMatrixForFitResult.py "
+	                                             "and eigenvectorLikelihoodSlices.py (option --server)"
+	                                )
+
+	parser.add_argument("socketPath", type=str, metavar="socket", help="path of the Unix socket the server listens on")
+	parser.add_argument("-c", type=str, metavar="configFileName", dest="configFileName", default="./rootpwa.config", help="path to config file (default: './rootpwa.config')")
+	parser.add_argument("-m", type=float, metavar="memory", dest="maxMemory", default=4096.,
+	                    help="memory in MiB for loaded likelihoods; least recently used ones are dropped (default: 4096, 0 for unlimited)")
+	parser.add_argument("-j", type=int, metavar="#", dest="nmbThreads", default=1,
+	                    help="number of threads for the event loops of the likelihoods (default: 1, 0 for the number of cores)")
+	parser.add_argument("--stop", action="store_true", dest="stop", help="shut down the server listening on the socket")
+	parser.add_argument("-v", "--verbose", help="verbose; print debug output (default: false)", action="store_true")
+	args = parser.parse_args()
+
+	if args.stop:
+		try:
+			pyRootPwa.likelihoodClient.shutdownServer(args.socketPath)
+		except (IOError, OSError) as exc:
+			pyRootPwa.utils.printErr("could not shut down server at '" + args.socketPath + "': " + str(exc))
+			sys.exit(1)
+		pyRootPwa.utils.printSucc("shut down server at '" + args.socketPath + "'.")
+		sys.exit(0)
+
+	config = pyRootPwa.rootPwaConfig()
+	if not config.initialize(args.configFileName):
+		pyRootPwa.utils.printErr("loading config file '" + args.configFileName + "' failed. Aborting...")
+		sys.exit(1)
+	pyRootPwa.core.particleDataTable.readFile(config.pdgFileName)
+
+	server = pyRootPwa.likelihoodServer(args.socketPath,
+	                                    maxMemory = int(args.maxMemory * 1024**2),
+	                                    nmbThreads = args.nmbThreads,
+	                                    verbose = args.verbose)
+	if not server.serve():
+		sys.exit(1)
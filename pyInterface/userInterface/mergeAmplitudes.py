@@ -0,0 +1,145 @@
+#!/usr/bin/env python
+
+import argparse
+import glob
+import os
+import sys
+
+import pyRootPwa
+import pyRootPwa.core
+
+
+def getNmbEvents(dataFileName):
+	dataFile = pyRootPwa.ROOT.TFile.Open(dataFileName, "READ")
+	if not dataFile:
+		return -1
+	eventMeta = pyRootPwa.core.eventMetadata.readEventFile(dataFile, True)
+	if not eventMeta:
+		dataFile.Close()
+		return -1
+	nmbEvents = eventMeta.eventTree().GetEntries()
+	dataFile.Close()
+	return nmbEvents
+
+
+def getShardFileNames(ampFileName, nmbEvents):
+	# returns the shard files of the given amplitude file ordered by their start
+	# event, or None if they do not cover the events [0, nmbEvents) exactly once
+	(base, ext) = os.path.splitext(ampFileName)
+	shards = []
+	for shardFileName in glob.glob(base + "_events-*-*" + ext):
+		shardRange = pyRootPwa.amplitudeShardFileRange(shardFileName)
+		if shardRange is None:
+			continue
+		shards.append((shardRange[0], shardRange[1], shardFileName))
+	if not shards:
+		return []
+	shards.sort()
+	nextEvent = 0
+	for (startEvent, nmbShardEvents, shardFileName) in shards:
+		if startEvent != nextEvent:
+			pyRootPwa.utils.printWarn("shard files of amplitude file '" + ampFileName + "' are not contiguous: expected start event "
+			                          + str(nextEvent) + ", found '" + shardFileName + "'.")
+			return None
+		nextEvent = startEvent + nmbShardEvents
+	if nextEvent != nmbEvents:
+		pyRootPwa.utils.printWarn("shard files of amplitude file '" + ampFileName + "' cover " + str(nextEvent)
+		                          + " events, but data file has " + str(nmbEvents) + " events.")
+		return None
+	return [ shardFileName for (_, _, shardFileName) in shards ]
+
+
+if __name__ == "__main__":
+
+	# parse command line arguments
+	parser = argparse.ArgumentParser(
+	                                 description="merges the amplitude shard files written by "
+	                                             "'calcAmplitudes.py -s' into one amplitude file "
+	                                             "per wave, bin and events type"
+	                                )
+
+	parser.add_argument("-c", type=str, metavar="configFileName", default="rootpwa.config", dest="configFileName", help="path to config file (default: ./rootpwa.config)")
+	parser.add_argument("-b", type=int, metavar="massBin", default=-1, dest="massBin", help="mass bin to be merged (default: all)")
+	parser.add_argument("-e", type=str, metavar="eventsType", default="all", dest="eventsType", help="events type to be merged ('real', 'generated' or 'accepted', default: all)")
+	parser.add_argument("-w", type=str, metavar="wavelistFileName", default="", dest="wavelistFileName", help="path to wavelist file (default: none)")
+	parser.add_argument("-r", "--remove-shards", action="store_true", dest="removeShards", help="remove the shard files after a successful merge")
+	args = parser.parse_args()
+
+	config = pyRootPwa.rootPwaConfig()
+	if not config.initialize(args.configFileName):
+		pyRootPwa.utils.printErr("loading config file '" + args.configFileName + "' failed. Aborting...")
+		sys.exit(1)
+	fileManager = pyRootPwa.loadFileManager(config.fileManagerPath)
+	if not fileManager:
+		pyRootPwa.utils.printErr("loading the file manager failed. Aborting...")
+		sys.exit(1)
+
+	waveList = []
+	if not args.wavelistFileName == "":
+		waveList = [ i[0] for i in pyRootPwa.utils.getWaveDescThresFromWaveList(args.wavelistFileName, fileManager.getKeyFiles()) ]
+	if not waveList:
+		waveList = fileManager.getWaveNameList()
+
+	binIDList = fileManager.getBinIDList()
+	if not args.massBin == -1:
+		binIDList = [args.massBin]
+
+	eventsTypes = []
+	if args.eventsType == "real":
+		eventsTypes = [ pyRootPwa.core.eventMetadata.REAL ]
+	elif args.eventsType == "generated":
+		eventsTypes = [ pyRootPwa.core.eventMetadata.GENERATED ]
+	elif args.eventsType == "accepted":
+		eventsTypes = [ pyRootPwa.core.eventMetadata.ACCEPTED ]
+	elif args.eventsType == "all":
+		eventsTypes = [ pyRootPwa.core.eventMetadata.REAL,
+		                pyRootPwa.core.eventMetadata.GENERATED,
+		                pyRootPwa.core.eventMetadata.ACCEPTED ]
+	else:
+		pyRootPwa.utils.printErr("Invalid events type given ('" + args.eventsType + "'). Aborting...")
+		sys.exit(1)
+
+	nmbMerged = 0
+	failed = []
+	for binID in binIDList:
+		for eventsType in eventsTypes:
+			dataFile = fileManager.getDataFile(binID, eventsType)
+			if not dataFile:
+				continue
+			nmbEvents = getNmbEvents(dataFile.dataFileName)
+			if nmbEvents < 0:
+				pyRootPwa.utils.printWarn("could not read number of events from data file '" + dataFile.dataFileName + "'.")
+				continue
+			for waveName in waveList:
+				ampFileName = fileManager.getAmplitudeFilePath(binID, waveName, eventsType)
+				shardFileNames = getShardFileNames(ampFileName, nmbEvents)
+				if shardFileNames is None:
+					failed.append(ampFileName)
+					continue
+				if not shardFileNames:
+					continue
+				if os.path.isfile(ampFileName):
+					complete = pyRootPwa.isAmplitudeFileComplete(ampFileName, waveName, nmbEvents)
+					if complete:
+						pyRootPwa.utils.printInfo("amplitude file '" + ampFileName + "' is already complete. Skipping...")
+						continue
+					if complete is None:
+						pyRootPwa.utils.printErr("could not check whether amplitude file '" + ampFileName + "' is complete. "
+						                         + "leaving it untouched.")
+						failed.append(ampFileName)
+						continue
+					pyRootPwa.utils.printWarn("removing incomplete amplitude file '" + ampFileName + "'.")
+					pyRootPwa.removeAmplitudeFile(ampFileName, waveName)
+				if not pyRootPwa.mergeAmplitudeFiles(shardFileNames, ampFileName, waveName):
+					failed.append(ampFileName)
+					continue
+				nmbMerged += 1
+				if args.removeShards:
+					for shardFileName in shardFileNames:
+						pyRootPwa.removeAmplitudeFile(shardFileName, waveName)
+
+	if failed:
+		for ampFileName in failed:
+			pyRootPwa.utils.printErr("could not merge shard files of amplitude file '" + ampFileName + "'.")
+		sys.exit(1)
+	pyRootPwa.utils.printSucc("merged shard files into " + str(nmbMerged) + " amplitude files.")
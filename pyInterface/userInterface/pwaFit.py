@@ -29,6 +29,11 @@ if __name__ == "__main__":
 	parser.add_argument("-H", "--checkHessian", help="check analytical Hessian eigenvalues (default: false)", action="store_true")
 	parser.add_argument("-z", "--saveSpace", help="save space by not saving integral and covariance matrices (default: false)", action="store_true")
 	parser.add_argument("-v", "--verbose", help="verbose; print debug output (default: false)", action="store_true")
+	parser.add_argument("-j", type=int, metavar="#", dest="nmbThreads", default=1,
+	                    help="number of threads for the likelihood calculation (0 for the number of cores); "
+	                         "results are reproducible for a fixed number of threads (default: 1)")
+	parser.add_argument("--io-report", type=str, metavar="reportFileName", default="", dest="ioReportFileName",
+	                    help="append I/O statistics of reading the amplitudes and timing of the fit as JSON line to this file (default: none)")
 	args = parser.parse_args()
 
 	printErr  = pyRootPwa.utils.printErr
@@ -70,6 +75,10 @@ if __name__ == "__main__":
 			         "a fit without acceptance (got: {:d}, expected: {:d}). Aborting...".format(args.accEventsOverride, intMatrix.nmbEvents()))
 			sys.exit(1)
 
+	ioMonitor = None
+	if args.ioReportFileName:
+		ioMonitor = pyRootPwa.utils.ioMonitor("pwaFit", binID = args.binID, nmbWaves = len(ampFileList), rank = args.rank, attempts = args.nAttempts)
+		ioMonitor.start()
 	fitResults = pyRootPwa.pwaFit(
 	                              ampFileList = ampFileList,
 	                              normIntegralFileName = psIntegralPath,
@@ -86,8 +95,14 @@ if __name__ == "__main__":
 	                              saveSpace = args.saveSpace,
 	                              rank = args.rank,
 	                              verbose = args.verbose,
-	                              attempts = args.nAttempts
+	                              attempts = args.nAttempts,
+	                              ioMonitor = ioMonitor,
+	                              nmbThreads = args.nmbThreads
 	                             )
+	if ioMonitor:
+		ioRecord = ioMonitor.stop()
+		ioRecord["success"] = bool(fitResults)
+		pyRootPwa.utils.appendIoReport(args.ioReportFileName, [ ioRecord ])
 	if not fitResults:
 		printErr("didn't get valid fit result(s). Aborting...")
 		sys.exit(1)
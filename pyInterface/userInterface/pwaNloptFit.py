@@ -29,6 +29,9 @@ if __name__ == "__main__":
 	parser.add_argument("-H", "--checkHessian", help="check analytical Hessian eigenvalues (default: false)", action="store_true")
 	parser.add_argument("-z", "--saveSpace", help="save space by not saving integral and covariance matrices (default: false)", action="store_true")
 	parser.add_argument("-v", "--verbose", help="verbose; print debug output (default: false)", action="store_true")
+	parser.add_argument("-j", type=int, metavar="#", dest="nmbThreads", default=1,
+	                    help="number of threads for the likelihood calculation (0 for the number of cores); "
+	                         "results are reproducible for a fixed number of threads (default: 1)")
 	args = parser.parse_args()
 
 	printErr  = pyRootPwa.utils.printErr
@@ -86,7 +89,8 @@ if __name__ == "__main__":
 	                                   saveSpace = args.saveSpace,
 	                                   rank = args.rank,
 	                                   verbose = args.verbose,
-	                                   attempts = args.nAttempts
+	                                   attempts = args.nAttempts,
+	                                   nmbThreads = args.nmbThreads
 	                                  )
 	if not fitResults:
 		printErr("didn't get valid fit result(s). Aborting...")
@@ -0,0 +1,102 @@
+#!/usr/bin/env python
+
+import argparse
+import os
+import sys
+
+import pyRootPwa
+import pyRootPwa.core
+
+
+def getBinGroups(fileManager, binningVariable, factor):
+	# groups the bins of the file manager into coarse bins of 'factor'
+	# consecutive bins along 'binningVariable'
+	if binningVariable not in fileManager.globalAxes:
+		pyRootPwa.utils.printErr("binning variable '" + binningVariable + "' not in binning axes " + str(fileManager.globalAxes.keys()) + ".")
+		return None
+	axis = fileManager.globalAxes[binningVariable]
+	groups = {}
+	for binID in fileManager.getBinIDList():
+		currentBin = fileManager.getBinFromID(binID)
+		otherBins = tuple(sorted((variable, currentBin[variable]) for variable in currentBin if variable != binningVariable))
+		groupIndex = axis.index(currentBin[binningVariable]) // factor
+		groups.setdefault((otherBins, groupIndex), []).append(binID)
+	binGroups = []
+	for key in sorted(groups):
+		binIDs = sorted(groups[key], key = lambda binID: fileManager.getBinFromID(binID)[binningVariable][0])
+		if len(binIDs) < factor:
+			pyRootPwa.utils.printWarn("coarse bin of bins " + str(binIDs) + " contains only " + str(len(binIDs)) + " bins.")
+		binGroups.append(binIDs)
+	return binGroups
+
+
+if __name__ == "__main__":
+
+	parser = argparse.ArgumentParser(
+	                                 description="combines the integrals of adjacent bins into the integrals of "
+	                                             "coarser bins without recalculating amplitudes or integrals"
+	                                )
+
+	parser.add_argument("-c", type=str, metavar="configFileName", dest="configFileName", default="./rootpwa.config", help="path to config file (default: './rootpwa.config')")
+	parser.add_argument("-e", type=str, metavar="eventsType", default="all", dest="eventsType", help="events type to be combined ('generated' or 'accepted', default: both)")
+	parser.add_argument("-o", type=str, metavar="outputDirectory", required=True, dest="outputDirectory", help="directory for the integral files of the coarse bins")
+	parser.add_argument("-b", type=int, metavar="binID", action="append", default=[], dest="binIDs",
+	                    help="bin to be combined into one coarse bin; can be given several times")
+	parser.add_argument("-v", type=str, metavar="binningVariable", default="", dest="binningVariable",
+	                    help="combine each 'factor' consecutive bins along this binning variable (see -n)")
+	parser.add_argument("-n", type=int, metavar="factor", default=2, dest="factor", help="number of bins combined along the binning variable (default: 2)")
+	args = parser.parse_args()
+
+	printErr  = pyRootPwa.utils.printErr
+	printSucc = pyRootPwa.utils.printSucc
+
+	if bool(args.binIDs) == bool(args.binningVariable):
+		printErr("either bins (-b) or a binning variable (-v) have to be given. Aborting...")
+		sys.exit(1)
+	if args.factor < 1:
+		printErr("number of combined bins has to be positive (got " + str(args.factor) + "). Aborting...")
+		sys.exit(1)
+
+	config = pyRootPwa.rootPwaConfig()
+	if not config.initialize(args.configFileName):
+		printErr("loading config file '" + args.configFileName + "' failed. Aborting...")
+		sys.exit(1)
+	fileManager = pyRootPwa.loadFileManager(config.fileManagerPath)
+	if not fileManager:
+		printErr("loading the file manager failed. Aborting...")
+		sys.exit(1)
+
+	eventsTypes = []
+	if args.eventsType == "generated":
+		eventsTypes = [ pyRootPwa.core.eventMetadata.GENERATED ]
+	elif args.eventsType == "accepted":
+		eventsTypes = [ pyRootPwa.core.eventMetadata.ACCEPTED ]
+	elif args.eventsType == "all":
+		eventsTypes = [ pyRootPwa.core.eventMetadata.GENERATED,
+		                pyRootPwa.core.eventMetadata.ACCEPTED ]
+	else:
+		printErr("Invalid events type given ('" + args.eventsType + "'). Aborting...")
+		sys.exit(1)
+
+	if args.binIDs:
+		for binID in args.binIDs:
+			if binID not in fileManager.getBinIDList():
+				printErr("bin " + str(binID) + " does not exist. Aborting...")
+				sys.exit(1)
+		binGroups = [ sorted(set(args.binIDs)) ]
+	else:
+		binGroups = getBinGroups(fileManager, args.binningVariable, args.factor)
+		if binGroups is None:
+			sys.exit(1)
+
+	if not os.path.isdir(args.outputDirectory):
+		os.makedirs(args.outputDirectory)
+	for binIDs in binGroups:
+		for eventsType in eventsTypes:
+			inputFileNames = [ fileManager.getIntegralFilePath(binID, eventsType) for binID in binIDs ]
+			outputFileName = os.path.join(args.outputDirectory, "integral_binIDs-" + "-".join(str(binID) for binID in binIDs)
+			                              + "_" + str(fileManager.eventsTypeFromBpEnum(eventsType)) + ".root")
+			if not pyRootPwa.rebinIntegralFiles(inputFileNames, outputFileName):
+				printErr("could not combine integrals of bins " + str(binIDs) + ". Aborting...")
+				sys.exit(1)
+			printSucc("wrote integral of bins " + str(binIDs) + " to file '" + outputFileName + "'")
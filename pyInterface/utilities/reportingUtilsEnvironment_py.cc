@@ -12,5 +12,6 @@ void rpwa::py::exportReportingUtilsEnvironment() {
 	bp::def("printGitHash", &rpwa::printGitHash);
 	bp::def("printCompilerInfo", &rpwa::printCompilerInfo);
 	bp::def("printLibraryInfo", &rpwa::printLibraryInfo);
+	bp::def("gitHash", &rpwa::gitHash);
 
 }
@@ -0,0 +1,299 @@
+#include "amplitudeDataFile.h"
+
+#include <algorithm>
+#include <cerrno>
+#include <cstring>
+
+#include <fcntl.h>
+#include <sys/mman.h>
+#include <sys/stat.h>
+#include <unistd.h>
+
+#include <boost/cstdint.hpp>
+
+#include "reportingUtils.hpp"
+
+using namespace rpwa;
+using namespace std;
+
+
+namespace {
+
+	// header layout: 8 bytes magic, 8 bytes number of amplitudes,
+	// 4 bytes bytes per amplitude, zero padding up to the header size
+	const char   dataFileMagic[8]    = {'R', 'P', 'W', 'A', 'A', 'M', 'P', '1'};
+	const size_t nmbAmplitudesOffset = 8;
+	const size_t bytesPerAmpOffset   = 16;
+
+}
+
+
+const string rpwa::amplitudeDataFile::fileExtension = ".amps";
+
+
+rpwa::amplitudeDataFile::amplitudeDataFile()
+	: _fileName(""),
+	  _outputStream(),
+	  _nmbAmplitudes(0),
+	  _singlePrecision(false),
+	  _conversionBuffer(),
+	  _mappedData(0),
+	  _mappedSize(0) { }
+
+
+rpwa::amplitudeDataFile::~amplitudeDataFile()
+{
+	close();
+}
+
+
+bool rpwa::amplitudeDataFile::openForWriting(const string& fileName,
+                                             const bool    singlePrecision)
+{
+	if(isOpenForWriting() or isOpenForReading()) {
+		printWarn << "trying to open data file '" << fileName << "' while file '" << _fileName << "' is still open." << endl;
+		return false;
+	}
+	// like TFile::Open(..., "NEW") an existing file is not overwritten
+	if(access(fileName.c_str(), F_OK) == 0) {
+		printWarn << "amplitude data file '" << fileName << "' already exists." << endl;
+		return false;
+	}
+	_outputStream.open(fileName.c_str(), ios::out | ios::binary | ios::trunc);
+	if(not _outputStream) {
+		printWarn << "could not open amplitude data file '" << fileName << "' for writing." << endl;
+		return false;
+	}
+	_fileName        = fileName;
+	_nmbAmplitudes   = 0;
+	_singlePrecision = singlePrecision;
+	// the number of amplitudes stays zero until the file is closed, so
+	// that incompletely written files are recognized when reading them
+	return writeHeader();
+}
+
+
+bool rpwa::amplitudeDataFile::write(const complex<double>* amplitudes, const size_t nmbAmplitudes)
+{
+	if(not isOpenForWriting()) {
+		printWarn << "trying to write amplitudes to data file which is not open for writing." << endl;
+		return false;
+	}
+	if(_singlePrecision) {
+		_conversionBuffer.resize(nmbAmplitudes);
+		for(size_t i = 0; i < nmbAmplitudes; ++i) {
+			_conversionBuffer[i] = complex<float>(amplitudes[i].real(), amplitudes[i].imag());
+		}
+		_outputStream.write(reinterpret_cast<const char*>(_conversionBuffer.data()), nmbAmplitudes * sizeof(complex<float>));
+	} else {
+		_outputStream.write(reinterpret_cast<const char*>(amplitudes), nmbAmplitudes * sizeof(complex<double>));
+	}
+	if(not _outputStream) {
+		printWarn << "error writing amplitudes to data file '" << _fileName << "'." << endl;
+		return false;
+	}
+	_nmbAmplitudes += nmbAmplitudes;
+	return true;
+}
+
+
+bool rpwa::amplitudeDataFile::closeForWriting()
+{
+	if(not isOpenForWriting()) {
+		printWarn << "trying to close data file which is not open for writing." << endl;
+		return false;
+	}
+	_outputStream.seekp(0);
+	const bool success = writeHeader();
+	_outputStream.close();
+	if(not success or _outputStream.fail()) {
+		printWarn << "error finishing amplitude data file '" << _fileName << "'." << endl;
+		return false;
+	}
+	return true;
+}
+
+
+bool rpwa::amplitudeDataFile::openForReading(const string& fileName, const bool quiet)
+{
+	if(isOpenForWriting() or isOpenForReading()) {
+		printWarn << "trying to open data file '" << fileName << "' while file '" << _fileName << "' is still open." << endl;
+		return false;
+	}
+	const int fileDescriptor = open(fileName.c_str(), O_RDONLY);
+	if(fileDescriptor < 0) {
+		if(not quiet) {
+			printWarn << "could not open amplitude data file '" << fileName << "': " << strerror(errno) << "." << endl;
+		}
+		return false;
+	}
+	struct stat fileStat;
+	if(fstat(fileDescriptor, &fileStat) != 0 or (size_t)fileStat.st_size < headerSize) {
+		if(not quiet) {
+			printWarn << "amplitude data file '" << fileName << "' is too short to contain a header." << endl;
+		}
+		::close(fileDescriptor);
+		return false;
+	}
+	void* mappedData = mmap(0, fileStat.st_size, PROT_READ, MAP_SHARED, fileDescriptor, 0);
+	// the mapping stays valid after the file descriptor is closed
+	::close(fileDescriptor);
+	if(mappedData == MAP_FAILED) {
+		if(not quiet) {
+			printWarn << "could not map amplitude data file '" << fileName << "': " << strerror(errno) << "." << endl;
+		}
+		return false;
+	}
+	_fileName   = fileName;
+	_mappedData = mappedData;
+	_mappedSize = fileStat.st_size;
+
+	const char* header = static_cast<const char*>(_mappedData);
+	boost::uint64_t nmbAmplitudes;
+	boost::uint32_t bytesPerAmp;
+	memcpy(&nmbAmplitudes, header + nmbAmplitudesOffset, sizeof(nmbAmplitudes));
+	memcpy(&bytesPerAmp,   header + bytesPerAmpOffset,   sizeof(bytesPerAmp));
+	if(memcmp(header, dataFileMagic, sizeof(dataFileMagic)) != 0) {
+		if(not quiet) {
+			printWarn << "'" << fileName << "' is not an amplitude data file." << endl;
+		}
+		close();
+		return false;
+	}
+	if(bytesPerAmp != sizeof(complex<double>) and bytesPerAmp != sizeof(complex<float>)) {
+		if(not quiet) {
+			printWarn << "amplitude data file '" << fileName << "' has " << bytesPerAmp << " bytes per amplitude, "
+			          << "expected " << sizeof(complex<double>) << " or " << sizeof(complex<float>) << "." << endl;
+		}
+		close();
+		return false;
+	}
+	if(_mappedSize != headerSize + nmbAmplitudes * bytesPerAmp) {
+		if(not quiet) {
+			printWarn << "size of amplitude data file '" << fileName << "' does not match the "
+			          << nmbAmplitudes << " amplitudes given in its header. file is incomplete." << endl;
+		}
+		close();
+		return false;
+	}
+	_nmbAmplitudes   = nmbAmplitudes;
+	_singlePrecision = (bytesPerAmp == sizeof(complex<float>));
+	// amplitudes are read sequentially by all consumers
+	madvise(_mappedData, _mappedSize, MADV_SEQUENTIAL);
+	return true;
+}
+
+
+void rpwa::amplitudeDataFile::close()
+{
+	if(isOpenForWriting()) {
+		_outputStream.close();
+	}
+	if(_mappedData) {
+		munmap(_mappedData, _mappedSize);
+		_mappedData = 0;
+		_mappedSize = 0;
+	}
+	_nmbAmplitudes = 0;
+}
+
+
+const complex<double>* rpwa::amplitudeDataFile::amplitudes() const
+{
+	if(not _mappedData or _singlePrecision) {
+		return 0;
+	}
+	return reinterpret_cast<const complex<double>*>(static_cast<const char*>(_mappedData) + headerSize);
+}
+
+
+const complex<float>* rpwa::amplitudeDataFile::singlePrecisionAmplitudes() const
+{
+	if(not _mappedData or not _singlePrecision) {
+		return 0;
+	}
+	return reinterpret_cast<const complex<float>*>(static_cast<const char*>(_mappedData) + headerSize);
+}
+
+
+bool rpwa::amplitudeDataFile::readAmplitudes(complex<double>* amplitudes,
+                                             const size_t     firstAmplitude,
+                                             const size_t     nmbAmplitudes) const
+{
+	if(not isOpenForReading()) {
+		printWarn << "trying to read amplitudes from data file which is not open for reading." << endl;
+		return false;
+	}
+	if(firstAmplitude + nmbAmplitudes > _nmbAmplitudes) {
+		printWarn << "requested amplitudes [" << firstAmplitude << ", " << firstAmplitude + nmbAmplitudes << ") "
+		          << "are out of range [0, " << _nmbAmplitudes << ")." << endl;
+		return false;
+	}
+	if(_singlePrecision) {
+		const complex<float>* amps = singlePrecisionAmplitudes() + firstAmplitude;
+		copy(amps, amps + nmbAmplitudes, amplitudes);
+	} else {
+		const complex<double>* amps = this->amplitudes() + firstAmplitude;
+		copy(amps, amps + nmbAmplitudes, amplitudes);
+	}
+	return true;
+}
+
+
+long rpwa::amplitudeDataFile::readNmbAmplitudes(const string& fileName)
+{
+	const int fileDescriptor = open(fileName.c_str(), O_RDONLY);
+	if(fileDescriptor < 0) {
+		return -2;
+	}
+	char header[headerSize];
+	struct stat fileStat;
+	const bool headerRead = (fstat(fileDescriptor, &fileStat) == 0
+	                         and (size_t)fileStat.st_size >= headerSize
+	                         and pread(fileDescriptor, header, headerSize, 0) == (ssize_t)headerSize);
+	::close(fileDescriptor);
+	if(not headerRead or memcmp(header, dataFileMagic, sizeof(dataFileMagic)) != 0) {
+		return -2;
+	}
+	boost::uint64_t nmbAmplitudes;
+	boost::uint32_t bytesPerAmp;
+	memcpy(&nmbAmplitudes, header + nmbAmplitudesOffset, sizeof(nmbAmplitudes));
+	memcpy(&bytesPerAmp,   header + bytesPerAmpOffset,   sizeof(bytesPerAmp));
+	if(bytesPerAmp != sizeof(complex<double>) and bytesPerAmp != sizeof(complex<float>)) {
+		return -2;
+	}
+	if((size_t)fileStat.st_size != headerSize + nmbAmplitudes * bytesPerAmp) {
+		return -1;
+	}
+	return nmbAmplitudes;
+}
+
+
+string rpwa::amplitudeDataFile::dataFileName(const string& rootFileName,
+                                             const string& objectBaseName)
+{
+	string stem = rootFileName;
+	const size_t extPos = stem.rfind(".root");
+	if(extPos != string::npos and extPos + 5 == stem.size()) {
+		stem.erase(extPos);
+	}
+	return stem + "." + objectBaseName + fileExtension;
+}
+
+
+bool rpwa::amplitudeDataFile::writeHeader()
+{
+	char header[headerSize];
+	memset(header, 0, headerSize);
+	const boost::uint64_t nmbAmplitudes = _nmbAmplitudes;
+	const boost::uint32_t bytesPerAmp   = bytesPerAmplitude();
+	memcpy(header,                       dataFileMagic,  sizeof(dataFileMagic));
+	memcpy(header + nmbAmplitudesOffset, &nmbAmplitudes, sizeof(nmbAmplitudes));
+	memcpy(header + bytesPerAmpOffset,   &bytesPerAmp,   sizeof(bytesPerAmp));
+	_outputStream.write(header, headerSize);
+	if(not _outputStream) {
+		printWarn << "error writing header of amplitude data file '" << _fileName << "'." << endl;
+		return false;
+	}
+	return true;
+}
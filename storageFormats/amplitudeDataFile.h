@@ -0,0 +1,81 @@
+#ifndef AMPLITUDEDATAFILE_H
+#define AMPLITUDEDATAFILE_H
+
+#include <complex>
+#include <fstream>
+#include <string>
+#include <vector>
+
+
+namespace rpwa {
+
+	// raw file holding the amplitudes of one wave as one contiguous array of
+	// std::complex<double> (or std::complex<float> in single-precision mode)
+	// behind a fixed-size header; it is written
+	// sequentially and memory-mapped read-only for reading, so that the
+	// amplitudes can be accessed without deserializing one object per event
+	// and processes reading the same file share its pages in the page cache
+	class amplitudeDataFile {
+
+	  public:
+
+		amplitudeDataFile();
+		~amplitudeDataFile();
+
+		bool openForWriting(const std::string& fileName,
+		                    const bool         singlePrecision = false);  ///< if set, amplitudes are stored as std::complex<float>
+		bool write(const std::complex<double>* amplitudes, const size_t nmbAmplitudes);
+		bool write(const std::complex<double>& amplitude) { return write(&amplitude, 1); }
+		bool closeForWriting();  ///< writes the number of amplitudes into the header and closes the file
+
+		bool openForReading(const std::string& fileName, const bool quiet = false);
+
+		void close();  ///< closes the file (a file opened for writing is left incomplete)
+
+		bool                        isOpenForWriting() const { return _outputStream.is_open(); }
+		bool                        isOpenForReading() const { return _mappedData != 0;        }
+		const std::string&          fileName        () const { return _fileName;               }
+		size_t                      nmbAmplitudes   () const { return _nmbAmplitudes;          }
+		bool                        singlePrecision () const { return _singlePrecision;        }
+		const std::complex<double>* amplitudes      () const;  ///< mapped amplitudes; NULL if not open for reading or in single precision
+		const std::complex<float>*  singlePrecisionAmplitudes() const;  ///< mapped amplitudes; NULL if not open for reading or in double precision
+
+		// copies nmbAmplitudes mapped amplitudes starting at firstAmplitude,
+		// converting them to double precision if necessary
+		bool readAmplitudes(std::complex<double>* amplitudes,
+		                    const size_t          firstAmplitude,
+		                    const size_t          nmbAmplitudes) const;
+
+		// number of amplitudes given in the header of the data file, which is
+		// read without mapping the file; -1 if the file is incomplete, i.e. its
+		// size does not match the header, and -2 if it could not be read
+		static long readNmbAmplitudes(const std::string& fileName);
+
+		// name of the data file belonging to the given amplitude file and object
+		static std::string dataFileName(const std::string& rootFileName,
+		                                const std::string& objectBaseName);
+
+		static const std::string fileExtension;
+		static const size_t      headerSize = 64;
+
+	  private:
+
+		amplitudeDataFile(const amplitudeDataFile&);
+		amplitudeDataFile& operator =(const amplitudeDataFile&);
+
+		bool writeHeader();
+		size_t bytesPerAmplitude() const { return _singlePrecision ? sizeof(std::complex<float>) : sizeof(std::complex<double>); }
+
+		std::string                       _fileName;
+		std::ofstream                     _outputStream;
+		size_t                            _nmbAmplitudes;
+		bool                              _singlePrecision;
+		std::vector<std::complex<float> > _conversionBuffer;  ///< buffer for writing in single precision
+		void*                             _mappedData;
+		size_t                            _mappedSize;
+
+	}; // class amplitudeDataFile
+
+} // namespace rpwa
+
+#endif
@@ -1,6 +1,9 @@
 
 #include "amplitudeFileWriter.h"
 
+#include <algorithm>
+#include <cstdio>
+
 #include <TFile.h>
 #include <TTree.h>
 
@@ -13,11 +16,21 @@ using namespace rpwa;
 using namespace std;
 
 
+namespace {
+
+	// number of amplitudes of a columnar file that are read and written at a
+	// time when appending it
+	const long appendBlockSize = 1 << 16;
+
+}
+
+
 rpwa::amplitudeFileWriter::amplitudeFileWriter()
 	: _initialized(false),
 	  _outputFile(0),
 	  _metadata(),
 	  _ampTreeLeaf(0),
+	  _dataFile(),
 	  _hashCalculator()
 {
 
@@ -35,13 +48,21 @@ bool rpwa::amplitudeFileWriter::initialize(TFile&                             ou
                                            const string&                      keyfileContent,
                                            const string&                      objectBaseName,
                                            const int&                         splitlevel,
-                                           const int&                         buffsize)
+                                           const int&                         buffsize,
+                                           const bool&                        columnar,
+                                           const bool&                        singlePrecision)
 {
 	if(_initialized) {
 		printWarn << "trying to initialized when already initialized." << endl;
 		return false;
 	}
 
+	if(singlePrecision and not columnar) {
+		// the sub-amplitudes of amplitudeTreeLeaf are always stored in double precision
+		printWarn << "single-precision amplitudes can only be stored in columnar files." << endl;
+		return false;
+	}
+
 	_outputFile = &outputFile;
 	_outputFile->cd();
 
@@ -54,6 +75,24 @@ bool rpwa::amplitudeFileWriter::initialize(TFile&                             ou
 	_metadata.setRootpwaGitHash(gitHash());
 	_metadata.setObjectBaseName(objectBaseName);
 
+	if(columnar) {
+		const string dataFileName = amplitudeDataFile::dataFileName(outputFile.GetName(), objectBaseName);
+		if(not _dataFile.openForWriting(dataFileName, singlePrecision)) {
+			printWarn << "could not open amplitude data file '" << dataFileName << "'." << endl;
+			_outputFile = 0;
+			return false;
+		}
+		// the metadata refer to the data file relative to the amplitude file
+		const size_t slashPos = dataFileName.rfind('/');
+		_metadata.setAmplitudeDataFileName((slashPos == string::npos) ? dataFileName : dataFileName.substr(slashPos + 1));
+		_metadata.setSinglePrecision(singlePrecision);
+		_metadata._amplitudeTree = 0;
+		_initialized = true;
+		return _initialized;
+	}
+	_metadata.setAmplitudeDataFileName("");
+	_metadata.setSinglePrecision(false);
+
 	const string treeName = amplitudeMetadata::getObjectNames(objectBaseName).first;
 
 	_metadata._amplitudeTree = new TTree(treeName.c_str(), treeName.c_str());
@@ -71,26 +110,114 @@ void rpwa::amplitudeFileWriter::addAmplitude(const complex<double>& amplitude)
 		printWarn << "trying to add amplitude when not initialized." << endl;
 		return;
 	}
-	_ampTreeLeaf->setAmp(amplitude);
+	if(_dataFile.isOpenForWriting()) {
+		if(_dataFile.singlePrecision()) {
+			// the hash has to match the stored values
+			_hashCalculator.Update(complex<double>(complex<float>(amplitude)));
+		} else {
+			_hashCalculator.Update(amplitude);
+		}
+		_dataFile.write(amplitude);
+		return;
+	}
 	_hashCalculator.Update(amplitude);
+	_ampTreeLeaf->setAmp(amplitude);
 	_metadata._amplitudeTree->Fill();
 }
 
 
 void rpwa::amplitudeFileWriter::addAmplitudes(const vector<complex<double> >& amplitudes)
 {
+	if(_initialized and _dataFile.isOpenForWriting()) {
+		if(_dataFile.singlePrecision()) {
+			// the hash has to match the stored values
+			for(unsigned int i = 0; i < amplitudes.size(); ++i) {
+				_hashCalculator.Update(complex<double>(complex<float>(amplitudes[i])));
+			}
+		} else {
+			for(unsigned int i = 0; i < amplitudes.size(); ++i) {
+				_hashCalculator.Update(amplitudes[i]);
+			}
+		}
+		if(not amplitudes.empty()) {
+			_dataFile.write(&amplitudes[0], amplitudes.size());
+		}
+		return;
+	}
 	for(unsigned int i = 0; i < amplitudes.size(); ++i) {
 		addAmplitude(amplitudes[i]);
 	}
 }
 
 
+bool rpwa::amplitudeFileWriter::appendAmplitudeTree(const amplitudeMetadata& amplitudeMeta)
+{
+	if(not _initialized) {
+		printWarn << "trying to append amplitudes when not initialized." << endl;
+		return false;
+	}
+	if(amplitudeMeta.keyfileContent() != _metadata.keyfileContent()) {
+		printWarn << "keyfile content of amplitudes to be appended does not match." << endl;
+		return false;
+	}
+	if(amplitudeMeta.isColumnar()) {
+		// the amplitudes are copied in blocks, so that the data file does not
+		// have to fit into memory
+		const long nmbAmps = amplitudeMeta.nmbAmplitudes();
+		vector<complex<double> > amplitudes;
+		amplitudes.reserve(min(nmbAmps, appendBlockSize));
+		for(long firstEntry = 0; firstEntry < nmbAmps; firstEntry += appendBlockSize) {
+			if(not amplitudeMeta.readAmplitudes(amplitudes, firstEntry, min(appendBlockSize, nmbAmps - firstEntry))) {
+				printWarn << "could not read amplitudes [" << firstEntry << ", "
+				          << min(firstEntry + appendBlockSize, nmbAmps) << ") to be appended." << endl;
+				return false;
+			}
+			addAmplitudes(amplitudes);
+		}
+		return true;
+	}
+	TTree* inputTree = amplitudeMeta.amplitudeTree();
+	if(not inputTree) {
+		printWarn << "input tree not found in metadata." << endl;
+		return false;
+	}
+	amplitudeTreeLeaf* inputLeaf = 0;
+	if(inputTree->SetBranchAddress(amplitudeMetadata::amplitudeLeafName.c_str(), &inputLeaf) < 0) {
+		printWarn << "could not set address for branch '" << amplitudeMetadata::amplitudeLeafName << "'." << endl;
+		return false;
+	}
+	// the writer stores a single amplitude per event, so incoherent
+	// sub-amplitudes cannot be appended
+	bool success = true;
+	const long int nmbEntries = inputTree->GetEntries();
+	for(long int eventIndex = 0; eventIndex < nmbEntries; ++eventIndex) {
+		inputTree->GetEntry(eventIndex);
+		if(inputLeaf->nmbIncohSubAmps() != 1) {
+			printWarn << "amplitude at entry " << eventIndex << " has " << inputLeaf->nmbIncohSubAmps()
+			          << " incoherent sub-amplitudes, expected one." << endl;
+			success = false;
+			break;
+		}
+		addAmplitude(inputLeaf->incohSubAmp(0));
+	}
+	inputTree->ResetBranchAddresses();
+	delete inputLeaf;
+	return success;
+}
+
+
 void rpwa::amplitudeFileWriter::reset()
 {
 	if(_ampTreeLeaf) {
 		delete _ampTreeLeaf;
 		_ampTreeLeaf = 0;
 	}
+	if(_dataFile.isOpenForWriting()) {
+		// an unfinished data file is useless, as no metadata refer to it
+		const string dataFileName = _dataFile.fileName();
+		_dataFile.close();
+		remove(dataFileName.c_str());
+	}
 	_outputFile = 0;
 	_hashCalculator = hashCalculator();
 	_initialized = false;
@@ -103,6 +230,12 @@ bool rpwa::amplitudeFileWriter::finalize()
 		printWarn << "trying to finalize when not initialized." << endl;
 		return false;
 	}
+	if(_dataFile.isOpenForWriting() and not _dataFile.closeForWriting()) {
+		printWarn << "could not finish amplitude data file." << endl;
+		remove(_dataFile.fileName().c_str());
+		reset();
+		return false;
+	}
 	_metadata.setContentHash(_hashCalculator.hash());
 	_outputFile->cd();
 	_metadata.Write(_metadata.getObjectNames().second.c_str());
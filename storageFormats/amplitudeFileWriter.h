@@ -3,6 +3,7 @@
 
 #include <complex>
 
+#include "amplitudeDataFile.h"
 #include "amplitudeMetadata.h"
 #include "hashCalculator.h"
 
@@ -25,10 +26,15 @@ namespace rpwa {
 		                const std::string&                            keyfileContent,
 		                const std::string&                            objectBasename,
 		                const int&                                    splitlevel = 99,
-		                const int&                                    buffsize = 256000);
+		                const int&                                    buffsize = 256000,
+		                const bool&                                   columnar = false,          // write amplitudes to a raw, memory-mappable data file instead of a tree
+		                const bool&                                   singlePrecision = false);  // store amplitudes as std::complex<float> (columnar files only)
 
 		void addAmplitude(const std::complex<double>& amplitude);
 		void addAmplitudes(const std::vector<std::complex<double> >& amplitudes);
+		// appends all amplitudes stored in the tree of the given file, e.g. to merge several
+		// event-range shards into one file (the content hash is updated accordingly)
+		bool appendAmplitudeTree(const rpwa::amplitudeMetadata& amplitudeMeta);
 
 		void reset();
 
@@ -42,6 +48,7 @@ namespace rpwa {
 		TFile* _outputFile;
 		rpwa::amplitudeMetadata _metadata;
 		rpwa::amplitudeTreeLeaf* _ampTreeLeaf;
+		rpwa::amplitudeDataFile _dataFile;
 		hashCalculator _hashCalculator;
 
 	};
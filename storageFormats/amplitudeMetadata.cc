@@ -2,12 +2,17 @@
 #include "amplitudeMetadata.h"
 
 #include <algorithm>
+#include <thread>
+
+#include <unistd.h>
 
 #include <boost/progress.hpp>
 
 #include <TFile.h>
+#include <TKey.h>
 #include <TTree.h>
 
+#include "amplitudeDataFile.h"
 #include "amplitudeTreeLeaf.h"
 #include "hashCalculator.h"
 #include "reportingUtils.hpp"
@@ -17,22 +22,62 @@ using namespace std;
 
 const std::string rpwa::amplitudeMetadata::amplitudeLeafName = "amplitude";
 
+
+namespace {
+
+	// size of the tree cache used for reading amplitudes in bytes
+	const Long64_t treeCacheSize = 64 << 20;
+
+}
+
 rpwa::amplitudeMetadata::amplitudeMetadata()
 	: _contentHash(""),
 	  _eventMetadata(),
 	  _keyfileContent(""),
 	  _rootpwaGitHash(""),
 	  _objectBaseName(""),
-	  _amplitudeTree(0) { }
+	  _amplitudeDataFileName(""),
+	  _singlePrecision(false),
+	  _amplitudeTree(0),
+	  _amplitudeDataFile(0) { }
 
 
-rpwa::amplitudeMetadata::~amplitudeMetadata() { }
+rpwa::amplitudeMetadata::~amplitudeMetadata()
+{
+	delete _amplitudeDataFile;
+}
 
 
 string rpwa::amplitudeMetadata::recalculateHash(const bool& printProgress) const
 {
 	amplitudeTreeLeaf* ampTreeLeaf = 0;
-	hashCalculator hashor;
+	// the hash is recalculated with the algorithm the stored hash was calculated with
+	const hashCalculator::hashAlgorithm algorithm = hashCalculator::algorithmOfHash(_contentHash);
+	hashCalculator hashor(algorithm);
+	if(isColumnar()) {
+		const complex<double>* amps = amplitudeData();
+		const complex<float>* singlePrecisionAmps = singlePrecisionAmplitudeData();
+		if(not amps and not singlePrecisionAmps) {
+			printWarn << "amplitude data file not opened." << endl;
+			return "";
+		}
+		const long nmbAmps = nmbAmplitudes();
+		if(algorithm == hashCalculator::XXH64) {
+			// the chunks of the mapped amplitudes are hashed in parallel
+			return amps ? hashCalculator::hashValues(amps, nmbAmps, algorithm)
+			            : hashCalculator::hashValues(singlePrecisionAmps, nmbAmps, algorithm);
+		}
+		boost::progress_display* progressIndicator = printProgress ? new boost::progress_display(nmbAmps, cout, "") : 0;
+		for(long eventNumber = 0; eventNumber < nmbAmps; ++eventNumber) {
+			if(progressIndicator) {
+				++(*progressIndicator);
+			}
+			// the hash of single-precision amplitudes is calculated from their values converted to double
+			hashor.Update(amps ? amps[eventNumber] : complex<double>(singlePrecisionAmps[eventNumber]));
+		}
+		delete progressIndicator;
+		return hashor.hash();
+	}
 	if(not _amplitudeTree) {
 		printWarn << "input tree not found in metadata." << endl;
 		return "";
@@ -42,14 +87,36 @@ string rpwa::amplitudeMetadata::recalculateHash(const bool& printProgress) const
 		printWarn << "could not set address for branch '" << rpwa::amplitudeMetadata::amplitudeLeafName << "'." << endl;
 		return "";
 	}
-	boost::progress_display* progressIndicator = printProgress ? new boost::progress_display(_amplitudeTree->GetEntries(), cout, "") : 0;
-	for(long eventNumber = 0; eventNumber < _amplitudeTree->GetEntries(); ++eventNumber) {
-		_amplitudeTree->GetEntry(eventNumber);
-		if(progressIndicator) {
-			++(*progressIndicator);
+	// the amplitudes are read in chunks, and each chunk is hashed in a
+	// separate thread while the next one is read from the tree
+	const long nmbEntries = _amplitudeTree->GetEntries();
+	const long nmbEntriesPerChunk = hashCalculator::chunkSize / 2;
+	vector<complex<double> > chunks[2];
+	thread hashThread;
+	boost::progress_display* progressIndicator = printProgress ? new boost::progress_display(nmbEntries, cout, "") : 0;
+	for(long firstEntry = 0, chunkIndex = 0; firstEntry < nmbEntries; firstEntry += nmbEntriesPerChunk, ++chunkIndex) {
+		vector<complex<double> >& chunk = chunks[chunkIndex % 2];
+		chunk.resize(min(nmbEntriesPerChunk, nmbEntries - firstEntry));
+		for(size_t i = 0; i < chunk.size(); ++i) {
+			_amplitudeTree->GetEntry(firstEntry + i);
+			if(progressIndicator) {
+				++(*progressIndicator);
+			}
+			chunk[i] = ampTreeLeaf->amp();
+		}
+		if(hashThread.joinable()) {
+			hashThread.join();
 		}
-		hashor.Update(ampTreeLeaf->amp());
+		hashThread = thread([&hashor, &chunk]() {
+			for(size_t i = 0; i < chunk.size(); ++i) {
+				hashor.Update(chunk[i]);
+			}
+		});
+	}
+	if(hashThread.joinable()) {
+		hashThread.join();
 	}
+	delete progressIndicator;
 	return hashor.hash();
 }
 
@@ -60,8 +127,12 @@ ostream& rpwa::amplitudeMetadata::print(ostream& out) const
 	    << "    contentHash ......... '" << _contentHash << "'"        << endl
 	    << "    object base name .... '" << _objectBaseName << "'"     << endl
 	    << "    rootpwa git hash .... '" << _rootpwaGitHash << "'"     << endl;
-	if(_amplitudeTree) {
-		out << "    amplitude entries ... "  << _amplitudeTree->GetEntries() << endl;
+	if(isColumnar()) {
+		out << "    amplitude data file . '" << _amplitudeDataFileName << "'" << endl;
+	}
+	out << "    precision ........... " << (_singlePrecision ? "single" : "double") << endl;
+	if(_amplitudeTree or _amplitudeDataFile) {
+		out << "    amplitude entries ... "  << nmbAmplitudes() << endl;
 	}
 	out << endl;
 	out << "connected event metadata information:" << endl;
@@ -83,6 +154,25 @@ const amplitudeMetadata* rpwa::amplitudeMetadata::readAmplitudeFile(TFile* input
 		}
 		return 0;
 	}
+	if(amplitudeMeta->isColumnar()) {
+		const string dataFilePath = amplitudeMeta->dataFilePath(inputFile, objectBaseName);
+		amplitudeMeta->_amplitudeDataFile = new amplitudeDataFile();
+		if(not amplitudeMeta->_amplitudeDataFile->openForReading(dataFilePath, quiet)) {
+			if(not quiet) {
+				printWarn << "could not open amplitude data file '" << dataFilePath << "'." << endl;
+			}
+			delete amplitudeMeta;
+			return 0;
+		}
+		if(amplitudeMeta->_amplitudeDataFile->singlePrecision() != amplitudeMeta->_singlePrecision) {
+			if(not quiet) {
+				printWarn << "precision of amplitude data file '" << dataFilePath << "' does not match the metadata." << endl;
+			}
+			delete amplitudeMeta;
+			return 0;
+		}
+		return amplitudeMeta;
+	}
 	amplitudeMeta->_amplitudeTree = (TTree*)inputFile->Get(objectNames.first.c_str());
 	if(not amplitudeMeta->_amplitudeTree) {
 		if(not quiet) {
@@ -94,6 +184,170 @@ const amplitudeMetadata* rpwa::amplitudeMetadata::readAmplitudeFile(TFile* input
 }
 
 
+long rpwa::amplitudeMetadata::nmbAmplitudesInFile(TFile* inputFile, const string& objectBaseName)
+{
+	const pair<string, string> objectNames = amplitudeMetadata::getObjectNames(objectBaseName);
+	// the metadata are written last
+	amplitudeMetadata* amplitudeMeta = (amplitudeMetadata*)inputFile->Get(objectNames.second.c_str());
+	if(not amplitudeMeta) {
+		return -1;
+	}
+	long nmbAmps = -1;
+	if(not amplitudeMeta->_contentHash.empty()) {
+		if(amplitudeMeta->isColumnar()) {
+			nmbAmps = amplitudeDataFile::readNmbAmplitudes(amplitudeMeta->dataFilePath(inputFile, objectBaseName));
+		} else {
+			const TTree* amplitudeTree = (TTree*)inputFile->Get(objectNames.first.c_str());
+			nmbAmps = amplitudeTree ? amplitudeTree->GetEntries() : -2;
+		}
+	}
+	delete amplitudeMeta;
+	return nmbAmps;
+}
+
+
+long rpwa::amplitudeMetadata::nmbAmplitudes() const
+{
+	if(_amplitudeDataFile) {
+		return _amplitudeDataFile->nmbAmplitudes();
+	}
+	if(_amplitudeTree) {
+		return _amplitudeTree->GetEntries();
+	}
+	return 0;
+}
+
+
+const complex<double>* rpwa::amplitudeMetadata::amplitudeData() const
+{
+	if(not _amplitudeDataFile) {
+		return 0;
+	}
+	return _amplitudeDataFile->amplitudes();
+}
+
+
+const complex<float>* rpwa::amplitudeMetadata::singlePrecisionAmplitudeData() const
+{
+	if(not _amplitudeDataFile) {
+		return 0;
+	}
+	return _amplitudeDataFile->singlePrecisionAmplitudes();
+}
+
+
+bool rpwa::amplitudeMetadata::readAmplitudes(vector<complex<double> >& amplitudes,
+                                             const long                firstEntry,
+                                             const long                nmbEntries) const
+{
+	const long nmbAmps = nmbAmplitudes();
+	const long lastEntry = (nmbEntries < 0) ? nmbAmps : firstEntry + nmbEntries;
+	if(firstEntry < 0 or lastEntry > nmbAmps or firstEntry > lastEntry) {
+		printWarn << "requested amplitudes [" << firstEntry << ", " << lastEntry << ") are out of range "
+		          << "[0, " << nmbAmps << ")." << endl;
+		return false;
+	}
+	amplitudes.resize(lastEntry - firstEntry);
+	if(_amplitudeDataFile) {
+		return amplitudes.empty() or _amplitudeDataFile->readAmplitudes(&amplitudes[0], firstEntry, lastEntry - firstEntry);
+	}
+	if(not _amplitudeTree) {
+		printWarn << "neither amplitude tree nor amplitude data file found in metadata." << endl;
+		return false;
+	}
+	return amplitudes.empty() or readTreeAmplitudes(&amplitudes[0], 0, firstEntry, lastEntry - firstEntry);
+}
+
+
+bool rpwa::amplitudeMetadata::readAmplitudes(vector<complex<double> >& amplitudes,
+                                             const vector<long>&       entries) const
+{
+	const long nmbAmps = nmbAmplitudes();
+	for(size_t i = 0; i < entries.size(); ++i) {
+		if(entries[i] < 0 or entries[i] >= nmbAmps or (i > 0 and entries[i] <= entries[i - 1])) {
+			printWarn << "requested amplitude entries are not in ascending order or out of range "
+			          << "[0, " << nmbAmps << ")." << endl;
+			return false;
+		}
+	}
+	amplitudes.resize(entries.size());
+	if(entries.empty()) {
+		return true;
+	}
+	if(_amplitudeDataFile) {
+		const complex<double>* amps = amplitudeData();
+		const complex<float>* singlePrecisionAmps = singlePrecisionAmplitudeData();
+		for(size_t i = 0; i < entries.size(); ++i) {
+			amplitudes[i] = amps ? amps[entries[i]] : complex<double>(singlePrecisionAmps[entries[i]]);
+		}
+		return true;
+	}
+	if(not _amplitudeTree) {
+		printWarn << "neither amplitude tree nor amplitude data file found in metadata." << endl;
+		return false;
+	}
+	return readTreeAmplitudes(&amplitudes[0], &entries[0], entries.front(), entries.size());
+}
+
+
+bool rpwa::amplitudeMetadata::readTreeAmplitudes(complex<double>* amplitudes,
+                                                 const long*      entries,
+                                                 const long       firstEntry,
+                                                 const long       nmbEntries) const
+{
+	amplitudeTreeLeaf* ampTreeLeaf = 0;
+	if(_amplitudeTree->SetBranchAddress(rpwa::amplitudeMetadata::amplitudeLeafName.c_str(), &ampTreeLeaf) < 0) {
+		printWarn << "could not set address for branch '" << rpwa::amplitudeMetadata::amplitudeLeafName << "'." << endl;
+		return false;
+	}
+	// only the sub-amplitudes are read from split trees, the labels are not
+	// needed. the baskets of the requested entries are read in large blocks
+	// through the tree cache instead of one basket at a time
+	UInt_t nmbLabelBranches = 0;
+	_amplitudeTree->SetBranchStatus("*_incohSubAmpLabels*", 0, &nmbLabelBranches);
+	const long lastEntry = entries ? entries[nmbEntries - 1] : firstEntry + nmbEntries - 1;
+	_amplitudeTree->SetCacheSize(treeCacheSize);
+	_amplitudeTree->AddBranchToCache("*", true);
+	_amplitudeTree->SetCacheEntryRange(firstEntry, lastEntry + 1);
+	bool success = true;
+	for(long i = 0; i < nmbEntries; ++i) {
+		const long eventNumber = entries ? entries[i] : firstEntry + i;
+		_amplitudeTree->GetEntry(eventNumber);
+		if(ampTreeLeaf->nmbIncohSubAmps() != 1) {
+			printWarn << "amplitude at entry " << eventNumber << " has " << ampTreeLeaf->nmbIncohSubAmps()
+			          << " incoherent sub-amplitudes, expected one." << endl;
+			success = false;
+			break;
+		}
+		amplitudes[i] = ampTreeLeaf->incohSubAmp(0);
+	}
+	if(nmbLabelBranches > 0) {
+		_amplitudeTree->SetBranchStatus("*_incohSubAmpLabels*", 1);
+	}
+	_amplitudeTree->ResetBranchAddresses();
+	delete ampTreeLeaf;
+	return success;
+}
+
+
+map<string, string> rpwa::amplitudeMetadata::amplitudeDataFilesInFile(TFile* inputFile)
+{
+	map<string, string> dataFiles;
+	TIter nextKey(inputFile->GetListOfKeys());
+	while(TKey* key = (TKey*)nextKey()) {
+		if(string(key->GetClassName()) != amplitudeMetadata::Class()->GetName()) {
+			continue;
+		}
+		amplitudeMetadata* amplitudeMeta = (amplitudeMetadata*)key->ReadObj();
+		if(amplitudeMeta and amplitudeMeta->isColumnar()) {
+			dataFiles[amplitudeMeta->objectBaseName()] = amplitudeMeta->dataFilePath(inputFile, amplitudeMeta->objectBaseName());
+		}
+		delete amplitudeMeta;
+	}
+	return dataFiles;
+}
+
+
 pair<string, string> rpwa::amplitudeMetadata::getObjectNames(const string& objectBaseName)
 {
 	std::stringstream sstr;
@@ -107,6 +361,22 @@ pair<string, string> rpwa::amplitudeMetadata::getObjectNames(const string& objec
 }
 
 
+string rpwa::amplitudeMetadata::dataFilePath(TFile* inputFile, const string& objectBaseName) const
+{
+	// the amplitudes are stored in a raw data file next to the amplitude
+	// file; it is looked up by the current name of the amplitude file
+	// first, so that renamed or linked copies of both files stay usable
+	string fileName = amplitudeDataFile::dataFileName(inputFile->GetName(), objectBaseName);
+	if(access(fileName.c_str(), F_OK) != 0) {
+		fileName = inputFile->GetName();
+		const size_t slashPos = fileName.rfind('/');
+		fileName = (slashPos == string::npos) ? "" : fileName.substr(0, slashPos + 1);
+		fileName += _amplitudeDataFileName;
+	}
+	return fileName;
+}
+
+
 Int_t rpwa::amplitudeMetadata::Write(const char* name, Int_t option, Int_t bufsize) const
 {
 	Int_t retval = 0;
@@ -2,6 +2,9 @@
 #ifndef AMPLITUDEMETADATA_H
 #define AMPLITUDEMETADATA_H
 
+#include <complex>
+#include <map>
+
 #include <TObject.h>
 
 #include "eventMetadata.h"
@@ -12,6 +15,8 @@ class TTree;
 
 namespace rpwa {
 
+	class amplitudeDataFile;
+
 	class amplitudeMetadata : public TObject {
 		friend class amplitudeFileWriter;
 
@@ -24,6 +29,11 @@ namespace rpwa {
 		const std::string& keyfileContent() const { return _keyfileContent; }
 		const std::string& rootpwaGitHash() const { return _rootpwaGitHash; }
 		const std::string& objectBaseName() const { return _objectBaseName; }
+		// name of the raw data file (relative to the directory of the amplitude
+		// file) the amplitudes were written to; empty if they are stored in a tree
+		const std::string& amplitudeDataFileName() const { return _amplitudeDataFileName; }
+		bool isColumnar() const { return not _amplitudeDataFileName.empty(); }
+		bool singlePrecision() const { return _singlePrecision; }  ///< whether the amplitudes are stored as std::complex<float>
 
 		std::string recalculateHash(const bool& printProgress = false) const;
 
@@ -33,8 +43,33 @@ namespace rpwa {
 		                                                  const std::string& objectBaseName,
 		                                                  const bool& quiet = false);
 
+		// number of amplitudes stored for objectBaseName in the amplitude file,
+		// which is read from the tree or from the header of the data file
+		// without mapping the amplitudes; -1 if the file was not written
+		// completely and -2 if the number could not be read, e.g. because the
+		// data file could not be opened
+		static long nmbAmplitudesInFile(TFile* inputFile,
+		                                const std::string& objectBaseName);
+
+		// maps the object base names of the columnar amplitudes in the
+		// amplitude file to the paths of the data files they are read from,
+		// as given by the metadata objects in the file
+		static std::map<std::string, std::string> amplitudeDataFilesInFile(TFile* inputFile);
+
 		TTree* amplitudeTree() const { return _amplitudeTree; } // changing this tree is not allowed (it should be const, but then you can't read it...)
 
+		// access to the amplitudes independent of the storage backend
+		long nmbAmplitudes() const;
+		const std::complex<double>* amplitudeData() const;  ///< memory-mapped amplitudes of a columnar file; NULL for trees or single precision
+		const std::complex<float>* singlePrecisionAmplitudeData() const;  ///< memory-mapped amplitudes of a single-precision columnar file; NULL otherwise
+		bool readAmplitudes(std::vector<std::complex<double> >& amplitudes,
+		                    const long                           firstEntry = 0,
+		                    const long                           nmbEntries = -1) const;
+		// reads the amplitudes at the given entries, which have to be in
+		// ascending order
+		bool readAmplitudes(std::vector<std::complex<double> >& amplitudes,
+		                    const std::vector<long>&             entries) const;
+
 		Int_t Write(const char* name = 0, Int_t option = 0, Int_t bufsize = 0) { return ((const amplitudeMetadata*)this)->Write(name, option, bufsize); }
 		Int_t Write(const char* name = 0, Int_t option = 0, Int_t bufsize = 0) const;
 
@@ -56,8 +91,20 @@ namespace rpwa {
 		void setKeyfileContent(const std::string& keyfileContent) { _keyfileContent = keyfileContent; }
 		void setRootpwaGitHash(const std::string& rootpwaGitHash) { _rootpwaGitHash = rootpwaGitHash; }
 		void setObjectBaseName(const std::string& objectBaseName) { _objectBaseName = objectBaseName; }
+		void setAmplitudeDataFileName(const std::string& amplitudeDataFileName) { _amplitudeDataFileName = amplitudeDataFileName; }
+		void setSinglePrecision(const bool singlePrecision) { _singlePrecision = singlePrecision; }
+
+		// reads the amplitudes of nmbEntries entries of the tree, either the
+		// ones listed in entries or, if entries is NULL, the ones starting at
+		// firstEntry
+		bool readTreeAmplitudes(std::complex<double>* amplitudes,
+		                        const long*           entries,
+		                        const long            firstEntry,
+		                        const long            nmbEntries) const;
 
 		static std::pair<std::string, std::string> getObjectNames(const std::string& objectBaseName);
+		// path of the data file of a columnar amplitude file
+		std::string dataFilePath(TFile* inputFile, const std::string& objectBaseName) const;
 		std::pair<std::string, std::string> getObjectNames() const { return amplitudeMetadata::getObjectNames(objectBaseName()); }
 
 		std::string _contentHash;
@@ -65,10 +112,13 @@ namespace rpwa {
 		std::string _keyfileContent;
 		std::string _rootpwaGitHash;
 		std::string _objectBaseName;
+		std::string _amplitudeDataFileName;
+		bool _singlePrecision;
 
 		mutable TTree* _amplitudeTree; //!
+		mutable rpwa::amplitudeDataFile* _amplitudeDataFile; //!
 
-		ClassDef(amplitudeMetadata, 1);
+		ClassDef(amplitudeMetadata, 3);
 
 	}; // class amplitudeMetadata
 
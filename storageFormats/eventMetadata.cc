@@ -136,7 +136,8 @@ string rpwa::eventMetadata::recalculateHash(const bool& printProgress) const
 {
 	TClonesArray* productionKinematicsMomenta = 0;
 	TClonesArray* decayKinematicsMomenta = 0;
-	hashCalculator hashor;
+	// the hash is recalculated with the algorithm the stored hash was calculated with
+	hashCalculator hashor(hashCalculator::algorithmOfHash(_contentHash));
 	if(not _eventTree) {
 		printWarn << "input tree not found in metadata." << endl;
 		return "";
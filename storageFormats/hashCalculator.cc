@@ -1,6 +1,13 @@
 
 #include "hashCalculator.h"
 
+#include <algorithm>
+#include <cstring>
+#include <iomanip>
+#include <sstream>
+#include <thread>
+#include <vector>
+
 #include <TVector3.h>
 
 #include "reportingUtils.hpp"
@@ -11,12 +18,125 @@ using namespace rpwa;
 
 
 bool rpwa::hashCalculator::_debug = false;
+hashCalculator::hashAlgorithm rpwa::hashCalculator::_defaultAlgorithm = hashCalculator::MD5;
+const string rpwa::hashCalculator::fastHashPrefix = "xxh64:";
+
+
+namespace {
+
+	const boost::uint64_t prime1 = 0x9E3779B185EBCA87ULL;
+	const boost::uint64_t prime2 = 0xC2B2AE3D27D4EB4FULL;
+	const boost::uint64_t prime3 = 0x165667B19E3779F9ULL;
+	const boost::uint64_t prime4 = 0x85EBCA77C2B2AE63ULL;
+	const boost::uint64_t prime5 = 0x27D4EB2F165667C5ULL;
+
+
+	inline
+	boost::uint64_t
+	rotateLeft(const boost::uint64_t value, const int bits)
+	{
+		return (value << bits) | (value >> (64 - bits));
+	}
+
+
+	inline
+	boost::uint64_t
+	xxhRound(boost::uint64_t accumulator, const boost::uint64_t word)
+	{
+		accumulator += word * prime2;
+		accumulator  = rotateLeft(accumulator, 31);
+		return accumulator * prime1;
+	}
+
+
+	inline
+	boost::uint64_t
+	mergeRound(boost::uint64_t hash, const boost::uint64_t accumulator)
+	{
+		hash ^= xxhRound(0, accumulator);
+		return hash * prime1 + prime4;
+	}
+
+
+	inline
+	boost::uint64_t
+	asWord(const double value)
+	{
+		boost::uint64_t word;
+		memcpy(&word, &value, sizeof(word));
+		return word;
+	}
+
+
+	string
+	fastHashString(const boost::uint64_t hash)
+	{
+		ostringstream hashString;
+		hashString << hashCalculator::fastHashPrefix << hex << setw(16) << setfill('0') << hash;
+		return hashString.str();
+	}
+
+}
+
+
+rpwa::hashCalculator::xxh64::xxh64()
+	: _nmbBufferedWords(0),
+	  _nmbBytes(0)
+{
+	_accumulators[0] = prime1 + prime2;
+	_accumulators[1] = prime2;
+	_accumulators[2] = 0;
+	_accumulators[3] = 0 - prime1;
+}
+
+
+void rpwa::hashCalculator::xxh64::update(const boost::uint64_t word)
+{
+	_buffer[_nmbBufferedWords++] = word;
+	_nmbBytes += sizeof(word);
+	if(_nmbBufferedWords == 4) {
+		for(size_t i = 0; i < 4; ++i) {
+			_accumulators[i] = xxhRound(_accumulators[i], _buffer[i]);
+		}
+		_nmbBufferedWords = 0;
+	}
+}
+
+
+boost::uint64_t rpwa::hashCalculator::xxh64::digest() const
+{
+	boost::uint64_t hash;
+	if(_nmbBytes >= 32) {
+		hash = rotateLeft(_accumulators[0], 1) + rotateLeft(_accumulators[1], 7)
+		     + rotateLeft(_accumulators[2], 12) + rotateLeft(_accumulators[3], 18);
+		for(size_t i = 0; i < 4; ++i) {
+			hash = mergeRound(hash, _accumulators[i]);
+		}
+	} else {
+		hash = prime5;
+	}
+	hash += _nmbBytes;
+	for(size_t i = 0; i < _nmbBufferedWords; ++i) {
+		hash ^= xxhRound(0, _buffer[i]);
+		hash  = rotateLeft(hash, 27) * prime1 + prime4;
+	}
+	hash ^= hash >> 33;
+	hash *= prime2;
+	hash ^= hash >> 29;
+	hash *= prime3;
+	hash ^= hash >> 32;
+	return hash;
+}
 
 
 void rpwa::hashCalculator::Update(const double& value) {
 	if(_debug) {
 		printDebug << "updating with " << value << "." << endl;
 	}
+	if(_algorithm == XXH64) {
+		updateFastHash(value);
+		return;
+	}
 	TMD5::Update((UChar_t*)&value, 8);
 }
 
@@ -36,3 +156,105 @@ void rpwa::hashCalculator::Update(const TVector3& vector) {
 	Update(vector.Y());
 	Update(vector.Z());
 }
+
+
+string rpwa::hashCalculator::hash()
+{
+	if(_algorithm == XXH64) {
+		xxh64 chunkHashes = _chunkHashes;
+		if(_nmbValuesInChunk > 0) {
+			chunkHashes.update(_chunkHash.digest());
+		}
+		return fastHashString(chunkHashes.digest());
+	}
+	TMD5::Final();
+	return TMD5::AsString();
+}
+
+
+hashCalculator::hashAlgorithm rpwa::hashCalculator::algorithmOfHash(const string& hash)
+{
+	if(hash.compare(0, fastHashPrefix.size(), fastHashPrefix) == 0) {
+		return XXH64;
+	}
+	return MD5;
+}
+
+
+string rpwa::hashCalculator::hashValues(const complex<double>* values,
+                                        const size_t            nmbValues,
+                                        const hashAlgorithm     algorithm,
+                                        const unsigned int      nmbThreads)
+{
+	return hashValuesInChunks(values, nmbValues, algorithm, nmbThreads);
+}
+
+
+string rpwa::hashCalculator::hashValues(const complex<float>* values,
+                                        const size_t           nmbValues,
+                                        const hashAlgorithm    algorithm,
+                                        const unsigned int     nmbThreads)
+{
+	return hashValuesInChunks(values, nmbValues, algorithm, nmbThreads);
+}
+
+
+template<typename T>
+string rpwa::hashCalculator::hashValuesInChunks(const complex<T>*   values,
+                                                const size_t        nmbValues,
+                                                const hashAlgorithm algorithm,
+                                                const unsigned int  nmbThreads)
+{
+	if(algorithm != XXH64) {
+		hashCalculator hashor(algorithm);
+		for(size_t i = 0; i < nmbValues; ++i) {
+			hashor.Update(complex<double>(values[i]));
+		}
+		return hashor.hash();
+	}
+	// each complex value contributes two doubles to a chunk
+	const size_t valuesPerChunk = chunkSize / 2;
+	const size_t nmbChunks      = (nmbValues + valuesPerChunk - 1) / valuesPerChunk;
+	vector<boost::uint64_t> chunkHashes(nmbChunks);
+	auto hashChunks = [values, nmbValues, valuesPerChunk, &chunkHashes](const size_t firstChunk, const size_t endChunk) {
+		for(size_t chunk = firstChunk; chunk < endChunk; ++chunk) {
+			xxh64 chunkHash;
+			const size_t endValue = min((chunk + 1) * valuesPerChunk, nmbValues);
+			for(size_t i = chunk * valuesPerChunk; i < endValue; ++i) {
+				chunkHash.update(asWord(values[i].real()));
+				chunkHash.update(asWord(values[i].imag()));
+			}
+			chunkHashes[chunk] = chunkHash.digest();
+		}
+	};
+	size_t nmbWorkers = (nmbThreads > 0) ? nmbThreads : thread::hardware_concurrency();
+	nmbWorkers = max((size_t)1, min(nmbWorkers, nmbChunks));
+	if(nmbWorkers == 1) {
+		hashChunks(0, nmbChunks);
+	} else {
+		// each thread hashes a contiguous range of chunks
+		vector<thread> workers;
+		for(size_t i = 0; i < nmbWorkers; ++i) {
+			workers.push_back(thread(hashChunks, (i * nmbChunks) / nmbWorkers, ((i + 1) * nmbChunks) / nmbWorkers));
+		}
+		for(size_t i = 0; i < nmbWorkers; ++i) {
+			workers[i].join();
+		}
+	}
+	xxh64 hashOfChunkHashes;
+	for(size_t chunk = 0; chunk < nmbChunks; ++chunk) {
+		hashOfChunkHashes.update(chunkHashes[chunk]);
+	}
+	return fastHashString(hashOfChunkHashes.digest());
+}
+
+
+void rpwa::hashCalculator::updateFastHash(const double& value)
+{
+	_chunkHash.update(asWord(value));
+	if(++_nmbValuesInChunk == chunkSize) {
+		_chunkHashes.update(_chunkHash.digest());
+		_chunkHash        = xxh64();
+		_nmbValuesInChunk = 0;
+	}
+}
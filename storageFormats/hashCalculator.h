@@ -1,8 +1,10 @@
-
 #ifndef HASHCALCULATOR_H
 #define HASHCALCULATOR_H
 
 #include <complex>
+#include <string>
+
+#include <boost/cstdint.hpp>
 
 #include <TMD5.h>
 
@@ -11,28 +13,105 @@ class TVector3;
 
 namespace rpwa {
 
+	// calculates the content hashes of event, amplitude and integral files
+	//
+	// besides MD5 a much faster non-cryptographic hash is available: the
+	// values are split into chunks of chunkSize values, the chunks are hashed
+	// with XXH64 and the hash is the XXH64 hash of the chunk hashes. the
+	// chunks can thus be hashed in parallel. fast hashes are marked by the
+	// prefix 'xxh64:', so that the algorithm of a stored hash is known when it
+	// is verified
 	class hashCalculator : public TMD5 {
 
 	  public:
 
+		enum hashAlgorithm {
+			MD5,
+			XXH64
+		};
+
 		hashCalculator()
-			: TMD5() { }
+			: TMD5(),
+			  _algorithm(_defaultAlgorithm),
+			  _chunkHash(),
+			  _chunkHashes(),
+			  _nmbValuesInChunk(0) { }
+		explicit hashCalculator(const hashAlgorithm algorithm)
+			: TMD5(),
+			  _algorithm(algorithm),
+			  _chunkHash(),
+			  _chunkHashes(),
+			  _nmbValuesInChunk(0) { }
 
 		void Update(const double& value);
 		void Update(const std::complex<double>& value);
 		void Update(const TVector3& vector);
 
-		std::string hash() {
-			TMD5::Final();
-			return TMD5::AsString();
-		}
+		std::string hash();
+
+		hashAlgorithm algorithm() const { return _algorithm; }
 
 		const bool& debug() { return _debug; }
 		void setDebug(const bool& debug = true) { _debug = debug; }
 
+		// algorithm used by default-constructed hash calculators, i.e. for all
+		// newly written files
+		static hashAlgorithm defaultAlgorithm() { return _defaultAlgorithm; }
+		static void setDefaultAlgorithm(const hashAlgorithm algorithm) { _defaultAlgorithm = algorithm; }
+		// algorithm a stored hash was calculated with
+		static hashAlgorithm algorithmOfHash(const std::string& hash);
+
+		// hash of the values as calculated by Update() for each value; with the
+		// fast algorithm the chunks are hashed in nmbThreads threads (0 for the
+		// number of cores). single-precision values are hashed as doubles
+		static std::string hashValues(const std::complex<double>* values,
+		                              const size_t                nmbValues,
+		                              const hashAlgorithm         algorithm,
+		                              const unsigned int          nmbThreads = 0);
+		static std::string hashValues(const std::complex<float>* values,
+		                              const size_t               nmbValues,
+		                              const hashAlgorithm        algorithm,
+		                              const unsigned int         nmbThreads = 0);
+
+		static const std::string fastHashPrefix;
+		static const size_t      chunkSize = 1 << 16;  ///< number of doubles hashed into one chunk hash
+
 	  private:
 
-		static bool _debug;
+		// XXH64 with seed 0 of a stream of 64 bit words
+		class xxh64 {
+
+		  public:
+
+			xxh64();
+
+			void update(const boost::uint64_t word);
+			boost::uint64_t digest() const;
+
+		  private:
+
+			boost::uint64_t _accumulators[4];
+			boost::uint64_t _buffer[4];
+			size_t          _nmbBufferedWords;
+			boost::uint64_t _nmbBytes;
+
+		};
+
+		template<typename T>
+		static std::string hashValuesInChunks(const std::complex<T>* values,
+		                                      const size_t           nmbValues,
+		                                      const hashAlgorithm    algorithm,
+		                                      const unsigned int     nmbThreads);
+
+		void updateFastHash(const double& value);
+
+		hashAlgorithm _algorithm;
+		xxh64         _chunkHash;         ///< hash of the current chunk
+		xxh64         _chunkHashes;       ///< hash of the hashes of the completed chunks
+		size_t        _nmbValuesInChunk;
+
+		static bool          _debug;
+		static hashAlgorithm _defaultAlgorithm;
 
 	}; // class hashCalculator
 